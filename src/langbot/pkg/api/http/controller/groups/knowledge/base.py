@@ -82,6 +82,33 @@ class KnowledgeBaseRouterGroup(group.RouterGroup):
             await self.ap.knowledge_service.delete_file(knowledge_base_uuid, file_id)
             return self.success({})
 
+        @self.route(
+            '/<knowledge_base_uuid>/files/<file_id>/reindex',
+            methods=['POST'],
+            auth_type=group.AuthType.USER_TOKEN_OR_API_KEY,
+        )
+        async def reindex_file_in_kb(file_id: str, knowledge_base_uuid: str) -> str:
+            json_data = await quart.request.json
+            new_file_id = json_data.get('file_id')
+            if not new_file_id:
+                return self.http_status(400, -1, 'File ID is required')
+
+            task_id = await self.ap.knowledge_service.reindex_file(knowledge_base_uuid, file_id, new_file_id)
+            return self.success(
+                {
+                    'task_id': task_id,
+                }
+            )
+
+        @self.route(
+            '/<knowledge_base_uuid>/dedup-report',
+            methods=['GET'],
+            auth_type=group.AuthType.USER_TOKEN_OR_API_KEY,
+        )
+        async def get_knowledge_base_dedup_report(knowledge_base_uuid: str) -> str:
+            report = await self.ap.knowledge_service.get_dedup_report(knowledge_base_uuid)
+            return self.success(data=report)
+
         @self.route(
             '/<knowledge_base_uuid>/retrieve',
             methods=['POST'],
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import datetime
+import json
+import typing
+
 import quart
 
 from .. import group
+from ...service import monitoring as monitoring_service
+
+COUNT_MODES = ('exact', 'approximate', 'none')
 
 
 def parse_iso_datetime(datetime_str: str | None) -> datetime.datetime | None:
@@ -21,6 +27,137 @@ def parse_iso_datetime(datetime_str: str | None) -> datetime.datetime | None:
     return dt
 
 
+def parse_page_args() -> tuple[int, int, str | None, str]:
+    """limit, offset, cursor and count of a list request, raises ValueError on bad input"""
+    limit = int(quart.request.args.get('limit', 100))
+    offset = int(quart.request.args.get('offset', 0))
+    cursor = quart.request.args.get('cursor') or None
+    count = quart.request.args.get('count', 'exact')
+
+    if count not in COUNT_MODES:
+        raise ValueError('count must be one of: ' + ', '.join(COUNT_MODES))
+    if cursor is not None:
+        monitoring_service.decode_cursor(cursor)
+
+    return limit, offset, cursor, count
+
+
+EXPORT_HEADERS = {
+    'messages': [
+        'id',
+        'timestamp',
+        'bot_id',
+        'bot_name',
+        'pipeline_id',
+        'pipeline_name',
+        'runner_name',
+        'message_content',
+        'message_text',
+        'session_id',
+        'status',
+        'level',
+        'platform',
+        'user_id',
+    ],
+    'llm-calls': [
+        'id',
+        'timestamp',
+        'model_name',
+        'input_tokens',
+        'output_tokens',
+        'total_tokens',
+        'duration_ms',
+        'cost',
+        'status',
+        'bot_id',
+        'bot_name',
+        'pipeline_id',
+        'pipeline_name',
+        'session_id',
+        'message_id',
+        'error_message',
+    ],
+    'embedding-calls': [
+        'id',
+        'timestamp',
+        'model_name',
+        'prompt_tokens',
+        'total_tokens',
+        'duration_ms',
+        'input_count',
+        'status',
+        'error_message',
+        'knowledge_base_id',
+        'query_text',
+        'session_id',
+        'message_id',
+        'call_type',
+    ],
+    'errors': [
+        'id',
+        'timestamp',
+        'error_type',
+        'error_message',
+        'bot_id',
+        'bot_name',
+        'pipeline_id',
+        'pipeline_name',
+        'session_id',
+        'message_id',
+        'stack_trace',
+    ],
+    'sessions': [
+        'session_id',
+        'bot_id',
+        'bot_name',
+        'pipeline_id',
+        'pipeline_name',
+        'message_count',
+        'start_time',
+        'last_activity',
+        'is_active',
+        'platform',
+        'user_id',
+    ],
+}
+"""CSV columns of each export type"""
+
+EXPORT_CHUNK_ROWS = 200
+"""Rows encoded into one chunk of a streamed export"""
+
+
+async def iter_csv(
+    rows: typing.AsyncIterator[dict],
+    headers: list[str],
+    escape: typing.Callable[[typing.Any], str],
+) -> typing.AsyncIterator[bytes]:
+    """Encode rows as CSV with UTF-8 BOM for Excel compatibility"""
+    yield ('\ufeff' + ','.join(headers) + '\n').encode('utf-8')
+
+    lines = []
+    async for row in rows:
+        lines.append(','.join(escape(row.get(header, '')) for header in headers) + '\n')
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+async def iter_jsonl(rows: typing.AsyncIterator[dict]) -> typing.AsyncIterator[bytes]:
+    """Encode rows as JSON Lines"""
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False) + '\n')
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
 @group.group_class('monitoring', '/api/v1/monitoring')
 class MonitoringRouterGroup(group.RouterGroup):
     async def initialize(self) -> None:
@@ -46,6 +183,33 @@ class MonitoringRouterGroup(group.RouterGroup):
 
             return self.success(data=metrics)
 
+        @self.route('/timeseries', methods=['GET'], auth_type=group.AuthType.USER_TOKEN)
+        async def get_timeseries() -> str:
+            """Get per-minute or per-hour counters for charts"""
+            # Parse query parameters
+            bot_ids = quart.request.args.getlist('botId')
+            pipeline_ids = quart.request.args.getlist('pipelineId')
+            start_time_str = quart.request.args.get('startTime')
+            end_time_str = quart.request.args.get('endTime')
+            granularity = quart.request.args.get('granularity', 'hour')
+
+            if granularity not in ('minute', 'hour'):
+                return self.http_status(400, -1, 'granularity must be minute or hour')
+
+            # Parse datetime
+            start_time = parse_iso_datetime(start_time_str)
+            end_time = parse_iso_datetime(end_time_str)
+
+            points = await self.ap.monitoring_service.get_timeseries(
+                bot_ids=bot_ids if bot_ids else None,
+                pipeline_ids=pipeline_ids if pipeline_ids else None,
+                start_time=start_time,
+                end_time=end_time,
+                granularity=granularity,
+            )
+
+            return self.success(data={'points': points, 'granularity': granularity})
+
         @self.route('/messages', methods=['GET'], auth_type=group.AuthType.USER_TOKEN)
         async def get_messages() -> str:
             """Get message logs"""
@@ -55,8 +219,11 @@ class MonitoringRouterGroup(group.RouterGroup):
             session_ids = quart.request.args.getlist('sessionId')
             start_time_str = quart.request.args.get('startTime')
             end_time_str = quart.request.args.get('endTime')
-            limit = int(quart.request.args.get('limit', 100))
-            offset = int(quart.request.args.get('offset', 0))
+
+            try:
+                limit, offset, cursor, count = parse_page_args()
+            except ValueError as e:
+                return self.http_status(400, -1, str(e))
 
             # Parse datetime
             start_time = parse_iso_datetime(start_time_str)
@@ -70,6 +237,8 @@ class MonitoringRouterGroup(group.RouterGroup):
                 end_time=end_time,
                 limit=limit,
                 offset=offset,
+                cursor=cursor,
+                count=count,
             )
 
             return self.success(
@@ -78,6 +247,7 @@ class MonitoringRouterGroup(group.RouterGroup):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'next_cursor': self.ap.monitoring_service.next_cursor(messages, limit),
                 }
             )
 
@@ -89,8 +259,11 @@ class MonitoringRouterGroup(group.RouterGroup):
             pipeline_ids = quart.request.args.getlist('pipelineId')
             start_time_str = quart.request.args.get('startTime')
             end_time_str = quart.request.args.get('endTime')
-            limit = int(quart.request.args.get('limit', 100))
-            offset = int(quart.request.args.get('offset', 0))
+
+            try:
+                limit, offset, cursor, count = parse_page_args()
+            except ValueError as e:
+                return self.http_status(400, -1, str(e))
 
             # Parse datetime
             start_time = parse_iso_datetime(start_time_str)
@@ -103,6 +276,8 @@ class MonitoringRouterGroup(group.RouterGroup):
                 end_time=end_time,
                 limit=limit,
                 offset=offset,
+                cursor=cursor,
+                count=count,
             )
 
             return self.success(
@@ -111,6 +286,7 @@ class MonitoringRouterGroup(group.RouterGroup):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'next_cursor': self.ap.monitoring_service.next_cursor(llm_calls, limit),
                 }
             )
 
@@ -121,8 +297,11 @@ class MonitoringRouterGroup(group.RouterGroup):
             start_time_str = quart.request.args.get('startTime')
             end_time_str = quart.request.args.get('endTime')
             knowledge_base_id = quart.request.args.get('knowledgeBaseId')
-            limit = int(quart.request.args.get('limit', 100))
-            offset = int(quart.request.args.get('offset', 0))
+
+            try:
+                limit, offset, cursor, count = parse_page_args()
+            except ValueError as e:
+                return self.http_status(400, -1, str(e))
 
             # Parse datetime
             start_time = parse_iso_datetime(start_time_str)
@@ -134,6 +313,8 @@ class MonitoringRouterGroup(group.RouterGroup):
                 knowledge_base_id=knowledge_base_id if knowledge_base_id else None,
                 limit=limit,
                 offset=offset,
+                cursor=cursor,
+                count=count,
             )
 
             return self.success(
@@ -142,6 +323,48 @@ class MonitoringRouterGroup(group.RouterGroup):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'next_cursor': self.ap.monitoring_service.next_cursor(embedding_calls, limit),
+                }
+            )
+
+        @self.route('/tool-calls', methods=['GET'], auth_type=group.AuthType.USER_TOKEN)
+        async def get_tool_calls() -> str:
+            """Get tool call records"""
+            # Parse query parameters
+            bot_ids = quart.request.args.getlist('botId')
+            pipeline_ids = quart.request.args.getlist('pipelineId')
+            tool_name = quart.request.args.get('toolName')
+            start_time_str = quart.request.args.get('startTime')
+            end_time_str = quart.request.args.get('endTime')
+
+            try:
+                limit, offset, cursor, count = parse_page_args()
+            except ValueError as e:
+                return self.http_status(400, -1, str(e))
+
+            # Parse datetime
+            start_time = parse_iso_datetime(start_time_str)
+            end_time = parse_iso_datetime(end_time_str)
+
+            tool_calls, total = await self.ap.monitoring_service.get_tool_calls(
+                bot_ids=bot_ids if bot_ids else None,
+                pipeline_ids=pipeline_ids if pipeline_ids else None,
+                tool_name=tool_name if tool_name else None,
+                start_time=start_time,
+                end_time=end_time,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                count=count,
+            )
+
+            return self.success(
+                data={
+                    'tool_calls': tool_calls,
+                    'total': total,
+                    'limit': limit,
+                    'offset': offset,
+                    'next_cursor': self.ap.monitoring_service.next_cursor(tool_calls, limit),
                 }
             )
 
@@ -154,8 +377,11 @@ class MonitoringRouterGroup(group.RouterGroup):
             start_time_str = quart.request.args.get('startTime')
             end_time_str = quart.request.args.get('endTime')
             is_active_str = quart.request.args.get('isActive')
-            limit = int(quart.request.args.get('limit', 100))
-            offset = int(quart.request.args.get('offset', 0))
+
+            try:
+                limit, offset, cursor, count = parse_page_args()
+            except ValueError as e:
+                return self.http_status(400, -1, str(e))
 
             # Parse datetime
             start_time = parse_iso_datetime(start_time_str)
@@ -174,6 +400,8 @@ class MonitoringRouterGroup(group.RouterGroup):
                 is_active=is_active,
                 limit=limit,
                 offset=offset,
+                cursor=cursor,
+                count=count,
             )
 
             return self.success(
@@ -182,6 +410,9 @@ class MonitoringRouterGroup(group.RouterGroup):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'next_cursor': self.ap.monitoring_service.next_cursor(
+                        sessions, limit, sort_field='last_activity', key_field='session_id'
+                    ),
                 }
             )
 
@@ -193,8 +424,11 @@ class MonitoringRouterGroup(group.RouterGroup):
             pipeline_ids = quart.request.args.getlist('pipelineId')
             start_time_str = quart.request.args.get('startTime')
             end_time_str = quart.request.args.get('endTime')
-            limit = int(quart.request.args.get('limit', 100))
-            offset = int(quart.request.args.get('offset', 0))
+
+            try:
+                limit, offset, cursor, count = parse_page_args()
+            except ValueError as e:
+                return self.http_status(400, -1, str(e))
 
             # Parse datetime
             start_time = parse_iso_datetime(start_time_str)
@@ -207,6 +441,8 @@ class MonitoringRouterGroup(group.RouterGroup):
                 end_time=end_time,
                 limit=limit,
                 offset=offset,
+                cursor=cursor,
+                count=count,
             )
 
             return self.success(
@@ -215,6 +451,7 @@ class MonitoringRouterGroup(group.RouterGroup):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'next_cursor': self.ap.monitoring_service.next_cursor(errors, limit),
                 }
             )
 
@@ -322,167 +559,84 @@ class MonitoringRouterGroup(group.RouterGroup):
             details = await self.ap.monitoring_service.get_message_details(message_id)
 
             if not details.get('found'):
-                return self.error(message=f'Message {message_id} not found', code=404)
+                return self.http_status(404, -1, f'Message {message_id} not found')
 
             return self.success(data=details)
 
         @self.route('/export', methods=['GET'], auth_type=group.AuthType.USER_TOKEN)
-        async def export_data() -> tuple[str, int]:
-            """Export monitoring data as CSV"""
+        async def export_data() -> quart.Response:
+            """Export monitoring data as CSV or JSON Lines, streamed while it is read"""
             # Parse query parameters
             export_type = quart.request.args.get('type', 'messages')
+            export_format = quart.request.args.get('format', 'csv')
             bot_ids = quart.request.args.getlist('botId')
             pipeline_ids = quart.request.args.getlist('pipelineId')
             start_time_str = quart.request.args.get('startTime')
             end_time_str = quart.request.args.get('endTime')
             limit = int(quart.request.args.get('limit', 100000))
 
+            if export_type not in EXPORT_HEADERS:
+                return self.http_status(400, -1, f'Invalid export type: {export_type}')
+            if export_format not in ('csv', 'jsonl'):
+                return self.http_status(400, -1, f'Invalid export format: {export_format}')
+
             # Parse datetime
             start_time = parse_iso_datetime(start_time_str)
             end_time = parse_iso_datetime(end_time_str)
 
             # Get data based on export type
             if export_type == 'messages':
-                data = await self.ap.monitoring_service.export_messages(
+                data = self.ap.monitoring_service.export_messages(
                     bot_ids=bot_ids if bot_ids else None,
                     pipeline_ids=pipeline_ids if pipeline_ids else None,
                     start_time=start_time,
                     end_time=end_time,
                     limit=limit,
                 )
-                headers = [
-                    'id',
-                    'timestamp',
-                    'bot_id',
-                    'bot_name',
-                    'pipeline_id',
-                    'pipeline_name',
-                    'runner_name',
-                    'message_content',
-                    'message_text',
-                    'session_id',
-                    'status',
-                    'level',
-                    'platform',
-                    'user_id',
-                ]
             elif export_type == 'llm-calls':
-                data = await self.ap.monitoring_service.export_llm_calls(
+                data = self.ap.monitoring_service.export_llm_calls(
                     bot_ids=bot_ids if bot_ids else None,
                     pipeline_ids=pipeline_ids if pipeline_ids else None,
                     start_time=start_time,
                     end_time=end_time,
                     limit=limit,
                 )
-                headers = [
-                    'id',
-                    'timestamp',
-                    'model_name',
-                    'input_tokens',
-                    'output_tokens',
-                    'total_tokens',
-                    'duration_ms',
-                    'cost',
-                    'status',
-                    'bot_id',
-                    'bot_name',
-                    'pipeline_id',
-                    'pipeline_name',
-                    'session_id',
-                    'message_id',
-                    'error_message',
-                ]
             elif export_type == 'embedding-calls':
-                data = await self.ap.monitoring_service.export_embedding_calls(
+                data = self.ap.monitoring_service.export_embedding_calls(
                     start_time=start_time,
                     end_time=end_time,
                     limit=limit,
                 )
-                headers = [
-                    'id',
-                    'timestamp',
-                    'model_name',
-                    'prompt_tokens',
-                    'total_tokens',
-                    'duration_ms',
-                    'input_count',
-                    'status',
-                    'error_message',
-                    'knowledge_base_id',
-                    'query_text',
-                    'session_id',
-                    'message_id',
-                    'call_type',
-                ]
             elif export_type == 'errors':
-                data = await self.ap.monitoring_service.export_errors(
+                data = self.ap.monitoring_service.export_errors(
                     bot_ids=bot_ids if bot_ids else None,
                     pipeline_ids=pipeline_ids if pipeline_ids else None,
                     start_time=start_time,
                     end_time=end_time,
                     limit=limit,
                 )
-                headers = [
-                    'id',
-                    'timestamp',
-                    'error_type',
-                    'error_message',
-                    'bot_id',
-                    'bot_name',
-                    'pipeline_id',
-                    'pipeline_name',
-                    'session_id',
-                    'message_id',
-                    'stack_trace',
-                ]
-            elif export_type == 'sessions':
-                data = await self.ap.monitoring_service.export_sessions(
+            else:
+                data = self.ap.monitoring_service.export_sessions(
                     bot_ids=bot_ids if bot_ids else None,
                     pipeline_ids=pipeline_ids if pipeline_ids else None,
                     start_time=start_time,
                     end_time=end_time,
                     limit=limit,
                 )
-                headers = [
-                    'session_id',
-                    'bot_id',
-                    'bot_name',
-                    'pipeline_id',
-                    'pipeline_name',
-                    'message_count',
-                    'start_time',
-                    'last_activity',
-                    'is_active',
-                    'platform',
-                    'user_id',
-                ]
+
+            if export_format == 'jsonl':
+                body = iter_jsonl(data)
+                content_type = 'application/x-ndjson; charset=utf-8'
             else:
-                return self.error(message=f'Invalid export type: {export_type}', code=400)
-
-            # Generate CSV content with UTF-8 BOM for Excel compatibility
-            import io
-
-            output = io.StringIO()
-            # Write UTF-8 BOM for Excel
-            output.write('\ufeff')
-            # Write header
-            output.write(','.join(headers) + '\n')
-
-            # Escape and write each row
-            for row in data:
-                escaped_values = []
-                for header in headers:
-                    value = row.get(header, '')
-                    escaped_values.append(self.ap.monitoring_service._escape_csv_field(value))
-                output.write(','.join(escaped_values) + '\n')
-
-            csv_content = output.getvalue()
-
-            # Return as file download
-            response = await quart.make_response(csv_content)
-            response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+                body = iter_csv(data, EXPORT_HEADERS[export_type], self.ap.monitoring_service._escape_csv_field)
+                content_type = 'text/csv; charset=utf-8'
+
+            # Return as file download, rows are sent as they are read
+            response = quart.Response(body, status=200)
+            response.timeout = None
+            response.headers['Content-Type'] = content_type
             response.headers['Content-Disposition'] = (
-                f'attachment; filename="monitoring-{export_type}-{int(datetime.datetime.now().timestamp())}.csv"'
+                f'attachment; filename="monitoring-{export_type}-{int(datetime.datetime.now().timestamp())}.{export_format}"'
             )
 
-            return response, 200
+            return response
@@ -7,13 +7,20 @@ class StatsRouterGroup(group.RouterGroup):
         @self.route('/basic', methods=['GET'], auth_type=group.AuthType.USER_TOKEN)
         async def _() -> str:
             conv_count = 0
-            for session in self.ap.sess_mgr.session_list:
+            for session in self.ap.sess_mgr.sessions.values():
                 conv_count += len(session.conversations if session.conversations is not None else [])
 
             return self.success(
                 data={
-                    'active_session_count': len(self.ap.sess_mgr.session_list),
+                    'active_session_count': self.ap.sess_mgr.live_session_count,
                     'conversation_count': conv_count,
                     'query_count': self.ap.query_pool.query_id_counter,
+                    'session': self.ap.sess_mgr.get_stats(),
+                    'monitoring_writer': self.ap.monitoring_service.writer.get_stats(),
+                    'monitoring_retention': self.ap.monitoring_service.retention.get_stats(),
+                    'embedding_cache': self.ap.rag_mgr.embedding_cache.get_stats(),
+                    'response_cache': self.ap.pipeline_mgr.response_cache.get_stats(),
+                    'model_budget': self.ap.pipeline_mgr.model_budget.get_stats(),
+                    'media_store': self.ap.media_store.get_stats(),
                 }
             )
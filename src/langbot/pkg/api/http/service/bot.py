@@ -145,7 +145,7 @@ class BotService:
             await runtime_bot.run()
 
         # update all conversation that use this bot
-        for session in self.ap.sess_mgr.session_list:
+        for session in self.ap.sess_mgr.sessions.values():
             if session.using_conversation is not None and session.using_conversation.bot_uuid == bot_uuid:
                 session.using_conversation = None
 
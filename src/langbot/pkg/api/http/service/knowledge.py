@@ -85,6 +85,33 @@ class KnowledgeService:
 
         return result
 
+    async def reindex_file(self, kb_uuid: str, file_id: str, new_file_id: str) -> str:
+        """用新版本文件重建文件索引，只嵌入变化的块"""
+        runtime_kb = await self.ap.rag_mgr.get_knowledge_base_by_uuid(kb_uuid)
+        if runtime_kb is None:
+            raise Exception('Knowledge base not found')
+        if runtime_kb.get_type() != 'internal':
+            raise Exception('Only internal knowledge bases support file storage')
+        result = await runtime_kb.reindex_file(file_id, new_file_id)
+
+        # Update the KB's updated_at timestamp
+        await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.update(persistence_rag.KnowledgeBase)
+            .values(updated_at=sqlalchemy.func.now())
+            .where(persistence_rag.KnowledgeBase.uuid == kb_uuid)
+        )
+
+        return result
+
+    async def get_dedup_report(self, kb_uuid: str) -> dict:
+        """获取知识库重复块统计"""
+        runtime_kb = await self.ap.rag_mgr.get_knowledge_base_by_uuid(kb_uuid)
+        if runtime_kb is None:
+            raise Exception('Knowledge base not found')
+        if runtime_kb.get_type() != 'internal':
+            raise Exception('Only internal knowledge bases store chunks')
+        return await runtime_kb.get_dedup_report()
+
     async def retrieve_knowledge_base(self, kb_uuid: str, query: str) -> list[dict]:
         """检索知识库"""
         runtime_kb = await self.ap.rag_mgr.get_knowledge_base_by_uuid(kb_uuid)
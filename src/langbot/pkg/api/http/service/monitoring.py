@@ -1,20 +1,619 @@
 from __future__ import annotations
 
 import uuid
+import asyncio
+import base64
 import datetime
+import json
+import time
+import typing
 import sqlalchemy
 
 from ....core import app
+from ....entity.persistence import metadata as persistence_metadata
 from ....entity.persistence import monitoring as persistence_monitoring
 
 
+MINUTE = datetime.timedelta(minutes=1)
+HOUR = datetime.timedelta(hours=1)
+
+ROLLUP_COUNTERS = [
+    'message_count',
+    'message_success_count',
+    'message_error_count',
+    'llm_call_count',
+    'llm_error_count',
+    'input_tokens',
+    'output_tokens',
+    'llm_duration_sum',
+    'llm_duration_lt_1s',
+    'llm_duration_lt_3s',
+    'llm_duration_lt_10s',
+    'llm_duration_lt_30s',
+    'llm_duration_ge_30s',
+    'embedding_call_count',
+    'tool_call_count',
+    'tool_error_count',
+    'tool_duration_sum',
+    'error_count',
+]
+
+ROLLUP_UNTIL_KEY = 'monitoring_rollup_until'
+"""Metadata key of the time up to which raw records have been rolled up"""
+
+LAST_VACUUM_KEY = 'monitoring_last_vacuum'
+"""Metadata key of the time of the last retention VACUUM"""
+
+
+def floor_time(value: datetime.datetime, step: datetime.timedelta) -> datetime.datetime:
+    if step == HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+
+def ceil_time(value: datetime.datetime, step: datetime.timedelta) -> datetime.datetime:
+    floored = floor_time(value, step)
+    return floored if floored == value else floored + step
+
+
+def encode_cursor(sort_value: datetime.datetime, key: str) -> str:
+    """Opaque keyset cursor pointing at the row (sort_value, key)"""
+    payload = json.dumps([sort_value.isoformat(), key]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, str]:
+    """Raises ValueError on a malformed cursor"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, key = json.loads(payload)
+        return datetime.datetime.fromisoformat(sort_value), str(key)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def _row_model(row):
+    return row[0] if isinstance(row, tuple) else row
+
+
+class MonitoringWriter:
+    """Buffered monitoring sink
+
+    Inserts and updates are kept in a bounded in-memory buffer and written by a background
+    task in multi-row batches, when batch_size records are pending or flush_interval seconds
+    passed. Updates to the same row are merged before writing. When the buffer is full,
+    producers wait up to put_timeout seconds for a flush and the record is dropped after that.
+
+    With buffered disabled every record is written immediately.
+    """
+
+    ap: app.Application
+
+    buffered: bool
+
+    batch_size: int
+
+    flush_interval: float
+
+    max_pending: int
+
+    put_timeout: float
+
+    _inserts: dict[type, list[dict]]
+    """table -> rows to insert, in enqueue order"""
+
+    _updates: dict[tuple[type, str, typing.Any], tuple[dict, dict]]
+    """(table, key column, key) -> (values to set, values to add)"""
+
+    pending_count: int
+
+    def __init__(
+        self,
+        ap: app.Application,
+        buffered: bool = True,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        put_timeout: float = 0.5,
+    ):
+        self.ap = ap
+        self.buffered = buffered
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+
+        self._inserts = {}
+        self._updates = {}
+        self.pending_count = 0
+
+        self._flush_lock = asyncio.Lock()
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        self.enqueued_count = 0
+        self.written_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.flush_count = 0
+        self.backpressure_count = 0
+
+    @classmethod
+    def from_config(cls, ap: app.Application) -> MonitoringWriter:
+        writer_config = ap.instance_config.data.get('monitoring', {}).get('writer', {})
+        return cls(
+            ap,
+            buffered=writer_config.get('buffered', True),
+            batch_size=writer_config.get('batch_size', 200),
+            flush_interval=writer_config.get('flush_interval', 1.0),
+            max_pending=writer_config.get('max_pending', 10000),
+            put_timeout=writer_config.get('put_timeout', 0.5),
+        )
+
+    def start(self):
+        if self.buffered and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self.flush()
+
+    async def _reserve(self) -> bool:
+        """Wait for room in the buffer, False if the record has to be dropped"""
+        if self.pending_count < self.max_pending:
+            return True
+
+        self.backpressure_count += 1
+        self._wakeup.set()
+
+        try:
+            async with self._space:
+                await asyncio.wait_for(
+                    self._space.wait_for(lambda: self.pending_count < self.max_pending),
+                    timeout=self.put_timeout,
+                )
+            return True
+        except asyncio.TimeoutError:
+            self.dropped_count += 1
+            return False
+
+    def _added(self):
+        self.pending_count += 1
+        self.enqueued_count += 1
+        if self.pending_count >= self.batch_size:
+            self._wakeup.set()
+
+    async def insert(self, table: type, row: dict) -> bool:
+        """Queue a row insert, returns False if it was dropped"""
+        if not self.buffered or self._closed:
+            await self.ap.persistence_mgr.execute_async(sqlalchemy.insert(table).values(row))
+            return True
+
+        if not await self._reserve():
+            return False
+
+        self._inserts.setdefault(table, []).append(row)
+        self._added()
+        return True
+
+    async def update(
+        self,
+        table: type,
+        key_column: str,
+        key: typing.Any,
+        values: dict | None = None,
+        increments: dict | None = None,
+    ) -> bool:
+        """Queue an update of the row whose key_column equals key
+
+        values are set, increments are added to the current column values.
+        Pending updates of the same row are merged.
+        """
+        values = values or {}
+        increments = increments or {}
+
+        if not self.buffered or self._closed:
+            columns = table.__table__.c
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.update(table)
+                .where(columns[key_column] == key)
+                .values({**values, **{name: columns[name] + amount for name, amount in increments.items()}})
+            )
+            return True
+
+        update_key = (table, key_column, key)
+        pending = self._updates.get(update_key)
+        if pending is not None:
+            pending[0].update(values)
+            for name, amount in increments.items():
+                pending[1][name] = pending[1].get(name, 0) + amount
+            return True
+
+        if not await self._reserve():
+            return False
+
+        self._updates[update_key] = (dict(values), dict(increments))
+        self._added()
+        return True
+
+    async def flush(self):
+        """Write everything pending"""
+        async with self._flush_lock:
+            if not self.pending_count:
+                return
+
+            inserts, updates, count = self._inserts, self._updates, self.pending_count
+            self._inserts, self._updates, self.pending_count = {}, {}, 0
+
+            async with self._space:
+                self._space.notify_all()
+
+            try:
+                async with self.ap.persistence_mgr.get_db_engine().begin() as conn:
+                    for table, rows in inserts.items():
+                        await conn.execute(sqlalchemy.insert(table), rows)
+
+                    for statement, params in self._group_updates(updates):
+                        await conn.execute(statement, params)
+            except Exception as e:
+                self.failed_count += count
+                self.ap.logger.error(f'Failed to write {count} monitoring records: {e}')
+            else:
+                self.written_count += count
+                self.flush_count += 1
+
+    def _group_updates(self, updates: dict) -> list[tuple[typing.Any, list[dict]]]:
+        """Group updates touching the same columns into one executemany statement each"""
+        groups: dict[tuple, list[dict]] = {}
+
+        for (table, key_column, key), (values, increments) in updates.items():
+            group_key = (table, key_column, tuple(sorted(values)), tuple(sorted(increments)))
+            params = {'_key': key}
+            params.update({f'_set_{name}': value for name, value in values.items()})
+            params.update({f'_add_{name}': amount for name, amount in increments.items()})
+            groups.setdefault(group_key, []).append(params)
+
+        statements = []
+        for (table, key_column, value_names, increment_names), params in groups.items():
+            columns = table.__table__.c
+            set_values = {name: sqlalchemy.bindparam(f'_set_{name}') for name in value_names}
+            set_values.update({name: columns[name] + sqlalchemy.bindparam(f'_add_{name}') for name in increment_names})
+            statement = (
+                sqlalchemy.update(table)
+                .where(columns[key_column] == sqlalchemy.bindparam('_key'))
+                .values(set_values)
+                .execution_options(synchronize_session=False)
+            )
+            statements.append((statement, params))
+
+        return statements
+
+    async def shutdown(self):
+        """Stop the background task and write what is left"""
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> dict:
+        return {
+            'buffered': self.buffered,
+            'pending': self.pending_count,
+            'max_pending': self.max_pending,
+            'enqueued': self.enqueued_count,
+            'written': self.written_count,
+            'dropped': self.dropped_count,
+            'failed': self.failed_count,
+            'flushes': self.flush_count,
+            'backpressure_waits': self.backpressure_count,
+        }
+
+
+class MonitoringRetention:
+    """Deletes monitoring records older than their table's TTL
+
+    Raw records are rolled up first and never deleted past the rollup watermark minus the
+    rollup lookback, so the per-minute and per-hour aggregates keep counting them. Rows are
+    deleted in chunks of chunk_size, one short transaction each. On SQLite the file is
+    vacuumed and analyzed after a run that deleted rows, at most once per vacuum_interval.
+    """
+
+    TABLES: dict[str, tuple[type, str]] = {
+        'messages': (persistence_monitoring.MonitoringMessage, 'timestamp'),
+        'llm_calls': (persistence_monitoring.MonitoringLLMCall, 'timestamp'),
+        'embedding_calls': (persistence_monitoring.MonitoringEmbeddingCall, 'timestamp'),
+        'tool_calls': (persistence_monitoring.MonitoringToolCall, 'timestamp'),
+        'errors': (persistence_monitoring.MonitoringError, 'timestamp'),
+        'sessions': (persistence_monitoring.MonitoringSession, 'last_activity'),
+        'rollup_minute': (persistence_monitoring.MonitoringRollupMinute, 'bucket'),
+    }
+    """Name in the config -> (table, time column)"""
+
+    ROLLED_UP = ('messages', 'llm_calls', 'embedding_calls', 'tool_calls', 'errors', 'rollup_minute')
+    """Tables whose rows feed the rollups"""
+
+    service: MonitoringService
+
+    interval: float
+    """Seconds between two runs, <=0 to disable the background job"""
+
+    ttl: dict[str, datetime.timedelta]
+    """Tables with a TTL, tables kept forever are absent"""
+
+    rollup_first: bool
+
+    chunk_size: int
+
+    vacuum_interval: float
+    """Minimum seconds between two VACUUMs, <=0 to never vacuum"""
+
+    last_report: dict | None
+
+    def __init__(
+        self,
+        service: MonitoringService,
+        interval: float = 3600,
+        ttl_days: dict[str, float] | None = None,
+        rollup_first: bool = True,
+        chunk_size: int = 1000,
+        vacuum_interval: float = 86400,
+    ):
+        self.service = service
+        self.interval = interval
+        self.ttl = {
+            name: datetime.timedelta(days=days)
+            for name, days in (ttl_days or {}).items()
+            if name in self.TABLES and days and days > 0
+        }
+        self.rollup_first = rollup_first
+        self.chunk_size = chunk_size
+        self.vacuum_interval = vacuum_interval
+        self.last_report = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls, service: MonitoringService) -> MonitoringRetention:
+        retention_config = service.ap.instance_config.data.get('monitoring', {}).get('retention', {})
+        return cls(
+            service,
+            interval=retention_config.get('interval', 3600),
+            ttl_days=retention_config.get('ttl_days', {}),
+            rollup_first=retention_config.get('rollup', True),
+            chunk_size=retention_config.get('chunk_size', 1000),
+            vacuum_interval=retention_config.get('vacuum_interval', 86400),
+        )
+
+    def start(self):
+        if self.interval > 0 and self.ttl and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                report = await self.run()
+                if any(report['deleted'].values()):
+                    self.service.ap.logger.info(f'Monitoring retention: {report}')
+            except Exception as e:
+                self.service.ap.logger.error(f'Failed to apply monitoring retention: {e}')
+            await asyncio.sleep(self.interval)
+
+    async def _rollup_floor(self) -> datetime.datetime | None:
+        """Raw rows and minute rollups older than this will never be read by a rollup again"""
+        service = self.service
+        if self.rollup_first:
+            until = await service.rollup()
+        else:
+            async with service.ap.persistence_mgr.get_db_engine().connect() as conn:
+                until = await service._get_rollup_until(conn)
+
+        if until is None:
+            return None
+        return floor_time(until - service.rollup_lookback, HOUR)
+
+    async def _delete_before(self, model: type, time_column: str, cutoff: datetime.datetime) -> int:
+        """Delete rows with time_column < cutoff, chunk_size rows per transaction"""
+        key_columns = list(model.__table__.primary_key.columns)
+        key = key_columns[0] if len(key_columns) == 1 else sqlalchemy.tuple_(*key_columns)
+
+        engine = self.service.ap.persistence_mgr.get_db_engine()
+        deleted = 0
+
+        while True:
+            chunk = sqlalchemy.select(*key_columns).where(getattr(model, time_column) < cutoff).limit(self.chunk_size)
+            async with engine.begin() as conn:
+                result = await conn.execute(sqlalchemy.delete(model).where(key.in_(chunk)))
+            deleted += result.rowcount
+            if result.rowcount < self.chunk_size:
+                return deleted
+            # let queued monitoring writes in between two chunks
+            await asyncio.sleep(0)
+
+    async def _database_size(self, conn) -> int:
+        page_size = (await conn.exec_driver_sql('PRAGMA page_size')).scalar()
+        page_count = (await conn.exec_driver_sql('PRAGMA page_count')).scalar()
+        return page_size * page_count
+
+    async def _vacuum(self, now: datetime.datetime) -> int | None:
+        """VACUUM and ANALYZE an SQLite database if vacuum_interval has passed, returns bytes reclaimed"""
+        engine = self.service.ap.persistence_mgr.get_db_engine()
+        if engine.dialect.name != 'sqlite' or self.vacuum_interval <= 0:
+            return None
+
+        async with engine.connect() as conn:
+            last_vacuum = await self.service._get_metadata(conn, LAST_VACUUM_KEY)
+        if last_vacuum is not None and now - datetime.datetime.fromisoformat(last_vacuum) < datetime.timedelta(
+            seconds=self.vacuum_interval
+        ):
+            return None
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level='AUTOCOMMIT')
+            size_before = await self._database_size(conn)
+            await conn.exec_driver_sql('VACUUM')
+            await conn.exec_driver_sql('ANALYZE')
+            size_after = await self._database_size(conn)
+
+        async with engine.begin() as conn:
+            await self.service._set_metadata(conn, LAST_VACUUM_KEY, now.isoformat())
+
+        return size_before - size_after
+
+    async def run(self, now: datetime.datetime | None = None) -> dict:
+        """Apply the TTLs once
+
+        Returns a report with the rows deleted per table, the bytes reclaimed by VACUUM (None
+        when no VACUUM ran) and the run time.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        started = time.monotonic()
+
+        async with self._lock:
+            await self.service.writer.flush()
+
+            rollup_floor = None
+            if any(name in self.ROLLED_UP for name in self.ttl):
+                rollup_floor = await self._rollup_floor()
+
+            deleted = {}
+            for name, ttl in self.ttl.items():
+                model, time_column = self.TABLES[name]
+                cutoff = now - ttl
+                if name in self.ROLLED_UP and rollup_floor is not None:
+                    cutoff = min(cutoff, rollup_floor)
+                deleted[name] = await self._delete_before(model, time_column, cutoff)
+
+            if deleted.get('sessions'):
+                self.service.forget_sessions()
+
+            bytes_reclaimed = await self._vacuum(now) if any(deleted.values()) else None
+
+        self.last_report = {
+            'time': now.isoformat(),
+            'deleted': deleted,
+            'bytes_reclaimed': bytes_reclaimed,
+            'duration_ms': int((time.monotonic() - started) * 1000),
+        }
+        return self.last_report
+
+    def get_stats(self) -> dict:
+        return {
+            'ttl_days': {name: ttl.total_seconds() / 86400 for name, ttl in self.ttl.items()},
+            'last_report': self.last_report,
+        }
+
+
 class MonitoringService:
-    """Monitoring service"""
+    """Monitoring service
+
+    Writes go through a MonitoringWriter, read methods flush it first so they always
+    see every record written before them.
+    """
 
     ap: app.Application
 
+    writer: MonitoringWriter
+
+    _known_sessions: set[str]
+    """Session ids known to exist in monitoring_sessions"""
+
+    max_known_sessions: int = 100000
+
+    rollup_interval: float
+    """Seconds between two rollup runs, <=0 to disable the background job"""
+
+    rollup_lookback: datetime.timedelta
+    """Already rolled up minutes are recomputed this far back, to pick up late status updates"""
+
+    rollup_chunk: datetime.timedelta = datetime.timedelta(days=1)
+    """Backfill is done in transactions of at most this span"""
+
+    approximate_count_cap: int
+    """Approximate counts that cannot come from the rollups stop counting at this many rows"""
+
+    export_batch_size: int
+    """Rows read per query while streaming an export"""
+
+    retention: MonitoringRetention
+
+    _rollup_task: asyncio.Task | None
+
     def __init__(self, ap: app.Application) -> None:
         self.ap = ap
+        self.writer = MonitoringWriter.from_config(ap)
+        self._known_sessions = set()
+
+        rollup_config = ap.instance_config.data.get('monitoring', {}).get('rollup', {})
+        self.rollup_interval = rollup_config.get('interval', 60)
+        self.rollup_lookback = datetime.timedelta(seconds=rollup_config.get('lookback', 3600))
+
+        query_config = ap.instance_config.data.get('monitoring', {}).get('query', {})
+        self.approximate_count_cap = query_config.get('approximate_count_cap', 10000)
+        self.export_batch_size = query_config.get('export_batch_size', 1000)
+        self._rollup_task = None
+        self._rollup_lock = asyncio.Lock()
+
+        self.retention = MonitoringRetention.from_config(self)
+
+    async def initialize(self):
+        self.writer.start()
+        if self.rollup_interval > 0:
+            self._rollup_task = asyncio.create_task(self._rollup_loop())
+        self.retention.start()
+
+    async def shutdown(self):
+        await self.retention.shutdown()
+        if self._rollup_task is not None:
+            self._rollup_task.cancel()
+            try:
+                await self._rollup_task
+            except asyncio.CancelledError:
+                pass
+            self._rollup_task = None
+        await self.writer.shutdown()
+
+    def forget_sessions(self):
+        """Drop the cache of known sessions, call after deleting monitoring sessions"""
+        self._known_sessions.clear()
+
+    def _remember_session(self, session_id: str):
+        if len(self._known_sessions) >= self.max_known_sessions:
+            self._known_sessions.clear()
+        self._known_sessions.add(session_id)
+
+    async def _session_exists(self, session_id: str) -> bool:
+        if session_id in self._known_sessions:
+            return True
+
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.select(persistence_monitoring.MonitoringSession.session_id).where(
+                persistence_monitoring.MonitoringSession.session_id == session_id
+            )
+        )
+        if result.first() is None:
+            return False
+
+        self._remember_session(session_id)
+        return True
 
     # ========== Recording Methods ==========
 
@@ -54,9 +653,7 @@ class MonitoringService:
             'role': role,
         }
 
-        await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.insert(persistence_monitoring.MonitoringMessage).values(message_data)
-        )
+        await self.writer.insert(persistence_monitoring.MonitoringMessage, message_data)
 
         return message_id
 
@@ -97,9 +694,7 @@ class MonitoringService:
             'message_id': message_id,
         }
 
-        await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.insert(persistence_monitoring.MonitoringLLMCall).values(call_data)
-        )
+        await self.writer.insert(persistence_monitoring.MonitoringLLMCall, call_data)
 
         return call_id
 
@@ -137,9 +732,41 @@ class MonitoringService:
             'call_type': call_type,
         }
 
-        await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.insert(persistence_monitoring.MonitoringEmbeddingCall).values(call_data)
-        )
+        await self.writer.insert(persistence_monitoring.MonitoringEmbeddingCall, call_data)
+
+        return call_id
+
+    async def record_tool_call(
+        self,
+        bot_id: str,
+        bot_name: str,
+        pipeline_id: str,
+        pipeline_name: str,
+        session_id: str,
+        tool_name: str,
+        duration: int,
+        status: str = 'success',
+        error_message: str | None = None,
+        message_id: str | None = None,
+    ) -> str:
+        """Record a tool call"""
+        call_id = str(uuid.uuid4())
+        call_data = {
+            'id': call_id,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None),
+            'tool_name': tool_name,
+            'duration': duration,
+            'status': status,
+            'error_message': error_message,
+            'bot_id': bot_id,
+            'bot_name': bot_name,
+            'pipeline_id': pipeline_id,
+            'pipeline_name': pipeline_name,
+            'session_id': session_id,
+            'message_id': message_id,
+        }
+
+        await self.writer.insert(persistence_monitoring.MonitoringToolCall, call_data)
 
         return call_id
 
@@ -168,9 +795,8 @@ class MonitoringService:
             'user_id': user_id,
         }
 
-        await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.insert(persistence_monitoring.MonitoringSession).values(session_data)
-        )
+        await self.writer.insert(persistence_monitoring.MonitoringSession, session_data)
+        self._remember_session(session_id)
 
     async def update_session_activity(
         self,
@@ -185,9 +811,11 @@ class MonitoringService:
         Returns:
             True if session was found and updated, False if session doesn't exist.
         """
+        if not await self._session_exists(session_id):
+            return False
+
         update_values = {
             'last_activity': datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None),
-            'message_count': persistence_monitoring.MonitoringSession.message_count + 1,
         }
 
         # Update pipeline info if provided (handles pipeline switch)
@@ -196,13 +824,14 @@ class MonitoringService:
         if pipeline_name is not None:
             update_values['pipeline_name'] = pipeline_name
 
-        result = await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.update(persistence_monitoring.MonitoringSession)
-            .where(persistence_monitoring.MonitoringSession.session_id == session_id)
-            .values(update_values)
+        await self.writer.update(
+            persistence_monitoring.MonitoringSession,
+            'session_id',
+            session_id,
+            values=update_values,
+            increments={'message_count': 1},
         )
-        # Check if any rows were updated
-        return result.rowcount > 0
+        return True
 
     async def record_error(
         self,
@@ -232,9 +861,7 @@ class MonitoringService:
             'message_id': message_id,
         }
 
-        await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.insert(persistence_monitoring.MonitoringError).values(error_data)
-        )
+        await self.writer.insert(persistence_monitoring.MonitoringError, error_data)
 
         return error_id
 
@@ -252,88 +879,432 @@ class MonitoringService:
         if variables is not None:
             update_values['variables'] = variables
 
-        await self.ap.persistence_mgr.execute_async(
-            sqlalchemy.update(persistence_monitoring.MonitoringMessage)
-            .where(persistence_monitoring.MonitoringMessage.id == message_id)
-            .values(update_values)
+        await self.writer.update(persistence_monitoring.MonitoringMessage, 'id', message_id, values=update_values)
+
+    # ========== Rollups ==========
+
+    async def _rollup_loop(self):
+        while True:
+            try:
+                await self.rollup()
+            except Exception as e:
+                self.ap.logger.error(f'Failed to roll up monitoring data: {e}')
+            await asyncio.sleep(self.rollup_interval)
+
+    def _minute_bucket(self, column):
+        """SQL expression truncating a timestamp column to its minute"""
+        if self.ap.persistence_mgr.get_db_engine().dialect.name == 'postgresql':
+            return sqlalchemy.func.date_trunc('minute', column)
+        return sqlalchemy.func.strftime('%Y-%m-%d %H:%M:00', column)
+
+    async def _get_metadata(self, conn, key: str) -> str | None:
+        result = await conn.execute(
+            sqlalchemy.select(persistence_metadata.Metadata.value).where(persistence_metadata.Metadata.key == key)
         )
+        return result.scalar()
 
-    # ========== Query Methods ==========
+    async def _set_metadata(self, conn, key: str, value: str):
+        result = await conn.execute(
+            sqlalchemy.update(persistence_metadata.Metadata)
+            .where(persistence_metadata.Metadata.key == key)
+            .values(value=value)
+        )
+        if result.rowcount == 0:
+            await conn.execute(sqlalchemy.insert(persistence_metadata.Metadata).values(key=key, value=value))
 
-    async def get_overview_metrics(
+    async def _get_rollup_until(self, conn) -> datetime.datetime | None:
+        value = await self._get_metadata(conn, ROLLUP_UNTIL_KEY)
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    async def _set_rollup_until(self, conn, until: datetime.datetime):
+        await self._set_metadata(conn, ROLLUP_UNTIL_KEY, until.isoformat())
+
+    async def _aggregate_raw(
         self,
-        bot_ids: list[str] | None = None,
-        pipeline_ids: list[str] | None = None,
-        start_time: datetime.datetime | None = None,
-        end_time: datetime.datetime | None = None,
-    ) -> dict:
-        """Get overview metrics"""
-        # Build base query conditions
-        message_conditions = []
-        llm_conditions = []
-        embedding_conditions = []
-        session_conditions = []
+        conn,
+        start: datetime.datetime | None,
+        end: datetime.datetime | None,
+        end_inclusive: bool = False,
+    ) -> dict[tuple[datetime.datetime, str, str], dict[str, int]]:
+        """Aggregate raw records in [start, end) into per-minute counters keyed by (bucket, bot_id, pipeline_id)"""
+        monitoring = persistence_monitoring
+
+        def case_count(condition):
+            return sqlalchemy.func.sum(sqlalchemy.case((condition, 1), else_=0))
+
+        sources = [
+            (
+                monitoring.MonitoringMessage,
+                True,
+                {
+                    'message_count': sqlalchemy.func.count(),
+                    'message_success_count': case_count(monitoring.MonitoringMessage.status == 'success'),
+                    'message_error_count': case_count(monitoring.MonitoringMessage.status == 'error'),
+                },
+            ),
+            (
+                monitoring.MonitoringLLMCall,
+                True,
+                {
+                    'llm_call_count': sqlalchemy.func.count(),
+                    'llm_error_count': case_count(monitoring.MonitoringLLMCall.status != 'success'),
+                    'input_tokens': sqlalchemy.func.sum(monitoring.MonitoringLLMCall.input_tokens),
+                    'output_tokens': sqlalchemy.func.sum(monitoring.MonitoringLLMCall.output_tokens),
+                    'llm_duration_sum': sqlalchemy.func.sum(monitoring.MonitoringLLMCall.duration),
+                    'llm_duration_lt_1s': case_count(monitoring.MonitoringLLMCall.duration < 1000),
+                    'llm_duration_lt_3s': case_count(
+                        sqlalchemy.and_(
+                            monitoring.MonitoringLLMCall.duration >= 1000, monitoring.MonitoringLLMCall.duration < 3000
+                        )
+                    ),
+                    'llm_duration_lt_10s': case_count(
+                        sqlalchemy.and_(
+                            monitoring.MonitoringLLMCall.duration >= 3000, monitoring.MonitoringLLMCall.duration < 10000
+                        )
+                    ),
+                    'llm_duration_lt_30s': case_count(
+                        sqlalchemy.and_(
+                            monitoring.MonitoringLLMCall.duration >= 10000,
+                            monitoring.MonitoringLLMCall.duration < 30000,
+                        )
+                    ),
+                    'llm_duration_ge_30s': case_count(monitoring.MonitoringLLMCall.duration >= 30000),
+                },
+            ),
+            (
+                monitoring.MonitoringEmbeddingCall,
+                False,
+                {'embedding_call_count': sqlalchemy.func.count()},
+            ),
+            (
+                monitoring.MonitoringToolCall,
+                True,
+                {
+                    'tool_call_count': sqlalchemy.func.count(),
+                    'tool_error_count': case_count(monitoring.MonitoringToolCall.status != 'success'),
+                    'tool_duration_sum': sqlalchemy.func.sum(monitoring.MonitoringToolCall.duration),
+                },
+            ),
+            (
+                monitoring.MonitoringError,
+                True,
+                {'error_count': sqlalchemy.func.count()},
+            ),
+        ]
 
-        if bot_ids:
-            message_conditions.append(persistence_monitoring.MonitoringMessage.bot_id.in_(bot_ids))
-            llm_conditions.append(persistence_monitoring.MonitoringLLMCall.bot_id.in_(bot_ids))
-            session_conditions.append(persistence_monitoring.MonitoringSession.bot_id.in_(bot_ids))
+        aggregated: dict[tuple[datetime.datetime, str, str], dict[str, int]] = {}
+
+        for model, by_pipeline, counters in sources:
+            bucket = self._minute_bucket(model.timestamp).label('bucket')
+            group_columns = [bucket]
+            if by_pipeline:
+                group_columns.extend([model.bot_id, model.pipeline_id])
+
+            query = sqlalchemy.select(*group_columns, *[expr.label(name) for name, expr in counters.items()])
+            if start is not None:
+                query = query.where(model.timestamp >= start)
+            if end is not None:
+                query = query.where(model.timestamp <= end if end_inclusive else model.timestamp < end)
+            query = query.group_by(*group_columns)
+
+            for row in (await conn.execute(query)).all():
+                bucket_value = row.bucket
+                if isinstance(bucket_value, str):
+                    bucket_value = datetime.datetime.fromisoformat(bucket_value)
+                bucket_value = bucket_value.replace(tzinfo=None)
+
+                key = (bucket_value, row.bot_id, row.pipeline_id) if by_pipeline else (bucket_value, '', '')
+                values = aggregated.setdefault(key, dict.fromkeys(ROLLUP_COUNTERS, 0))
+                for name in counters:
+                    values[name] += getattr(row, name) or 0
+
+        return aggregated
+
+    async def _replace_rollups(
+        self,
+        conn,
+        table: type,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        rows: dict[tuple[datetime.datetime, str, str], dict[str, int]],
+    ):
+        await conn.execute(sqlalchemy.delete(table).where(table.bucket >= start).where(table.bucket < end))
+        if rows:
+            await conn.execute(
+                sqlalchemy.insert(table),
+                [
+                    {'bucket': bucket, 'bot_id': bot_id, 'pipeline_id': pipeline_id, **values}
+                    for (bucket, bot_id, pipeline_id), values in rows.items()
+                ],
+            )
+
+    async def _rollup_range(self, conn, start: datetime.datetime, end: datetime.datetime):
+        """Recompute minute rollups in [start, end) and the hour rollups containing them"""
+        minute_rows = await self._aggregate_raw(conn, start, end)
+        await self._replace_rollups(conn, persistence_monitoring.MonitoringRollupMinute, start, end, minute_rows)
 
+        hour_start = floor_time(start, HOUR)
+        hour_end = ceil_time(end, HOUR)
+
+        minute_table = persistence_monitoring.MonitoringRollupMinute
+        result = await conn.execute(
+            sqlalchemy.select(minute_table)
+            .where(minute_table.bucket >= hour_start)
+            .where(minute_table.bucket < hour_end)
+        )
+
+        hour_rows: dict[tuple[datetime.datetime, str, str], dict[str, int]] = {}
+        for row in result.all():
+            key = (floor_time(row.bucket, HOUR), row.bot_id, row.pipeline_id)
+            values = hour_rows.setdefault(key, dict.fromkeys(ROLLUP_COUNTERS, 0))
+            for name in ROLLUP_COUNTERS:
+                values[name] += getattr(row, name)
+
+        await self._replace_rollups(conn, persistence_monitoring.MonitoringRollupHour, hour_start, hour_end, hour_rows)
+
+    async def _earliest_raw_time(self, conn) -> datetime.datetime | None:
+        earliest = None
+        for model in (
+            persistence_monitoring.MonitoringMessage,
+            persistence_monitoring.MonitoringLLMCall,
+            persistence_monitoring.MonitoringEmbeddingCall,
+            persistence_monitoring.MonitoringToolCall,
+            persistence_monitoring.MonitoringError,
+        ):
+            value = (await conn.execute(sqlalchemy.select(sqlalchemy.func.min(model.timestamp)))).scalar()
+            if value is not None and (earliest is None or value < earliest):
+                earliest = value
+        return earliest
+
+    async def rollup(self, now: datetime.datetime | None = None) -> datetime.datetime | None:
+        """Roll raw records up to the last closed minute into the rollup tables
+
+        Minutes already rolled up within rollup_lookback are recomputed. Returns the new
+        rollup watermark.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        end = floor_time(now, MINUTE)
+
+        await self.writer.flush()
+
+        async with self._rollup_lock:
+            engine = self.ap.persistence_mgr.get_db_engine()
+
+            async with engine.connect() as conn:
+                until = await self._get_rollup_until(conn)
+                if until is None:
+                    earliest = await self._earliest_raw_time(conn)
+                    start = floor_time(earliest, MINUTE) if earliest is not None else end
+                else:
+                    start = floor_time(min(until, end) - self.rollup_lookback, MINUTE)
+
+            if start >= end:
+                if until is None:
+                    async with engine.begin() as conn:
+                        await self._set_rollup_until(conn, end)
+                return end
+
+            while start < end:
+                chunk_end = min(start + self.rollup_chunk, end)
+                async with engine.begin() as conn:
+                    await self._rollup_range(conn, start, chunk_end)
+                    if until is None or chunk_end > until:
+                        await self._set_rollup_until(conn, chunk_end)
+                        until = chunk_end
+                start = chunk_end
+
+            return until
+
+    def _rollup_filters(self, table: type, bot_ids: list[str] | None, pipeline_ids: list[str] | None) -> list:
+        # rows with an empty bot_id carry counters that are not tied to a pipeline, they always match
+        conditions = []
+        if bot_ids:
+            conditions.append(sqlalchemy.or_(table.bot_id.in_(bot_ids), table.bot_id == ''))
         if pipeline_ids:
-            message_conditions.append(persistence_monitoring.MonitoringMessage.pipeline_id.in_(pipeline_ids))
-            llm_conditions.append(persistence_monitoring.MonitoringLLMCall.pipeline_id.in_(pipeline_ids))
-            session_conditions.append(persistence_monitoring.MonitoringSession.pipeline_id.in_(pipeline_ids))
+            conditions.append(sqlalchemy.or_(table.pipeline_id.in_(pipeline_ids), table.pipeline_id == ''))
+        return conditions
+
+    def _raw_rows_match(self, key: tuple, bot_ids: list[str] | None, pipeline_ids: list[str] | None) -> bool:
+        _, bot_id, pipeline_id = key
+        if bot_ids and bot_id != '' and bot_id not in bot_ids:
+            return False
+        if pipeline_ids and pipeline_id != '' and pipeline_id not in pipeline_ids:
+            return False
+        return True
+
+    def _plan_ranges(
+        self,
+        start: datetime.datetime | None,
+        end: datetime.datetime | None,
+        until: datetime.datetime | None,
+    ) -> list[tuple]:
+        """Split [start, end] into parts read from the raw tables, minute rollups and hour rollups
 
-        if start_time:
-            message_conditions.append(persistence_monitoring.MonitoringMessage.timestamp >= start_time)
-            llm_conditions.append(persistence_monitoring.MonitoringLLMCall.timestamp >= start_time)
-            embedding_conditions.append(persistence_monitoring.MonitoringEmbeddingCall.timestamp >= start_time)
-            session_conditions.append(persistence_monitoring.MonitoringSession.start_time >= start_time)
+        Returns (source, start, end) tuples; raw parts are ('raw', start, end, end_inclusive).
+        """
+        if until is None:
+            return [('raw', start, end, True)]
 
-        if end_time:
-            message_conditions.append(persistence_monitoring.MonitoringMessage.timestamp <= end_time)
-            llm_conditions.append(persistence_monitoring.MonitoringLLMCall.timestamp <= end_time)
-            embedding_conditions.append(persistence_monitoring.MonitoringEmbeddingCall.timestamp <= end_time)
-            session_conditions.append(persistence_monitoring.MonitoringSession.start_time <= end_time)
+        mid_start = ceil_time(start, MINUTE) if start is not None else None
+        mid_end = until if end is None else min(until, floor_time(end, MINUTE))
+
+        if mid_start is not None and mid_end <= mid_start:
+            return [('raw', start, end, True)]
+
+        parts = []
+        if start is not None and start < mid_start:
+            parts.append(('raw', start, mid_start, False))
+
+        hour_start = ceil_time(mid_start, HOUR) if mid_start is not None else None
+        hour_end = floor_time(mid_end, HOUR)
+
+        if hour_start is None or hour_start < hour_end:
+            if hour_start is not None and mid_start < hour_start:
+                parts.append(('minute', mid_start, hour_start))
+            parts.append(('hour', hour_start, hour_end))
+            if hour_end < mid_end:
+                parts.append(('minute', hour_end, mid_end))
+        else:
+            parts.append(('minute', mid_start, mid_end))
+
+        parts.append(('raw', mid_end, end, True))
+        return parts
+
+    async def _sum_counters(
+        self,
+        bot_ids: list[str] | None,
+        pipeline_ids: list[str] | None,
+        start: datetime.datetime | None,
+        end: datetime.datetime | None,
+    ) -> dict[str, int]:
+        """Counter totals over [start, end], read from the rollups where possible"""
+        totals = dict.fromkeys(ROLLUP_COUNTERS, 0)
+
+        async with self.ap.persistence_mgr.get_db_engine().connect() as conn:
+            until = await self._get_rollup_until(conn)
+
+            for part in self._plan_ranges(start, end, until):
+                if part[0] == 'raw':
+                    _, part_start, part_end, end_inclusive = part
+                    for key, values in (await self._aggregate_raw(conn, part_start, part_end, end_inclusive)).items():
+                        if self._raw_rows_match(key, bot_ids, pipeline_ids):
+                            for name in ROLLUP_COUNTERS:
+                                totals[name] += values[name]
+                    continue
 
-        # Total messages
-        message_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringMessage.id))
-        if message_conditions:
-            message_query = message_query.where(sqlalchemy.and_(*message_conditions))
+                source, part_start, part_end = part
+                table = (
+                    persistence_monitoring.MonitoringRollupHour
+                    if source == 'hour'
+                    else persistence_monitoring.MonitoringRollupMinute
+                )
+                query = sqlalchemy.select(
+                    *[
+                        sqlalchemy.func.coalesce(sqlalchemy.func.sum(getattr(table, name)), 0)
+                        for name in ROLLUP_COUNTERS
+                    ]
+                ).where(table.bucket < part_end)
+                if part_start is not None:
+                    query = query.where(table.bucket >= part_start)
+                for condition in self._rollup_filters(table, bot_ids, pipeline_ids):
+                    query = query.where(condition)
+
+                row = (await conn.execute(query)).one()
+                for name, value in zip(ROLLUP_COUNTERS, row):
+                    totals[name] += value or 0
+
+        return totals
+
+    async def get_timeseries(
+        self,
+        bot_ids: list[str] | None = None,
+        pipeline_ids: list[str] | None = None,
+        start_time: datetime.datetime | None = None,
+        end_time: datetime.datetime | None = None,
+        granularity: str = 'hour',
+    ) -> list[dict]:
+        """Get counters per minute or per hour for charts"""
+        await self.writer.flush()
+
+        step = HOUR if granularity == 'hour' else MINUTE
+        table = (
+            persistence_monitoring.MonitoringRollupHour
+            if step == HOUR
+            else persistence_monitoring.MonitoringRollupMinute
+        )
 
-        total_messages_result = await self.ap.persistence_mgr.execute_async(message_query)
-        total_messages = total_messages_result.scalar() or 0
+        points: dict[datetime.datetime, dict[str, int]] = {}
+
+        def add(bucket: datetime.datetime, values):
+            point = points.setdefault(bucket, dict.fromkeys(ROLLUP_COUNTERS, 0))
+            for name in ROLLUP_COUNTERS:
+                point[name] += values[name] if isinstance(values, dict) else getattr(values, name)
+
+        async with self.ap.persistence_mgr.get_db_engine().connect() as conn:
+            until = await self._get_rollup_until(conn)
+            # the hour containing the watermark may only be partly rolled up, fill it from the raw records
+            raw_start = floor_time(until, step) if until is not None else start_time
+
+            if until is not None:
+                query = sqlalchemy.select(
+                    table.bucket, *[sqlalchemy.func.sum(getattr(table, name)).label(name) for name in ROLLUP_COUNTERS]
+                ).where(table.bucket < raw_start)
+                if start_time is not None:
+                    query = query.where(table.bucket >= floor_time(start_time, step))
+                if end_time is not None:
+                    query = query.where(table.bucket <= end_time)
+                for condition in self._rollup_filters(table, bot_ids, pipeline_ids):
+                    query = query.where(condition)
+                query = query.group_by(table.bucket)
+
+                for row in (await conn.execute(query)).all():
+                    add(row.bucket, row)
+
+            if end_time is None or raw_start is None or raw_start <= end_time:
+                raw_from = raw_start
+                if start_time is not None and (raw_from is None or raw_from < start_time):
+                    raw_from = start_time
+                for key, values in (await self._aggregate_raw(conn, raw_from, end_time, True)).items():
+                    if self._raw_rows_match(key, bot_ids, pipeline_ids):
+                        add(floor_time(key[0], step), values)
+
+        return [{'bucket': bucket.isoformat(), **points[bucket]} for bucket in sorted(points)]
 
-        # Total LLM calls
-        llm_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringLLMCall.id))
-        if llm_conditions:
-            llm_query = llm_query.where(sqlalchemy.and_(*llm_conditions))
+    # ========== Query Methods ==========
 
-        llm_calls_result = await self.ap.persistence_mgr.execute_async(llm_query)
-        llm_calls = llm_calls_result.scalar() or 0
+    async def get_overview_metrics(
+        self,
+        bot_ids: list[str] | None = None,
+        pipeline_ids: list[str] | None = None,
+        start_time: datetime.datetime | None = None,
+        end_time: datetime.datetime | None = None,
+    ) -> dict:
+        """Get overview metrics"""
+        await self.writer.flush()
 
-        # Total Embedding calls
-        embedding_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringEmbeddingCall.id))
-        if embedding_conditions:
-            embedding_query = embedding_query.where(sqlalchemy.and_(*embedding_conditions))
+        totals = await self._sum_counters(bot_ids, pipeline_ids, start_time, end_time)
 
-        embedding_calls_result = await self.ap.persistence_mgr.execute_async(embedding_query)
-        embedding_calls = embedding_calls_result.scalar() or 0
+        total_messages = totals['message_count']
+        llm_calls = totals['llm_call_count']
+        embedding_calls = totals['embedding_call_count']
 
         # Total model calls (LLM + Embedding)
         model_calls = llm_calls + embedding_calls
 
         # Success rate (based on messages)
-        success_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringMessage.id)).where(
-            persistence_monitoring.MonitoringMessage.status == 'success'
-        )
-        if message_conditions:
-            success_query = success_query.where(sqlalchemy.and_(*message_conditions))
-
-        success_result = await self.ap.persistence_mgr.execute_async(success_query)
-        success_count = success_result.scalar() or 0
+        success_count = totals['message_success_count']
         success_rate = (success_count / total_messages * 100) if total_messages > 0 else 100
 
+        session_conditions = []
+        if bot_ids:
+            session_conditions.append(persistence_monitoring.MonitoringSession.bot_id.in_(bot_ids))
+        if pipeline_ids:
+            session_conditions.append(persistence_monitoring.MonitoringSession.pipeline_id.in_(pipeline_ids))
+        if start_time:
+            session_conditions.append(persistence_monitoring.MonitoringSession.start_time >= start_time)
+        if end_time:
+            session_conditions.append(persistence_monitoring.MonitoringSession.start_time <= end_time)
+
         # Active sessions
         active_session_query = sqlalchemy.select(
             sqlalchemy.func.count(persistence_monitoring.MonitoringSession.session_id)
@@ -351,8 +1322,110 @@ class MonitoringService:
             'model_calls': model_calls,
             'success_rate': round(success_rate, 2),
             'active_sessions': active_sessions,
+            'error_count': totals['error_count'],
+            'total_tokens': totals['input_tokens'] + totals['output_tokens'],
+            'avg_llm_duration': round(totals['llm_duration_sum'] / llm_calls) if llm_calls else 0,
         }
 
+    # ========== List Methods ==========
+
+    def _keyset_condition(
+        self,
+        sort_column: sqlalchemy.Column,
+        key_column: sqlalchemy.Column,
+        sort_value: datetime.datetime,
+        key: str,
+    ):
+        """Rows strictly after (sort_value, key) in (sort, key) descending order"""
+        return sqlalchemy.or_(
+            sort_column < sort_value,
+            sqlalchemy.and_(sort_column == sort_value, key_column < key),
+        )
+
+    async def _count_rows(
+        self,
+        key_column: sqlalchemy.Column,
+        conditions: list,
+        count: str,
+        rollup_counter: str | None = None,
+        bot_ids: list[str] | None = None,
+        pipeline_ids: list[str] | None = None,
+        start_time: datetime.datetime | None = None,
+        end_time: datetime.datetime | None = None,
+    ) -> int | None:
+        """Total for a list query
+
+        count:
+            exact        COUNT over every matching row
+            approximate  read from the rollups when the filters allow it (rollup_counter),
+                         otherwise counted up to approximate_count_cap rows
+            none         not counted, returns None
+        """
+        if count == 'none':
+            return None
+
+        if count == 'approximate':
+            if rollup_counter is not None:
+                totals = await self._sum_counters(bot_ids, pipeline_ids, start_time, end_time)
+                return totals[rollup_counter]
+
+            capped = sqlalchemy.select(key_column)
+            if conditions:
+                capped = capped.where(sqlalchemy.and_(*conditions))
+            count_query = sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                capped.limit(self.approximate_count_cap).subquery()
+            )
+        else:
+            count_query = sqlalchemy.select(sqlalchemy.func.count(key_column))
+            if conditions:
+                count_query = count_query.where(sqlalchemy.and_(*conditions))
+
+        count_result = await self.ap.persistence_mgr.execute_async(count_query)
+        return count_result.scalar() or 0
+
+    async def _fetch_page(
+        self,
+        model: type[persistence_monitoring.Base],
+        sort_column: sqlalchemy.Column,
+        key_column: sqlalchemy.Column,
+        conditions: list,
+        limit: int,
+        offset: int,
+        cursor: str | None,
+    ) -> list[dict]:
+        """One page in (sort, key) descending order
+
+        With a cursor the page starts right after the cursor row, the offset is ignored.
+        """
+        conditions = list(conditions)
+        if cursor:
+            conditions.append(self._keyset_condition(sort_column, key_column, *decode_cursor(cursor)))
+
+        query = sqlalchemy.select(model).order_by(sort_column.desc(), key_column.desc())
+        if conditions:
+            query = query.where(sqlalchemy.and_(*conditions))
+
+        query = query.limit(limit)
+        if not cursor and offset:
+            query = query.offset(offset)
+
+        result = await self.ap.persistence_mgr.execute_async(query)
+
+        return [self.ap.persistence_mgr.serialize_model(model, _row_model(row)) for row in result.all()]
+
+    def next_cursor(
+        self,
+        rows: list[dict],
+        limit: int,
+        sort_field: str = 'timestamp',
+        key_field: str = 'id',
+    ) -> str | None:
+        """Cursor of the page following rows, None if rows is the last page"""
+        if not rows or len(rows) < limit:
+            return None
+        last = rows[-1]
+        return encode_cursor(datetime.datetime.fromisoformat(last[sort_field]), last[key_field])
+
     async def get_messages(
         self,
         bot_ids: list[str] | None = None,
@@ -362,49 +1435,39 @@ class MonitoringService:
         end_time: datetime.datetime | None = None,
         limit: int = 100,
         offset: int = 0,
-    ) -> tuple[list[dict], int]:
+        cursor: str | None = None,
+        count: str = 'exact',
+    ) -> tuple[list[dict], int | None]:
         """Get messages with filters"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringMessage
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringMessage.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringMessage.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if session_ids:
-            conditions.append(persistence_monitoring.MonitoringMessage.session_id.in_(session_ids))
+            conditions.append(model.session_id.in_(session_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringMessage.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringMessage.timestamp <= end_time)
-
-        # Get total count
-        count_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringMessage.id))
-        if conditions:
-            count_query = count_query.where(sqlalchemy.and_(*conditions))
-
-        count_result = await self.ap.persistence_mgr.execute_async(count_query)
-        total = count_result.scalar() or 0
-
-        # Get messages
-        query = sqlalchemy.select(persistence_monitoring.MonitoringMessage).order_by(
-            persistence_monitoring.MonitoringMessage.timestamp.desc()
+            conditions.append(model.timestamp <= end_time)
+
+        total = await self._count_rows(
+            model.id,
+            conditions,
+            count,
+            rollup_counter=None if session_ids else 'message_count',
+            bot_ids=bot_ids,
+            pipeline_ids=pipeline_ids,
+            start_time=start_time,
+            end_time=end_time,
         )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit).offset(offset)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        messages_rows = result.all()
+        rows = await self._fetch_page(model, model.timestamp, model.id, conditions, limit, offset, cursor)
 
-        serialized = []
-        for row in messages_rows:
-            # Extract model instance from Row (SQLAlchemy returns Row objects)
-            msg = row[0] if isinstance(row, tuple) else row
-            serialized_msg = self.ap.persistence_mgr.serialize_model(persistence_monitoring.MonitoringMessage, msg)
-            serialized.append(serialized_msg)
-
-        return (serialized, total)
+        return (rows, total)
 
     async def get_llm_calls(
         self,
@@ -414,48 +1477,37 @@ class MonitoringService:
         end_time: datetime.datetime | None = None,
         limit: int = 100,
         offset: int = 0,
-    ) -> tuple[list[dict], int]:
+        cursor: str | None = None,
+        count: str = 'exact',
+    ) -> tuple[list[dict], int | None]:
         """Get LLM calls with filters"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringLLMCall
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.timestamp <= end_time)
-
-        # Get total count
-        count_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringLLMCall.id))
-        if conditions:
-            count_query = count_query.where(sqlalchemy.and_(*conditions))
-
-        count_result = await self.ap.persistence_mgr.execute_async(count_query)
-        total = count_result.scalar() or 0
-
-        # Get LLM calls
-        query = sqlalchemy.select(persistence_monitoring.MonitoringLLMCall).order_by(
-            persistence_monitoring.MonitoringLLMCall.timestamp.desc()
+            conditions.append(model.timestamp <= end_time)
+
+        total = await self._count_rows(
+            model.id,
+            conditions,
+            count,
+            rollup_counter='llm_call_count',
+            bot_ids=bot_ids,
+            pipeline_ids=pipeline_ids,
+            start_time=start_time,
+            end_time=end_time,
         )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit).offset(offset)
+        rows = await self._fetch_page(model, model.timestamp, model.id, conditions, limit, offset, cursor)
 
-        result = await self.ap.persistence_mgr.execute_async(query)
-        llm_calls_rows = result.all()
-
-        return (
-            [
-                self.ap.persistence_mgr.serialize_model(
-                    persistence_monitoring.MonitoringLLMCall, row[0] if isinstance(row, tuple) else row
-                )
-                for row in llm_calls_rows
-            ],
-            total,
-        )
+        return (rows, total)
 
     async def get_embedding_calls(
         self,
@@ -464,46 +1516,76 @@ class MonitoringService:
         knowledge_base_id: str | None = None,
         limit: int = 100,
         offset: int = 0,
-    ) -> tuple[list[dict], int]:
+        cursor: str | None = None,
+        count: str = 'exact',
+    ) -> tuple[list[dict], int | None]:
         """Get embedding calls with filters"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringEmbeddingCall
         conditions = []
 
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringEmbeddingCall.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringEmbeddingCall.timestamp <= end_time)
+            conditions.append(model.timestamp <= end_time)
         if knowledge_base_id:
-            conditions.append(persistence_monitoring.MonitoringEmbeddingCall.knowledge_base_id == knowledge_base_id)
-
-        # Get total count
-        count_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringEmbeddingCall.id))
-        if conditions:
-            count_query = count_query.where(sqlalchemy.and_(*conditions))
-
-        count_result = await self.ap.persistence_mgr.execute_async(count_query)
-        total = count_result.scalar() or 0
-
-        # Get embedding calls
-        query = sqlalchemy.select(persistence_monitoring.MonitoringEmbeddingCall).order_by(
-            persistence_monitoring.MonitoringEmbeddingCall.timestamp.desc()
+            conditions.append(model.knowledge_base_id == knowledge_base_id)
+
+        total = await self._count_rows(
+            model.id,
+            conditions,
+            count,
+            rollup_counter=None if knowledge_base_id else 'embedding_call_count',
+            start_time=start_time,
+            end_time=end_time,
         )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
+        rows = await self._fetch_page(model, model.timestamp, model.id, conditions, limit, offset, cursor)
 
-        query = query.limit(limit).offset(offset)
+        return (rows, total)
 
-        result = await self.ap.persistence_mgr.execute_async(query)
-        embedding_calls_rows = result.all()
+    async def get_tool_calls(
+        self,
+        bot_ids: list[str] | None = None,
+        pipeline_ids: list[str] | None = None,
+        tool_name: str | None = None,
+        start_time: datetime.datetime | None = None,
+        end_time: datetime.datetime | None = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: str | None = None,
+        count: str = 'exact',
+    ) -> tuple[list[dict], int | None]:
+        """Get tool calls with filters"""
+        await self.writer.flush()
 
-        return (
-            [
-                self.ap.persistence_mgr.serialize_model(
-                    persistence_monitoring.MonitoringEmbeddingCall, row[0] if isinstance(row, tuple) else row
-                )
-                for row in embedding_calls_rows
-            ],
-            total,
+        model = persistence_monitoring.MonitoringToolCall
+        conditions = []
+
+        if bot_ids:
+            conditions.append(model.bot_id.in_(bot_ids))
+        if pipeline_ids:
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
+        if tool_name:
+            conditions.append(model.tool_name == tool_name)
+        if start_time:
+            conditions.append(model.timestamp >= start_time)
+        if end_time:
+            conditions.append(model.timestamp <= end_time)
+
+        total = await self._count_rows(
+            model.id,
+            conditions,
+            count,
+            rollup_counter=None if tool_name else 'tool_call_count',
+            bot_ids=bot_ids,
+            pipeline_ids=pipeline_ids,
+            start_time=start_time,
+            end_time=end_time,
         )
+        rows = await self._fetch_page(model, model.timestamp, model.id, conditions, limit, offset, cursor)
+
+        return (rows, total)
 
     async def get_sessions(
         self,
@@ -514,50 +1596,30 @@ class MonitoringService:
         is_active: bool | None = None,
         limit: int = 100,
         offset: int = 0,
-    ) -> tuple[list[dict], int]:
-        """Get sessions with filters"""
+        cursor: str | None = None,
+        count: str = 'exact',
+    ) -> tuple[list[dict], int | None]:
+        """Get sessions with filters, ordered by last activity"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringSession
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringSession.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringSession.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringSession.start_time >= start_time)
+            conditions.append(model.start_time >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringSession.start_time <= end_time)
+            conditions.append(model.start_time <= end_time)
         if is_active is not None:
-            conditions.append(persistence_monitoring.MonitoringSession.is_active == is_active)
-
-        # Get total count
-        count_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringSession.session_id))
-        if conditions:
-            count_query = count_query.where(sqlalchemy.and_(*conditions))
-
-        count_result = await self.ap.persistence_mgr.execute_async(count_query)
-        total = count_result.scalar() or 0
-
-        # Get sessions
-        query = sqlalchemy.select(persistence_monitoring.MonitoringSession).order_by(
-            persistence_monitoring.MonitoringSession.last_activity.desc()
-        )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit).offset(offset)
+            conditions.append(model.is_active == is_active)
 
-        result = await self.ap.persistence_mgr.execute_async(query)
-        sessions_rows = result.all()
+        total = await self._count_rows(model.session_id, conditions, count)
+        rows = await self._fetch_page(model, model.last_activity, model.session_id, conditions, limit, offset, cursor)
 
-        return (
-            [
-                self.ap.persistence_mgr.serialize_model(
-                    persistence_monitoring.MonitoringSession, row[0] if isinstance(row, tuple) else row
-                )
-                for row in sessions_rows
-            ],
-            total,
-        )
+        return (rows, total)
 
     async def get_errors(
         self,
@@ -567,54 +1629,45 @@ class MonitoringService:
         end_time: datetime.datetime | None = None,
         limit: int = 100,
         offset: int = 0,
-    ) -> tuple[list[dict], int]:
+        cursor: str | None = None,
+        count: str = 'exact',
+    ) -> tuple[list[dict], int | None]:
         """Get errors with filters"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringError
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringError.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringError.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringError.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringError.timestamp <= end_time)
-
-        # Get total count
-        count_query = sqlalchemy.select(sqlalchemy.func.count(persistence_monitoring.MonitoringError.id))
-        if conditions:
-            count_query = count_query.where(sqlalchemy.and_(*conditions))
-
-        count_result = await self.ap.persistence_mgr.execute_async(count_query)
-        total = count_result.scalar() or 0
-
-        # Get errors
-        query = sqlalchemy.select(persistence_monitoring.MonitoringError).order_by(
-            persistence_monitoring.MonitoringError.timestamp.desc()
+            conditions.append(model.timestamp <= end_time)
+
+        total = await self._count_rows(
+            model.id,
+            conditions,
+            count,
+            rollup_counter='error_count',
+            bot_ids=bot_ids,
+            pipeline_ids=pipeline_ids,
+            start_time=start_time,
+            end_time=end_time,
         )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit).offset(offset)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        errors_rows = result.all()
+        rows = await self._fetch_page(model, model.timestamp, model.id, conditions, limit, offset, cursor)
 
-        return (
-            [
-                self.ap.persistence_mgr.serialize_model(
-                    persistence_monitoring.MonitoringError, row[0] if isinstance(row, tuple) else row
-                )
-                for row in errors_rows
-            ],
-            total,
-        )
+        return (rows, total)
 
     async def get_session_analysis(
         self,
         session_id: str,
     ) -> dict:
         """Get detailed analysis for a specific session"""
+        await self.writer.flush()
+
         # Get session info
         session_query = sqlalchemy.select(persistence_monitoring.MonitoringSession).where(
             persistence_monitoring.MonitoringSession.session_id == session_id
@@ -731,6 +1784,8 @@ class MonitoringService:
         message_id: str,
     ) -> dict:
         """Get detailed information for a specific message including associated LLM calls and errors"""
+        await self.writer.flush()
+
         # Get message info
         message_query = sqlalchemy.select(persistence_monitoring.MonitoringMessage).where(
             persistence_monitoring.MonitoringMessage.id == message_id
@@ -877,6 +1932,48 @@ class MonitoringService:
             # If not valid JSON, return as-is
             return message_content
 
+    async def _iter_keyset(
+        self,
+        model: type[persistence_monitoring.Base],
+        sort_column: sqlalchemy.Column,
+        key_column: sqlalchemy.Column,
+        conditions: list,
+        limit: int,
+    ) -> typing.AsyncIterator[typing.Any]:
+        """Rows in (sort, key) descending order, read in keyset batches of export_batch_size
+
+        Every batch is a short query of its own, so no read transaction stays open while a
+        slow client downloads the export.
+        """
+        remaining = limit
+        after = []
+
+        while remaining > 0:
+            batch_size = min(self.export_batch_size, remaining)
+            query = (
+                sqlalchemy.select(model)
+                .where(sqlalchemy.and_(sqlalchemy.true(), *conditions, *after))
+                .order_by(sort_column.desc(), key_column.desc())
+                .limit(batch_size)
+            )
+
+            result = await self.ap.persistence_mgr.execute_async(query)
+            rows = [_row_model(row) for row in result.all()]
+
+            for row in rows:
+                yield row
+
+            if len(rows) < batch_size:
+                return
+
+            remaining -= len(rows)
+            last = rows[-1]
+            after = [
+                self._keyset_condition(
+                    sort_column, key_column, getattr(last, sort_column.key), getattr(last, key_column.key)
+                )
+            ]
+
     async def export_messages(
         self,
         bot_ids: list[str] | None = None,
@@ -884,51 +1981,39 @@ class MonitoringService:
         start_time: datetime.datetime | None = None,
         end_time: datetime.datetime | None = None,
         limit: int = 100000,
-    ) -> list[dict]:
-        """Export messages as list of dictionaries for CSV conversion"""
+    ) -> typing.AsyncIterator[dict]:
+        """Export messages as dictionaries for CSV conversion, newest first"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringMessage
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringMessage.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringMessage.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringMessage.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringMessage.timestamp <= end_time)
-
-        query = sqlalchemy.select(persistence_monitoring.MonitoringMessage).order_by(
-            persistence_monitoring.MonitoringMessage.timestamp.desc()
-        )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        rows = result.all()
-
-        return [
-            {
-                'id': row[0].id if isinstance(row, tuple) else row.id,
-                'timestamp': self._format_timestamp(row[0].timestamp if isinstance(row, tuple) else row.timestamp),
-                'bot_id': row[0].bot_id if isinstance(row, tuple) else row.bot_id,
-                'bot_name': row[0].bot_name if isinstance(row, tuple) else row.bot_name,
-                'pipeline_id': row[0].pipeline_id if isinstance(row, tuple) else row.pipeline_id,
-                'pipeline_name': row[0].pipeline_name if isinstance(row, tuple) else row.pipeline_name,
-                'runner_name': row[0].runner_name if isinstance(row, tuple) else row.runner_name,
-                'message_content': row[0].message_content if isinstance(row, tuple) else row.message_content,
-                'message_text': self._extract_message_text(
-                    row[0].message_content if isinstance(row, tuple) else row.message_content
-                ),
-                'session_id': row[0].session_id if isinstance(row, tuple) else row.session_id,
-                'status': row[0].status if isinstance(row, tuple) else row.status,
-                'level': row[0].level if isinstance(row, tuple) else row.level,
-                'platform': row[0].platform if isinstance(row, tuple) else row.platform,
-                'user_id': row[0].user_id if isinstance(row, tuple) else row.user_id,
+            conditions.append(model.timestamp <= end_time)
+
+        async for row in self._iter_keyset(model, model.timestamp, model.id, conditions, limit):
+            yield {
+                'id': row.id,
+                'timestamp': self._format_timestamp(row.timestamp),
+                'bot_id': row.bot_id,
+                'bot_name': row.bot_name,
+                'pipeline_id': row.pipeline_id,
+                'pipeline_name': row.pipeline_name,
+                'runner_name': row.runner_name,
+                'message_content': row.message_content,
+                'message_text': self._extract_message_text(row.message_content),
+                'session_id': row.session_id,
+                'status': row.status,
+                'level': row.level,
+                'platform': row.platform,
+                'user_id': row.user_id,
             }
-            for row in rows
-        ]
 
     async def export_llm_calls(
         self,
@@ -937,51 +2022,41 @@ class MonitoringService:
         start_time: datetime.datetime | None = None,
         end_time: datetime.datetime | None = None,
         limit: int = 100000,
-    ) -> list[dict]:
-        """Export LLM calls as list of dictionaries for CSV conversion"""
+    ) -> typing.AsyncIterator[dict]:
+        """Export LLM calls as dictionaries for CSV conversion, newest first"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringLLMCall
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringLLMCall.timestamp <= end_time)
-
-        query = sqlalchemy.select(persistence_monitoring.MonitoringLLMCall).order_by(
-            persistence_monitoring.MonitoringLLMCall.timestamp.desc()
-        )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        rows = result.all()
-
-        return [
-            {
-                'id': row[0].id if isinstance(row, tuple) else row.id,
-                'timestamp': self._format_timestamp(row[0].timestamp if isinstance(row, tuple) else row.timestamp),
-                'model_name': row[0].model_name if isinstance(row, tuple) else row.model_name,
-                'input_tokens': row[0].input_tokens if isinstance(row, tuple) else row.input_tokens,
-                'output_tokens': row[0].output_tokens if isinstance(row, tuple) else row.output_tokens,
-                'total_tokens': row[0].total_tokens if isinstance(row, tuple) else row.total_tokens,
-                'duration_ms': row[0].duration if isinstance(row, tuple) else row.duration,
-                'cost': row[0].cost if isinstance(row, tuple) else row.cost,
-                'status': row[0].status if isinstance(row, tuple) else row.status,
-                'bot_id': row[0].bot_id if isinstance(row, tuple) else row.bot_id,
-                'bot_name': row[0].bot_name if isinstance(row, tuple) else row.bot_name,
-                'pipeline_id': row[0].pipeline_id if isinstance(row, tuple) else row.pipeline_id,
-                'pipeline_name': row[0].pipeline_name if isinstance(row, tuple) else row.pipeline_name,
-                'session_id': row[0].session_id if isinstance(row, tuple) else row.session_id,
-                'message_id': row[0].message_id if isinstance(row, tuple) else row.message_id,
-                'error_message': row[0].error_message if isinstance(row, tuple) else row.error_message,
+            conditions.append(model.timestamp <= end_time)
+
+        async for row in self._iter_keyset(model, model.timestamp, model.id, conditions, limit):
+            yield {
+                'id': row.id,
+                'timestamp': self._format_timestamp(row.timestamp),
+                'model_name': row.model_name,
+                'input_tokens': row.input_tokens,
+                'output_tokens': row.output_tokens,
+                'total_tokens': row.total_tokens,
+                'duration_ms': row.duration,
+                'cost': row.cost,
+                'status': row.status,
+                'bot_id': row.bot_id,
+                'bot_name': row.bot_name,
+                'pipeline_id': row.pipeline_id,
+                'pipeline_name': row.pipeline_name,
+                'session_id': row.session_id,
+                'message_id': row.message_id,
+                'error_message': row.error_message,
             }
-            for row in rows
-        ]
 
     async def export_embedding_calls(
         self,
@@ -989,47 +2064,37 @@ class MonitoringService:
         end_time: datetime.datetime | None = None,
         knowledge_base_id: str | None = None,
         limit: int = 100000,
-    ) -> list[dict]:
-        """Export embedding calls as list of dictionaries for CSV conversion"""
+    ) -> typing.AsyncIterator[dict]:
+        """Export embedding calls as dictionaries for CSV conversion, newest first"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringEmbeddingCall
         conditions = []
 
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringEmbeddingCall.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringEmbeddingCall.timestamp <= end_time)
+            conditions.append(model.timestamp <= end_time)
         if knowledge_base_id:
-            conditions.append(persistence_monitoring.MonitoringEmbeddingCall.knowledge_base_id == knowledge_base_id)
-
-        query = sqlalchemy.select(persistence_monitoring.MonitoringEmbeddingCall).order_by(
-            persistence_monitoring.MonitoringEmbeddingCall.timestamp.desc()
-        )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        rows = result.all()
-
-        return [
-            {
-                'id': row[0].id if isinstance(row, tuple) else row.id,
-                'timestamp': self._format_timestamp(row[0].timestamp if isinstance(row, tuple) else row.timestamp),
-                'model_name': row[0].model_name if isinstance(row, tuple) else row.model_name,
-                'prompt_tokens': row[0].prompt_tokens if isinstance(row, tuple) else row.prompt_tokens,
-                'total_tokens': row[0].total_tokens if isinstance(row, tuple) else row.total_tokens,
-                'duration_ms': row[0].duration if isinstance(row, tuple) else row.duration,
-                'input_count': row[0].input_count if isinstance(row, tuple) else row.input_count,
-                'status': row[0].status if isinstance(row, tuple) else row.status,
-                'error_message': row[0].error_message if isinstance(row, tuple) else row.error_message,
-                'knowledge_base_id': row[0].knowledge_base_id if isinstance(row, tuple) else row.knowledge_base_id,
-                'query_text': row[0].query_text if isinstance(row, tuple) else row.query_text,
-                'session_id': row[0].session_id if isinstance(row, tuple) else row.session_id,
-                'message_id': row[0].message_id if isinstance(row, tuple) else row.message_id,
-                'call_type': row[0].call_type if isinstance(row, tuple) else row.call_type,
+            conditions.append(model.knowledge_base_id == knowledge_base_id)
+
+        async for row in self._iter_keyset(model, model.timestamp, model.id, conditions, limit):
+            yield {
+                'id': row.id,
+                'timestamp': self._format_timestamp(row.timestamp),
+                'model_name': row.model_name,
+                'prompt_tokens': row.prompt_tokens,
+                'total_tokens': row.total_tokens,
+                'duration_ms': row.duration,
+                'input_count': row.input_count,
+                'status': row.status,
+                'error_message': row.error_message,
+                'knowledge_base_id': row.knowledge_base_id,
+                'query_text': row.query_text,
+                'session_id': row.session_id,
+                'message_id': row.message_id,
+                'call_type': row.call_type,
             }
-            for row in rows
-        ]
 
     async def export_errors(
         self,
@@ -1038,46 +2103,36 @@ class MonitoringService:
         start_time: datetime.datetime | None = None,
         end_time: datetime.datetime | None = None,
         limit: int = 100000,
-    ) -> list[dict]:
-        """Export errors as list of dictionaries for CSV conversion"""
+    ) -> typing.AsyncIterator[dict]:
+        """Export errors as dictionaries for CSV conversion, newest first"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringError
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringError.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringError.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringError.timestamp >= start_time)
+            conditions.append(model.timestamp >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringError.timestamp <= end_time)
-
-        query = sqlalchemy.select(persistence_monitoring.MonitoringError).order_by(
-            persistence_monitoring.MonitoringError.timestamp.desc()
-        )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        rows = result.all()
-
-        return [
-            {
-                'id': row[0].id if isinstance(row, tuple) else row.id,
-                'timestamp': self._format_timestamp(row[0].timestamp if isinstance(row, tuple) else row.timestamp),
-                'error_type': row[0].error_type if isinstance(row, tuple) else row.error_type,
-                'error_message': row[0].error_message if isinstance(row, tuple) else row.error_message,
-                'bot_id': row[0].bot_id if isinstance(row, tuple) else row.bot_id,
-                'bot_name': row[0].bot_name if isinstance(row, tuple) else row.bot_name,
-                'pipeline_id': row[0].pipeline_id if isinstance(row, tuple) else row.pipeline_id,
-                'pipeline_name': row[0].pipeline_name if isinstance(row, tuple) else row.pipeline_name,
-                'session_id': row[0].session_id if isinstance(row, tuple) else row.session_id,
-                'message_id': row[0].message_id if isinstance(row, tuple) else row.message_id,
-                'stack_trace': row[0].stack_trace if isinstance(row, tuple) else row.stack_trace,
+            conditions.append(model.timestamp <= end_time)
+
+        async for row in self._iter_keyset(model, model.timestamp, model.id, conditions, limit):
+            yield {
+                'id': row.id,
+                'timestamp': self._format_timestamp(row.timestamp),
+                'error_type': row.error_type,
+                'error_message': row.error_message,
+                'bot_id': row.bot_id,
+                'bot_name': row.bot_name,
+                'pipeline_id': row.pipeline_id,
+                'pipeline_name': row.pipeline_name,
+                'session_id': row.session_id,
+                'message_id': row.message_id,
+                'stack_trace': row.stack_trace,
             }
-            for row in rows
-        ]
 
     async def export_sessions(
         self,
@@ -1086,45 +2141,33 @@ class MonitoringService:
         start_time: datetime.datetime | None = None,
         end_time: datetime.datetime | None = None,
         limit: int = 100000,
-    ) -> list[dict]:
-        """Export sessions as list of dictionaries for CSV conversion"""
+    ) -> typing.AsyncIterator[dict]:
+        """Export sessions as dictionaries for CSV conversion, most recently active first"""
+        await self.writer.flush()
+
+        model = persistence_monitoring.MonitoringSession
         conditions = []
 
         if bot_ids:
-            conditions.append(persistence_monitoring.MonitoringSession.bot_id.in_(bot_ids))
+            conditions.append(model.bot_id.in_(bot_ids))
         if pipeline_ids:
-            conditions.append(persistence_monitoring.MonitoringSession.pipeline_id.in_(pipeline_ids))
+            conditions.append(model.pipeline_id.in_(pipeline_ids))
         if start_time:
-            conditions.append(persistence_monitoring.MonitoringSession.start_time >= start_time)
+            conditions.append(model.start_time >= start_time)
         if end_time:
-            conditions.append(persistence_monitoring.MonitoringSession.start_time <= end_time)
-
-        query = sqlalchemy.select(persistence_monitoring.MonitoringSession).order_by(
-            persistence_monitoring.MonitoringSession.last_activity.desc()
-        )
-        if conditions:
-            query = query.where(sqlalchemy.and_(*conditions))
-
-        query = query.limit(limit)
-
-        result = await self.ap.persistence_mgr.execute_async(query)
-        rows = result.all()
-
-        return [
-            {
-                'session_id': row[0].session_id if isinstance(row, tuple) else row.session_id,
-                'bot_id': row[0].bot_id if isinstance(row, tuple) else row.bot_id,
-                'bot_name': row[0].bot_name if isinstance(row, tuple) else row.bot_name,
-                'pipeline_id': row[0].pipeline_id if isinstance(row, tuple) else row.pipeline_id,
-                'pipeline_name': row[0].pipeline_name if isinstance(row, tuple) else row.pipeline_name,
-                'message_count': row[0].message_count if isinstance(row, tuple) else row.message_count,
-                'start_time': self._format_timestamp(row[0].start_time if isinstance(row, tuple) else row.start_time),
-                'last_activity': self._format_timestamp(
-                    row[0].last_activity if isinstance(row, tuple) else row.last_activity
-                ),
-                'is_active': str(row[0].is_active if isinstance(row, tuple) else row.is_active),
-                'platform': row[0].platform if isinstance(row, tuple) else row.platform,
-                'user_id': row[0].user_id if isinstance(row, tuple) else row.user_id,
+            conditions.append(model.start_time <= end_time)
+
+        async for row in self._iter_keyset(model, model.last_activity, model.session_id, conditions, limit):
+            yield {
+                'session_id': row.session_id,
+                'bot_id': row.bot_id,
+                'bot_name': row.bot_name,
+                'pipeline_id': row.pipeline_id,
+                'pipeline_name': row.pipeline_name,
+                'message_count': row.message_count,
+                'start_time': self._format_timestamp(row.start_time),
+                'last_activity': self._format_timestamp(row.last_activity),
+                'is_active': str(row.is_active),
+                'platform': row.platform,
+                'user_id': row.user_id,
             }
-            for row in rows
-        ]
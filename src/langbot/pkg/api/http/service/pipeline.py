@@ -147,7 +147,7 @@ class PipelineService:
         await self.ap.pipeline_mgr.load_pipeline(pipeline)
 
         # update all conversation that use this pipeline
-        for session in self.ap.sess_mgr.session_list:
+        for session in self.ap.sess_mgr.sessions.values():
             if session.using_conversation is not None and session.using_conversation.pipeline_uuid == pipeline_uuid:
                 session.using_conversation = None
 
@@ -33,6 +33,7 @@ from ..api.http.service import external_kb as external_kb_service
 from ..api.http.service import monitoring as monitoring_service
 from ..discover import engine as discover_engine
 from ..storage import mgr as storagemgr
+from ..storage import media
 from ..utils import logcache
 from . import taskmgr
 from . import entities as core_entities
@@ -120,6 +121,8 @@ class Application:
 
     storage_mgr: storagemgr.StorageMgr = None
 
+    media_store: media.MediaStore = None
+
     # ========= HTTP Services =========
 
     user_service: user_service.UserService = None
@@ -201,6 +204,15 @@ class Application:
             self.logger.error(f'Application runtime fatal exception: {e}')
             self.logger.debug(f'Traceback: {traceback.format_exc()}')
 
+    async def shutdown(self):
+        """Flush buffered state before the process exits"""
+        if self.monitoring_service is not None:
+            await self.monitoring_service.shutdown()
+        if self.rag_mgr is not None:
+            self.rag_mgr.shutdown()
+        if self.sess_mgr is not None:
+            await self.sess_mgr.shutdown()
+
     def dispose(self):
         self.plugin_connector.dispose()
 
@@ -50,12 +50,34 @@ async def main(loop: asyncio.AbstractEventLoop):
         # Hang system signal processing
         import signal
 
-        def signal_handler(sig, frame):
-            app_inst.dispose()
-            print('[Signal] Program exit.')
-            os._exit(0)
-
-        signal.signal(signal.SIGINT, signal_handler)
+        exiting = False
+
+        async def shutdown():
+            try:
+                await asyncio.wait_for(app_inst.shutdown(), timeout=10)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                app_inst.dispose()
+                print('[Signal] Program exit.')
+                os._exit(0)
+
+        def on_signal():
+            nonlocal exiting
+            if exiting:
+                # second Ctrl-C, exit without waiting
+                app_inst.dispose()
+                os._exit(0)
+            exiting = True
+            asyncio.ensure_future(shutdown())
+
+        # SIGTERM (docker stop, systemd) goes through the same shutdown as Ctrl-C
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, on_signal)
+            except NotImplementedError:
+                # Windows event loops have no signal handlers
+                signal.signal(sig, lambda sig, frame: loop.call_soon_threadsafe(on_signal))
 
         app_inst = await make_app(loop)
         await app_inst.run()
@@ -29,7 +29,7 @@ from ...api.http.service import webhook as webhook_service
 from ...api.http.service import external_kb as external_kb_service
 from ...api.http.service import monitoring as monitoring_service
 from ...discover import engine as discover_engine
-from ...storage import mgr as storagemgr
+from ...storage import mgr as storagemgr, media
 from ...utils import logcache
 from ...vector import mgr as vectordb_mgr
 from .. import taskmgr
@@ -102,6 +102,11 @@ class BuildAppStage(stage.BootingStage):
         await storage_mgr_inst.initialize()
         ap.storage_mgr = storage_mgr_inst
 
+        # 适配器收到的媒体，消息中以句柄引用
+        media_store_inst = media.MediaStore.from_config(ap)
+        media_store_inst.storage_provider = storage_mgr_inst.storage_provider
+        ap.media_store = media_store_inst
+
         persistence_mgr_inst = persistencemgr.PersistenceManager(ap)
         ap.persistence_mgr = persistence_mgr_inst
         await persistence_mgr_inst.initialize()
@@ -162,6 +167,7 @@ class BuildAppStage(stage.BootingStage):
         ap.http_ctrl = http_ctrl
 
         monitoring_service_inst = monitoring_service.MonitoringService(ap)
+        await monitoring_service_inst.initialize()
         ap.monitoring_service = monitoring_service_inst
 
         async def runtime_disconnect_callback(connector: plugin_connector.PluginRuntimeConnector) -> None:
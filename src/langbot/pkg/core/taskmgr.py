@@ -17,9 +17,13 @@ class TaskContext:
     log: str
     """Log"""
 
+    progress: dict | None
+    """Progress of a long running task, {'current': int, 'total': int | None, 'unit': str}"""
+
     def __init__(self):
         self.current_action = 'default'
         self.log = ''
+        self.progress = None
 
     def _log(self, msg: str):
         self.log += msg + '\n'
@@ -27,6 +31,9 @@ class TaskContext:
     def set_current_action(self, action: str):
         self.current_action = action
 
+    def set_progress(self, current: int, total: int | None = None, unit: str = ''):
+        self.progress = {'current': current, 'total': total, 'unit': unit}
+
     def trace(
         self,
         msg: str,
@@ -38,7 +45,7 @@ class TaskContext:
         self._log(f'{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")} | {self.current_action} | {msg}')
 
     def to_dict(self) -> dict:
-        return {'current_action': self.current_action, 'log': self.log}
+        return {'current_action': self.current_action, 'log': self.log, 'progress': self.progress}
 
     @staticmethod
     def new() -> TaskContext:
@@ -0,0 +1,28 @@
+import sqlalchemy
+
+from .base import Base
+
+
+class Conversation(Base):
+    """Persisted conversation metadata"""
+
+    __tablename__ = 'conversations'
+
+    id = sqlalchemy.Column(sqlalchemy.String(255), primary_key=True)
+    session_key = sqlalchemy.Column(sqlalchemy.String(255), nullable=False, index=True)
+    pipeline_uuid = sqlalchemy.Column(sqlalchemy.String(255), nullable=False)
+    bot_uuid = sqlalchemy.Column(sqlalchemy.String(255), nullable=False)
+    uuid = sqlalchemy.Column(sqlalchemy.String(255), nullable=True)  # External conversation id bound by runners
+    prompt = sqlalchemy.Column(sqlalchemy.Text, nullable=False)  # Prompt as JSON string
+    create_time = sqlalchemy.Column(sqlalchemy.Float, nullable=False)
+    update_time = sqlalchemy.Column(sqlalchemy.Float, nullable=False)
+
+
+class ConversationMessage(Base):
+    """Persisted conversation message, append-only"""
+
+    __tablename__ = 'conversation_messages'
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
+    conversation_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=False, index=True)
+    content = sqlalchemy.Column(sqlalchemy.Text, nullable=False)  # Message as JSON string
@@ -104,3 +104,65 @@ class MonitoringEmbeddingCall(Base):
     session_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=True, index=True)
     message_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=True, index=True)
     call_type = sqlalchemy.Column(sqlalchemy.String(50), nullable=True)  # embedding, retrieve
+
+
+class MonitoringToolCall(Base):
+    """Tool call records"""
+
+    __tablename__ = 'monitoring_tool_calls'
+
+    id = sqlalchemy.Column(sqlalchemy.String(255), primary_key=True)
+    timestamp = sqlalchemy.Column(sqlalchemy.DateTime, nullable=False, index=True)
+    tool_name = sqlalchemy.Column(sqlalchemy.String(255), nullable=False, index=True)
+    duration = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)  # milliseconds
+    status = sqlalchemy.Column(sqlalchemy.String(50), nullable=False)  # success, error, timeout
+    error_message = sqlalchemy.Column(sqlalchemy.Text, nullable=True)
+    bot_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=False, index=True)
+    bot_name = sqlalchemy.Column(sqlalchemy.String(255), nullable=False)
+    pipeline_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=False, index=True)
+    pipeline_name = sqlalchemy.Column(sqlalchemy.String(255), nullable=False)
+    session_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=False)
+    message_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=True, index=True)  # Associated message ID
+
+
+class MonitoringRollupMixin:
+    """Counters of one time bucket for one bot and pipeline
+
+    Rows with empty bot_id and pipeline_id hold the counters that are not tied to a pipeline
+    (embedding calls).
+    """
+
+    bucket = sqlalchemy.Column(sqlalchemy.DateTime, primary_key=True)  # bucket start, UTC
+    bot_id = sqlalchemy.Column(sqlalchemy.String(255), primary_key=True)
+    pipeline_id = sqlalchemy.Column(sqlalchemy.String(255), primary_key=True)
+    message_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    message_success_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    message_error_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    llm_call_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    llm_error_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    input_tokens = sqlalchemy.Column(sqlalchemy.BigInteger, nullable=False, default=0)
+    output_tokens = sqlalchemy.Column(sqlalchemy.BigInteger, nullable=False, default=0)
+    llm_duration_sum = sqlalchemy.Column(sqlalchemy.BigInteger, nullable=False, default=0)  # milliseconds
+    # LLM call duration histogram
+    llm_duration_lt_1s = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    llm_duration_lt_3s = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    llm_duration_lt_10s = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    llm_duration_lt_30s = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    llm_duration_ge_30s = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    embedding_call_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    tool_call_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    tool_error_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    tool_duration_sum = sqlalchemy.Column(sqlalchemy.BigInteger, nullable=False, default=0)  # milliseconds
+    error_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+
+
+class MonitoringRollupMinute(MonitoringRollupMixin, Base):
+    """Per-minute monitoring rollup"""
+
+    __tablename__ = 'monitoring_rollup_minute'
+
+
+class MonitoringRollupHour(MonitoringRollupMixin, Base):
+    """Per-hour monitoring rollup"""
+
+    __tablename__ = 'monitoring_rollup_hour'
@@ -12,6 +12,9 @@ class KnowledgeBase(Base):
     updated_at = sqlalchemy.Column(sqlalchemy.DateTime, default=sqlalchemy.func.now(), onupdate=sqlalchemy.func.now())
     embedding_model_uuid = sqlalchemy.Column(sqlalchemy.String, default='')
     top_k = sqlalchemy.Column(sqlalchemy.Integer, default=5)
+    retrieval_mode = sqlalchemy.Column(
+        sqlalchemy.String(32), nullable=False, default='vector'
+    )  # vector, hybrid, lexical
 
 
 class File(Base):
@@ -29,6 +32,7 @@ class Chunk(Base):
     uuid = sqlalchemy.Column(sqlalchemy.String(255), primary_key=True, unique=True)
     file_id = sqlalchemy.Column(sqlalchemy.String(255), nullable=True)
     text = sqlalchemy.Column(sqlalchemy.Text)
+    content_hash = sqlalchemy.Column(sqlalchemy.String(64), nullable=True, index=True)  # sha256 of text
 
 
 class ExternalKnowledgeBase(Base):
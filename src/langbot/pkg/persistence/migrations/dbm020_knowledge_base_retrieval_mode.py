@@ -0,0 +1,37 @@
+import sqlalchemy
+from .. import migration
+
+
+@migration.migration_class(20)
+class DBMigrateKnowledgeBaseRetrievalMode(migration.DBMigration):
+    """Add retrieval_mode field to knowledge_bases table"""
+
+    async def upgrade(self):
+        """Upgrade"""
+        # Get all column names from the table
+        columns = []
+
+        if self.ap.persistence_mgr.db.name == 'postgresql':
+            result = await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = 'knowledge_bases';"
+                )
+            )
+            all_result = result.fetchall()
+            columns = [row[0] for row in all_result]
+        else:
+            result = await self.ap.persistence_mgr.execute_async(sqlalchemy.text('PRAGMA table_info(knowledge_bases);'))
+            all_result = result.fetchall()
+            columns = [row[1] for row in all_result]
+
+        # Check and add retrieval_mode column, existing knowledge bases keep searching vectors only
+        if 'retrieval_mode' not in columns:
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text(
+                    "ALTER TABLE knowledge_bases ADD COLUMN retrieval_mode VARCHAR(32) NOT NULL DEFAULT 'vector'"
+                )
+            )
+
+    async def downgrade(self):
+        """Downgrade"""
+        pass
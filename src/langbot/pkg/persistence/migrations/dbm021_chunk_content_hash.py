@@ -0,0 +1,58 @@
+import hashlib
+
+import sqlalchemy
+from .. import migration
+
+
+@migration.migration_class(21)
+class DBMigrateChunkContentHash(migration.DBMigration):
+    """Add content_hash field to knowledge_base_chunks table"""
+
+    async def upgrade(self):
+        """Upgrade"""
+        # Get all column names from the table
+        columns = []
+
+        if self.ap.persistence_mgr.db.name == 'postgresql':
+            result = await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = 'knowledge_base_chunks';"
+                )
+            )
+            all_result = result.fetchall()
+            columns = [row[0] for row in all_result]
+        else:
+            result = await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text('PRAGMA table_info(knowledge_base_chunks);')
+            )
+            all_result = result.fetchall()
+            columns = [row[1] for row in all_result]
+
+        if 'content_hash' not in columns:
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text('ALTER TABLE knowledge_base_chunks ADD COLUMN content_hash VARCHAR(64)')
+            )
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text(
+                    'CREATE INDEX IF NOT EXISTS ix_knowledge_base_chunks_content_hash '
+                    'ON knowledge_base_chunks (content_hash)'
+                )
+            )
+
+        # Hash the existing chunks, so re-indexing their files reuses them
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.text('SELECT uuid, text FROM knowledge_base_chunks WHERE content_hash IS NULL')
+        )
+        rows = result.fetchall()
+        for start in range(0, len(rows), 500):
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.text('UPDATE knowledge_base_chunks SET content_hash = :content_hash WHERE uuid = :uuid'),
+                [
+                    {'uuid': row[0], 'content_hash': hashlib.sha256((row[1] or '').encode('utf-8')).hexdigest()}
+                    for row in rows[start : start + 500]
+                ],
+            )
+
+    async def downgrade(self):
+        """Downgrade"""
+        pass
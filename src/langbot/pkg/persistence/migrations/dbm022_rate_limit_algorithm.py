@@ -0,0 +1,50 @@
+from .. import migration
+
+import sqlalchemy
+import json
+
+
+@migration.migration_class(22)
+class DBMigrateRateLimitAlgorithm(migration.DBMigration):
+    """Rate limit algorithm and scope config"""
+
+    async def upgrade(self):
+        """Upgrade"""
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.text('SELECT uuid, config FROM legacy_pipelines')
+        )
+        pipelines = result.fetchall()
+
+        current_version = self.ap.ver_mgr.get_current_version()
+
+        for pipeline_row in pipelines:
+            uuid = pipeline_row[0]
+            config = json.loads(pipeline_row[1]) if isinstance(pipeline_row[1], str) else pipeline_row[1]
+
+            if 'safety' not in config:
+                config['safety'] = {}
+            if 'rate-limit' not in config['safety']:
+                config['safety']['rate-limit'] = {}
+
+            # Existing pipelines keep the fixed window per group or private chat
+            config['safety']['rate-limit'].setdefault('algorithm', 'fixwin')
+            config['safety']['rate-limit'].setdefault('scope', 'session')
+
+            if self.ap.persistence_mgr.db.name == 'postgresql':
+                await self.ap.persistence_mgr.execute_async(
+                    sqlalchemy.text(
+                        'UPDATE legacy_pipelines SET config = :config::jsonb, for_version = :for_version WHERE uuid = :uuid'
+                    ),
+                    {'config': json.dumps(config), 'for_version': current_version, 'uuid': uuid},
+                )
+            else:
+                await self.ap.persistence_mgr.execute_async(
+                    sqlalchemy.text(
+                        'UPDATE legacy_pipelines SET config = :config, for_version = :for_version WHERE uuid = :uuid'
+                    ),
+                    {'config': json.dumps(config), 'for_version': current_version, 'uuid': uuid},
+                )
+
+    async def downgrade(self):
+        """Downgrade"""
+        pass
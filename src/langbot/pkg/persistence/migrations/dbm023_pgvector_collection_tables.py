@@ -0,0 +1,24 @@
+from .. import migration
+
+
+@migration.migration_class(23)
+class DBMigratePgvectorCollectionTables(migration.DBMigration):
+    """Move the vectors of the shared pgvector table into one table per knowledge base"""
+
+    async def upgrade(self):
+        """Upgrade"""
+        vdb_config = self.ap.instance_config.data.get('vdb') or {}
+        if vdb_config.get('use') != 'pgvector':
+            return
+
+        from ...vector import mgr as vector_mgr
+
+        vector_db = vector_mgr.create_pgvector_database(self.ap, vdb_config.get('pgvector', {}))
+        try:
+            await vector_db.migrate_legacy_table()
+        finally:
+            await vector_db.close()
+
+    async def downgrade(self):
+        """Downgrade"""
+        pass
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import os
 import re
 
 from .. import filter as filter_model
@@ -6,30 +7,166 @@ from .. import entities
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 
 
+_REGEX_CHARS = frozenset('.^$*+?{}[]|()\\')
+
+
+class BanWordMatcher:
+    """Prebuilt matcher of a ban word list
+
+    Literal words go into an Aho-Corasick automaton, so a message is scanned once for them regardless
+    of the list size. Words using regex syntax are matched one by one, an alternation would only report
+    the first of two overlapping matches. Overlapping matches are merged before masking.
+    """
+
+    def __init__(self, words: list[str], mask: str = '*', mask_word: str = ''):
+        self.mask = mask
+        self.mask_word = mask_word
+
+        literals = []
+        patterns = []
+        for word in dict.fromkeys(words):
+            if not word:
+                continue
+            if _REGEX_CHARS.isdisjoint(word):
+                literals.append(word)
+            else:
+                patterns.append(word)
+
+        self._build_automaton(literals)
+        self._regexes = self._compile(patterns)
+
+    def _build_automaton(self, literals: list[str]):
+        # state 0 is the root, _longest[state] is the longest word ending at the state
+        # including the ones reached through failure links
+        goto: list[dict[str, int]] = [{}]
+        longest = [0]
+        for word in literals:
+            state = 0
+            for char in word:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    longest.append(0)
+                state = nxt
+            longest[state] = len(word)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(char, 0)
+                longest[nxt] = max(longest[nxt], longest[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        self._longest = longest
+
+    @staticmethod
+    def _compile(patterns: list[str]) -> list[re.Pattern]:
+        compiled = []
+        for pattern in patterns:
+            try:
+                compiled.append(re.compile(pattern))
+            except re.error:
+                continue
+        return compiled
+
+    def find(self, message: str) -> list[tuple[int, int]]:
+        """Merged (start, end) spans of all the ban words in the message"""
+        spans = []
+
+        goto = self._goto
+        fail = self._fail
+        longest = self._longest
+        state = 0
+        for i, char in enumerate(message):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if longest[state]:
+                spans.append((i + 1 - longest[state], i + 1))
+
+        for regex in self._regexes:
+            spans.extend(match.span() for match in regex.finditer(message) if match.end() > match.start())
+
+        if not spans:
+            return spans
+
+        spans.sort()
+        merged = [spans[0]]
+        for start, end in spans[1:]:
+            if start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def mask_message(self, message: str) -> tuple[str, bool]:
+        """The masked message and whether any ban word was found"""
+        spans = self.find(message)
+        if not spans:
+            return message, False
+
+        parts = []
+        last = 0
+        for start, end in spans:
+            parts.append(message[last:start])
+            parts.append(self.mask_word if self.mask_word != '' else self.mask * (end - start))
+            last = end
+        parts.append(message[last:])
+        return ''.join(parts), True
+
+
 @filter_model.filter_class('ban-word-filter')
 class BanWordFilter(filter_model.ContentFilter):
     """Filter content"""
 
+    matcher: BanWordMatcher | None = None
+
     async def initialize(self):
-        pass
+        self.matcher = None
+        self._words = None
+        self._mtime = None
+
+    async def _get_matcher(self) -> BanWordMatcher:
+        """Matcher of the current word list, rebuilt only when the sensitive word file changes"""
+        meta = self.ap.sensitive_meta
+        try:
+            mtime = os.stat(meta.file.config_file_name).st_mtime_ns
+        except (AttributeError, OSError):
+            mtime = None
+
+        if self.matcher is not None and mtime != self._mtime:
+            try:
+                await meta.load_config()
+            except Exception as e:
+                # e.g. the file is read while being written, keep the previous list until it changes again
+                self.ap.logger.warning(f'Failed to reload sensitive words, keeping the previous list: {e}')
+                self._mtime = mtime
+                return self.matcher
+
+        data = meta.data
+        if (
+            self.matcher is None
+            or data['words'] is not self._words
+            or data['mask'] != self.matcher.mask
+            or data['mask_word'] != self.matcher.mask_word
+        ):
+            self.matcher = BanWordMatcher(data['words'], data['mask'], data['mask_word'])
+            self._words = data['words']
+        self._mtime = mtime
+        return self.matcher
 
     async def process(self, query: pipeline_query.Query, message: str) -> entities.FilterResult:
-        found = False
-
-        for word in self.ap.sensitive_meta.data['words']:
-            match = re.findall(word, message)
-
-            if len(match) > 0:
-                found = True
-
-                for i in range(len(match)):
-                    if self.ap.sensitive_meta.data['mask_word'] == '':
-                        message = message.replace(
-                            match[i],
-                            self.ap.sensitive_meta.data['mask'] * len(match[i]),
-                        )
-                    else:
-                        message = message.replace(match[i], self.ap.sensitive_meta.data['mask_word'])
+        matcher = await self._get_matcher()
+        message, found = matcher.mask_message(message)
 
         return entities.FilterResult(
             level=entities.ResultLevel.MASKED if found else entities.ResultLevel.PASS,
@@ -5,8 +5,10 @@ import traceback
 
 from ..core import app
 from ..core import entities as core_entities
+from . import pool
 
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
 
 
 class Controller:
@@ -29,31 +31,39 @@ class Controller:
 
                 # 取请求
                 async with self.ap.query_pool:
-                    queries: list[pipeline_query.Query] = self.ap.query_pool.queries
+                    query_pool = self.ap.query_pool
 
-                    for query in queries:
-                        session = await self.ap.sess_mgr.get_session(query)
-                        # Debug logging removed from tight loop to prevent excessive log generation
-                        # that can cause memory overflow in high-traffic scenarios
+                    while True:
+                        session_key = query_pool.next_ready_session()
 
-                        if not session._semaphore.locked():
-                            selected_query = query
-                            await session._semaphore.acquire()
-                            # Only log when actually selecting a query
-                            self.ap.logger.debug(f'Selected query {query.query_id} for processing')
+                        if session_key is None:  # 没有请求 或者 所有有请求的session都已达到并发上限
+                            await query_pool.condition.wait()
+                            continue
+
+                        query = query_pool.peek_query(session_key)
+                        # 持有锁时不等待存储，对话在处理请求时再等待加载完成
+                        session = await self.ap.sess_mgr.get_session(query, wait_loaded=False)
+
+                        if session._semaphore.locked():
+                            # 会话已满，暂不放回就绪队列，待该会话有请求完成时再放回
+                            continue
 
-                            break
+                        await session._semaphore.acquire()
+                        selected_query = query_pool.pop_query(session_key)
+
+                        if not session._semaphore.locked():
+                            # 会话仍有空闲并发，轮转到就绪队列尾部
+                            query_pool.mark_ready(session_key)
 
-                    if selected_query:  # 找到了
-                        queries.remove(selected_query)
-                    else:  # 没找到 说明：没有请求 或者 所有query对应的session都已达到并发上限
-                        await self.ap.query_pool.condition.wait()
-                        continue
+                        # Only log when actually selecting a query
+                        self.ap.logger.debug(f'Selected query {selected_query.query_id} for processing')
+                        break
 
                 if selected_query:
 
-                    async def _process_query(selected_query: pipeline_query.Query):
-                        async with self.semaphore:  # 总并发上限
+                    async def _process_query(selected_query: pipeline_query.Query, session: provider_session.Session):
+                        # 多实例部署时会话的并发由租约限制，等待租约时不占用总并发
+                        async with self.ap.sess_mgr.lease(session), self.semaphore:  # 总并发上限
                             # find pipeline
                             # Here firstly find the bot, then find the pipeline, in case the bot adapter's config is not the latest one.
                             # Like aiocqhttp, once a client is connected, even the adapter was updated and restarted, the existing client connection will not be affected.
@@ -65,12 +75,15 @@ class Controller:
                                     await pipeline.run(selected_query)
 
                         async with self.ap.query_pool:
-                            (await self.ap.sess_mgr.get_session(selected_query))._semaphore.release()
-                            # 通知其他协程，有新的请求可以处理了
-                            self.ap.query_pool.condition.notify_all()
+                            # 使用调度时取得的会话，保证释放的是同一个信号量
+                            session._semaphore.release()
+                            # 该会话有空闲并发了，若还有待处理请求则放回就绪队列
+                            self.ap.query_pool.mark_ready(pool.get_session_key(selected_query))
+                            # 通知调度协程，有新的请求可以处理了
+                            self.ap.query_pool.condition.notify()
 
                     self.ap.task_mgr.create_task(
-                        _process_query(selected_query),
+                        _process_query(selected_query, session),
                         kind='query',
                         name=f'query-{selected_query.query_id}',
                         scopes=[
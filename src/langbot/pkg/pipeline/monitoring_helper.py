@@ -257,6 +257,35 @@ class MonitoringHelper:
         except Exception as e:
             ap.logger.error(f'Failed to record LLM call: {e}')
 
+    @staticmethod
+    async def record_tool_call(
+        ap: app.Application,
+        query: pipeline_query.Query,
+        tool_name: str,
+        duration_ms: int,
+        status: str = 'success',
+        error_message: str | None = None,
+    ):
+        """Record tool call, monitoring metadata is taken from query variables"""
+        try:
+            session_id = f'{query.launcher_type}_{query.launcher_id}'
+            variables = query.variables or {}
+
+            await ap.monitoring_service.record_tool_call(
+                bot_id=query.bot_uuid or 'unknown',
+                bot_name=variables.get('_monitoring_bot_name', 'Unknown'),
+                pipeline_id=query.pipeline_uuid or 'unknown',
+                pipeline_name=variables.get('_monitoring_pipeline_name', 'Unknown'),
+                session_id=session_id,
+                tool_name=tool_name,
+                duration=duration_ms,
+                status=status,
+                error_message=error_message,
+                message_id=variables.get('_monitoring_message_id'),
+            )
+        except Exception as e:
+            ap.logger.error(f'Failed to record tool call: {e}')
+
 
 class LLMCallMonitor:
     """Context manager for monitoring LLM calls"""
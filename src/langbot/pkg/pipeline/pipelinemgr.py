@@ -13,6 +13,9 @@ import langbot_plugin.api.entities.builtin.platform.message as platform_message
 import langbot_plugin.api.entities.builtin.platform.events as platform_events
 import langbot_plugin.api.entities.events as events
 from ..utils import importutil
+from ..provider.response_cache import ResponseCache
+from .ratelimit.budget import ModelBudget
+from ..storage import media
 
 import langbot_plugin.api.entities.builtin.provider.session as provider_session
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
@@ -299,6 +302,10 @@ class RuntimePipeline:
         except Exception as e:
             self.ap.logger.error(f'Failed to record query start: {e}')
 
+        # keep the media of the message while it is processed
+        query_media = media.media_uris(query.message_chain)
+        self.ap.media_store.acquire(query_media)
+
         try:
             # Get bound plugins for this pipeline
             bound_plugins = query.variables.get('_pipeline_bound_plugins', None)
@@ -376,6 +383,7 @@ class RuntimePipeline:
                 self.ap.logger.error(f'Failed to record query error: {me}')
 
         finally:
+            self.ap.media_store.release(query_media)
             self.ap.logger.debug(f'Query {query.query_id} processed')
             del self.ap.query_pool.cached_queries[query.query_id]
 
@@ -389,9 +397,17 @@ class PipelineManager:
 
     stage_dict: dict[str, type[stage.PipelineStage]]
 
+    response_cache: ResponseCache
+    """Cached answers of the local agent, emptied per pipeline when it is updated or removed"""
+
+    model_budget: ModelBudget
+    """Model usage budgets shared by all pipelines"""
+
     def __init__(self, ap: app.Application):
         self.ap = ap
         self.pipelines = []
+        self.response_cache = ResponseCache.from_config(ap)
+        self.model_budget = ModelBudget.from_config(ap)
 
     async def initialize(self):
         self.stage_dict = {name: cls for name, cls in stage.preregistered_stages.items()}
@@ -438,6 +454,7 @@ class PipelineManager:
         return None
 
     async def remove_pipeline(self, uuid: str):
+        self.response_cache.invalidate_pipeline(uuid)
         for pipeline in self.pipelines:
             if pipeline.pipeline_entity.uuid == uuid:
                 self.pipelines.remove(pipeline)
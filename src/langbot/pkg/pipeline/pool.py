@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import collections
 import typing
 
 import langbot_plugin.api.entities.builtin.platform.message as platform_message
@@ -10,14 +11,40 @@ import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 import langbot_plugin.api.definition.abstract.platform.adapter as abstract_platform_adapter
 
 
+SessionKey = tuple[str, str]
+"""会话键：(launcher_type, launcher_id)"""
+
+
+def get_session_key(query: pipeline_query.Query) -> SessionKey:
+    """获取请求对应的会话键"""
+    launcher_type = query.launcher_type
+    if isinstance(launcher_type, provider_session.LauncherTypes):
+        launcher_type = launcher_type.value
+    return (str(launcher_type), str(query.launcher_id))
+
+
 class QueryPool:
-    """请求池，请求获得调度进入pipeline之前，保存在这里"""
+    """请求池，请求获得调度进入pipeline之前，保存在这里
+
+    每个会话一个 FIFO 队列，另外维护一个就绪会话队列（有待处理请求且未被标记为繁忙的会话），
+    使得调度器取下一个可运行请求的代价为 O(1)，而不是每次唤醒都扫描全部请求。
+    """
 
     query_id_counter: int = 0
 
     pool_lock: asyncio.Lock
 
-    queries: list[pipeline_query.Query]
+    session_queues: dict[SessionKey, collections.deque[pipeline_query.Query]]
+    """每个会话的待处理请求队列"""
+
+    ready_sessions: collections.deque[SessionKey]
+    """就绪会话队列，按轮转顺序调度"""
+
+    ready_set: set[SessionKey]
+    """就绪会话集合，用于去重"""
+
+    pending_count: int
+    """尚未被调度的请求数"""
 
     cached_queries: dict[int, pipeline_query.Query]
     """Cached queries, used for plugin backward api call, will be removed after the query completely processed"""
@@ -27,10 +54,18 @@ class QueryPool:
     def __init__(self):
         self.query_id_counter = 0
         self.pool_lock = asyncio.Lock()
-        self.queries = []
+        self.session_queues = {}
+        self.ready_sessions = collections.deque()
+        self.ready_set = set()
+        self.pending_count = 0
         self.cached_queries = {}
         self.condition = asyncio.Condition(self.pool_lock)
 
+    @property
+    def queries(self) -> list[pipeline_query.Query]:
+        """所有待调度的请求（只读快照，按会话分组）"""
+        return [query for queue in self.session_queues.values() for query in queue]
+
     async def add_query(
         self,
         bot_uuid: str,
@@ -58,10 +93,54 @@ class QueryPool:
                 adapter=adapter,
                 pipeline_uuid=pipeline_uuid,
             )
-            self.queries.append(query)
+            self.enqueue(query)
             self.cached_queries[query_id] = query
             self.query_id_counter += 1
-            self.condition.notify_all()
+            self.condition.notify()
+            return query
+
+    def enqueue(self, query: pipeline_query.Query):
+        """将请求加入其会话队列，调用方需持有锁"""
+        key = get_session_key(query)
+        queue = self.session_queues.get(key)
+        if queue is None:
+            queue = collections.deque()
+            self.session_queues[key] = queue
+        queue.append(query)
+        self.pending_count += 1
+        self.mark_ready(key)
+
+    def mark_ready(self, key: SessionKey):
+        """若会话有待处理请求，则将其放入就绪队列，调用方需持有锁"""
+        if key in self.ready_set or key not in self.session_queues:
+            return
+        self.ready_set.add(key)
+        self.ready_sessions.append(key)
+
+    def next_ready_session(self) -> typing.Optional[SessionKey]:
+        """取出下一个就绪会话，没有则返回 None，调用方需持有锁
+
+        取出的会话不再处于就绪队列中，直到调用 mark_ready 将其放回。
+        """
+        if not self.ready_sessions:
+            return None
+        key = self.ready_sessions.popleft()
+        self.ready_set.discard(key)
+        return key
+
+    def peek_query(self, key: SessionKey) -> typing.Optional[pipeline_query.Query]:
+        """查看会话队首请求"""
+        queue = self.session_queues.get(key)
+        return queue[0] if queue else None
+
+    def pop_query(self, key: SessionKey) -> pipeline_query.Query:
+        """取出会话队首请求，队列为空时删除该会话队列，调用方需持有锁"""
+        queue = self.session_queues[key]
+        query = queue.popleft()
+        if not queue:
+            del self.session_queues[key]
+        self.pending_count -= 1
+        return query
 
     async def __aenter__(self):
         await self.pool_lock.acquire()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import datetime
 
 from .. import stage, entities
+from ...storage import media
 from langbot_plugin.api.entities.builtin.provider import message as provider_message
 import langbot_plugin.api.entities.events as events
 import langbot_plugin.api.entities.builtin.platform.message as platform_message
@@ -106,10 +107,14 @@ class PreProcessor(stage.PipelineStage):
             and not llm_model.model_entity.abilities.__contains__('vision')
         ):
             for msg in query.messages:
-                if isinstance(msg.content, list):
-                    for me in msg.content:
-                        if me.type == 'image_url':
-                            msg.content.remove(me)
+                if isinstance(msg.content, list) and any(me.type == 'image_url' for me in msg.content):
+                    # 对话历史不再引用被移除的图片
+                    self.ap.media_store.release(
+                        me.image_url.url
+                        for me in msg.content
+                        if me.type == 'image_url' and me.image_url is not None and media.is_media_uri(me.image_url.url)
+                    )
+                    msg.content = [me for me in msg.content if me.type != 'image_url']
 
         content_list: list[provider_message.ContentElement] = []
 
@@ -124,7 +129,9 @@ class PreProcessor(stage.PipelineStage):
                 if selected_runner != 'local-agent' or (
                     llm_model and llm_model.model_entity.abilities.__contains__('vision')
                 ):
-                    if me.base64 is not None:
+                    if media.is_media_uri(me.url):
+                        content_list.append(provider_message.ContentElement.from_image_url(me.url))
+                    elif me.base64 is not None:
                         content_list.append(provider_message.ContentElement.from_image_base64(me.base64))
             elif isinstance(me, platform_message.Voice):
                 # 转成文件链接，让下游 runner 上传到目标模型
@@ -143,7 +150,9 @@ class PreProcessor(stage.PipelineStage):
                         if selected_runner != 'local-agent' or (
                             llm_model and llm_model.model_entity.abilities.__contains__('vision')
                         ):
-                            if msg.base64 is not None:
+                            if media.is_media_uri(msg.url):
+                                content_list.append(provider_message.ContentElement.from_image_url(msg.url))
+                            elif msg.base64 is not None:
                                 content_list.append(provider_message.ContentElement.from_image_base64(msg.base64))
 
         query.variables['user_message_text'] = plain_text
@@ -10,6 +10,7 @@ from datetime import datetime
 from .. import handler
 from ... import entities
 from ....provider import runner as runner_module
+from ....provider import streaming
 
 import langbot_plugin.api.entities.events as events
 from ....utils import importutil, constants
@@ -23,6 +24,15 @@ importutil.import_modules_in_pkg(runners)
 
 
 class ChatMessageHandler(handler.MessageHandler):
+    @staticmethod
+    def _is_text_delta(message: provider_message.Message | provider_message.MessageChunk) -> bool:
+        """是否为 assistant 的文本增量块"""
+        return (
+            isinstance(message, provider_message.MessageChunk)
+            and message.role == 'assistant'
+            and (message.content is None or isinstance(message.content, str))
+        )
+
     async def handle(
         self,
         query: pipeline_query.Query,
@@ -93,8 +103,27 @@ class ChatMessageHandler(handler.MessageHandler):
                     resp_message_id = uuid.uuid4()
                     chunk_count = 0  # Track streaming chunks to reduce excessive logging
 
+                    # Runner 输出增量时，在这里累积完整文本；适配器支持增量更新时只向其发送增量
+                    stream_buffer = streaming.StreamBuffer() if runner.stream_delta else None
+                    try:
+                        is_delta_supported = (
+                            stream_buffer is not None and await query.adapter.is_stream_delta_supported()
+                        )
+                    except AttributeError:
+                        is_delta_supported = False
+
                     async for result in runner.run(query):
                         result.resp_message_id = str(resp_message_id)
+
+                        if stream_buffer is not None and self._is_text_delta(result):
+                            stream_buffer.append(result.content)
+                            if not is_delta_supported or result.is_final:
+                                # 这些适配器每个分片都发送完整文本；最后一个分片总是完整文本，
+                                # 插件事件据此触发，插件替换的回复也会替换掉已发送的文本
+                                result = provider_message.MessageChunk.model_construct(
+                                    **{**dict(result), 'content': stream_buffer.getvalue()}
+                                )
+
                         if query.resp_messages:
                             query.resp_messages.pop()
                         if query.resp_message_chain:
@@ -123,6 +152,12 @@ class ChatMessageHandler(handler.MessageHandler):
 
                         yield entities.StageProcessResult(result_type=entities.ResultType.CONTINUE, new_query=query)
 
+                    if is_delta_supported and query.resp_messages and self._is_text_delta(query.resp_messages[-1]):
+                        # 写入对话历史的需要是完整文本
+                        query.resp_messages[-1] = provider_message.MessageChunk.model_construct(
+                            **{**dict(query.resp_messages[-1]), 'content': stream_buffer.getvalue()}
+                        )
+
                     # Log final summary after streaming completes
                     self.ap.logger.info(
                         f'Conversation({query.query_id}) Streaming completed: {chunk_count} chunks, {text_length} chars'
@@ -141,9 +176,11 @@ class ChatMessageHandler(handler.MessageHandler):
 
                         yield entities.StageProcessResult(result_type=entities.ResultType.CONTINUE, new_query=query)
 
-                query.session.using_conversation.messages.append(query.user_message)
-
-                query.session.using_conversation.messages.extend(query.resp_messages)
+                await self.ap.sess_mgr.append_messages(
+                    query.session,
+                    query.session.using_conversation,
+                    [query.user_message, *query.resp_messages],
+                )
             except Exception as e:
                 error_info = f'{traceback.format_exc()}'
                 self.ap.logger.error(f'Conversation({query.query_id}) Request Failed: {error_info}')
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import abc
+import collections
 import typing
 
 from ...core import app
@@ -18,6 +19,54 @@ def algo_class(name: str):
     return decorator
 
 
+T = typing.TypeVar('T')
+
+
+def scope_key(query: pipeline_query.Query, launcher_type: str, launcher_id: typing.Union[int, str]) -> str:
+    """限流范围的键
+
+    session 为每个群或私聊，user 为每个用户（跨群和私聊），bot 为整个机器人
+    """
+    scope = query.pipeline_config['safety']['rate-limit'].get('scope', 'session')
+    if scope == 'user':
+        return f'user_{query.sender_id}'
+    elif scope == 'bot':
+        return f'bot_{query.bot_uuid}'
+    return f'{launcher_type}_{launcher_id}'
+
+
+class ScopedContainers(typing.Generic[T]):
+    """按限流范围保存的状态容器
+
+    容器的 expires_at 之后其状态与新建的容器等价，可以直接丢弃。容器按访问顺序排列，
+    每次访问时顺带清理最久未访问且已过期的容器，内存只与窗口内活跃的范围数有关。
+    """
+
+    def __init__(self, factory: typing.Callable[[], T]):
+        self.factory = factory
+        self.containers: collections.OrderedDict[str, T] = collections.OrderedDict()
+        self.evicted_count = 0
+
+    def get(self, key: str, now: float) -> T:
+        containers = self.containers
+        while containers:
+            oldest = next(iter(containers.values()))
+            if oldest.expires_at > now:
+                break
+            containers.popitem(last=False)
+            self.evicted_count += 1
+
+        container = containers.get(key)
+        if container is None:
+            container = containers[key] = self.factory()
+        else:
+            containers.move_to_end(key)
+        return container
+
+    def __len__(self) -> int:
+        return len(self.containers)
+
+
 class ReteLimitAlgo(metaclass=abc.ABCMeta):
     """限流算法抽象类"""
 
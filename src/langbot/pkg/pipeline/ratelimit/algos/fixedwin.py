@@ -8,27 +8,34 @@ import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 
 # 固定窗口算法
 class SessionContainer:
-    wait_lock: asyncio.Lock
+    __slots__ = ('window', 'count', 'queued', 'expires_at')
 
-    records: dict[int, int]
-    """访问记录，key为每窗口长度的起始时间戳，value为访问次数"""
+    window: int
+    """当前窗口的起始时间戳"""
+
+    count: int
+    """当前窗口的访问次数"""
+
+    queued: int
+    """等待之后窗口的请求数，按到达顺序依次占满之后的各个窗口"""
+
+    expires_at: float
+    """此后容器与新建的等价"""
 
     def __init__(self):
-        self.wait_lock = asyncio.Lock()
-        self.records = {}
+        self.window = 0
+        self.count = 0
+        self.queued = 0
+        self.expires_at = 0
 
 
 @algo.algo_class('fixwin')
 class FixedWindowAlgo(algo.ReteLimitAlgo):
-    containers_lock: asyncio.Lock
-    """访问记录容器锁"""
-
-    containers: dict[str, SessionContainer]
-    """访问记录容器，key为launcher_type launcher_id"""
+    containers: algo.ScopedContainers[SessionContainer]
+    """访问记录容器，key为限流范围"""
 
     async def initialize(self):
-        self.containers_lock = asyncio.Lock()
-        self.containers = {}
+        self.containers = algo.ScopedContainers(SessionContainer)
 
     async def require_access(
         self,
@@ -36,58 +43,40 @@ class FixedWindowAlgo(algo.ReteLimitAlgo):
         launcher_type: str,
         launcher_id: typing.Union[int, str],
     ) -> bool:
-        # 加锁，找容器
-        container: SessionContainer = None
-
-        session_name = f'{launcher_type}_{launcher_id}'
-
-        async with self.containers_lock:
-            container = self.containers.get(session_name)
+        rate_limit = query.pipeline_config['safety']['rate-limit']
 
-            if container is None:
-                container = SessionContainer()
-                self.containers[session_name] = container
+        # 获取窗口大小和限制
+        window_size = rate_limit['window-length']
+        limitation = rate_limit['limitation']
 
-        # 等待锁
-        async with container.wait_lock:
-            # 获取窗口大小和限制
-            window_size = query.pipeline_config['safety']['rate-limit']['window-length']
-            limitation = query.pipeline_config['safety']['rate-limit']['limitation']
+        now = time.time()
+        container = self.containers.get(algo.scope_key(query, launcher_type, launcher_id), now)
 
-            # TODO revert it
-            # if session_name in self.ap.pipeline_cfg.data['rate-limit']['fixwin']:
-            #     window_size = self.ap.pipeline_cfg.data['rate-limit']['fixwin'][session_name]['window-size']
-            #     limitation = self.ap.pipeline_cfg.data['rate-limit']['fixwin'][session_name]['limit']
+        # 获取当前窗口的起始时间戳
+        window = int(now) - int(now) % window_size
 
-            # 获取当前时间戳
-            now = int(time.time())
+        if container.window != window:
+            # 之前窗口中等待的请求已经放行，在当前窗口占位的计入当前窗口
+            passed = (window - container.window) // window_size
+            remaining = max(0, container.queued - (passed - 1) * limitation) if passed > 0 else 0
+            container.count = min(limitation, remaining)
+            container.queued = remaining - container.count
+            container.window = window
 
-            # 获取当前窗口的起始时间戳
-            now = now - now % window_size
-
-            # 获取当前窗口的访问次数
-            count = container.records.get(now, 0)
-
-            # 如果访问次数超过了限制
-            if count >= limitation:
-                if query.pipeline_config['safety']['rate-limit']['strategy'] == 'drop':
-                    return False
-                elif query.pipeline_config['safety']['rate-limit']['strategy'] == 'wait':
-                    # 等待下一窗口
-                    await asyncio.sleep(window_size - time.time() % window_size)
-
-                    now = int(time.time())
-                    now = now - now % window_size
+        if container.count < limitation:
+            container.count += 1
+            container.expires_at = max(container.expires_at, window + window_size)
+            return True
 
-            if now not in container.records:
-                container.records = {}
-                container.records[now] = 1
-            else:
-                # 访问次数加一
-                container.records[now] = count + 1
+        if rate_limit['strategy'] != 'wait':
+            return False
 
-            # 返回True
-            return True
+        # 在之后第一个有空位的窗口占位后等待，判断和占位之间没有 await，不需要加锁，等待时也不阻塞其他请求
+        at = window + (1 + container.queued // limitation) * window_size
+        container.queued += 1
+        container.expires_at = max(container.expires_at, at + window_size)
+        await asyncio.sleep(at - now)
+        return True
 
     async def release_access(
         self,
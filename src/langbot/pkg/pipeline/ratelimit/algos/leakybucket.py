@@ -0,0 +1,63 @@
+from __future__ import annotations
+import asyncio
+import time
+import typing
+from .. import algo
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+
+
+# 漏桶算法
+class LeakContainer:
+    __slots__ = ('next_at', 'expires_at')
+
+    next_at: float
+    """下一个请求最早可以流出的时间，晚于当前时间表示有请求在桶中排队"""
+
+    expires_at: float
+
+    def __init__(self):
+        self.next_at = 0
+        self.expires_at = 0
+
+
+@algo.algo_class('leakybucket')
+class LeakyBucketAlgo(algo.ReteLimitAlgo):
+    """请求以恒定速率流出，相邻两个请求至少间隔 窗口长度/限制次数，不允许突发"""
+
+    containers: algo.ScopedContainers[LeakContainer]
+
+    async def initialize(self):
+        self.containers = algo.ScopedContainers(LeakContainer)
+
+    async def require_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ) -> bool:
+        rate_limit = query.pipeline_config['safety']['rate-limit']
+        interval = rate_limit['window-length'] / rate_limit['limitation']
+
+        now = time.monotonic()
+        container = self.containers.get(algo.scope_key(query, launcher_type, launcher_id), now)
+
+        at = max(now, container.next_at)
+        if at > now:
+            # 桶中最多排队一个窗口的请求，溢出的直接丢弃
+            if rate_limit['strategy'] != 'wait' or at - now > rate_limit['window-length']:
+                return False
+
+        container.next_at = at + interval
+        container.expires_at = container.next_at
+
+        if at > now:
+            await asyncio.sleep(at - now)
+        return True
+
+    async def release_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ):
+        pass
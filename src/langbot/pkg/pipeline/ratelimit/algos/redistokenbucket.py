@@ -0,0 +1,83 @@
+from __future__ import annotations
+import asyncio
+import time
+import typing
+from .. import algo
+from . import tokenbucket
+from ....utils import redisclient, redisscripts
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+
+
+STORE_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, redisclient.RedisError)
+
+
+@algo.algo_class('redis-tokenbucket')
+class RedisTokenBucketAlgo(algo.ReteLimitAlgo):
+    """令牌桶保存在 Redis 协议兼容的服务中，由多个 LangBot 实例共享
+
+    存储不可用时退回进程内的令牌桶，retry_interval 秒后再尝试存储。
+    """
+
+    client: redisclient.RedisClient
+
+    key_prefix: str
+
+    retry_interval: float
+
+    fallback: tokenbucket.TokenBucketAlgo
+    """存储不可用时使用的进程内令牌桶"""
+
+    unavailable_until: float
+    """在此之前不尝试存储（monotonic）"""
+
+    async def initialize(self):
+        redis_config = self.ap.instance_config.data.get('rate_limit', {}).get('redis', {})
+        self.client = redisclient.RedisClient(
+            redis_config.get('url', 'redis://127.0.0.1:6379/0'),
+            timeout=redis_config.get('timeout', 1),
+        )
+        self.key_prefix = redis_config.get('key_prefix', 'langbot')
+        self.retry_interval = redis_config.get('retry_interval', 30)
+
+        self.fallback = tokenbucket.TokenBucketAlgo(self.ap)
+        await self.fallback.initialize()
+        self.unavailable_until = 0
+
+    async def require_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ) -> bool:
+        if time.monotonic() < self.unavailable_until:
+            return await self.fallback.require_access(query, launcher_type, launcher_id)
+
+        rate_limit = query.pipeline_config['safety']['rate-limit']
+        window_ms = int(rate_limit['window-length'] * 1000)
+        max_wait_ms = window_ms if rate_limit['strategy'] == 'wait' else 0
+        key = f'{self.key_prefix}:ratelimit:{query.pipeline_uuid}:{algo.scope_key(query, launcher_type, launcher_id)}'
+
+        try:
+            delay = await self.client.eval(
+                redisscripts.TOKEN_BUCKET, [key], [rate_limit['limitation'], window_ms, max_wait_ms]
+            )
+        except STORE_ERRORS as e:
+            self.unavailable_until = time.monotonic() + self.retry_interval
+            self.ap.logger.warning(
+                f'Rate limit store unavailable, limiting per instance for {self.retry_interval}s: {e!r}'
+            )
+            return await self.fallback.require_access(query, launcher_type, launcher_id)
+
+        if delay < 0:
+            return False
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        return True
+
+    async def release_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ):
+        pass
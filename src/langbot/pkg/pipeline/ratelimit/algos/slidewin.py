@@ -0,0 +1,70 @@
+from __future__ import annotations
+import asyncio
+import collections
+import time
+import typing
+from .. import algo
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+
+
+# 滑动窗口日志算法
+class LogContainer:
+    __slots__ = ('log', 'expires_at')
+
+    log: collections.deque[float]
+    """窗口内请求的时间，包含等待中的请求预占的未来时间"""
+
+    expires_at: float
+
+    def __init__(self):
+        self.log = collections.deque()
+        self.expires_at = 0
+
+
+@algo.algo_class('slidewin')
+class SlidingWindowLogAlgo(algo.ReteLimitAlgo):
+    """任意一个窗口长度内的请求数不超过限制次数"""
+
+    containers: algo.ScopedContainers[LogContainer]
+
+    async def initialize(self):
+        self.containers = algo.ScopedContainers(LogContainer)
+
+    async def require_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ) -> bool:
+        rate_limit = query.pipeline_config['safety']['rate-limit']
+        window_size = rate_limit['window-length']
+        limitation = rate_limit['limitation']
+
+        now = time.monotonic()
+        container = self.containers.get(algo.scope_key(query, launcher_type, launcher_id), now)
+        log = container.log
+
+        while log and log[0] <= now - window_size:
+            log.popleft()
+
+        at = now
+        if len(log) >= limitation:
+            # 倒数第 limitation 个请求移出窗口后才有空位，最多等待一个窗口
+            at = max(now, log[len(log) - limitation] + window_size)
+            if rate_limit['strategy'] != 'wait' or at - now > window_size:
+                return False
+
+        log.append(at)
+        container.expires_at = at + window_size
+
+        if at > now:
+            await asyncio.sleep(at - now)
+        return True
+
+    async def release_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ):
+        pass
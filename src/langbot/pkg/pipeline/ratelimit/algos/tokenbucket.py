@@ -0,0 +1,75 @@
+from __future__ import annotations
+import asyncio
+import time
+import typing
+from .. import algo
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+
+
+# 令牌桶算法
+class BucketContainer:
+    __slots__ = ('tokens', 'updated_at', 'expires_at')
+
+    tokens: float
+    """剩余令牌数，为负表示已被等待中的请求预占"""
+
+    updated_at: float
+
+    expires_at: float
+    """令牌补满的时间，此后容器与新建的等价"""
+
+    def __init__(self):
+        self.tokens = None
+        self.updated_at = 0
+        self.expires_at = 0
+
+
+@algo.algo_class('tokenbucket')
+class TokenBucketAlgo(algo.ReteLimitAlgo):
+    """桶容量为限制次数，每个窗口长度补满一次，允许突发且平滑补充"""
+
+    containers: algo.ScopedContainers[BucketContainer]
+
+    async def initialize(self):
+        self.containers = algo.ScopedContainers(BucketContainer)
+
+    async def require_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ) -> bool:
+        rate_limit = query.pipeline_config['safety']['rate-limit']
+        capacity = rate_limit['limitation']
+        rate = capacity / rate_limit['window-length']
+
+        now = time.monotonic()
+        container = self.containers.get(algo.scope_key(query, launcher_type, launcher_id), now)
+
+        if container.tokens is None:
+            container.tokens = capacity
+        else:
+            container.tokens = min(capacity, container.tokens + (now - container.updated_at) * rate)
+        container.updated_at = now
+
+        delay = 0
+        if container.tokens < 1:
+            delay = (1 - container.tokens) / rate
+            # 最多等待一个窗口，积压更多的请求直接丢弃
+            if rate_limit['strategy'] != 'wait' or delay > rate_limit['window-length']:
+                return False
+
+        container.tokens -= 1
+        container.expires_at = now + (capacity - container.tokens) / rate
+
+        if delay:
+            await asyncio.sleep(delay)
+        return True
+
+    async def release_access(
+        self,
+        query: pipeline_query.Query,
+        launcher_type: str,
+        launcher_id: typing.Union[int, str],
+    ):
+        pass
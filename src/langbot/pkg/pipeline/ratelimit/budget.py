@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    from ...core import app
+
+
+class _Budget:
+    """一项预算，令牌和调用次数各为一个桶，每个窗口长度补满一次，用量可以透支"""
+
+    def __init__(self, tokens: int | None, requests: int | None, window: float):
+        self.tokens = tokens
+        self.requests = requests
+        self.window = window
+
+        self.token_balance = float(tokens) if tokens else 0.0
+        self.request_balance = float(requests) if requests else 0.0
+        self.updated_at = time.monotonic()
+
+        self.used_tokens = 0
+        self.used_requests = 0
+        self.rejected = 0
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        if self.tokens:
+            self.token_balance = min(self.tokens, self.token_balance + elapsed * self.tokens / self.window)
+        if self.requests:
+            self.request_balance = min(self.requests, self.request_balance + elapsed * self.requests / self.window)
+
+    def available(self) -> bool:
+        return (not self.tokens or self.token_balance > 0) and (not self.requests or self.request_balance >= 1)
+
+    def charge(self, tokens: int):
+        self.used_tokens += tokens
+        self.used_requests += 1
+        if self.tokens:
+            self.token_balance -= tokens
+        if self.requests:
+            self.request_balance -= 1
+
+
+class ModelBudget:
+    """全局模型用量预算，所有流水线共享
+
+    键为模型 uuid，`*` 为所有模型共用的一项。预算用尽后新的请求在限速阶段被丢弃，
+    已开始的请求仍照常完成并计入用量。
+    """
+
+    def __init__(self, budgets: dict[str, dict] | None = None):
+        self.budgets: dict[str, _Budget] = {}
+        for model_uuid, budget in (budgets or {}).items():
+            if not budget or not (budget.get('tokens') or budget.get('requests')):
+                continue
+            self.budgets[model_uuid] = _Budget(
+                tokens=budget.get('tokens'),
+                requests=budget.get('requests'),
+                window=budget.get('window', 86400),
+            )
+
+    @classmethod
+    def from_config(cls, ap: app.Application) -> ModelBudget:
+        return cls(ap.instance_config.data.get('rate_limit', {}).get('model_budgets'))
+
+    def _applicable(self, model_uuid: str) -> list[_Budget]:
+        return [budget for key in (model_uuid, '*') if (budget := self.budgets.get(key)) is not None]
+
+    def allow(self, model_uuid: str) -> bool:
+        """模型的预算是否还有余量"""
+        budgets = self._applicable(model_uuid)
+        if not budgets:
+            return True
+
+        now = time.monotonic()
+        for budget in budgets:
+            budget.refill(now)
+        if all(budget.available() for budget in budgets):
+            return True
+
+        for budget in budgets:
+            budget.rejected += 1
+        return False
+
+    def charge(self, model_uuid: str, tokens: int):
+        """计入一次模型调用的用量"""
+        now = time.monotonic()
+        for budget in self._applicable(model_uuid):
+            budget.refill(now)
+            budget.charge(tokens)
+
+    def get_stats(self) -> dict:
+        return {
+            key: {
+                'tokens': budget.tokens,
+                'requests': budget.requests,
+                'window': budget.window,
+                'token_balance': round(budget.token_balance) if budget.tokens else None,
+                'request_balance': round(budget.request_balance, 2) if budget.requests else None,
+                'used_tokens': budget.used_tokens,
+                'used_requests': budget.used_requests,
+                'rejected': budget.rejected,
+            }
+            for key, budget in self.budgets.items()
+        }
@@ -24,7 +24,7 @@ class RateLimit(stage.PipelineStage):
     algo: algo.ReteLimitAlgo
 
     async def initialize(self, pipeline_config: dict):
-        algo_name = 'fixwin'
+        algo_name = pipeline_config.get('safety', {}).get('rate-limit', {}).get('algorithm', 'fixwin')
 
         algo_class = None
 
@@ -48,6 +48,14 @@ class RateLimit(stage.PipelineStage):
     ]:
         """处理"""
         if stage_inst_name == 'RequireRateLimitOccupancy':
+            if query.use_llm_model_uuid and not self.ap.pipeline_mgr.model_budget.allow(query.use_llm_model_uuid):
+                return entities.StageProcessResult(
+                    result_type=entities.ResultType.INTERRUPT,
+                    new_query=query,
+                    console_notice=f'模型 {query.use_llm_model_uuid} 的用量预算已用尽，忽略 {query.launcher_type.value}:{query.launcher_id} 消息',
+                    user_notice='模型用量已达上限，请稍后再试。',
+                )
+
             if await self.algo.require_access(
                 query,
                 query.launcher_type.value,
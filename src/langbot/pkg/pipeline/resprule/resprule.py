@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import typing
 
 from . import rule
 
@@ -23,6 +24,12 @@ class GroupRespondRuleCheckStage(stage.PipelineStage):
     rule_matchers: list[rule.GroupRespondRule]
     """检查器实例"""
 
+    default_rules: list[tuple[rule.GroupRespondRule, typing.Any]]
+    """预编译的默认规则，(检查器, compile 的结果)"""
+
+    group_rules: dict[str, list[tuple[rule.GroupRespondRule, typing.Any]]]
+    """预编译的群单独规则，键为群号"""
+
     async def initialize(self, pipeline_config: dict):
         """初始化检查器"""
 
@@ -33,20 +40,36 @@ class GroupRespondRuleCheckStage(stage.PipelineStage):
             await rule_inst.initialize()
             self.rule_matchers.append(rule_inst)
 
+        # 流水线重建时会创建新的阶段实例，规则随之重新编译
+        self._compile_rules(pipeline_config['trigger']['group-respond-rules'])
+
+    def _compile_rules(self, rules: dict):
+        """编译默认规则和群单独规则
+
+        值为字典的项是群单独规则，覆盖默认规则中的同名项
+        """
+        default_rule = {key: value for key, value in rules.items() if not isinstance(value, dict)}
+
+        self.default_rules = [(matcher, matcher.compile(default_rule)) for matcher in self.rule_matchers]
+        self.group_rules = {
+            group_id: [(matcher, matcher.compile({**default_rule, **override})) for matcher in self.rule_matchers]
+            for group_id, override in rules.items()
+            if isinstance(override, dict)
+        }
+        self._compiled_for = (rules, self.rule_matchers)
+
     async def process(self, query: pipeline_query.Query, stage_inst_name: str) -> entities.StageProcessResult:
         if query.launcher_type.value != 'group':  # 只处理群消息
             return entities.StageProcessResult(result_type=entities.ResultType.CONTINUE, new_query=query)
 
         rules = query.pipeline_config['trigger']['group-respond-rules']
+        if self._compiled_for[0] is not rules or self._compiled_for[1] is not self.rule_matchers:
+            self._compile_rules(rules)
 
-        use_rule = rules
-
-        # TODO revert it
-        # if str(query.launcher_id) in rules:
-        #     use_rule = rules[str(query.launcher_id)]
+        use_rule = self.group_rules.get(str(query.launcher_id), self.default_rules)
 
-        for rule_matcher in self.rule_matchers:  # 任意一个匹配就放行
-            res = await rule_matcher.match(str(query.message_chain), query.message_chain, use_rule, query)
+        for rule_matcher, compiled_rule in use_rule:  # 任意一个匹配就放行
+            res = await rule_matcher.match(str(query.message_chain), query.message_chain, compiled_rule, query)
             if res.matching:
                 query.message_chain = res.replacement
 
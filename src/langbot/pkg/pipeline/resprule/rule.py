@@ -34,6 +34,13 @@ class GroupRespondRule(metaclass=abc.ABCMeta):
     async def initialize(self):
         pass
 
+    def compile(self, rule_dict: dict) -> typing.Any:
+        """预编译规则配置
+
+        每个流水线版本只调用一次，返回值作为 match 的 rule_dict 传入。默认原样返回。
+        """
+        return rule_dict
+
     @abc.abstractmethod
     async def match(
         self,
@@ -42,5 +49,8 @@ class GroupRespondRule(metaclass=abc.ABCMeta):
         rule_dict: dict,
         query: pipeline_query.Query,
     ) -> entities.RuleJudgeResult:
-        """判断消息是否匹配规则"""
+        """判断消息是否匹配规则
+
+        rule_dict 为 compile 的返回值
+        """
         raise NotImplementedError
@@ -4,27 +4,56 @@ import langbot_plugin.api.entities.builtin.platform.message as platform_message
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 
 
+class PrefixTrie:
+    """前缀字典树，匹配时只需沿消息开头走一遍"""
+
+    def __init__(self, prefixes: list[str]):
+        # 节点为 [子节点, 前缀在配置中的序号]
+        self.root: list = [{}, None]
+        for index, prefix in enumerate(prefixes):
+            node = self.root
+            for char in prefix:
+                node = node[0].setdefault(char, [{}, None])
+            if node[1] is None:
+                node[1] = index
+        self.prefixes = prefixes
+
+    def match(self, text: str) -> str | None:
+        """返回匹配的前缀，多个前缀匹配时与逐个检查一样取配置中靠前的"""
+        node = self.root
+        best = node[1]
+        for char in text:
+            node = node[0].get(char)
+            if node is None:
+                break
+            if node[1] is not None and (best is None or node[1] < best):
+                best = node[1]
+        return self.prefixes[best] if best is not None else None
+
+
 @rule_model.rule_class('prefix')
 class PrefixRule(rule_model.GroupRespondRule):
+    def compile(self, rule_dict: dict) -> PrefixTrie:
+        return PrefixTrie(rule_dict.get('prefix', []))
+
     async def match(
         self,
         message_text: str,
         message_chain: platform_message.MessageChain,
-        rule_dict: dict,
+        rule_dict: PrefixTrie,
         query: pipeline_query.Query,
     ) -> entities.RuleJudgeResult:
-        prefixes = rule_dict['prefix']
-
-        for prefix in prefixes:
-            if message_text.startswith(prefix):
-                # 查找第一个plain元素
-                for me in message_chain:
-                    if isinstance(me, platform_message.Plain):
-                        me.text = me.text[len(prefix) :]
-
-                return entities.RuleJudgeResult(
-                    matching=True,
-                    replacement=message_chain,
-                )
+        prefix = rule_dict.match(message_text)
+
+        if prefix is not None:
+            # 查找第一个plain元素
+            for me in message_chain:
+                if isinstance(me, platform_message.Plain):
+                    me.text = me.text[len(prefix) :]
+
+            return entities.RuleJudgeResult(
+                matching=True,
+                replacement=message_chain,
+            )
 
         return entities.RuleJudgeResult(matching=False, replacement=message_chain)
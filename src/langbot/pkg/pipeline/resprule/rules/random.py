@@ -9,13 +9,16 @@ import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 
 @rule_model.rule_class('random')
 class RandomRespRule(rule_model.GroupRespondRule):
+    def compile(self, rule_dict: dict) -> float:
+        return float(rule_dict.get('random', 0))
+
     async def match(
         self,
         message_text: str,
         message_chain: platform_message.MessageChain,
-        rule_dict: dict,
+        rule_dict: float,
         query: pipeline_query.Query,
     ) -> entities.RuleJudgeResult:
-        random_rate = rule_dict['random']
-
-        return entities.RuleJudgeResult(matching=random.random() < random_rate, replacement=message_chain)
+        return entities.RuleJudgeResult(
+            matching=rule_dict > 0 and random.random() < rule_dict, replacement=message_chain
+        )
@@ -9,19 +9,33 @@ import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 
 @rule_model.rule_class('regexp')
 class RegExpRule(rule_model.GroupRespondRule):
+    def compile(self, rule_dict: dict) -> list[re.Pattern]:
+        """所有表达式合并为一个分支表达式"""
+        regexps = rule_dict.get('regexp', [])
+        if not regexps:
+            return []
+
+        try:
+            return [re.compile('|'.join(f'(?:{regexp})' for regexp in regexps))]
+        except re.error:
+            # 带全局内联标志的表达式无法合并，逐个编译，跳过无效的表达式
+            compiled = []
+            for regexp in regexps:
+                try:
+                    compiled.append(re.compile(regexp))
+                except re.error as e:
+                    self.ap.logger.warning(f'Invalid group respond regexp {regexp!r} skipped: {e}')
+            return compiled
+
     async def match(
         self,
         message_text: str,
         message_chain: platform_message.MessageChain,
-        rule_dict: dict,
+        rule_dict: list[re.Pattern],
         query: pipeline_query.Query,
     ) -> entities.RuleJudgeResult:
-        regexps = rule_dict['regexp']
-
-        for regexp in regexps:
-            match = re.match(regexp, message_text)
-
-            if match:
+        for regexp in rule_dict:
+            if regexp.match(message_text):
                 return entities.RuleJudgeResult(
                     matching=True,
                     replacement=message_chain,
@@ -4,6 +4,7 @@ import typing
 
 from .. import entities
 from .. import stage
+from ...provider import streaming
 
 import langbot_plugin.api.entities.builtin.platform.message as platform_message
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
@@ -54,7 +55,15 @@ class ResponseWrapper(stage.PipelineStage):
 
                     reply_text = ''
 
-                    if result.content:  # 有内容
+                    if result.content and isinstance(result, streaming.DeltaChunk) and not result.is_final:
+                        # 增量分片只有新增的文本，插件事件在带完整文本的最后一个分片上触发
+                        query.resp_message_chain.append(result.get_content_platform_message_chain())
+
+                        yield entities.StageProcessResult(
+                            result_type=entities.ResultType.CONTINUE,
+                            new_query=query,
+                        )
+                    elif result.content:  # 有内容
                         reply_text = str(result.get_content_platform_message_chain())
 
                         # ============= 触发插件事件 ===============
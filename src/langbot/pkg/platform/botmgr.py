@@ -273,6 +273,10 @@ class PlatformManager:
         if hasattr(adapter_inst, 'set_bot_uuid'):
             adapter_inst.set_bot_uuid(bot_entity.uuid)
 
+        # 收到的媒体以句柄放入消息，发送时从媒体存储读取
+        if hasattr(adapter_inst, 'media_store'):
+            adapter_inst.media_store = self.ap.media_store
+
         runtime_bot = RuntimeBot(ap=self.ap, bot_entity=bot_entity, adapter=adapter_inst, logger=logger)
 
         await runtime_bot.initialize()
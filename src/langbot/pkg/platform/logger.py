@@ -9,6 +9,7 @@ import traceback
 import uuid
 
 from ..core import app
+from ..storage import media
 import langbot_plugin.api.entities.builtin.platform.message as platform_message
 import langbot_plugin.api.definition.abstract.platform.event_logger as abstract_platform_event_logger
 
@@ -145,7 +146,10 @@ class EventLogger(abstract_platform_event_logger.AbstractEventLogger):
                 message_session_id = str(message_session_id)
 
             for img in images:
-                img_bytes, mime_type = await img.get_bytes()
+                if media.is_media_uri(img.url):
+                    img_bytes, mime_type = await self.ap.media_store.get_bytes(img.url)
+                else:
+                    img_bytes, mime_type = await img.get_bytes()
                 extension = mimetypes.guess_extension(mime_type)
                 if extension is None:
                     extension = '.jpg'
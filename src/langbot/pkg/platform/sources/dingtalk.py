@@ -8,6 +8,7 @@ import langbot_plugin.api.entities.builtin.platform.entities as platform_entitie
 from langbot.libs.dingtalk_api.api import DingTalkClient
 import datetime
 from langbot.pkg.platform.logger import EventLogger
+from langbot.pkg.platform import streaming
 
 
 class DingTalkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
@@ -138,6 +139,7 @@ class DingTalkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
     card_instance_id_dict: (
         dict  # 回复卡片消息字典，key为消息id，value为回复卡片实例id，用于在流式消息时判断是否发送到指定卡片
     )
+    stream_buffers: streaming.StreamReplyBuffers  # 流式回复的增量文本，更新卡片时才拼接
 
     def __init__(self, config: dict, logger: EventLogger):
         required_keys = [
@@ -162,6 +164,7 @@ class DingTalkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             config=config,
             logger=logger,
             card_instance_id_dict={},
+            stream_buffers=streaming.StreamReplyBuffers(),
             bot_account_id=bot_account_id,
             bot=bot,
             listeners={},
@@ -197,21 +200,21 @@ class DingTalkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
 
         # msg_id = incoming_message.message_id
         message_id = bot_message.resp_message_id
-        msg_seq = bot_message.msg_sequence
-
-        if (msg_seq - 1) % 8 == 0 or is_final:
-            markdown_enabled = self.config.get('markdown_card', False)
-            content, at = await DingTalkMessageConverter.yiri2target(message, markdown_enabled)
-
-            card_instance, card_instance_id = self.card_instance_id_dict[message_id]
-            if not content and bot_message.content:
-                content = bot_message.content  # 兼容直接传入content的情况
-            # print(card_instance_id)
-            if content:
-                await self.bot.send_card_message(card_instance, card_instance_id, content, is_final)
-            if is_final and bot_message.tool_calls is None:
-                # self.seq = 1  # 消息回复结束之后重置seq
-                self.card_instance_id_dict.pop(message_id)  # 消息回复结束之后删除卡片实例id
+        self.stream_buffers.append(message_id, bot_message, message)
+
+        markdown_enabled = self.config.get('markdown_card', False)
+        content, at = await DingTalkMessageConverter.yiri2target(
+            self.stream_buffers.message_chain(message_id, message), markdown_enabled
+        )
+
+        card_instance, card_instance_id = self.card_instance_id_dict[message_id]
+        # print(card_instance_id)
+        if content:
+            await self.bot.send_card_message(card_instance, card_instance_id, content, is_final)
+        if is_final and bot_message.tool_calls is None:
+            # self.seq = 1  # 消息回复结束之后重置seq
+            self.card_instance_id_dict.pop(message_id)  # 消息回复结束之后删除卡片实例id
+            self.stream_buffers.pop(message_id)
 
     async def send_message(self, target_type: str, target_id: str, message: platform_message.MessageChain):
         markdown_enabled = self.config.get('markdown_card', False)
@@ -227,6 +230,9 @@ class DingTalkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             is_stream = True
         return is_stream
 
+    async def is_stream_delta_supported(self) -> bool:
+        return True
+
     async def create_message_card(self, message_id, event):
         card_template_id = self.config['card_template_id']
         incoming_message = event.source_platform_object.incoming_message
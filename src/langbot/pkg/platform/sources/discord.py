@@ -11,10 +11,13 @@ import datetime
 
 # 使用BytesIO创建文件对象，避免路径问题
 import io
+import functools
+import mimetypes
 import asyncio
 from enum import Enum
 
 from langbot.pkg.utils import httpclient
+from langbot.pkg.storage import media
 import pydantic
 
 import langbot_plugin.api.definition.abstract.platform.adapter as abstract_platform_adapter
@@ -590,6 +593,7 @@ class DiscordMessageConverter(abstract_platform_adapter.AbstractMessageConverter
     @staticmethod
     async def yiri2target(
         message_chain: platform_message.MessageChain,
+        media_store: media.MediaStore,
     ) -> typing.Tuple[str, typing.List[discord.File]]:
         for ele in message_chain:
             if isinstance(ele, platform_message.At):
@@ -620,6 +624,9 @@ class DiscordMessageConverter(abstract_platform_adapter.AbstractMessageConverter
                     else:
                         base64_data = ele.base64
                     image_bytes = base64.b64decode(base64_data)
+                elif media.is_media_uri(ele.url):
+                    image_bytes, mime_type = await media_store.get_bytes(ele.url)
+                    filename = f'{uuid.uuid4()}{mimetypes.guess_extension(mime_type) or ".png"}'
                 elif ele.url:
                     # 从URL下载图片
                     session = httpclient.get_session()
@@ -701,6 +708,9 @@ class DiscordMessageConverter(abstract_platform_adapter.AbstractMessageConverter
 
                     file_base64 = ele.base64.split(',')[-1]
                     file_bytes = base64.b64decode(file_base64)
+                elif media.is_media_uri(ele.url):
+                    file_bytes, mime_type = await media_store.get_bytes(ele.url)
+                    filename = f'{uuid.uuid4()}{mimetypes.guess_extension(mime_type) or ".mp3"}'
                 elif ele.url:
                     session = httpclient.get_session()
                     async with session.get(ele.url) as response:
@@ -716,6 +726,8 @@ class DiscordMessageConverter(abstract_platform_adapter.AbstractMessageConverter
                         file_bytes = base64.b64decode(file_base64)
                     else:
                         file_bytes = base64.b64decode(ele.base64)
+                elif media.is_media_uri(ele.url):
+                    file_bytes, _ = await media_store.get_bytes(ele.url)
                 elif ele.url:
                     session = httpclient.get_session()
                     async with session.get(ele.url) as response:
@@ -727,14 +739,20 @@ class DiscordMessageConverter(abstract_platform_adapter.AbstractMessageConverter
                     (
                         node_text,
                         node_files,
-                    ) = await DiscordMessageConverter.yiri2target(node.message_chain)
+                    ) = await DiscordMessageConverter.yiri2target(node.message_chain, media_store)
                     text_string += node_text
                     files.extend(node_files)
 
         return text_string, files
 
     @staticmethod
-    async def target2yiri(message: discord.Message) -> platform_message.MessageChain:
+    async def download_attachment(url: str) -> tuple[bytes, str]:
+        session = httpclient.get_session(trust_env=True)
+        async with session.get(url) as response:
+            return await response.read(), response.headers.get('Content-Type', '')
+
+    @staticmethod
+    async def target2yiri(message: discord.Message, media_store: media.MediaStore) -> platform_message.MessageChain:
         lb_msg_list = []
 
         msg_create_time = datetime.datetime.fromtimestamp(int(message.created_at.timestamp()))
@@ -775,12 +793,14 @@ class DiscordMessageConverter(abstract_platform_adapter.AbstractMessageConverter
 
         # attachments
         for attachment in message.attachments:
-            session = httpclient.get_session(trust_env=True)
-            async with session.get(attachment.url) as response:
-                image_data = await response.read()
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                image_format = response.headers['Content-Type']
-                element_list.append(platform_message.Image(base64=f'data:{image_format};base64,{image_base64}'))
+            # downloaded when it is first needed
+            handle = media_store.put_lazy(
+                media.media_key('discord', attachment.id),
+                functools.partial(DiscordMessageConverter.download_attachment, attachment.url),
+                attachment.content_type or 'application/octet-stream',
+                size=attachment.size or 0,
+            )
+            element_list.append(platform_message.Image(url=handle.uri))
 
         return platform_message.MessageChain(element_list)
 
@@ -791,8 +811,8 @@ class DiscordEventConverter(abstract_platform_adapter.AbstractEventConverter):
         pass
 
     @staticmethod
-    async def target2yiri(event: discord.Message) -> platform_events.Event:
-        message_chain = await DiscordMessageConverter.target2yiri(event)
+    async def target2yiri(event: discord.Message, media_store: media.MediaStore) -> platform_events.Event:
+        message_chain = await DiscordMessageConverter.target2yiri(event, media_store)
 
         if isinstance(event.channel, discord.DMChannel):
             return platform_events.FriendMessage(
@@ -837,6 +857,8 @@ class DiscordAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
 
     voice_manager: VoiceConnectionManager | None = pydantic.Field(exclude=True, default=None)
 
+    media_store: media.MediaStore | None = pydantic.Field(exclude=True, default=None)  # 由机器人管理器设置
+
     def __init__(self, config: dict, logger: abstract_platform_logger.AbstractEventLogger, **kwargs):
         bot_account_id = config['client_id']
 
@@ -852,7 +874,7 @@ class DiscordAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
                 if message.author.id == self.user.id or message.author.bot:
                     return
 
-                lb_event = await adapter_self.event_converter.target2yiri(message)
+                lb_event = await adapter_self.event_converter.target2yiri(message, adapter_self.media_store)
                 await adapter_self.listeners[type(lb_event)](lb_event, adapter_self)
 
         intents = discord.Intents.default()
@@ -1038,7 +1060,7 @@ class DiscordAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             await self.voice_manager.cleanup_inactive_connections()
 
     async def send_message(self, target_type: str, target_id: str, message: platform_message.MessageChain):
-        msg_to_send, files = await self.message_converter.yiri2target(message)
+        msg_to_send, files = await self.message_converter.yiri2target(message, self.media_store)
 
         try:
             # 获取频道对象
@@ -1066,7 +1088,7 @@ class DiscordAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
         message: platform_message.MessageChain,
         quote_origin: bool = False,
     ):
-        msg_to_send, files = await self.message_converter.yiri2target(message)
+        msg_to_send, files = await self.message_converter.yiri2target(message, self.media_store)
 
         assert isinstance(message_source.source_platform_object, discord.Message)
 
@@ -16,8 +16,11 @@ from Crypto.Cipher import AES
 import tempfile
 import os
 import mimetypes
+import functools
 
 from langbot.pkg.utils import httpclient
+from langbot.pkg.storage import media
+from langbot.pkg.platform import streaming
 import lark_oapi.ws.exception
 import quart
 from lark_oapi.api.im.v1 import *
@@ -61,7 +64,9 @@ class AESCipher(object):
 
 class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
     @staticmethod
-    async def upload_image_to_lark(msg: platform_message.Image, api_client: lark_oapi.Client) -> typing.Optional[str]:
+    async def upload_image_to_lark(
+        msg: platform_message.Image, api_client: lark_oapi.Client, media_store: media.MediaStore
+    ) -> typing.Optional[str]:
         """Upload an image to Lark and return the image_key, or None if upload fails."""
         image_bytes = None
 
@@ -76,6 +81,12 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
                 print(f'Failed to decode base64 image: {e}')
                 traceback.print_exc()
                 return None
+        elif media.is_media_uri(msg.url):
+            try:
+                image_bytes, _ = await media_store.get_bytes(msg.url)
+            except Exception as e:
+                print(f'Failed to load image {msg.url}: {e}')
+                return None
         elif msg.url:
             try:
                 session = httpclient.get_session()
@@ -194,6 +205,7 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
     @staticmethod
     async def _get_media_bytes(
         msg: typing.Union[platform_message.Voice, platform_message.File],
+        media_store: media.MediaStore,
     ) -> typing.Optional[bytes]:
         """Get bytes from a Voice or File message (base64, url, or path)."""
         data = None
@@ -206,6 +218,11 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
                 data = base64.b64decode(base64_str)
             except Exception:
                 pass
+        elif media.is_media_uri(msg.url):
+            try:
+                data, _ = await media_store.get_bytes(msg.url)
+            except Exception:
+                pass
         elif msg.url:
             try:
                 session = httpclient.get_session()
@@ -223,9 +240,44 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
 
         return data
 
+    @staticmethod
+    async def download_resource(
+        api_client: lark_oapi.Client, message_id: str, file_key: str, resource_type: str
+    ) -> tuple[bytes, str]:
+        """Download an image or file of a received message"""
+        request: GetMessageResourceRequest = (
+            GetMessageResourceRequest.builder().message_id(message_id).file_key(file_key).type(resource_type).build()
+        )
+
+        response: GetMessageResourceResponse = await api_client.im.v1.message_resource.aget(request)
+
+        if not response.success():
+            raise Exception(
+                f'client.im.v1.message_resource.get failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}'
+            )
+
+        content_type = response.raw.headers.get('content-type', '')
+        return response.file.read(), content_type.split(';')[0].strip()
+
+    @staticmethod
+    def media_uri(
+        api_client: lark_oapi.Client,
+        media_store: media.MediaStore,
+        message_id: str,
+        file_key: str,
+        resource_type: str,
+        mime_type: str,
+    ) -> str:
+        """Handle of an image or file of a received message, downloaded when it is first needed"""
+        return media_store.put_lazy(
+            media.media_key('lark', file_key),
+            functools.partial(LarkMessageConverter.download_resource, api_client, message_id, file_key, resource_type),
+            mime_type,
+        ).uri
+
     @staticmethod
     async def yiri2target(
-        message_chain: platform_message.MessageChain, api_client: lark_oapi.Client
+        message_chain: platform_message.MessageChain, api_client: lark_oapi.Client, media_store: media.MediaStore
     ) -> typing.Tuple[list, list]:
         """Convert message chain to Lark format.
 
@@ -295,7 +347,7 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
                 # Process extracted image URLs
                 for url in extracted_urls:
                     temp_image = platform_message.Image(url=url)
-                    image_key = await LarkMessageConverter.upload_image_to_lark(temp_image, api_client)
+                    image_key = await LarkMessageConverter.upload_image_to_lark(temp_image, api_client, media_store)
                     if image_key:
                         media_items.append({'msg_type': 'image', 'content': {'image_key': image_key}})
 
@@ -304,11 +356,11 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
             elif isinstance(msg, platform_message.AtAll):
                 pending_paragraph.append({'tag': 'at', 'user_id': 'all', 'style': []})
             elif isinstance(msg, platform_message.Image):
-                image_key = await LarkMessageConverter.upload_image_to_lark(msg, api_client)
+                image_key = await LarkMessageConverter.upload_image_to_lark(msg, api_client, media_store)
                 if image_key:
                     media_items.append({'msg_type': 'image', 'content': {'image_key': image_key}})
             elif isinstance(msg, platform_message.Voice):
-                data = await LarkMessageConverter._get_media_bytes(msg)
+                data = await LarkMessageConverter._get_media_bytes(msg, media_store)
                 if data:
                     duration = int(msg.length * 1000) if msg.length else None
                     file_key = await LarkMessageConverter.upload_file_to_lark(
@@ -317,7 +369,7 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
                     if file_key:
                         media_items.append({'msg_type': 'audio', 'content': {'file_key': file_key}})
             elif isinstance(msg, platform_message.File):
-                data = await LarkMessageConverter._get_media_bytes(msg)
+                data = await LarkMessageConverter._get_media_bytes(msg, media_store)
                 if data:
                     file_name = msg.name or 'file'
                     # Guess file_type from extension
@@ -341,7 +393,9 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
                         media_items.append({'msg_type': 'file', 'content': {'file_key': file_key}})
             elif isinstance(msg, platform_message.Forward):
                 for node in msg.node_list:
-                    sub_elements, sub_media = await LarkMessageConverter.yiri2target(node.message_chain, api_client)
+                    sub_elements, sub_media = await LarkMessageConverter.yiri2target(
+                        node.message_chain, api_client, media_store
+                    )
                     message_elements.extend(sub_elements)
                     media_items.extend(sub_media)
 
@@ -354,6 +408,7 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
     async def target2yiri(
         message: lark_oapi.api.im.v1.model.event_message.EventMessage,
         api_client: lark_oapi.Client,
+        media_store: media.MediaStore,
     ) -> platform_message.MessageChain:
         message_content = json.loads(message.content)
 
@@ -442,132 +497,40 @@ class LarkMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
                 lb_msg_list.append(platform_message.At(target=ele['user_name']))
             elif ele['tag'] == 'img':
                 image_key = ele['image_key']
-
-                request: GetMessageResourceRequest = (
-                    GetMessageResourceRequest.builder()
-                    .message_id(message.message_id)
-                    .file_key(image_key)
-                    .type('image')
-                    .build()
-                )
-
-                response: GetMessageResourceResponse = await api_client.im.v1.message_resource.aget(request)
-
-                if not response.success():
-                    raise Exception(
-                        f'client.im.v1.message_resource.get failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}, resp: \n{json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}'
+                lb_msg_list.append(
+                    platform_message.Image(
+                        url=LarkMessageConverter.media_uri(
+                            api_client, media_store, message.message_id, image_key, 'image', 'image/png'
+                        )
                     )
-
-                image_bytes = response.file.read()
-                image_base64 = base64.b64encode(image_bytes).decode()
-
-                image_format = response.raw.headers['content-type']
-
-                lb_msg_list.append(platform_message.Image(base64=f'data:{image_format};base64,{image_base64}'))
+                )
             elif ele['tag'] == 'audio':
                 file_key = ele['file_key']
                 duration = ele['duration']
-
-                # Download audio file
-                request: GetMessageResourceRequest = (
-                    GetMessageResourceRequest.builder()
-                    .message_id(message.message_id)
-                    .file_key(file_key)
-                    .type('file')
-                    .build()
-                )
-
-                try:
-                    response: GetMessageResourceResponse = await api_client.im.v1.message_resource.aget(request)
-
-                    if not response.success():
-                        print(f'Failed to download audio: code: {response.code}, msg: {response.msg}')
-                        lb_msg_list.append(platform_message.Plain(text='[Audio file download failed]'))
-                        return platform_message.MessageChain(lb_msg_list)
-
-                    # Read audio bytes
-                    audio_bytes = response.file.read()
-                    audio_base64 = base64.b64encode(audio_bytes).decode()
-
-                    # Get content type from response headers
-                    content_type = response.raw.headers.get('content-type', 'audio/mpeg')
-
-                    mime_main = content_type.split(';')[0].strip()
-                    ext = mimetypes.guess_extension(mime_main) or '.bin'
-                    temp_dir = tempfile.gettempdir()
-                    temp_file_path = os.path.join(temp_dir, f'lark_audio_{file_key}{ext}')
-
-                    with open(temp_file_path, 'wb') as f:
-                        f.write(audio_bytes)
-
-                    # Create Voice message: prefer path/url + length, include base64 as optional data URI
-                    lb_msg_list.append(
-                        platform_message.Voice(
-                            voice_id=file_key,
-                            url=f'file://{temp_file_path}',
-                            path=temp_file_path,
-                            base64=f'data:{content_type};base64,{audio_base64}',
-                            length=(duration // 1000) if duration else None,
-                        )
+                lb_msg_list.append(
+                    platform_message.Voice(
+                        voice_id=file_key,
+                        url=LarkMessageConverter.media_uri(
+                            api_client, media_store, message.message_id, file_key, 'file', 'audio/opus'
+                        ),
+                        length=(duration // 1000) if duration else None,
                     )
-                except Exception as e:
-                    print(f'Error downloading audio: {e}')
-                    traceback.print_exc()
-                    lb_msg_list.append(platform_message.Plain(text='[Audio file download error]'))
-
+                )
             elif ele['tag'] == 'file':
                 file_key = ele['file_key']
                 file_name = ele['file_name']
-
-                request: GetMessageResourceRequest = (
-                    GetMessageResourceRequest.builder()
-                    .message_id(message.message_id)
-                    .file_key(file_key)
-                    .type('file')
-                    .build()
-                )
-
-                response: GetMessageResourceResponse = await api_client.im.v1.message_resource.aget(request)
-
-                if not response.success():
-                    raise Exception(
-                        f'client.im.v1.message_resource.get failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}, resp: \n{json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}'
-                    )
-
-                file_bytes = response.file.read()
-                file_base64 = base64.b64encode(file_bytes).decode()
-
-                file_format = response.raw.headers['content-type']
-
-                file_size = len(file_bytes)
-
-                # Determine extension from content-type if possible
-                content_type = response.raw.headers.get('content-type', '')
-                mime_main = content_type.split(';')[0].strip() if content_type else ''
-                ext = mimetypes.guess_extension(mime_main) or ''
-
-                # Ensure a safe filename (avoid path components)
-                safe_name = os.path.basename(file_name).replace('/', '_').replace('\\', '_')
-                if ext and not safe_name.lower().endswith(ext.lower()):
-                    filename_with_ext = f'{safe_name}{ext}'
-                else:
-                    filename_with_ext = safe_name
-
-                temp_dir = tempfile.gettempdir()
-                temp_file_path = os.path.join(temp_dir, f'lark_{file_key}_{filename_with_ext}')
-
-                with open(temp_file_path, 'wb') as f:
-                    f.write(file_bytes)
-
-                # Create File message with local path and file:// URL
                 lb_msg_list.append(
                     platform_message.File(
                         id=file_key,
                         name=file_name,
-                        size=file_size,
-                        url=f'file://{temp_file_path}',
-                        path=temp_file_path,
-                        base64=f'data:{file_format};base64,{file_base64}',  # not including base64 by default to save memory; can be added if needed
+                        url=LarkMessageConverter.media_uri(
+                            api_client,
+                            media_store,
+                            message.message_id,
+                            file_key,
+                            'file',
+                            mimetypes.guess_type(file_name)[0] or 'application/octet-stream',
+                        ),
                     )
                 )
 
@@ -583,9 +546,9 @@ class LarkEventConverter(abstract_platform_adapter.AbstractEventConverter):
 
     @staticmethod
     async def target2yiri(
-        event: lark_oapi.im.v1.P2ImMessageReceiveV1, api_client: lark_oapi.Client
+        event: lark_oapi.im.v1.P2ImMessageReceiveV1, api_client: lark_oapi.Client, media_store: media.MediaStore
     ) -> platform_events.Event:
-        message_chain = await LarkMessageConverter.target2yiri(event.event.message, api_client)
+        message_chain = await LarkMessageConverter.target2yiri(event.event.message, api_client, media_store)
 
         if event.event.message.chat_type == 'p2p':
             return platform_events.FriendMessage(
@@ -641,6 +604,10 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
 
     card_id_dict: dict[str, str]  # 消息id到卡片id的映射，便于创建卡片后的发送消息到指定卡片
 
+    stream_buffers: streaming.StreamReplyBuffers = pydantic.Field(exclude=True)  # 流式回复的增量文本，更新卡片时才拼接
+
+    media_store: media.MediaStore | None = pydantic.Field(exclude=True, default=None)  # 由机器人管理器设置
+
     seq: int  # 用于在发送卡片消息中识别消息顺序，直接以seq作为标识
     bot_uuid: str = None  # 机器人UUID
     app_ticket: str = None  # 商店应用用到
@@ -652,7 +619,7 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
         quart_app = quart.Quart(__name__)
 
         async def on_message(event: lark_oapi.im.v1.P2ImMessageReceiveV1):
-            lb_event = await self.event_converter.target2yiri(event, self.api_client)
+            lb_event = await self.event_converter.target2yiri(event, self.api_client, self.media_store)
 
             await self.listeners[type(lb_event)](lb_event, self)
 
@@ -675,6 +642,7 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             logger=logger,
             lark_tenant_key=config.get('lark_tenant_key', ''),
             card_id_dict={},
+            stream_buffers=streaming.StreamReplyBuffers(),
             seq=1,
             listeners={},
             quart_app=quart_app,
@@ -789,6 +757,9 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             is_stream = True
         return is_stream
 
+    async def is_stream_delta_supported(self) -> bool:
+        return True
+
     async def create_card_id(self, message_id):
         try:
             # self.logger.debug('飞书支持stream输出,创建卡片......')
@@ -1036,7 +1007,9 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
     ):
         # 不再需要了，因为message_id已经被包含到message_chain中
         # lark_event = await self.event_converter.yiri2target(message_source)
-        text_elements, media_items = await self.message_converter.yiri2target(message, self.api_client)
+        text_elements, media_items = await self.message_converter.yiri2target(
+            message, self.api_client, self.media_store
+        )
 
         # Send text message if there are text elements
         if text_elements:
@@ -1151,89 +1124,90 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
         # self.seq += 1
         message_id = bot_message.resp_message_id
         msg_seq = bot_message.msg_sequence
-        if msg_seq % 8 == 0 or is_final:
-            text_elements, media_items = await self.message_converter.yiri2target(message, self.api_client)
-
-            text_message = ''
-            if text_elements:
-                parts = []
-                for paragraph in text_elements:
-                    para_text = ''.join(ele['text'] for ele in paragraph if ele['tag'] in ('text', 'md'))
-                    if para_text:
-                        parts.append(para_text)
-                text_message = '\n\n'.join(parts)
-
-            # content = {
-            #     'type': 'card_json',
-            #     'data': {'card_id': self.card_id_dict[message_id], 'elements': {'content': text_message}},
-            # }
+        self.stream_buffers.append(message_id, bot_message, message)
+        text_elements, media_items = await self.message_converter.yiri2target(
+            self.stream_buffers.message_chain(message_id, message), self.api_client, self.media_store
+        )
 
-            request: ContentCardElementRequest = (
-                ContentCardElementRequest.builder()
-                .card_id(self.card_id_dict[message_id])
-                .element_id('streaming_txt')
-                .request_body(
-                    ContentCardElementRequestBody.builder()
-                    # .uuid("a0d69e20-1dd1-458b-k525-dfeca4015204")
-                    .content(text_message)
-                    .sequence(msg_seq)
-                    .build()
-                )
+        text_message = ''
+        if text_elements:
+            parts = []
+            for paragraph in text_elements:
+                para_text = ''.join(ele['text'] for ele in paragraph if ele['tag'] in ('text', 'md'))
+                if para_text:
+                    parts.append(para_text)
+            text_message = '\n\n'.join(parts)
+
+        # content = {
+        #     'type': 'card_json',
+        #     'data': {'card_id': self.card_id_dict[message_id], 'elements': {'content': text_message}},
+        # }
+
+        request: ContentCardElementRequest = (
+            ContentCardElementRequest.builder()
+            .card_id(self.card_id_dict[message_id])
+            .element_id('streaming_txt')
+            .request_body(
+                ContentCardElementRequestBody.builder()
+                # .uuid("a0d69e20-1dd1-458b-k525-dfeca4015204")
+                .content(text_message)
+                .sequence(msg_seq)
                 .build()
             )
+            .build()
+        )
 
-            if is_final and bot_message.tool_calls is None:
-                # self.seq = 1  # 消息回复结束之后重置seq
-                self.card_id_dict.pop(message_id)  # 清理已经使用过的卡片
+        if is_final and bot_message.tool_calls is None:
+            # self.seq = 1  # 消息回复结束之后重置seq
+            self.card_id_dict.pop(message_id)  # 清理已经使用过的卡片
+            self.stream_buffers.pop(message_id)
 
-            tenant_key = (
-                message_source.source_platform_object.header.tenant_key
-                if message_source.source_platform_object
-                else None
-            )
-            app_access_token = self.get_app_access_token()
-            tenant_access_token = self.get_tenant_access_token(tenant_key)
-            req_opt: RequestOption = (
-                RequestOption.builder()
-                .app_ticket(self.app_ticket)
-                .tenant_key(tenant_key)
-                .app_access_token(app_access_token)
-                .tenant_access_token(tenant_access_token)
-                .build()
-            )
-            # 发起请求
-            response: ContentCardElementResponse = self.api_client.cardkit.v1.card_element.content(request, req_opt)
+        tenant_key = (
+            message_source.source_platform_object.header.tenant_key if message_source.source_platform_object else None
+        )
+        app_access_token = self.get_app_access_token()
+        tenant_access_token = self.get_tenant_access_token(tenant_key)
+        req_opt: RequestOption = (
+            RequestOption.builder()
+            .app_ticket(self.app_ticket)
+            .tenant_key(tenant_key)
+            .app_access_token(app_access_token)
+            .tenant_access_token(tenant_access_token)
+            .build()
+        )
+        # 发起请求
+        response: ContentCardElementResponse = self.api_client.cardkit.v1.card_element.content(request, req_opt)
 
-            # 处理失败返回
-            if not response.success():
-                raise Exception(
-                    f'client.im.v1.message.patch failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}, resp: \n{json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}'
-                )
-                return
-
-            # Send media messages when streaming is done
-            if is_final and media_items:
-                for media in media_items:
-                    media_request: ReplyMessageRequest = (
-                        ReplyMessageRequest.builder()
-                        .message_id(message_source.message_chain.message_id)
-                        .request_body(
-                            ReplyMessageRequestBody.builder()
-                            .content(json.dumps(media['content']))
-                            .msg_type(media['msg_type'])
-                            .reply_in_thread(False)
-                            .uuid(str(uuid.uuid4()))
-                            .build()
-                        )
+        # 处理失败返回
+        if not response.success():
+            raise Exception(
+                f'client.im.v1.message.patch failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}, resp: \n{json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}'
+            )
+            return
+
+        # Send media messages when streaming is done
+        if is_final and media_items:
+            for media in media_items:
+                media_request: ReplyMessageRequest = (
+                    ReplyMessageRequest.builder()
+                    .message_id(message_source.message_chain.message_id)
+                    .request_body(
+                        ReplyMessageRequestBody.builder()
+                        .content(json.dumps(media['content']))
+                        .msg_type(media['msg_type'])
+                        .reply_in_thread(False)
+                        .uuid(str(uuid.uuid4()))
                         .build()
                     )
-                    media_response: ReplyMessageResponse = await self.api_client.im.v1.message.areply(
-                        media_request, req_opt
+                    .build()
+                )
+                media_response: ReplyMessageResponse = await self.api_client.im.v1.message.areply(
+                    media_request, req_opt
+                )
+                if not media_response.success():
+                    raise Exception(
+                        f'client.im.v1.message.reply ({media["msg_type"]}) failed, code: {media_response.code}, msg: {media_response.msg}, log_id: {media_response.get_log_id()}'
                     )
-                    if not media_response.success():
-                        raise Exception(
-                            f'client.im.v1.message.reply ({media["msg_type"]}) failed, code: {media_response.code}, msg: {media_response.msg}, log_id: {media_response.get_log_id()}'
-                        )
 
     async def is_muted(self, group_id: int) -> bool:
         return False
@@ -1302,7 +1276,7 @@ class LarkAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
                     event.sender = EventSender(context.event['sender'])
                     p2v1.event = event
                     p2v1.schema = context.schema
-                    event = await self.event_converter.target2yiri(p2v1, self.api_client)
+                    event = await self.event_converter.target2yiri(p2v1, self.api_client, self.media_store)
                 except Exception:
                     await self.logger.error(f'Error in lark callback: {traceback.format_exc()}')
 
@@ -8,10 +8,13 @@ from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filte
 import telegramify_markdown
 import typing
 import traceback
+import functools
 import base64
 import pydantic
 
 from langbot.pkg.utils import httpclient
+from langbot.pkg.storage import media
+from langbot.pkg.platform import streaming
 import langbot_plugin.api.definition.abstract.platform.adapter as abstract_platform_adapter
 import langbot_plugin.api.entities.builtin.platform.message as platform_message
 import langbot_plugin.api.entities.builtin.platform.events as platform_events
@@ -21,7 +24,9 @@ import langbot_plugin.api.definition.abstract.platform.event_logger as abstract_
 
 class TelegramMessageConverter(abstract_platform_adapter.AbstractMessageConverter):
     @staticmethod
-    async def yiri2target(message_chain: platform_message.MessageChain, bot: telegram.Bot) -> list[dict]:
+    async def yiri2target(
+        message_chain: platform_message.MessageChain, bot: telegram.Bot, media_store: media.MediaStore
+    ) -> list[dict]:
         components = []
 
         for component in message_chain:
@@ -32,6 +37,8 @@ class TelegramMessageConverter(abstract_platform_adapter.AbstractMessageConverte
 
                 if component.base64:
                     photo_bytes = base64.b64decode(component.base64)
+                elif media.is_media_uri(component.url):
+                    photo_bytes, _ = await media_store.get_bytes(component.url)
                 elif component.url:
                     session = httpclient.get_session()
                     async with session.get(component.url) as response:
@@ -43,12 +50,30 @@ class TelegramMessageConverter(abstract_platform_adapter.AbstractMessageConverte
                 components.append({'type': 'photo', 'photo': photo_bytes})
             elif isinstance(component, platform_message.Forward):
                 for node in component.node_list:
-                    components.extend(await TelegramMessageConverter.yiri2target(node.message_chain, bot))
+                    components.extend(await TelegramMessageConverter.yiri2target(node.message_chain, bot, media_store))
 
         return components
 
     @staticmethod
-    async def target2yiri(message: telegram.Message, bot: telegram.Bot, bot_account_id: str):
+    async def download_file(bot: telegram.Bot, file_id: str, mime_type: str) -> tuple[bytes, str]:
+        file = await bot.get_file(file_id)
+        async with httpclient.get_session(trust_env=True).get(file.file_path) as response:
+            return await response.read(), mime_type
+
+    @staticmethod
+    def media_uri(bot: telegram.Bot, media_store: media.MediaStore, file: typing.Any, mime_type: str) -> str:
+        """Handle of a photo or voice clip, downloaded when it is first needed"""
+        return media_store.put_lazy(
+            media.media_key('telegram', file.file_unique_id),
+            functools.partial(TelegramMessageConverter.download_file, bot, file.file_id, mime_type),
+            mime_type,
+            size=file.file_size or 0,
+        ).uri
+
+    @staticmethod
+    async def target2yiri(
+        message: telegram.Message, bot: telegram.Bot, bot_account_id: str, media_store: media.MediaStore
+    ):
         message_components = []
 
         def parse_message_text(text: str) -> list[platform_message.MessageComponent]:
@@ -69,18 +94,9 @@ class TelegramMessageConverter(abstract_platform_adapter.AbstractMessageConverte
             if message.caption:
                 message_components.extend(parse_message_text(message.caption))
 
-            file = await message.photo[-1].get_file()
-
-            file_bytes = None
-            file_format = ''
-
-            async with httpclient.get_session(trust_env=True).get(file.file_path) as response:
-                file_bytes = await response.read()
-                file_format = 'image/jpeg'
-
             message_components.append(
                 platform_message.Image(
-                    base64=f'data:{file_format};base64,{base64.b64encode(file_bytes).decode("utf-8")}'
+                    url=TelegramMessageConverter.media_uri(bot, media_store, message.photo[-1], 'image/jpeg'),
                 )
             )
 
@@ -88,17 +104,11 @@ class TelegramMessageConverter(abstract_platform_adapter.AbstractMessageConverte
             if message.caption:
                 message_components.extend(parse_message_text(message.caption))
 
-            file = await message.voice.get_file()
-
-            file_bytes = None
-            file_format = message.voice.mime_type or 'audio/ogg'
-
-            async with httpclient.get_session(trust_env=True).get(file.file_path) as response:
-                file_bytes = await response.read()
-
             message_components.append(
                 platform_message.Voice(
-                    base64=f'data:{file_format};base64,{base64.b64encode(file_bytes).decode("utf-8")}',
+                    url=TelegramMessageConverter.media_uri(
+                        bot, media_store, message.voice, message.voice.mime_type or 'audio/ogg'
+                    ),
                     length=message.voice.duration,
                 )
             )
@@ -112,8 +122,8 @@ class TelegramEventConverter(abstract_platform_adapter.AbstractEventConverter):
         return event.source_platform_object
 
     @staticmethod
-    async def target2yiri(event: Update, bot: telegram.Bot, bot_account_id: str):
-        lb_message = await TelegramMessageConverter.target2yiri(event.message, bot, bot_account_id)
+    async def target2yiri(event: Update, bot: telegram.Bot, bot_account_id: str, media_store: media.MediaStore):
+        lb_message = await TelegramMessageConverter.target2yiri(event.message, bot, bot_account_id, media_store)
 
         if event.effective_chat.type == 'private':
             return platform_events.FriendMessage(
@@ -158,6 +168,10 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
 
     seq: int  # 消息中识别消息顺序，直接以seq作为标识
 
+    stream_buffers: streaming.StreamReplyBuffers  # 流式回复的增量文本，更新消息时才拼接
+
+    media_store: media.MediaStore | None = pydantic.Field(exclude=True, default=None)  # 由机器人管理器设置
+
     listeners: typing.Dict[
         typing.Type[platform_events.Event],
         typing.Callable[[platform_events.Event, abstract_platform_adapter.AbstractMessagePlatformAdapter], None],
@@ -169,7 +183,9 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
                 return
 
             try:
-                lb_event = await self.event_converter.target2yiri(update, self.bot, self.bot_account_id)
+                lb_event = await self.event_converter.target2yiri(
+                    update, self.bot, self.bot_account_id, self.media_store
+                )
                 await self.listeners[type(lb_event)](lb_event, self)
                 await self.is_stream_output_supported()
             except Exception:
@@ -185,6 +201,7 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             logger=logger,
             msg_stream_id={},
             seq=1,
+            stream_buffers=streaming.StreamReplyBuffers(),
             bot=bot,
             application=application,
             bot_account_id='',
@@ -192,7 +209,7 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
         )
 
     async def send_message(self, target_type: str, target_id: str, message: platform_message.MessageChain):
-        components = await TelegramMessageConverter.yiri2target(message, self.bot)
+        components = await TelegramMessageConverter.yiri2target(message, self.bot, self.media_store)
 
         chat_id_str, _, thread_id_str = str(target_id).partition('#')
         chat_id: int | str = int(chat_id_str) if chat_id_str.lstrip('-').isdigit() else chat_id_str
@@ -225,7 +242,7 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
         quote_origin: bool = False,
     ):
         assert isinstance(message_source.source_platform_object, Update)
-        components = await TelegramMessageConverter.yiri2target(message, self.bot)
+        components = await TelegramMessageConverter.yiri2target(message, self.bot, self.media_store)
 
         for component in components:
             if component['type'] == 'text':
@@ -258,59 +275,60 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
         quote_origin: bool = False,
         is_final: bool = False,
     ):
-        msg_seq = bot_message.msg_sequence
-        if (msg_seq - 1) % 8 == 0 or is_final:
-            assert isinstance(message_source.source_platform_object, Update)
-            components = await TelegramMessageConverter.yiri2target(message, self.bot)
-            args = {}
-            message_id = message_source.source_platform_object.message.id
-
-            component = components[0]
-            if message_id not in self.msg_stream_id:  # 当消息回复第一次时，发送新消息
-                # time.sleep(0.6)
-                if component['type'] == 'text':
-                    if self.config['markdown_card'] is True:
-                        content = telegramify_markdown.markdownify(
-                            content=component['text'],
-                        )
-                    else:
-                        content = component['text']
-                    args = {
-                        'chat_id': message_source.source_platform_object.effective_chat.id,
-                        'text': content,
-                    }
-                    if message_source.source_platform_object.message.message_thread_id:
-                        args['message_thread_id'] = message_source.source_platform_object.message.message_thread_id
-
-                    if quote_origin:
-                        args['reply_to_message_id'] = message_source.source_platform_object.message.id
-
-                    if self.config['markdown_card'] is True:
-                        args['parse_mode'] = 'MarkdownV2'
-
-                send_msg = await self.bot.send_message(**args)
-                send_msg_id = send_msg.message_id
-                self.msg_stream_id[message_id] = send_msg_id
-            else:  # 存在消息的时候直接编辑消息1
-                if component['type'] == 'text':
-                    if self.config['markdown_card'] is True:
-                        content = telegramify_markdown.markdownify(
-                            content=component['text'],
-                        )
-                    else:
-                        content = component['text']
-                    args = {
-                        'message_id': self.msg_stream_id[message_id],
-                        'chat_id': message_source.source_platform_object.effective_chat.id,
-                        'text': content,
-                    }
-                    if self.config['markdown_card'] is True:
-                        args['parse_mode'] = 'MarkdownV2'
-
-                await self.bot.edit_message_text(**args)
-            if is_final and bot_message.tool_calls is None:
-                # self.seq = 1  # 消息回复结束之后重置seq
-                self.msg_stream_id.pop(message_id)  # 消息回复结束之后删除流式消息id
+        self.stream_buffers.append(bot_message.resp_message_id, bot_message, message)
+        assert isinstance(message_source.source_platform_object, Update)
+        message = self.stream_buffers.message_chain(bot_message.resp_message_id, message)
+        components = await TelegramMessageConverter.yiri2target(message, self.bot, self.media_store)
+        args = {}
+        message_id = message_source.source_platform_object.message.id
+
+        component = components[0]
+        if message_id not in self.msg_stream_id:  # 当消息回复第一次时，发送新消息
+            # time.sleep(0.6)
+            if component['type'] == 'text':
+                if self.config['markdown_card'] is True:
+                    content = telegramify_markdown.markdownify(
+                        content=component['text'],
+                    )
+                else:
+                    content = component['text']
+                args = {
+                    'chat_id': message_source.source_platform_object.effective_chat.id,
+                    'text': content,
+                }
+                if message_source.source_platform_object.message.message_thread_id:
+                    args['message_thread_id'] = message_source.source_platform_object.message.message_thread_id
+
+                if quote_origin:
+                    args['reply_to_message_id'] = message_source.source_platform_object.message.id
+
+                if self.config['markdown_card'] is True:
+                    args['parse_mode'] = 'MarkdownV2'
+
+            send_msg = await self.bot.send_message(**args)
+            send_msg_id = send_msg.message_id
+            self.msg_stream_id[message_id] = send_msg_id
+        else:  # 存在消息的时候直接编辑消息1
+            if component['type'] == 'text':
+                if self.config['markdown_card'] is True:
+                    content = telegramify_markdown.markdownify(
+                        content=component['text'],
+                    )
+                else:
+                    content = component['text']
+                args = {
+                    'message_id': self.msg_stream_id[message_id],
+                    'chat_id': message_source.source_platform_object.effective_chat.id,
+                    'text': content,
+                }
+                if self.config['markdown_card'] is True:
+                    args['parse_mode'] = 'MarkdownV2'
+
+            await self.bot.edit_message_text(**args)
+        if is_final and bot_message.tool_calls is None:
+            # self.seq = 1  # 消息回复结束之后重置seq
+            self.msg_stream_id.pop(message_id)  # 消息回复结束之后删除流式消息id
+            self.stream_buffers.pop(bot_message.resp_message_id)
 
     def get_launcher_id(self, event: platform_events.MessageEvent) -> str | None:
         if not isinstance(event.source_platform_object, Update):
@@ -336,6 +354,9 @@ class TelegramAdapter(abstract_platform_adapter.AbstractMessagePlatformAdapter):
             is_stream = True
         return is_stream
 
+    async def is_stream_delta_supported(self) -> bool:
+        return True
+
     async def is_muted(self, group_id: int) -> bool:
         return False
 
@@ -0,0 +1,43 @@
+"""适配器侧的流式回复缓冲
+
+Runner 输出增量时，支持增量更新的适配器只收到自上个分片以来新增的文本（DeltaChunk），
+由 StreamReplyBuffers 累积，只在确实更新卡片或消息时才拼接出完整文本。
+"""
+
+from __future__ import annotations
+
+from ..provider import streaming
+import langbot_plugin.api.entities.builtin.platform.message as platform_message
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+
+
+class StreamReplyBuffers:
+    """按回复消息 id 累积流式回复的文本"""
+
+    def __init__(self):
+        self._buffers: dict[str, streaming.StreamBuffer] = {}
+
+    def append(
+        self,
+        message_id: str,
+        bot_message: provider_message.MessageChunk,
+        message: platform_message.MessageChain,
+    ):
+        """写入一个分片的消息链中的文本，增量分片追加，其他分片的文本即为截至目前的完整文本"""
+        buffer = self._buffers.get(message_id)
+        if buffer is None or not isinstance(bot_message, streaming.DeltaChunk):
+            buffer = self._buffers[message_id] = streaming.StreamBuffer()
+        for component in message:
+            if isinstance(component, platform_message.Plain):
+                buffer.append(component.text)
+
+    def message_chain(self, message_id: str, message: platform_message.MessageChain) -> platform_message.MessageChain:
+        """目前为止的完整文本，加上当前分片中文本以外的组件"""
+        buffer = self._buffers.get(message_id)
+        text = platform_message.Plain(text=buffer.getvalue() if buffer else '')
+        return platform_message.MessageChain(
+            [text, *(component for component in message if not isinstance(component, platform_message.Plain))]
+        )
+
+    def pop(self, message_id: str):
+        self._buffers.pop(message_id, None)
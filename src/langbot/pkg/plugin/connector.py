@@ -6,6 +6,7 @@ from typing import Any
 import typing
 import os
 import sys
+import time
 import httpx
 import traceback
 import sqlalchemy
@@ -58,6 +59,12 @@ class PluginRuntimeConnector:
     is_enable_plugin: bool = True
     """Mark if the plugin system is enabled"""
 
+    plugins_version: int = 0
+    """Bumped whenever the set of plugins (and so their components) may have changed"""
+
+    _listener_plugins: tuple[int, float, set[str]] | None = None
+    """(plugins_version, monotonic time, ids of the plugins with an event listener)"""
+
     def __init__(
         self,
         ap: app.Application,
@@ -102,6 +109,7 @@ class PluginRuntimeConnector:
             self.handler_task = asyncio.create_task(self.handler.run())
             _ = await self.handler.ping()
             self.ap.logger.info('Connected to plugin runtime.')
+            self.plugins_version += 1
             # Sync polymorphic component instances after connection
             try:
                 await self.sync_polymorphic_component_instances()
@@ -232,16 +240,19 @@ class PluginRuntimeConnector:
                 self.ap.logger.error(f'Failed to download file from GitHub: {e}')
                 raise Exception(f'Failed to download file from GitHub: {e}')
 
-        async for ret in self.handler.install_plugin(install_source.value, install_info):
-            current_action = ret.get('current_action', None)
-            if current_action is not None:
-                if task_context is not None:
-                    task_context.set_current_action(current_action)
+        try:
+            async for ret in self.handler.install_plugin(install_source.value, install_info):
+                current_action = ret.get('current_action', None)
+                if current_action is not None:
+                    if task_context is not None:
+                        task_context.set_current_action(current_action)
 
-            trace = ret.get('trace', None)
-            if trace is not None:
-                if task_context is not None:
-                    task_context.trace(trace)
+                trace = ret.get('trace', None)
+                if trace is not None:
+                    if task_context is not None:
+                        task_context.trace(trace)
+        finally:
+            self.plugins_version += 1
 
     async def upgrade_plugin(
         self,
@@ -249,16 +260,19 @@ class PluginRuntimeConnector:
         plugin_name: str,
         task_context: taskmgr.TaskContext | None = None,
     ) -> dict[str, Any]:
-        async for ret in self.handler.upgrade_plugin(plugin_author, plugin_name):
-            current_action = ret.get('current_action', None)
-            if current_action is not None:
-                if task_context is not None:
-                    task_context.set_current_action(current_action)
-
-            trace = ret.get('trace', None)
-            if trace is not None:
-                if task_context is not None:
-                    task_context.trace(trace)
+        try:
+            async for ret in self.handler.upgrade_plugin(plugin_author, plugin_name):
+                current_action = ret.get('current_action', None)
+                if current_action is not None:
+                    if task_context is not None:
+                        task_context.set_current_action(current_action)
+
+                trace = ret.get('trace', None)
+                if trace is not None:
+                    if task_context is not None:
+                        task_context.trace(trace)
+        finally:
+            self.plugins_version += 1
 
     async def delete_plugin(
         self,
@@ -267,16 +281,19 @@ class PluginRuntimeConnector:
         delete_data: bool = False,
         task_context: taskmgr.TaskContext | None = None,
     ) -> dict[str, Any]:
-        async for ret in self.handler.delete_plugin(plugin_author, plugin_name):
-            current_action = ret.get('current_action', None)
-            if current_action is not None:
-                if task_context is not None:
-                    task_context.set_current_action(current_action)
-
-            trace = ret.get('trace', None)
-            if trace is not None:
-                if task_context is not None:
-                    task_context.trace(trace)
+        try:
+            async for ret in self.handler.delete_plugin(plugin_author, plugin_name):
+                current_action = ret.get('current_action', None)
+                if current_action is not None:
+                    if task_context is not None:
+                        task_context.set_current_action(current_action)
+
+                trace = ret.get('trace', None)
+                if trace is not None:
+                    if task_context is not None:
+                        task_context.trace(trace)
+        finally:
+            self.plugins_version += 1
 
         # Clean up plugin settings and binary storage if requested
         if delete_data:
@@ -371,7 +388,11 @@ class PluginRuntimeConnector:
         return await self.handler.get_plugin_info(author, plugin_name)
 
     async def set_plugin_config(self, plugin_author: str, plugin_name: str, config: dict[str, Any]) -> dict[str, Any]:
-        return await self.handler.set_plugin_config(plugin_author, plugin_name, config)
+        try:
+            return await self.handler.set_plugin_config(plugin_author, plugin_name, config)
+        finally:
+            # the runtime restarts the plugin with its new config
+            self.plugins_version += 1
 
     @alru_cache(ttl=5 * 60)  # 5 minutes
     async def get_plugin_icon(self, plugin_author: str, plugin_name: str) -> dict[str, Any]:
@@ -401,15 +422,50 @@ class PluginRuntimeConnector:
         if not self.is_enable_plugin:
             return event_ctx
 
+        # 没有插件监听事件时跳过，事件在每条消息的处理中多次触发，发送前还需读取其中的媒体
+        listeners = await self._event_listener_plugins()
+        if bound_plugins is not None:
+            listeners = listeners & set(bound_plugins)
+        if not listeners:
+            return event_ctx
+
+        # 插件进程无法访问媒体存储，发送前将消息中的媒体句柄替换为数据，返回后再换回句柄
+        media_store = self.ap.media_store
+        event_ctx_data = event_ctx.model_dump(serialize_as_any=False)
+        handles = await media_store.materialize_dump(event_ctx_data)
+
         # Pass include_plugins to runtime for filtering
-        event_ctx_result = await self.handler.emit_event(
-            event_ctx.model_dump(serialize_as_any=False), include_plugins=bound_plugins
-        )
+        event_ctx_result = await self.handler.emit_event(event_ctx_data, include_plugins=bound_plugins)
 
-        event_ctx = context.EventContext.model_validate(event_ctx_result['event_context'])
+        event_ctx = context.EventContext.model_validate(
+            media_store.restore_dump(event_ctx_result['event_context'], handles)
+        )
 
         return event_ctx
 
+    async def _event_listener_plugins(self) -> set[str]:
+        """Plugins that have an event listener component
+
+        Cached like the plugin tool lists: until the plugins change or plugin.tool_list_cache_ttl
+        runs out, debug plugins connect without bumping plugins_version.
+        """
+        ttl = self.ap.instance_config.data.get('plugin', {}).get('tool_list_cache_ttl', 60)
+        now = time.monotonic()
+        cached = self._listener_plugins
+        if cached is not None and cached[0] == self.plugins_version and now - cached[1] < ttl:
+            return cached[2]
+
+        plugin_ids = set()
+        for plugin in await self.handler.list_plugins():
+            metadata = plugin.get('manifest', {}).get('manifest', {}).get('metadata', {})
+            for component in plugin.get('components', []):
+                if component.get('manifest', {}).get('manifest', {}).get('kind', '') == 'EventListener':
+                    plugin_ids.add(f'{metadata.get("author", "")}/{metadata.get("name", "")}')
+                    break
+
+        self._listener_plugins = (self.plugins_version, now, plugin_ids)
+        return plugin_ids
+
     async def list_tools(self, bound_plugins: list[str] | None = None) -> list[ComponentManifest]:
         if not self.is_enable_plugin:
             return []
@@ -3,3 +3,7 @@ class RequesterError(Exception):
 
     def __init__(self, message: str):
         super().__init__('模型请求失败: ' + message)
+
+
+class RequesterRateLimitError(RequesterError):
+    """The provider rejected the request with HTTP 429, retrying later or with less input may succeed."""
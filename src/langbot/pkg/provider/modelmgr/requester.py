@@ -8,10 +8,27 @@ from ...core import app
 from ...entity.persistence import model as persistence_model
 import langbot_plugin.api.entities.builtin.resource.tool as resource_tool
 from . import token
+from .. import streaming
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 import langbot_plugin.api.entities.builtin.provider.message as provider_message
 
 
+def estimate_tokens(chars: int) -> int:
+    """Rough token count of a text of the given length, about 4 characters per token"""
+    return (chars + 3) // 4
+
+
+def text_length(messages: typing.List[provider_message.Message]) -> int:
+    """Characters of text in the messages, images and files are not counted"""
+    length = 0
+    for message in messages:
+        if isinstance(message.content, str):
+            length += len(message.content)
+        elif message.content:
+            length += sum(len(element.text or '') for element in message.content if element.type == 'text')
+    return length
+
+
 class RuntimeProvider:
     """运行时模型提供商"""
 
@@ -52,6 +69,9 @@ class RuntimeProvider:
         error_message = None
 
         try:
+            # Media handles in the messages are sent as base64 data, the history keeps the handles
+            messages = await self.requester.ap.media_store.materialize_messages(messages)
+
             # Call the underlying requester
             result = await self.requester.invoke_llm(
                 query=query,
@@ -78,6 +98,9 @@ class RuntimeProvider:
             error_message = str(e)
             raise
         finally:
+            # Usage counts against the model budgets of all pipelines
+            self.requester.ap.pipeline_mgr.model_budget.charge(model.model_entity.uuid, input_tokens + output_tokens)
+
             # Record LLM call monitoring data (only if query is provided)
             if query is not None:
                 duration_ms = int((time.time() - start_time) * 1000)
@@ -128,11 +151,14 @@ class RuntimeProvider:
         start_time = time.time()
         status = 'success'
         error_message = None
-        # Note: Stream doesn't easily provide token counts, set to 0
         input_tokens = 0
         output_tokens = 0
+        usage_info = None
+        output_chars = 0
 
         try:
+            messages = await self.requester.ap.media_store.materialize_messages(messages)
+
             # Stream the response
             async for chunk in self.requester.invoke_llm_stream(
                 query=query,
@@ -142,12 +168,28 @@ class RuntimeProvider:
                 extra_args=extra_args,
                 remove_think=remove_think,
             ):
+                if isinstance(chunk, streaming.UsageChunk):
+                    usage_info = chunk.usage
+                output_chars += len(chunk.content) if isinstance(chunk.content, str) else 0
+                for tool_call in chunk.tool_calls or []:
+                    output_chars += len(tool_call.function.arguments or '') if tool_call.function else 0
                 yield chunk
         except Exception as e:
             status = 'error'
             error_message = str(e)
             raise
         finally:
+            if usage_info:
+                input_tokens = usage_info.get('input_tokens', 0)
+                output_tokens = usage_info.get('output_tokens', 0)
+            else:
+                # The provider did not report usage in the stream, estimate it from the text
+                input_tokens = estimate_tokens(text_length(messages))
+                output_tokens = estimate_tokens(output_chars)
+
+            # Usage counts against the model budgets of all pipelines
+            self.requester.ap.pipeline_mgr.model_budget.charge(model.model_entity.uuid, input_tokens + output_tokens)
+
             # Record LLM call monitoring data (only if query is provided)
             if query is not None:
                 duration_ms = int((time.time() - start_time) * 1000)
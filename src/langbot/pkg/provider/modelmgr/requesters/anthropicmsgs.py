@@ -8,6 +8,7 @@ import anthropic
 import httpx
 
 from .. import errors, requester
+from ... import streaming
 
 from ....utils import image
 import langbot_plugin.api.entities.builtin.resource.tool as resource_tool
@@ -291,9 +292,14 @@ class AnthropicMessages(requester.ProviderAPIRequester):
             content = ''
             tool_name = ''
             tool_id = ''
+            input_tokens = 0
             async for chunk in await self.client.messages.create(**args):
                 tool_call = {'id': None, 'function': {'name': None, 'arguments': None}, 'type': 'function'}
-                if isinstance(
+                usage = None
+                if isinstance(chunk, anthropic.types.raw_message_start_event.RawMessageStartEvent):
+                    input_tokens = chunk.message.usage.input_tokens or 0
+                    continue
+                elif isinstance(
                     chunk, anthropic.types.raw_content_block_start_event.RawContentBlockStartEvent
                 ):  # 记录开始
                     if chunk.content_block.type == 'tool_use':
@@ -337,6 +343,8 @@ class AnthropicMessages(requester.ProviderAPIRequester):
                 elif isinstance(chunk, anthropic.types.raw_message_delta_event.RawMessageDeltaEvent):
                     if chunk.delta.stop_reason == 'end_turn':
                         finish_reason = True
+                    if chunk.usage:
+                        usage = {'input_tokens': input_tokens, 'output_tokens': chunk.usage.output_tokens or 0}
                 elif isinstance(chunk, anthropic.types.raw_message_stop_event.RawMessageStopEvent):
                     continue  # 这个好像是完全结束
                 else:
@@ -356,7 +364,10 @@ class AnthropicMessages(requester.ProviderAPIRequester):
 
                 # assert type(chunk) is anthropic.types.message.Chunk
 
-                yield provider_message.MessageChunk(**args)
+                if usage:
+                    yield streaming.UsageChunk(**args, usage=usage)
+                else:
+                    yield provider_message.MessageChunk(**args)
 
             # return llm_entities.Message(**args)
         except anthropic.AuthenticationError as e:
@@ -8,6 +8,7 @@ import openai.types.chat.chat_completion as chat_completion_module
 import httpx
 
 from .. import errors, requester
+from ... import streaming
 import langbot_plugin.api.entities.builtin.resource.tool as resource_tool
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 import langbot_plugin.api.entities.builtin.provider.message as provider_message
@@ -242,7 +243,18 @@ class OpenAIChatCompletions(requester.ProviderAPIRequester):
             # 移除 None 值
             chunk_data = {k: v for k, v in chunk_data.items() if v is not None}
 
-            yield provider_message.MessageChunk(**chunk_data)
+            usage = getattr(chunk, 'usage', None)
+            if usage:
+                # 部分提供商在最后一个分片中返回本次调用的用量
+                yield streaming.UsageChunk(
+                    **chunk_data,
+                    usage={
+                        'input_tokens': usage.prompt_tokens or 0,
+                        'output_tokens': usage.completion_tokens or 0,
+                    },
+                )
+            else:
+                yield provider_message.MessageChunk(**chunk_data)
             chunk_idx += 1
 
     async def _closure(
@@ -382,6 +394,8 @@ class OpenAIChatCompletions(requester.ProviderAPIRequester):
             raise errors.RequesterError('请求超时')
         except openai.BadRequestError as e:
             raise errors.RequesterError(f'请求参数错误: {e.message}')
+        except openai.RateLimitError as e:
+            raise errors.RequesterRateLimitError(f'请求过于频繁或余额不足: {e.message}')
 
     async def invoke_llm_stream(
         self,
@@ -0,0 +1,232 @@
+"""Response cache of the local agent
+
+Answers are cached per pipeline and looked up in two steps:
+
+- exact: the normalized question under the same context, i.e. the same prompt, model and
+  snapshot of the bound knowledge bases
+- semantic: the cached question of the same context whose embedding is the most similar to
+  the question's, if the cosine similarity reaches the pipeline's threshold
+
+The snapshot of a knowledge base is a revision counter bumped whenever its files change, so
+answers built on the old content are never served again. Only questions opening a conversation
+and answered without tool calls are cached, an answer depending on earlier turns of one session
+must not be served to another.
+"""
+
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import time
+import typing
+
+import numpy as np
+
+from ..rag.knowledge.embedding_cache import normalize_text
+
+if typing.TYPE_CHECKING:
+    from langbot.pkg.core import app
+    import langbot_plugin.api.entities.builtin.provider.message as provider_message
+
+
+def question_digest(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).casefold().encode('utf-8')).hexdigest()
+
+
+class CachedResponse:
+    """One cached answer"""
+
+    __slots__ = ('question', 'embedding', 'content', 'expires_at')
+
+    def __init__(self, question: str, embedding: np.ndarray | None, content: str, expires_at: float):
+        self.question = question
+        self.embedding = embedding
+        self.content = content
+        self.expires_at = expires_at
+
+
+class _Bucket:
+    """Answers of one pipeline under one context, with the matrix of their question embeddings"""
+
+    def __init__(self, kb_uuids: tuple[str, ...]):
+        self.kb_uuids = kb_uuids
+        self.entries: dict[str, CachedResponse] = {}
+        self._matrix: tuple[list[str], np.ndarray] | None = None
+
+    def changed(self):
+        self._matrix = None
+
+    def nearest(self, embedding: np.ndarray) -> tuple[str, float] | None:
+        if self._matrix is None:
+            digests = [digest for digest, entry in self.entries.items() if entry.embedding is not None]
+            if not digests:
+                return None
+            self._matrix = (digests, np.stack([self.entries[digest].embedding for digest in digests]))
+        digests, matrix = self._matrix
+        if matrix.shape[1] != embedding.shape[0]:
+            return None
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        return digests[best], float(scores[best])
+
+
+class ResponseCache:
+    """Answers of the pipelines with the response cache enabled, shared by all of them"""
+
+    max_entries: int
+    """Answers kept in memory over all pipelines, least recently used ones are evicted first"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+
+        # (pipeline uuid, context key, question digest), in least recently used order
+        self._lru: collections.OrderedDict[tuple[str, str, str], None] = collections.OrderedDict()
+        self._buckets: dict[tuple[str, str], _Bucket] = {}
+        self._kb_revisions: dict[str, int] = {}
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._pipeline_counters: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def from_config(cls, ap: app.Application) -> ResponseCache:
+        cache_config = ap.instance_config.data.get('response_cache', {})
+        return cls(max_entries=cache_config.get('max_entries', 10000))
+
+    def context_key(
+        self,
+        prompt_messages: list[provider_message.Message],
+        model_uuid: str,
+        kb_uuids: list[str],
+    ) -> str:
+        """Hash of everything but the question that the answer depends on"""
+        snapshot = sorted((kb_uuid, self._kb_revisions.get(kb_uuid, 0)) for kb_uuid in kb_uuids)
+        prompt = [message.model_dump(mode='json', exclude_none=True) for message in prompt_messages]
+        payload = json.dumps([prompt, model_uuid, snapshot], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def lookup(
+        self,
+        pipeline_uuid: str,
+        context_key: str,
+        question: str,
+        embedding: list[float] | None = None,
+        similarity: float = 1.0,
+    ) -> tuple[str, str] | None:
+        """The cached answer and how it matched, 'exact' or 'semantic', None on a miss"""
+        bucket = self._buckets.get((pipeline_uuid, context_key))
+        if bucket is not None:
+            self._drop_expired(pipeline_uuid, context_key, bucket)
+
+            digest = question_digest(question)
+            entry = bucket.entries.get(digest)
+            if entry is not None:
+                self._hit(pipeline_uuid, context_key, digest, 'exact')
+                return entry.content, 'exact'
+
+            if embedding is not None and similarity < 1:
+                nearest = bucket.nearest(_unit(embedding))
+                if nearest is not None and nearest[1] >= similarity:
+                    self._hit(pipeline_uuid, context_key, nearest[0], 'semantic')
+                    return bucket.entries[nearest[0]].content, 'semantic'
+
+        self.misses += 1
+        self._counters(pipeline_uuid)['misses'] += 1
+        return None
+
+    def store(
+        self,
+        pipeline_uuid: str,
+        context_key: str,
+        kb_uuids: list[str],
+        question: str,
+        content: str,
+        ttl: float,
+        embedding: list[float] | None = None,
+    ):
+        if self.max_entries <= 0:
+            return
+        bucket = self._buckets.get((pipeline_uuid, context_key))
+        if bucket is None:
+            bucket = self._buckets[(pipeline_uuid, context_key)] = _Bucket(tuple(kb_uuids))
+
+        digest = question_digest(question)
+        bucket.entries[digest] = CachedResponse(
+            question=question,
+            embedding=_unit(embedding) if embedding is not None else None,
+            content=content,
+            expires_at=time.monotonic() + ttl if ttl > 0 else float('inf'),
+        )
+        bucket.changed()
+
+        key = (pipeline_uuid, context_key, digest)
+        self._lru[key] = None
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._remove(*self._lru.popitem(last=False)[0])
+
+    def invalidate_pipeline(self, pipeline_uuid: str):
+        """Drop the answers of a pipeline, called when it is updated or deleted"""
+        for pipeline, context_key in list(self._buckets):
+            if pipeline == pipeline_uuid:
+                self._drop_bucket(pipeline, context_key)
+
+    def invalidate_kb(self, kb_uuid: str):
+        """Drop the answers built on a knowledge base, called when its content changes"""
+        self._kb_revisions[kb_uuid] = self._kb_revisions.get(kb_uuid, 0) + 1
+        for (pipeline, context_key), bucket in list(self._buckets.items()):
+            if kb_uuid in bucket.kb_uuids:
+                self._drop_bucket(pipeline, context_key)
+
+    def _hit(self, pipeline_uuid: str, context_key: str, digest: str, kind: str):
+        self._lru.move_to_end((pipeline_uuid, context_key, digest))
+        if kind == 'exact':
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        self._counters(pipeline_uuid)[f'{kind}_hits'] += 1
+
+    def _counters(self, pipeline_uuid: str) -> dict[str, int]:
+        counters = self._pipeline_counters.get(pipeline_uuid)
+        if counters is None:
+            counters = self._pipeline_counters[pipeline_uuid] = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+        return counters
+
+    def _drop_expired(self, pipeline_uuid: str, context_key: str, bucket: _Bucket):
+        now = time.monotonic()
+        for digest in [digest for digest, entry in bucket.entries.items() if entry.expires_at <= now]:
+            self._lru.pop((pipeline_uuid, context_key, digest), None)
+            self._remove(pipeline_uuid, context_key, digest)
+
+    def _drop_bucket(self, pipeline_uuid: str, context_key: str):
+        bucket = self._buckets.pop((pipeline_uuid, context_key))
+        for digest in bucket.entries:
+            self._lru.pop((pipeline_uuid, context_key, digest), None)
+
+    def _remove(self, pipeline_uuid: str, context_key: str, digest: str):
+        bucket = self._buckets.get((pipeline_uuid, context_key))
+        if bucket is None:
+            return
+        bucket.entries.pop(digest, None)
+        bucket.changed()
+        if not bucket.entries:
+            del self._buckets[(pipeline_uuid, context_key)]
+
+    def get_stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'entries': len(self._lru),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0,
+            'pipelines': {uuid: dict(counters) for uuid, counters in self._pipeline_counters.items()},
+        }
+
+
+def _unit(vector: list[float] | np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -25,6 +25,9 @@ class RequestRunner(abc.ABC):
 
     name: str = None
 
+    stream_delta: bool = False
+    """流式输出时，assistant 消息块的 content 是否为增量文本（否则为截至目前的完整文本）"""
+
     ap: app.Application
 
     pipeline_config: dict
@@ -72,7 +72,7 @@ class CozeAPIRunner(runner.RequestRunner):
             # 多模态消息处理
             content_parts = []
 
-            for ce in query.user_message.content:
+            for ce in await self.ap.media_store.materialize_content(query.user_message.content):
                 if ce.type == 'text':
                     content_parts.append({'type': 'text', 'text': ce.text})
                 elif ce.type == 'image_base64':
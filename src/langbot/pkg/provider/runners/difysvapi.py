@@ -111,7 +111,7 @@ class DifyServiceAPIRunner(runner.RequestRunner):
             return 'document'
 
         if isinstance(query.user_message.content, list):
-            for ce in query.user_message.content:
+            for ce in await self.ap.media_store.materialize_content(query.user_message.content):
                 if ce.type == 'text':
                     plain_text += ce.text
                 elif ce.type == 'image_base64':
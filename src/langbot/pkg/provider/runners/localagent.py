@@ -2,8 +2,11 @@ from __future__ import annotations
 
 import json
 import copy
+import time
 import typing
-from .. import runner
+import asyncio
+from .. import runner, streaming
+from ...pipeline import monitoring_helper
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 import langbot_plugin.api.entities.builtin.provider.message as provider_message
 import langbot_plugin.api.entities.builtin.rag.context as rag_context
@@ -28,6 +31,8 @@ Respond in the same language as the user's input.
 class LocalAgentRunner(runner.RequestRunner):
     """本地Agent请求运行器"""
 
+    stream_delta = True
+
     class ToolCallTracker:
         """工具调用追踪器"""
 
@@ -35,18 +40,211 @@ class LocalAgentRunner(runner.RequestRunner):
             self.active_calls: dict[str, dict] = {}
             self.completed_calls: list[provider_message.ToolCall] = []
 
+    async def _invoke_llm_stream(
+        self,
+        query: pipeline_query.Query,
+        use_llm_model,
+        req_messages: list[provider_message.Message],
+        remove_think: bool,
+        flush_policy: streaming.FlushPolicy,
+        stream_state: dict,
+    ) -> typing.AsyncGenerator[provider_message.MessageChunk, None]:
+        """流式请求一轮，按刷新策略输出增量内容
+
+        本轮完整的消息（用于追加到 req_messages）写入 stream_state['final_msg']，
+        stream_state['msg_sequence'] 在多轮之间延续。
+        """
+        tool_calls_map: dict[str, provider_message.ToolCall] = {}
+        buffer = streaming.StreamBuffer()
+        last_role = 'assistant'
+
+        async for msg in use_llm_model.provider.invoke_llm_stream(
+            query,
+            use_llm_model,
+            req_messages,
+            query.use_funcs,
+            extra_args=use_llm_model.model_entity.extra_args,
+            remove_think=remove_think,
+        ):
+            # 记录角色
+            if msg.role:
+                last_role = msg.role
+
+            # 累积内容
+            buffer.append(msg.content)
+
+            # 处理工具调用
+            if msg.tool_calls:
+                for tool_call in msg.tool_calls:
+                    if tool_call.id not in tool_calls_map:
+                        tool_calls_map[tool_call.id] = provider_message.ToolCall(
+                            id=tool_call.id,
+                            type=tool_call.type,
+                            function=provider_message.FunctionCall(
+                                name=tool_call.function.name if tool_call.function else '', arguments=''
+                            ),
+                        )
+                    if tool_call.function and tool_call.function.arguments:
+                        # 流式处理中，工具调用参数可能分多个chunk返回，需要追加而不是覆盖
+                        tool_calls_map[tool_call.id].function.arguments += tool_call.function.arguments
+
+            # 达到刷新条件或最后一个chunk时，输出自上次输出以来的增量内容
+            if msg.is_final or flush_policy.should_flush(buffer.delta_length):
+                flush_policy.mark_flushed()
+                stream_state['msg_sequence'] += 1
+                yield streaming.DeltaChunk(
+                    role=last_role,
+                    content=buffer.take_delta(),
+                    tool_calls=list(tool_calls_map.values()) if (tool_calls_map and msg.is_final) else None,
+                    is_final=msg.is_final,
+                    msg_sequence=stream_state['msg_sequence'],
+                )
+
+        if buffer.delta_length:
+            # 上游没有发送结束标记，补发剩余内容
+            stream_state['msg_sequence'] += 1
+            yield streaming.DeltaChunk(
+                role=last_role,
+                content=buffer.take_delta(),
+                msg_sequence=stream_state['msg_sequence'],
+            )
+
+        # 创建本轮完整消息用于后续处理
+        stream_state['final_msg'] = provider_message.MessageChunk(
+            role=last_role,
+            content=buffer.getvalue(),
+            tool_calls=list(tool_calls_map.values()) if tool_calls_map else None,
+            msg_sequence=stream_state['msg_sequence'],
+        )
+
+    async def _call_tool(
+        self,
+        query: pipeline_query.Query,
+        tool_call: provider_message.ToolCall,
+        timeout: float,
+    ) -> typing.Any:
+        """执行单个工具调用，并记录耗时到监控"""
+        func = tool_call.function
+
+        start_time = time.time()
+        status = 'success'
+        error_message = None
+
+        try:
+            if func.arguments:
+                parameters = json.loads(func.arguments)
+            else:
+                parameters = {}
+
+            call = self.ap.tool_mgr.execute_func_call(func.name, parameters, query=query)
+
+            if timeout and timeout > 0:
+                try:
+                    return await asyncio.wait_for(call, timeout)
+                except asyncio.TimeoutError:
+                    status = 'timeout'
+                    raise TimeoutError(f'tool {func.name} timed out after {timeout}s')
+
+            return await call
+        except Exception as e:
+            if status == 'success':
+                status = 'error'
+            error_message = str(e)
+            raise
+        finally:
+            await monitoring_helper.MonitoringHelper.record_tool_call(
+                ap=self.ap,
+                query=query,
+                tool_name=func.name,
+                duration_ms=int((time.time() - start_time) * 1000),
+                status=status,
+                error_message=error_message,
+            )
+
+    async def _execute_tool_calls(
+        self,
+        query: pipeline_query.Query,
+        tool_calls: list[provider_message.ToolCall],
+        concurrency: int,
+        timeout: float,
+    ) -> typing.AsyncGenerator[tuple[provider_message.ToolCall, typing.Any], None]:
+        """执行一轮中的所有工具调用
+
+        最多 concurrency 个调用同时执行，结果按 tool_calls 的顺序逐个输出，
+        调用失败时结果为异常对象。concurrency 为 1 时按顺序逐个执行。
+        """
+        if concurrency <= 1 or len(tool_calls) <= 1:
+            for tool_call in tool_calls:
+                try:
+                    yield tool_call, await self._call_tool(query, tool_call, timeout)
+                except Exception as e:
+                    yield tool_call, e
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited_call(tool_call: provider_message.ToolCall) -> typing.Any:
+            async with semaphore:
+                return await self._call_tool(query, tool_call, timeout)
+
+        tasks = [asyncio.create_task(limited_call(tool_call)) for tool_call in tool_calls]
+
+        try:
+            for tool_call, task in zip(tool_calls, tasks):
+                try:
+                    yield tool_call, await task
+                except Exception as e:
+                    yield tool_call, e
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _embed_question(self, kb_uuids: list[str], text: str) -> list[float] | None:
+        """用第一个按向量检索的内置知识库的嵌入模型计算问题向量，随后的检索会命中嵌入缓存
+
+        没有这样的知识库时返回 None，响应缓存只做精确匹配
+        """
+        for kb_uuid in kb_uuids:
+            kb = await self.ap.rag_mgr.get_knowledge_base_by_uuid(kb_uuid)
+            if kb is None or kb.get_type() != 'internal' or kb.retrieval_mode == 'lexical':
+                continue
+            try:
+                embedding_model = await kb.get_embedding_model()
+                return await kb.retriever.embed_query(kb_uuid, text, embedding_model)
+            except Exception as e:
+                self.ap.logger.warning(f'Failed to embed the question for the response cache: {e}')
+                return None
+        return None
+
+    async def _replay_cached_response(
+        self, query: pipeline_query.Query, content: str
+    ) -> provider_message.Message | provider_message.MessageChunk:
+        """将缓存的回复按正常的输出方式返回"""
+        try:
+            is_stream = await query.adapter.is_stream_output_supported()
+        except AttributeError:
+            is_stream = False
+
+        if is_stream:
+            # 与 _invoke_llm_stream 输出的第一个分片序号相同
+            return provider_message.MessageChunk(role='assistant', content=content, is_final=True, msg_sequence=2)
+        return provider_message.Message(role='assistant', content=content)
+
     async def run(
         self, query: pipeline_query.Query
     ) -> typing.AsyncGenerator[provider_message.Message | provider_message.MessageChunk, None]:
         """运行请求"""
         pending_tool_calls = []
 
+        local_agent_config = query.pipeline_config['ai']['local-agent']
+
         # Get knowledge bases list (new field)
-        kb_uuids = query.pipeline_config['ai']['local-agent'].get('knowledge-bases', [])
+        kb_uuids = local_agent_config.get('knowledge-bases', [])
 
         # Fallback to old field for backward compatibility
         if not kb_uuids:
-            old_kb_uuid = query.pipeline_config['ai']['local-agent'].get('knowledge-base', '')
+            old_kb_uuid = local_agent_config.get('knowledge-base', '')
             if old_kb_uuid and old_kb_uuid != '__none__':
                 kb_uuids = [old_kb_uuid]
 
@@ -62,30 +260,40 @@ class LocalAgentRunner(runner.RequestRunner):
                     user_message_text += ce.text
                     break
 
+        response_cache = self.ap.pipeline_mgr.response_cache
+        cache_key = None
+        question_embedding = None
+
+        if (
+            local_agent_config.get('response-cache', False)
+            and user_message_text
+            and not query.messages
+            and (isinstance(user_message.content, str) or all(ce.type == 'text' for ce in user_message.content))
+        ):
+            # 只缓存会话中第一个纯文本问题，有对话历史时回复取决于历史，不能用于其他会话
+            similarity = local_agent_config.get('response-cache-similarity', 0.95)
+            cache_key = response_cache.context_key(query.prompt.messages, query.use_llm_model_uuid, kb_uuids)
+            if similarity < 1:
+                question_embedding = await self._embed_question(kb_uuids, user_message_text)
+
+            cached = response_cache.lookup(
+                query.pipeline_uuid, cache_key, user_message_text, question_embedding, similarity
+            )
+            query.variables['response_cache'] = cached[1] if cached else 'miss'
+            if cached:
+                yield await self._replay_cached_response(query, cached[0])
+                return
+
         if kb_uuids and user_message_text:
             # only support text for now
-            all_results: list[rag_context.RetrievalResultEntry] = []
-
-            # Retrieve from each knowledge base
-            for kb_uuid in kb_uuids:
-                kb = await self.ap.rag_mgr.get_knowledge_base_by_uuid(kb_uuid)
-
-                if not kb:
-                    self.ap.logger.warning(f'Knowledge base {kb_uuid} not found, skipping')
-                    continue
-
-                # Get top_k based on KB type
-                if kb.get_type() == 'internal':
-                    top_k = kb.knowledge_base_entity.top_k
-                elif kb.get_type() == 'external':
-                    top_k = 5  # external kb's top_k is managed by plugin config
-                else:
-                    top_k = 5  # default fallback
-
-                result = await kb.retrieve(user_message_text, top_k)
-
-                if result:
-                    all_results.extend(result)
+            # Retrieve from all knowledge bases at once
+            all_results: list[rag_context.RetrievalResultEntry] = await self.ap.rag_mgr.retrieve(
+                kb_uuids,
+                user_message_text,
+                top_k=local_agent_config.get('retrieval-top-k', 0),
+                fusion=local_agent_config.get('retrieval-fusion', 'rrf'),
+                timeout=local_agent_config.get('retrieval-timeout', 10),
+            )
 
             final_user_message_text = ''
 
@@ -123,6 +331,8 @@ class LocalAgentRunner(runner.RequestRunner):
 
         use_llm_model = await self.ap.model_mgr.get_model_by_uuid(query.use_llm_model_uuid)
 
+        flush_policy = streaming.FlushPolicy.from_config(self.ap.instance_config.data)
+
         self.ap.logger.debug(
             f'localagent req: query={query.query_id} req_messages={req_messages} use_llm_model={query.use_llm_model_uuid}'
         )
@@ -142,183 +352,94 @@ class LocalAgentRunner(runner.RequestRunner):
             final_msg = msg
         else:
             # 流式输出，需要处理工具调用
-            tool_calls_map: dict[str, provider_message.ToolCall] = {}
-            msg_idx = 0
-            accumulated_content = ''  # 从开始累积的所有内容
-            last_role = 'assistant'
-            msg_sequence = 1
-            async for msg in use_llm_model.provider.invoke_llm_stream(
-                query,
-                use_llm_model,
-                req_messages,
-                query.use_funcs,
-                extra_args=use_llm_model.model_entity.extra_args,
-                remove_think=remove_think,
+            stream_state = {'msg_sequence': 1}
+            async for chunk in self._invoke_llm_stream(
+                query, use_llm_model, req_messages, remove_think, flush_policy, stream_state
             ):
-                msg_idx = msg_idx + 1
-
-                # 记录角色
-                if msg.role:
-                    last_role = msg.role
-
-                # 累积内容
-                if msg.content:
-                    accumulated_content += msg.content
-
-                # 处理工具调用
-                if msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        if tool_call.id not in tool_calls_map:
-                            tool_calls_map[tool_call.id] = provider_message.ToolCall(
-                                id=tool_call.id,
-                                type=tool_call.type,
-                                function=provider_message.FunctionCall(
-                                    name=tool_call.function.name if tool_call.function else '', arguments=''
-                                ),
-                            )
-                        if tool_call.function and tool_call.function.arguments:
-                            # 流式处理中，工具调用参数可能分多个chunk返回，需要追加而不是覆盖
-                            tool_calls_map[tool_call.id].function.arguments += tool_call.function.arguments
-                # continue
-                # 每8个chunk或最后一个chunk时，输出所有累积的内容
-                if msg_idx % 8 == 0 or msg.is_final:
-                    msg_sequence += 1
-                    yield provider_message.MessageChunk(
-                        role=last_role,
-                        content=accumulated_content,  # 输出所有累积内容
-                        tool_calls=list(tool_calls_map.values()) if (tool_calls_map and msg.is_final) else None,
-                        is_final=msg.is_final,
-                        msg_sequence=msg_sequence,
-                    )
-
-            # 创建最终消息用于后续处理
-            final_msg = provider_message.MessageChunk(
-                role=last_role,
-                content=accumulated_content,
-                tool_calls=list(tool_calls_map.values()) if tool_calls_map else None,
-                msg_sequence=msg_sequence,
-            )
+                yield chunk
+            final_msg = stream_state['final_msg']
 
         pending_tool_calls = final_msg.tool_calls
-        first_content = final_msg.content
-        if isinstance(final_msg, provider_message.MessageChunk):
-            first_end_sequence = final_msg.msg_sequence
+
+        if (
+            cache_key is not None
+            and not pending_tool_calls
+            and isinstance(final_msg.content, str)
+            and final_msg.content
+        ):
+            response_cache.store(
+                query.pipeline_uuid,
+                cache_key,
+                kb_uuids,
+                user_message_text,
+                final_msg.content,
+                ttl=local_agent_config.get('response-cache-ttl', 3600),
+                embedding=question_embedding,
+            )
 
         req_messages.append(final_msg)
 
+        parallel_tool_calls = local_agent_config.get('parallel-tool-calls', True)
+        tool_call_concurrency = local_agent_config.get('tool-call-concurrency', 4)
+        tool_call_timeout = local_agent_config.get('tool-call-timeout', 120)
+
         # 持续请求，只要还有待处理的工具调用就继续处理调用
         while pending_tool_calls:
-            for tool_call in pending_tool_calls:
-                try:
-                    func = tool_call.function
-
-                    if func.arguments:
-                        parameters = json.loads(func.arguments)
-                    else:
-                        parameters = {}
-
-                    func_ret = await self.ap.tool_mgr.execute_func_call(func.name, parameters, query=query)
-
-                    # Handle return value content
-                    tool_content = None
-                    if (
-                        isinstance(func_ret, list)
-                        and len(func_ret) > 0
-                        and isinstance(func_ret[0], provider_message.ContentElement)
-                    ):
-                        tool_content = func_ret
-                    else:
-                        tool_content = json.dumps(func_ret, ensure_ascii=False)
-
-                    if is_stream:
-                        msg = provider_message.MessageChunk(
-                            role='tool',
-                            content=tool_content,
-                            tool_call_id=tool_call.id,
-                        )
-                    else:
-                        msg = provider_message.Message(
-                            role='tool',
-                            content=tool_content,
-                            tool_call_id=tool_call.id,
-                        )
-
-                    yield msg
-
-                    req_messages.append(msg)
-                except Exception as e:
+            async for tool_call, func_ret in self._execute_tool_calls(
+                query,
+                pending_tool_calls,
+                tool_call_concurrency if parallel_tool_calls else 1,
+                tool_call_timeout,
+            ):
+                if isinstance(func_ret, Exception):
                     # 工具调用出错，添加一个报错信息到 req_messages
-                    err_msg = provider_message.Message(role='tool', content=f'err: {e}', tool_call_id=tool_call.id)
+                    err_msg = provider_message.Message(
+                        role='tool', content=f'err: {func_ret}', tool_call_id=tool_call.id
+                    )
 
                     yield err_msg
 
                     req_messages.append(err_msg)
+                    continue
+
+                # Handle return value content
+                tool_content = None
+                if (
+                    isinstance(func_ret, list)
+                    and len(func_ret) > 0
+                    and isinstance(func_ret[0], provider_message.ContentElement)
+                ):
+                    tool_content = func_ret
+                else:
+                    tool_content = json.dumps(func_ret, ensure_ascii=False)
+
+                if is_stream:
+                    msg = provider_message.MessageChunk(
+                        role='tool',
+                        content=tool_content,
+                        tool_call_id=tool_call.id,
+                    )
+                else:
+                    msg = provider_message.Message(
+                        role='tool',
+                        content=tool_content,
+                        tool_call_id=tool_call.id,
+                    )
+
+                yield msg
+
+                req_messages.append(msg)
 
             self.ap.logger.debug(
                 f'localagent req: query={query.query_id} req_messages={req_messages} use_llm_model={query.use_llm_model_uuid}'
             )
 
             if is_stream:
-                tool_calls_map = {}
-                msg_idx = 0
-                accumulated_content = ''  # 从开始累积的所有内容
-                last_role = 'assistant'
-                msg_sequence = first_end_sequence
-
-                async for msg in use_llm_model.provider.invoke_llm_stream(
-                    query,
-                    use_llm_model,
-                    req_messages,
-                    query.use_funcs,
-                    extra_args=use_llm_model.model_entity.extra_args,
-                    remove_think=remove_think,
+                async for chunk in self._invoke_llm_stream(
+                    query, use_llm_model, req_messages, remove_think, flush_policy, stream_state
                 ):
-                    msg_idx += 1
-
-                    # 记录角色
-                    if msg.role:
-                        last_role = msg.role
-
-                    # 第一次请求工具调用时的内容
-                    if msg_idx == 1:
-                        accumulated_content = first_content if first_content is not None else accumulated_content
-
-                    # 累积内容
-                    if msg.content:
-                        accumulated_content += msg.content
-
-                    # 处理工具调用
-                    if msg.tool_calls:
-                        for tool_call in msg.tool_calls:
-                            if tool_call.id not in tool_calls_map:
-                                tool_calls_map[tool_call.id] = provider_message.ToolCall(
-                                    id=tool_call.id,
-                                    type=tool_call.type,
-                                    function=provider_message.FunctionCall(
-                                        name=tool_call.function.name if tool_call.function else '', arguments=''
-                                    ),
-                                )
-                            if tool_call.function and tool_call.function.arguments:
-                                # 流式处理中，工具调用参数可能分多个chunk返回，需要追加而不是覆盖
-                                tool_calls_map[tool_call.id].function.arguments += tool_call.function.arguments
-
-                    # 每8个chunk或最后一个chunk时，输出所有累积的内容
-                    if msg_idx % 8 == 0 or msg.is_final:
-                        msg_sequence += 1
-                        yield provider_message.MessageChunk(
-                            role=last_role,
-                            content=accumulated_content,  # 输出所有累积内容
-                            tool_calls=list(tool_calls_map.values()) if (tool_calls_map and msg.is_final) else None,
-                            is_final=msg.is_final,
-                            msg_sequence=msg_sequence,
-                        )
-
-                final_msg = provider_message.MessageChunk(
-                    role=last_role,
-                    content=accumulated_content,
-                    tool_calls=list(tool_calls_map.values()) if tool_calls_map else None,
-                    msg_sequence=msg_sequence,
-                )
+                    yield chunk
+                final_msg = stream_state['final_msg']
             else:
                 # 处理完所有调用，再次请求
                 msg = await use_llm_model.provider.invoke_llm(
@@ -54,7 +54,7 @@ class TboxAPIRunner(runner.RequestRunner):
         image_ids = []
 
         if isinstance(query.user_message.content, list):
-            for ce in query.user_message.content:
+            for ce in await self.ap.media_store.materialize_content(query.user_message.content):
                 if ce.type == 'text':
                     plain_text += ce.text
                 elif ce.type == 'image_base64':
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+import typing
+import uuid
+
+from ...core import app
+from ...utils import redisclient, redisscripts
+from . import store
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+STORE_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, redisclient.RedisError)
+
+
+class SessionLeaseManager:
+    """会话租约管理器
+
+    会话的信号量只限制本进程的并发。启用后，处理请求前还需从 Redis 协议兼容的服务中
+    取得会话的租约，多个 LangBot 实例合计不超过单会话并发数。租约在处理期间定期续期，
+    实例崩溃时租约过期后自动释放。存储不可用时只使用本进程的信号量，retry_interval 秒后
+    再尝试存储。
+    """
+
+    ap: app.Application
+
+    client: typing.Optional[redisclient.RedisClient]
+    """未启用时为 None"""
+
+    key_prefix: str
+
+    ttl: float
+    """租约有效期（秒）"""
+
+    poll_interval: float
+    """会话在其他实例上已满时，重新尝试的间隔（秒）"""
+
+    retry_interval: float
+
+    unavailable_until: float
+    """在此之前不尝试存储（monotonic）"""
+
+    def __init__(self, ap: app.Application):
+        self.ap = ap
+        self.client = None
+        self.unavailable_until = 0
+
+    async def initialize(self):
+        lease_config = self.ap.instance_config.data.get('session', {}).get('lease', {})
+        if lease_config.get('use', 'none') != 'redis':
+            return
+
+        redis_config = lease_config.get('redis', {})
+        self.client = redisclient.RedisClient(
+            redis_config.get('url', 'redis://127.0.0.1:6379/0'),
+            timeout=redis_config.get('timeout', 1),
+        )
+        self.key_prefix = redis_config.get('key_prefix', 'langbot')
+        self.ttl = lease_config.get('ttl', 60)
+        self.poll_interval = lease_config.get('poll_interval', 0.2)
+        self.retry_interval = lease_config.get('retry_interval', 30)
+
+    def _store_failed(self, e: Exception):
+        self.unavailable_until = time.monotonic() + self.retry_interval
+        self.ap.logger.warning(
+            f'Session lease store unavailable, limiting concurrency per instance for {self.retry_interval}s: {e!r}'
+        )
+
+    async def _acquire(self, key: str, lease_id: str, limit: int) -> bool:
+        """等待取得租约，存储不可用时返回 False"""
+        ttl_ms = int(self.ttl * 1000)
+        while True:
+            try:
+                if await self.client.eval(redisscripts.LEASE_ACQUIRE, [key], [limit, lease_id, ttl_ms]):
+                    return True
+            except STORE_ERRORS as e:
+                self._store_failed(e)
+                return False
+            await asyncio.sleep(self.poll_interval)
+
+    async def _renew(self, key: str, lease_id: str, released: asyncio.Event):
+        ttl_ms = int(self.ttl * 1000)
+        while True:
+            try:
+                await asyncio.wait_for(released.wait(), timeout=self.ttl / 3)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if not await self.client.eval(redisscripts.LEASE_RENEW, [key], [lease_id, ttl_ms]):
+                    self.ap.logger.warning(f'Session lease of {key} expired before it was renewed')
+                    return
+            except STORE_ERRORS as e:
+                self.ap.logger.warning(f'Failed to renew session lease of {key}: {e!r}')
+
+    @contextlib.asynccontextmanager
+    async def hold(self, session: provider_session.Session, limit: int):
+        """在会话的租约下处理请求，未启用或存储不可用时直接进入"""
+        if self.client is None or time.monotonic() < self.unavailable_until:
+            yield
+            return
+
+        key = f'{self.key_prefix}:lease:{store.get_session_key(session)}'
+        lease_id = uuid.uuid4().hex
+
+        if not await self._acquire(key, lease_id, limit):
+            yield
+            return
+
+        released = asyncio.Event()
+        renew_task = asyncio.create_task(self._renew(key, lease_id, released))
+        try:
+            yield
+        finally:
+            # 不取消续期任务，进行中的续期请求完成后任务自行退出，避免连接上留下未读的回复
+            released.set()
+            try:
+                await asyncio.shield(renew_task)
+            except asyncio.CancelledError:
+                pass
+            try:
+                await self.client.execute('ZREM', key, lease_id)
+            except STORE_ERRORS as e:
+                # 未释放的租约在有效期后自动过期
+                self.ap.logger.warning(f'Failed to release session lease of {key}: {e!r}')
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
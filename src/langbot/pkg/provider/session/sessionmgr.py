@@ -1,44 +1,220 @@
 from __future__ import annotations
 
 import asyncio
+import collections
+import datetime
+import time
+import typing
 
 from ...core import app
+from ...utils import importutil
+from ...storage import media
+from . import lease, store, stores
 from langbot_plugin.api.entities.builtin.provider import message as provider_message, prompt as provider_prompt
 import langbot_plugin.api.entities.builtin.provider.session as provider_session
 import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
 
 
+importutil.import_modules_in_pkg(stores)
+
+
+SessionKey = tuple[provider_session.LauncherTypes, typing.Union[int, str]]
+
+
 class SessionManager:
-    """会话管理器"""
+    """会话管理器
+
+    会话按 (launcher_type, launcher_id) 索引，按最近使用顺序排列，
+    超过空闲时间或数量上限的会话会被淘汰（正在处理请求的会话除外）。
+    配置了对话存储时，对话会被持久化，会话重新被访问时在后台从存储中加载，
+    调度器取会话时不等待加载完成，处理请求时再等待。
+    """
 
     ap: app.Application
 
-    session_list: list[provider_session.Session]
+    sessions: collections.OrderedDict[SessionKey, provider_session.Session]
+    """会话索引，按最近使用顺序排列，最久未使用的在前"""
+
+    last_active: dict[SessionKey, float]
+    """会话最近一次使用的时间（monotonic）"""
+
+    session_concurrency: int
+    """单会话并发数"""
+
+    max_sessions: int
+    """最大会话数，-1 为不限制（配置中 0 表示不限制）"""
+
+    idle_timeout: int
+    """会话空闲淘汰时间（秒），-1 为不淘汰（配置中 0 表示不淘汰）"""
+
+    max_conversations: int
+    """每个会话保留的最大对话数，-1 为不限制（配置中 0 表示不限制）"""
+
+    max_messages: int
+    """每个对话保留的最大消息数，-1 为不限制（配置中 0 表示不限制）"""
+
+    conversation_store: typing.Optional[store.ConversationStore]
+    """对话存储，未启用时为 None"""
+
+    loading: dict[SessionKey, asyncio.Task]
+    """正在从存储中加载对话的会话"""
+
+    lease_mgr: lease.SessionLeaseManager
+    """跨实例的会话租约"""
+
+    evicted_session_count: int
+    """已淘汰的会话数"""
+
+    trimmed_conversation_count: int
+    """因超出上限被丢弃的对话数"""
+
+    trimmed_message_count: int
+    """因超出上限被丢弃的消息数"""
 
     def __init__(self, ap: app.Application):
         self.ap = ap
-        self.session_list = []
+        self.sessions = collections.OrderedDict()
+        self.last_active = {}
+        self.conversation_store = None
+        self.loading = {}
+        self.lease_mgr = lease.SessionLeaseManager(ap)
+        self.evicted_session_count = 0
+        self.trimmed_conversation_count = 0
+        self.trimmed_message_count = 0
 
     async def initialize(self):
-        pass
+        self.session_concurrency = self.ap.instance_config.data['concurrency']['session']
+
+        session_config = self.ap.instance_config.data.get('session', {})
+        # 配置中 0 或负数表示不限制，默认不淘汰任何会话、对话或消息
+        self.max_sessions = _limit(session_config.get('max_sessions', 0))
+        self.idle_timeout = _limit(session_config.get('idle_timeout', 0))
+        self.max_conversations = _limit(session_config.get('max_conversations', 0))
+        self.max_messages = _limit(session_config.get('max_messages', 0))
+
+        store_type = session_config.get('store', {}).get('use', 'none')
+        if store_type and store_type != 'none':
+            for store_cls in store.preregistered_stores:
+                if store_cls.name == store_type:
+                    self.conversation_store = store_cls(self.ap)
+                    await self.conversation_store.initialize()
+                    self.ap.logger.info(f'Initialized conversation store: {store_type}')
+                    break
+            else:
+                raise ValueError(f'Conversation store not found: {store_type}')
+
+        await self.lease_mgr.initialize()
+
+    def lease(self, session: provider_session.Session) -> typing.AsyncContextManager[None]:
+        """会话的跨实例租约，调度时取得会话信号量后、处理请求前进入"""
+        return self.lease_mgr.hold(session, self.session_concurrency)
+
+    @property
+    def session_list(self) -> list[provider_session.Session]:
+        """所有存活的会话"""
+        return list(self.sessions.values())
+
+    @property
+    def live_session_count(self) -> int:
+        return len(self.sessions)
+
+    def _is_busy(self, session: provider_session.Session) -> bool:
+        """会话是否有正在处理的请求"""
+        semaphore = session._semaphore
+        return semaphore is not None and semaphore._value < self.session_concurrency
+
+    def _evict(self, now: float):
+        """为即将创建的会话腾出空间，并淘汰空闲超时的会话，从最久未使用的开始检查"""
+        excess = len(self.sessions) + 1 - self.max_sessions if self.max_sessions >= 0 else 0
+
+        if excess <= 0 and self.idle_timeout < 0:
+            return
+
+        to_evict: list[SessionKey] = []
+
+        for key, session in self.sessions.items():
+            idle_expired = 0 <= self.idle_timeout < now - self.last_active[key]
+
+            if len(to_evict) >= excess and not idle_expired:
+                break
 
-    async def get_session(self, query: pipeline_query.Query) -> provider_session.Session:
-        """获取会话"""
-        for session in self.session_list:
-            if query.launcher_type == session.launcher_type and query.launcher_id == session.launcher_id:
-                return session
+            if self._is_busy(session):
+                # 正在处理请求的会话不淘汰
+                continue
 
-        session_concurrency = self.ap.instance_config.data['concurrency']['session']
+            to_evict.append(key)
+
+        for key in to_evict:
+            load_task = self.loading.pop(key, None)
+            if load_task is not None:
+                load_task.cancel()
+            self.ap.media_store.release(_conversation_media(self.sessions[key].conversations or []))
+            del self.sessions[key]
+            del self.last_active[key]
+
+        self.evicted_session_count += len(to_evict)
+
+    async def get_session(self, query: pipeline_query.Query, wait_loaded: bool = True) -> provider_session.Session:
+        """获取会话
+
+        Args:
+            wait_loaded: 是否等待对话从存储中加载完成，调度器持有请求池的锁时不等待
+        """
+        key = (query.launcher_type, query.launcher_id)
+        now = time.monotonic()
+
+        session = self.sessions.get(key)
+
+        if session is not None:
+            self.sessions.move_to_end(key)
+            self.last_active[key] = now
+            if wait_loaded:
+                await self._wait_loaded(key)
+            return session
+
+        self._evict(now)
 
         session = provider_session.Session(
             launcher_type=query.launcher_type,
             launcher_id=query.launcher_id,
             sender_id=query.sender_id,
         )
-        session._semaphore = asyncio.Semaphore(session_concurrency)
-        self.session_list.append(session)
+        session._semaphore = asyncio.Semaphore(self.session_concurrency)
+        self.sessions[key] = session
+        self.last_active[key] = now
+
+        if self.conversation_store is not None:
+            self.loading[key] = asyncio.create_task(self._load_conversations(session))
+            if wait_loaded:
+                await self._wait_loaded(key)
+
         return session
 
+    async def _wait_loaded(self, key: SessionKey):
+        load_task = self.loading.get(key)
+        if load_task is None:
+            return
+        await load_task
+        if self.loading.get(key) is load_task:
+            del self.loading[key]
+
+    async def _load_conversations(self, session: provider_session.Session):
+        """从存储中加载会话的对话，最近更新的对话作为当前对话"""
+        try:
+            conversations = await self.conversation_store.load_conversations(
+                store.get_session_key(session),
+                max_conversations=self.max_conversations,
+                max_messages=self.max_messages,
+            )
+        except Exception as e:
+            self.ap.logger.error(f'Failed to load conversations of session {store.get_session_key(session)}: {e}')
+            return
+
+        if conversations:
+            self.ap.media_store.acquire(_conversation_media(conversations))
+            session.conversations = conversations
+            session.using_conversation = max(conversations, key=lambda c: c.update_time)
+
     async def get_conversation(
         self,
         query: pipeline_query.Query,
@@ -73,4 +249,91 @@ class SessionManager:
             session.conversations.append(conversation)
             session.using_conversation = conversation
 
+            dropped: list[provider_session.Conversation] = []
+            if 0 <= self.max_conversations < len(session.conversations):
+                overflow = len(session.conversations) - self.max_conversations
+                dropped = session.conversations[:overflow]
+                del session.conversations[:overflow]
+                self.ap.media_store.release(_conversation_media(dropped))
+                self.trimmed_conversation_count += overflow
+
+            if self.conversation_store is not None:
+                session_key = store.get_session_key(session)
+                try:
+                    await self.conversation_store.save_conversation(
+                        session_key, store.get_conversation_id(conversation), conversation
+                    )
+                    for dropped_conversation in dropped:
+                        await self.conversation_store.delete_conversation(
+                            session_key, store.get_conversation_id(dropped_conversation)
+                        )
+                except Exception as e:
+                    self.ap.logger.error(f'Failed to save conversation of session {session_key}: {e}')
+
         return session.using_conversation
+
+    async def append_messages(
+        self,
+        session: provider_session.Session,
+        conversation: provider_session.Conversation,
+        messages: list[provider_message.Message],
+    ):
+        """向对话追加消息，超出上限时从最早的消息开始丢弃
+
+        启用了对话存储时，只有新追加的消息会被写入存储。
+        """
+        conversation.messages.extend(messages)
+        self.ap.media_store.acquire(media.media_uris(messages))
+        conversation.update_time = datetime.datetime.now()
+
+        trimmed = 0
+        if 0 <= self.max_messages < len(conversation.messages):
+            trimmed = len(conversation.messages) - self.max_messages
+
+            # 不要以孤立的 assistant/tool 消息开头，从之后的第一条 user 消息开始保留；
+            # 之后没有 user 消息时（例如一轮中有大量工具调用）保留最后一条 user 消息开始的整轮
+            user_indexes = [i for i, message in enumerate(conversation.messages) if message.role == 'user']
+            next_user = next((i for i in user_indexes if i >= trimmed), None)
+            if next_user is not None:
+                trimmed = next_user
+            elif user_indexes:
+                trimmed = user_indexes[-1]
+
+            self.ap.media_store.release(media.media_uris(conversation.messages[:trimmed]))
+            del conversation.messages[:trimmed]
+            self.trimmed_message_count += trimmed
+
+        if self.conversation_store is not None:
+            session_key = store.get_session_key(session)
+            conversation_id = store.get_conversation_id(conversation)
+            try:
+                await self.conversation_store.append_messages(session_key, conversation_id, conversation, messages)
+                if trimmed:
+                    await self.conversation_store.trim_messages(conversation_id, len(conversation.messages))
+            except Exception as e:
+                self.ap.logger.error(f'Failed to append messages to conversation of session {session_key}: {e}')
+
+    async def shutdown(self):
+        """关闭对话存储和租约存储的连接"""
+        if self.conversation_store is not None:
+            await self.conversation_store.close()
+        await self.lease_mgr.close()
+
+    def get_stats(self) -> dict:
+        """会话统计"""
+        return {
+            'live_session_count': self.live_session_count,
+            'evicted_session_count': self.evicted_session_count,
+            'trimmed_conversation_count': self.trimmed_conversation_count,
+            'trimmed_message_count': self.trimmed_message_count,
+        }
+
+
+def _conversation_media(conversations: list[provider_session.Conversation]) -> list[str]:
+    """对话历史中引用的媒体"""
+    return media.media_uris(message for conversation in conversations for message in conversation.messages)
+
+
+def _limit(value: int) -> int:
+    """配置中的上限，0 或负数表示不限制，统一为 -1"""
+    return value if value > 0 else -1
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import abc
+import json
+import typing
+import uuid
+
+from ...core import app
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.prompt as provider_prompt
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+preregistered_stores: list[typing.Type[ConversationStore]] = []
+
+
+def store_class(name: str):
+    """Register a conversation store class"""
+
+    def decorator(cls: typing.Type[ConversationStore]) -> typing.Type[ConversationStore]:
+        cls.name = name
+        preregistered_stores.append(cls)
+        return cls
+
+    return decorator
+
+
+def get_session_key(session: provider_session.Session) -> str:
+    """会话在存储中的键"""
+    return f'{session.launcher_type.value}_{session.launcher_id}'
+
+
+def get_conversation_id(conversation: provider_session.Conversation) -> str:
+    """对话在存储中的 ID，首次调用时生成
+
+    Conversation.uuid 由 Runner 用于绑定外部服务的会话，不能复用，因此单独保存在私有属性上。
+    """
+    conversation_id = getattr(conversation, '_store_id', None)
+    if conversation_id is None:
+        conversation_id = str(uuid.uuid4())
+        conversation._store_id = conversation_id
+    return conversation_id
+
+
+def dump_conversation_meta(conversation: provider_session.Conversation) -> dict:
+    """对话元数据（不含消息）"""
+    return {
+        'pipeline_uuid': conversation.pipeline_uuid,
+        'bot_uuid': conversation.bot_uuid,
+        'uuid': conversation.uuid,
+        'prompt': conversation.prompt.model_dump_json(),
+        'create_time': conversation.create_time.timestamp(),
+        'update_time': conversation.update_time.timestamp(),
+    }
+
+
+def load_conversation(
+    conversation_id: str, meta: dict, messages: list[provider_message.Message]
+) -> provider_session.Conversation:
+    """由元数据和消息还原对话"""
+    conversation = provider_session.Conversation(
+        prompt=provider_prompt.Prompt.model_validate_json(meta['prompt']),
+        messages=messages,
+        pipeline_uuid=meta['pipeline_uuid'],
+        bot_uuid=meta['bot_uuid'],
+        uuid=meta.get('uuid') or None,
+        create_time=float(meta['create_time']),
+        update_time=float(meta['update_time']),
+    )
+    conversation._store_id = conversation_id
+    return conversation
+
+
+def dump_message(message: provider_message.Message) -> str:
+    return message.model_dump_json()
+
+
+def load_message(data: typing.Union[str, bytes]) -> provider_message.Message:
+    return provider_message.Message.model_validate(json.loads(data))
+
+
+class ConversationStore(abc.ABC):
+    """对话持久化存储
+
+    对话元数据与消息分开保存：消息只追加写入，不会每次重新序列化整个历史。
+    会话首次被访问时才从存储中加载其对话。
+    """
+
+    name: str
+
+    ap: app.Application
+
+    def __init__(self, ap: app.Application):
+        self.ap = ap
+
+    async def initialize(self):
+        pass
+
+    @abc.abstractmethod
+    async def save_conversation(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+    ):
+        """新建或更新对话元数据"""
+        pass
+
+    @abc.abstractmethod
+    async def append_messages(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+        messages: list[provider_message.Message],
+    ):
+        """追加消息，并刷新对话元数据（更新时间、外部会话 uuid）"""
+        pass
+
+    @abc.abstractmethod
+    async def trim_messages(self, conversation_id: str, keep_last: int):
+        """只保留最后 keep_last 条消息"""
+        pass
+
+    @abc.abstractmethod
+    async def load_conversations(
+        self,
+        session_key: str,
+        max_conversations: int = -1,
+        max_messages: int = -1,
+    ) -> list[provider_session.Conversation]:
+        """加载会话的对话，按创建时间升序，-1 表示不限制"""
+        pass
+
+    @abc.abstractmethod
+    async def delete_conversation(self, session_key: str, conversation_id: str):
+        """删除对话及其消息"""
+        pass
+
+    async def close(self):
+        pass
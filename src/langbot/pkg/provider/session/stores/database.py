@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import sqlalchemy
+
+from .. import store
+from ....entity.persistence import conversation as persistence_conversation
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+@store.store_class('database')
+class DatabaseConversationStore(store.ConversationStore):
+    """保存在 LangBot 数据库中（SQLite / PostgreSQL）"""
+
+    async def _upsert_conversation(
+        self,
+        conn,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+    ):
+        meta = store.dump_conversation_meta(conversation)
+
+        result = await conn.execute(
+            sqlalchemy.update(persistence_conversation.Conversation)
+            .where(persistence_conversation.Conversation.id == conversation_id)
+            .values(meta)
+        )
+
+        if result.rowcount == 0:
+            await conn.execute(
+                sqlalchemy.insert(persistence_conversation.Conversation).values(
+                    id=conversation_id,
+                    session_key=session_key,
+                    **meta,
+                )
+            )
+
+    async def save_conversation(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+    ):
+        async with self.ap.persistence_mgr.get_db_engine().begin() as conn:
+            await self._upsert_conversation(conn, session_key, conversation_id, conversation)
+
+    async def append_messages(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+        messages: list[provider_message.Message],
+    ):
+        async with self.ap.persistence_mgr.get_db_engine().begin() as conn:
+            await self._upsert_conversation(conn, session_key, conversation_id, conversation)
+
+            if messages:
+                await conn.execute(
+                    sqlalchemy.insert(persistence_conversation.ConversationMessage),
+                    [
+                        {'conversation_id': conversation_id, 'content': store.dump_message(message)}
+                        for message in messages
+                    ],
+                )
+
+    async def trim_messages(self, conversation_id: str, keep_last: int):
+        message_table = persistence_conversation.ConversationMessage
+
+        async with self.ap.persistence_mgr.get_db_engine().begin() as conn:
+            # the newest message that falls out of the window, it and everything before it goes
+            result = await conn.execute(
+                sqlalchemy.select(message_table.id)
+                .where(message_table.conversation_id == conversation_id)
+                .order_by(message_table.id.desc())
+                .offset(keep_last)
+                .limit(1)
+            )
+            row = result.first()
+            if row is None:
+                return
+
+            await conn.execute(
+                sqlalchemy.delete(message_table)
+                .where(message_table.conversation_id == conversation_id)
+                .where(message_table.id <= row[0])
+            )
+
+    async def load_conversations(
+        self,
+        session_key: str,
+        max_conversations: int = -1,
+        max_messages: int = -1,
+    ) -> list[provider_session.Conversation]:
+        conversation_table = persistence_conversation.Conversation
+        message_table = persistence_conversation.ConversationMessage
+
+        query = (
+            sqlalchemy.select(conversation_table)
+            .where(conversation_table.session_key == session_key)
+            .order_by(conversation_table.create_time.desc())
+        )
+        if max_conversations >= 0:
+            query = query.limit(max_conversations)
+
+        conversations = []
+
+        async with self.ap.persistence_mgr.get_db_engine().connect() as conn:
+            rows = (await conn.execute(query)).all()
+
+            for row in reversed(rows):
+                message_query = (
+                    sqlalchemy.select(message_table.content)
+                    .where(message_table.conversation_id == row.id)
+                    .order_by(message_table.id.desc())
+                )
+                if max_messages >= 0:
+                    message_query = message_query.limit(max_messages)
+
+                message_rows = (await conn.execute(message_query)).all()
+
+                conversations.append(
+                    store.load_conversation(
+                        row.id,
+                        {
+                            'pipeline_uuid': row.pipeline_uuid,
+                            'bot_uuid': row.bot_uuid,
+                            'uuid': row.uuid,
+                            'prompt': row.prompt,
+                            'create_time': row.create_time,
+                            'update_time': row.update_time,
+                        },
+                        [store.load_message(message_row.content) for message_row in reversed(message_rows)],
+                    )
+                )
+
+        return conversations
+
+    async def delete_conversation(self, session_key: str, conversation_id: str):
+        async with self.ap.persistence_mgr.get_db_engine().begin() as conn:
+            await conn.execute(
+                sqlalchemy.delete(persistence_conversation.ConversationMessage).where(
+                    persistence_conversation.ConversationMessage.conversation_id == conversation_id
+                )
+            )
+            await conn.execute(
+                sqlalchemy.delete(persistence_conversation.Conversation).where(
+                    persistence_conversation.Conversation.id == conversation_id
+                )
+            )
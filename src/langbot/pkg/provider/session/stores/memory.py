@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from .. import store
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+@store.store_class('memory')
+class MemoryConversationStore(store.ConversationStore):
+    """进程内存储，数据以序列化形式保存，重启后丢失"""
+
+    session_conversations: dict[str, list[str]]
+    """session_key -> 对话 ID 列表"""
+
+    conversation_meta: dict[str, dict]
+
+    conversation_messages: dict[str, list[str]]
+
+    async def initialize(self):
+        self.session_conversations = {}
+        self.conversation_meta = {}
+        self.conversation_messages = {}
+
+    async def save_conversation(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+    ):
+        if conversation_id not in self.conversation_meta:
+            self.session_conversations.setdefault(session_key, []).append(conversation_id)
+            self.conversation_messages[conversation_id] = []
+        self.conversation_meta[conversation_id] = store.dump_conversation_meta(conversation)
+
+    async def append_messages(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+        messages: list[provider_message.Message],
+    ):
+        await self.save_conversation(session_key, conversation_id, conversation)
+        self.conversation_messages[conversation_id].extend(store.dump_message(message) for message in messages)
+
+    async def trim_messages(self, conversation_id: str, keep_last: int):
+        messages = self.conversation_messages.get(conversation_id)
+        if messages is not None and len(messages) > keep_last:
+            del messages[: len(messages) - keep_last]
+
+    async def load_conversations(
+        self,
+        session_key: str,
+        max_conversations: int = -1,
+        max_messages: int = -1,
+    ) -> list[provider_session.Conversation]:
+        conversation_ids = self.session_conversations.get(session_key, [])
+        if max_conversations >= 0:
+            conversation_ids = conversation_ids[len(conversation_ids) - max_conversations :]
+
+        conversations = []
+        for conversation_id in conversation_ids:
+            messages = self.conversation_messages[conversation_id]
+            if max_messages >= 0:
+                messages = messages[len(messages) - max_messages :] if max_messages else []
+            conversations.append(
+                store.load_conversation(
+                    conversation_id,
+                    self.conversation_meta[conversation_id],
+                    [store.load_message(message) for message in messages],
+                )
+            )
+        return conversations
+
+    async def delete_conversation(self, session_key: str, conversation_id: str):
+        conversation_ids = self.session_conversations.get(session_key)
+        if conversation_ids is not None and conversation_id in conversation_ids:
+            conversation_ids.remove(conversation_id)
+            if not conversation_ids:
+                del self.session_conversations[session_key]
+        self.conversation_meta.pop(conversation_id, None)
+        self.conversation_messages.pop(conversation_id, None)
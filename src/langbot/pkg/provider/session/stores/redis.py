@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from .. import store
+from ....utils import redisclient
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+@store.store_class('redis')
+class RedisConversationStore(store.ConversationStore):
+    """保存在 Redis 协议兼容的服务中，可被多个 LangBot 进程共享
+
+    键布局：
+        {prefix}:session:{session_key}       对话 ID 列表
+        {prefix}:conv:{conversation_id}      对话元数据 hash
+        {prefix}:msgs:{conversation_id}      消息 JSON 列表
+    """
+
+    client: redisclient.RedisClient
+
+    key_prefix: str
+
+    ttl: int
+    """键过期时间（秒），每次写入时刷新，<=0 为不过期"""
+
+    async def initialize(self):
+        redis_config = self.ap.instance_config.data.get('session', {}).get('store', {}).get('redis', {})
+        self.client = redisclient.RedisClient(
+            redis_config.get('url', 'redis://127.0.0.1:6379/0'),
+            timeout=redis_config.get('timeout', 5),
+        )
+        self.key_prefix = redis_config.get('key_prefix', 'langbot')
+        self.ttl = redis_config.get('ttl', 0)
+
+    def _session_key(self, session_key: str) -> str:
+        return f'{self.key_prefix}:session:{session_key}'
+
+    def _meta_key(self, conversation_id: str) -> str:
+        return f'{self.key_prefix}:conv:{conversation_id}'
+
+    def _messages_key(self, conversation_id: str) -> str:
+        return f'{self.key_prefix}:msgs:{conversation_id}'
+
+    def _meta_commands(
+        self, session_key: str, conversation_id: str, conversation: provider_session.Conversation
+    ) -> list[tuple]:
+        meta = store.dump_conversation_meta(conversation)
+        fields = []
+        for key, value in meta.items():
+            fields.extend([key, '' if value is None else value])
+
+        commands = [('HSET', self._meta_key(conversation_id), 'session_key', session_key, *fields)]
+
+        if self.ttl > 0:
+            commands.append(('EXPIRE', self._meta_key(conversation_id), self.ttl))
+            commands.append(('EXPIRE', self._session_key(session_key), self.ttl))
+
+        return commands
+
+    async def save_conversation(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+    ):
+        meta_key = self._meta_key(conversation_id)
+
+        exists = await self.client.execute('EXISTS', meta_key)
+
+        commands = self._meta_commands(session_key, conversation_id, conversation)
+        if not exists:
+            commands.insert(0, ('RPUSH', self._session_key(session_key), conversation_id))
+
+        await self.client.pipeline(commands)
+
+    async def append_messages(
+        self,
+        session_key: str,
+        conversation_id: str,
+        conversation: provider_session.Conversation,
+        messages: list[provider_message.Message],
+    ):
+        commands = self._meta_commands(session_key, conversation_id, conversation)
+
+        if messages:
+            messages_key = self._messages_key(conversation_id)
+            commands.append(('RPUSH', messages_key, *[store.dump_message(message) for message in messages]))
+            if self.ttl > 0:
+                commands.append(('EXPIRE', messages_key, self.ttl))
+
+        await self.client.pipeline(commands)
+
+    async def trim_messages(self, conversation_id: str, keep_last: int):
+        messages_key = self._messages_key(conversation_id)
+        if keep_last <= 0:
+            await self.client.execute('DEL', messages_key)
+        else:
+            await self.client.execute('LTRIM', messages_key, -keep_last, -1)
+
+    async def load_conversations(
+        self,
+        session_key: str,
+        max_conversations: int = -1,
+        max_messages: int = -1,
+    ) -> list[provider_session.Conversation]:
+        start = -max_conversations if max_conversations > 0 else 0
+        if max_conversations == 0:
+            return []
+
+        conversation_ids = [
+            conversation_id.decode('utf-8')
+            for conversation_id in await self.client.execute('LRANGE', self._session_key(session_key), start, -1)
+        ]
+        if not conversation_ids:
+            return []
+
+        message_start = -max_messages if max_messages > 0 else 0
+
+        commands = []
+        for conversation_id in conversation_ids:
+            commands.append(('HGETALL', self._meta_key(conversation_id)))
+            if max_messages == 0:
+                commands.append(('LRANGE', self._messages_key(conversation_id), 1, 0))
+            else:
+                commands.append(('LRANGE', self._messages_key(conversation_id), message_start, -1))
+
+        replies = await self.client.pipeline(commands)
+
+        conversations = []
+        for index, conversation_id in enumerate(conversation_ids):
+            raw_meta, raw_messages = replies[index * 2], replies[index * 2 + 1]
+            if not raw_meta:
+                # metadata expired, the id is stale
+                continue
+
+            meta = {raw_meta[i].decode('utf-8'): raw_meta[i + 1].decode('utf-8') for i in range(0, len(raw_meta), 2)}
+            conversations.append(
+                store.load_conversation(
+                    conversation_id,
+                    meta,
+                    [store.load_message(message) for message in raw_messages],
+                )
+            )
+
+        return conversations
+
+    async def delete_conversation(self, session_key: str, conversation_id: str):
+        await self.client.pipeline(
+            [
+                ('LREM', self._session_key(session_key), 0, conversation_id),
+                ('DEL', self._meta_key(conversation_id), self._messages_key(conversation_id)),
+            ]
+        )
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,100 @@
+"""流式输出的文本缓冲与刷新策略
+
+Runner 只输出增量文本（delta），由 StreamBuffer 以片段列表的形式保存，
+只有在确实需要完整文本时（不支持增量更新的适配器、写入对话历史）才拼接。
+何时向下游输出一个 chunk 由 FlushPolicy 按时间和字符数决定，而不是固定每 N 个 chunk。
+"""
+
+from __future__ import annotations
+
+import time
+import typing
+
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+
+
+class StreamBuffer:
+    """追加写入的文本缓冲区"""
+
+    def __init__(self, initial: str = ''):
+        self._parts: list[str] = [initial] if initial else []
+        self._length = len(initial)
+        self._delta_parts: list[str] = []
+        self._delta_length = 0
+
+    def append(self, text: typing.Optional[str]):
+        if not text:
+            return
+        self._parts.append(text)
+        self._length += len(text)
+        self._delta_parts.append(text)
+        self._delta_length += len(text)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def delta_length(self) -> int:
+        """自上次 take_delta 以来追加的字符数"""
+        return self._delta_length
+
+    def take_delta(self) -> str:
+        """取出自上次调用以来追加的文本"""
+        delta = ''.join(self._delta_parts)
+        self._delta_parts = []
+        self._delta_length = 0
+        return delta
+
+    def getvalue(self) -> str:
+        """完整文本，拼接结果会被缓存，下次只需拼接新增片段"""
+        if len(self._parts) > 1:
+            self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+
+class DeltaChunk(provider_message.MessageChunk):
+    """content 只包含自上个分片以来新增文本的消息块，支持增量更新的适配器据此累积完整文本"""
+
+
+class UsageChunk(provider_message.MessageChunk):
+    """提供商在流中返回本次调用用量时，请求器以此输出携带用量的分片"""
+
+    usage: dict[str, int]
+    """input_tokens 和 output_tokens"""
+
+
+class FlushPolicy:
+    """按时间和字符数决定何时输出 chunk
+
+    满足以下任一条件即刷新：
+        - 待输出字符数达到 max_chars
+        - 有待输出内容且距上次刷新超过 interval 秒
+    """
+
+    interval: float
+
+    max_chars: int
+
+    def __init__(self, interval: float = 0.2, max_chars: int = 256):
+        self.interval = interval
+        self.max_chars = max_chars
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_config(cls, instance_config: dict) -> FlushPolicy:
+        streaming_config = instance_config.get('streaming', {})
+        return cls(
+            interval=streaming_config.get('flush_interval', 0.2),
+            max_chars=streaming_config.get('flush_chars', 256),
+        )
+
+    def should_flush(self, pending_chars: int, now: typing.Optional[float] = None) -> bool:
+        if pending_chars <= 0:
+            return False
+        if pending_chars >= self.max_chars:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - self._last_flush >= self.interval
+
+    def mark_flushed(self, now: typing.Optional[float] = None):
+        self._last_flush = time.monotonic() if now is None else now
@@ -36,6 +36,15 @@ class ToolLoader(abc.ABC):
     async def initialize(self):
         pass
 
+    @property
+    def version(self) -> typing.Hashable:
+        """工具列表的版本号，变化时 ToolManager 会重建索引和缓存"""
+        return 0
+
+    def invalidate(self):
+        """丢弃加载器自身缓存的工具列表"""
+        pass
+
     @abc.abstractmethod
     async def get_tools(self, bound_plugins: list[str] | None = None) -> list[resource_tool.LLMTool]:
         """获取所有工具"""
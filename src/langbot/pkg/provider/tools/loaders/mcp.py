@@ -45,6 +45,9 @@ class RuntimeMCPSession:
 
     functions: list[resource_tool.LLMTool] = []
 
+    tools_version: int = 0
+    """工具列表每次变化时递增"""
+
     enable: bool
 
     # connected: bool
@@ -157,7 +160,8 @@ class RuntimeMCPSession:
             try:
                 if self.exit_stack:
                     await self.exit_stack.aclose()
-                self.functions.clear()
+                self.functions = []
+                self.tools_version += 1
                 self.session = None
             except Exception as e:
                 self.ap.logger.error(f'Error cleaning up MCP session {self.server_name}: {e}\n{traceback.format_exc()}')
@@ -184,7 +188,7 @@ class RuntimeMCPSession:
         if not self.session:
             return
 
-        self.functions.clear()
+        functions = []
 
         tools = await self.session.list_tools()
 
@@ -218,7 +222,7 @@ class RuntimeMCPSession:
 
             func.__name__ = tool.name
 
-            self.functions.append(
+            functions.append(
                 resource_tool.LLMTool(
                     name=tool.name,
                     human_desc=tool.description or '',
@@ -228,6 +232,9 @@ class RuntimeMCPSession:
                 )
             )
 
+        self.functions = functions
+        self.tools_version += 1
+
     def get_tools(self) -> list[resource_tool.LLMTool]:
         return self.functions
 
@@ -281,11 +288,21 @@ class MCPLoader(loader.ToolLoader):
 
     _hosted_mcp_tasks: list[asyncio.Task]
 
+    _sessions_version: int
+    """会话增删时递增"""
+
+    _tool_index: dict[str, resource_tool.LLMTool]
+
+    _tool_index_version: tuple[int, int] | None
+
     def __init__(self, ap: app.Application):
         super().__init__(ap)
         self.sessions = {}
         self._last_listed_functions = []
         self._hosted_mcp_tasks = []
+        self._sessions_version = 0
+        self._tool_index = {}
+        self._tool_index_version = None
 
     async def initialize(self):
         await self.load_mcp_servers_from_db()
@@ -294,6 +311,7 @@ class MCPLoader(loader.ToolLoader):
         self.ap.logger.info('Loading MCP servers from db...')
 
         self.sessions = {}
+        self._sessions_version += 1
 
         result = await self.ap.persistence_mgr.execute_async(sqlalchemy.select(persistence_mcp.MCPServer))
         servers = result.all()
@@ -309,6 +327,7 @@ class MCPLoader(loader.ToolLoader):
         try:
             session = await self.load_mcp_server(server_config)
             self.sessions[server_config['name']] = session
+            self._sessions_version += 1
         except Exception as e:
             self.ap.logger.error(
                 f'Failed to load MCP server from db: {server_config["name"]}({server_config["uuid"]}): {e}\n{traceback.format_exc()}'
@@ -376,29 +395,44 @@ class MCPLoader(loader.ToolLoader):
 
         return all_functions
 
+    @property
+    def version(self) -> tuple[int, int]:
+        """会话集合与各会话工具列表的版本号，变化时说明工具列表可能已变化
+
+        各会话的 tools_version 只增不减，在会话集合不变时其和可以唯一标识当前状态。
+        """
+        return (self._sessions_version, sum(session.tools_version for session in self.sessions.values()))
+
+    def _get_tool_index(self) -> dict[str, resource_tool.LLMTool]:
+        """工具名到工具的索引，仅在版本变化时重建"""
+        version = self.version
+        if self._tool_index_version != version:
+            tool_index = {}
+            for session in self.sessions.values():
+                for function in session.get_tools():
+                    tool_index.setdefault(function.name, function)
+            self._tool_index = tool_index
+            self._tool_index_version = version
+        return self._tool_index
+
     async def has_tool(self, name: str) -> bool:
         """检查工具是否存在"""
-        for session in self.sessions.values():
-            for function in session.get_tools():
-                if function.name == name:
-                    return True
-        return False
+        return name in self._get_tool_index()
 
     async def invoke_tool(self, name: str, parameters: dict, query: pipeline_query.Query) -> typing.Any:
         """执行工具调用"""
-        for session in self.sessions.values():
-            for function in session.get_tools():
-                if function.name == name:
-                    self.ap.logger.debug(f'Invoking MCP tool: {name} with parameters: {parameters}')
-                    try:
-                        result = await function.func(**parameters)
-                        self.ap.logger.debug(f'MCP tool {name} executed successfully')
-                        return result
-                    except Exception as e:
-                        self.ap.logger.error(f'Error invoking MCP tool {name}: {e}\n{traceback.format_exc()}')
-                        raise
+        function = self._get_tool_index().get(name)
+        if function is None:
+            raise ValueError(f'Tool not found: {name}')
 
-        raise ValueError(f'Tool not found: {name}')
+        self.ap.logger.debug(f'Invoking MCP tool: {name} with parameters: {parameters}')
+        try:
+            result = await function.func(**parameters)
+            self.ap.logger.debug(f'MCP tool {name} executed successfully')
+            return result
+        except Exception as e:
+            self.ap.logger.error(f'Error invoking MCP tool {name}: {e}\n{traceback.format_exc()}')
+            raise
 
     async def remove_mcp_server(self, server_name: str):
         """移除 MCP 服务器"""
@@ -407,6 +441,7 @@ class MCPLoader(loader.ToolLoader):
             return
 
         session = self.sessions.pop(server_name)
+        self._sessions_version += 1
         await session.shutdown()
         self.ap.logger.info(f'Removed MCP server: {server_name}')
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 import typing
 import traceback
 
@@ -14,9 +15,47 @@ class PluginToolLoader(loader.ToolLoader):
     """插件工具加载器。
 
     本加载器中不存储工具信息，仅负责从插件系统中获取工具信息。
+    获取到的工具列表按绑定的插件集合缓存，插件安装、更新、删除或修改配置后失效；
+    调试插件会直接连接到插件运行时，因此缓存另有 ttl 兜底。
     """
 
+    _tools_cache: dict[tuple[str, ...] | None, tuple[float, list[resource_tool.LLMTool]]]
+
+    _cached_plugins_version: int
+
+    cache_ttl: float
+    """缓存的最长有效时间（秒），<=0 为不缓存"""
+
+    def __init__(self, ap):
+        super().__init__(ap)
+        self._tools_cache = {}
+        self._cached_plugins_version = -1
+        self.cache_ttl = 60
+
+    async def initialize(self):
+        self.cache_ttl = self.ap.instance_config.data.get('plugin', {}).get('tool_list_cache_ttl', 60)
+
+    @property
+    def version(self) -> int:
+        """插件集合的版本号，变化时说明工具列表可能已变化"""
+        return self.ap.plugin_connector.plugins_version
+
+    def invalidate(self):
+        """丢弃缓存的工具列表"""
+        self._tools_cache.clear()
+
     async def get_tools(self, bound_plugins: list[str] | None = None) -> list[resource_tool.LLMTool]:
+        if self._cached_plugins_version != self.version:
+            self._tools_cache.clear()
+            self._cached_plugins_version = self.version
+
+        cache_key = tuple(sorted(bound_plugins)) if bound_plugins is not None else None
+        now = time.monotonic()
+
+        cached = self._tools_cache.get(cache_key)
+        if cached is not None and now - cached[0] < self.cache_ttl:
+            return cached[1]
+
         # 从插件系统获取工具（内容函数）
         all_functions: list[resource_tool.LLMTool] = []
 
@@ -30,21 +69,18 @@ class PluginToolLoader(loader.ToolLoader):
             )
             all_functions.append(tool_obj)
 
+        if self.cache_ttl > 0:
+            self._tools_cache[cache_key] = (now, all_functions)
+
         return all_functions
 
     async def has_tool(self, name: str) -> bool:
         """检查工具是否存在"""
-        for tool in await self.ap.plugin_connector.list_tools():
-            if tool.metadata.name == name:
+        for tool in await self.get_tools():
+            if tool.name == name:
                 return True
         return False
 
-    async def _get_tool(self, name: str) -> resource_tool.LLMTool:
-        for tool in await self.ap.plugin_connector.list_tools():
-            if tool.metadata.name == name:
-                return tool
-        return None
-
     async def invoke_tool(self, name: str, parameters: dict, query: pipeline_query.Query) -> typing.Any:
         try:
             return await self.ap.plugin_connector.call_tool(
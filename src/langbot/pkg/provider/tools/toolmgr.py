@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import time
 import typing
+import collections
 
 from ...core import app
 from langbot.pkg.utils import importutil
-from langbot.pkg.provider.tools import loaders
+from langbot.pkg.provider.tools import loader, loaders
 from langbot.pkg.provider.tools.loaders import mcp as mcp_loader, plugin as plugin_loader
 import langbot_plugin.api.entities.builtin.resource.tool as resource_tool
 from langbot_plugin.api.entities.events import pipeline_query
@@ -12,16 +14,45 @@ from langbot_plugin.api.entities.events import pipeline_query
 importutil.import_modules_in_pkg(loaders)
 
 
+ToolsKey = tuple[tuple[str, ...] | None, tuple[str, ...] | None]
+"""工具绑定集合：(绑定的插件, 绑定的 MCP 服务器)，None 表示不限制"""
+
+
 class ToolManager:
-    """LLM工具管理器"""
+    """LLM工具管理器
+
+    工具名索引、按绑定集合过滤后的工具列表和生成的 schema 都按加载器的版本号缓存，
+    在 MCP 会话刷新或插件变动后重建。调试插件等变动不会改变版本号，
+    因此缓存还会在插件工具列表的 ttl 到期后重建，ttl<=0 时不缓存。
+    """
 
     ap: app.Application
 
     plugin_tool_loader: plugin_loader.PluginToolLoader
     mcp_tool_loader: mcp_loader.MCPLoader
 
+    _cache_version: tuple | None
+
+    _cached_at: float
+    """缓存建立的时间（monotonic）"""
+
+    _tool_index: dict[str, tuple[loader.ToolLoader, resource_tool.LLMTool]] | None
+    """工具名 -> (加载器, 工具)"""
+
+    _bound_tools_cache: dict[ToolsKey, list[resource_tool.LLMTool]]
+
+    _schema_cache: collections.OrderedDict[tuple, tuple[tuple[resource_tool.LLMTool, ...], list]]
+    """(格式, 工具 id 序列) -> (工具, schema)，同时持有工具对象保证 id 不被复用"""
+
+    schema_cache_size: int = 128
+
     def __init__(self, ap: app.Application):
         self.ap = ap
+        self._cache_version = None
+        self._cached_at = 0
+        self._tool_index = None
+        self._bound_tools_cache = {}
+        self._schema_cache = collections.OrderedDict()
 
     async def initialize(self):
         self.plugin_tool_loader = plugin_loader.PluginToolLoader(self.ap)
@@ -29,19 +60,93 @@ class ToolManager:
         self.mcp_tool_loader = mcp_loader.MCPLoader(self.ap)
         await self.mcp_tool_loader.initialize()
 
+    @property
+    def version(self) -> tuple:
+        """所有加载器的版本号"""
+        return (self.plugin_tool_loader.version, self.mcp_tool_loader.version)
+
+    def _check_version(self):
+        """版本变化或插件工具列表的 ttl 到期时丢弃所有缓存"""
+        version = self.version
+        now = time.monotonic()
+        if self._cache_version != version or now - self._cached_at >= self.plugin_tool_loader.cache_ttl:
+            self._tool_index = None
+            self._bound_tools_cache.clear()
+            self._schema_cache.clear()
+            self._cache_version = version
+            self._cached_at = now
+
+    async def _get_tool_index(self) -> dict[str, tuple[loader.ToolLoader, resource_tool.LLMTool]]:
+        self._check_version()
+
+        if self._tool_index is None:
+            tool_index = {}
+            # 同名工具以插件工具优先
+            for tool_loader in (self.plugin_tool_loader, self.mcp_tool_loader):
+                for tool in await tool_loader.get_tools(None):
+                    tool_index.setdefault(tool.name, (tool_loader, tool))
+            self._tool_index = tool_index
+
+        return self._tool_index
+
+    def invalidate(self):
+        """丢弃所有缓存，下次访问时重建"""
+        self.plugin_tool_loader.invalidate()
+        self._cache_version = None
+        self._check_version()
+
     async def get_all_tools(
         self, bound_plugins: list[str] | None = None, bound_mcp_servers: list[str] | None = None
     ) -> list[resource_tool.LLMTool]:
-        """获取所有函数"""
-        all_functions: list[resource_tool.LLMTool] = []
+        """获取所有函数
+
+        返回的列表会被缓存并在多个请求间共享，调用方不应修改。
+        """
+        self._check_version()
+
+        key: ToolsKey = (
+            tuple(sorted(bound_plugins)) if bound_plugins is not None else None,
+            tuple(sorted(bound_mcp_servers)) if bound_mcp_servers is not None else None,
+        )
+
+        all_functions = self._bound_tools_cache.get(key)
+        if all_functions is None:
+            all_functions = []
 
-        all_functions.extend(await self.plugin_tool_loader.get_tools(bound_plugins))
-        all_functions.extend(await self.mcp_tool_loader.get_tools(bound_mcp_servers))
+            all_functions.extend(await self.plugin_tool_loader.get_tools(bound_plugins))
+            all_functions.extend(await self.mcp_tool_loader.get_tools(bound_mcp_servers))
+
+            # 加载器在请求期间可能已刷新，只缓存与当前版本一致的结果
+            if self._cache_version == self.version:
+                self._bound_tools_cache[key] = all_functions
 
         return all_functions
 
+    def _get_cached_schema(self, schema_key: tuple) -> list | None:
+        self._check_version()
+
+        cached = self._schema_cache.get(schema_key)
+        if cached is None:
+            return None
+
+        self._schema_cache.move_to_end(schema_key)
+        return cached[1]
+
+    def _set_cached_schema(self, schema_key: tuple, use_funcs: list[resource_tool.LLMTool], tools: list):
+        self._schema_cache[schema_key] = (tuple(use_funcs), tools)
+        while len(self._schema_cache) > self.schema_cache_size:
+            self._schema_cache.popitem(last=False)
+
     async def generate_tools_for_openai(self, use_funcs: list[resource_tool.LLMTool]) -> list:
-        """生成函数列表"""
+        """生成函数列表
+
+        结果按工具列表缓存，调用方不应修改。
+        """
+        schema_key = ('openai', *map(id, use_funcs))
+        cached = self._get_cached_schema(schema_key)
+        if cached is not None:
+            return cached
+
         tools = []
 
         for function in use_funcs:
@@ -55,6 +160,8 @@ class ToolManager:
             }
             tools.append(function_schema)
 
+        self._set_cached_schema(schema_key, use_funcs, tools)
+
         return tools
 
     async def generate_tools_for_anthropic(self, use_funcs: list[resource_tool.LLMTool]) -> list:
@@ -78,7 +185,13 @@ class ToolManager:
             }
           }
         ]
+
+        结果按工具列表缓存，调用方不应修改。
         """
+        schema_key = ('anthropic', *map(id, use_funcs))
+        cached = self._get_cached_schema(schema_key)
+        if cached is not None:
+            return cached
 
         tools = []
 
@@ -90,18 +203,26 @@ class ToolManager:
             }
             tools.append(function_schema)
 
+        self._set_cached_schema(schema_key, use_funcs, tools)
+
         return tools
 
     async def execute_func_call(self, name: str, parameters: dict, query: pipeline_query.Query) -> typing.Any:
         """执行函数调用"""
 
-        if await self.plugin_tool_loader.has_tool(name):
-            return await self.plugin_tool_loader.invoke_tool(name, parameters, query)
-        elif await self.mcp_tool_loader.has_tool(name):
-            return await self.mcp_tool_loader.invoke_tool(name, parameters, query)
-        else:
+        entry = (await self._get_tool_index()).get(name)
+
+        if entry is None:
+            # 调试插件可能在缓存有效期内接入，重新拉取一次
+            self.invalidate()
+            entry = (await self._get_tool_index()).get(name)
+
+        if entry is None:
             raise ValueError(f'未找到工具: {name}')
 
+        tool_loader, _ = entry
+        return await tool_loader.invoke_tool(name, parameters, query)
+
     async def shutdown(self):
         """关闭所有工具"""
         await self.plugin_tool_loader.shutdown()
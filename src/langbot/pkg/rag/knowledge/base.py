@@ -49,6 +49,10 @@ class KnowledgeBaseInterface(metaclass=abc.ABCMeta):
         """Get the type of knowledge base (internal/external)"""
         pass
 
+    def higher_is_better(self) -> bool | None:
+        """Whether a larger entry distance ranks higher, None when only the order of the results is meaningful"""
+        return None
+
     @abc.abstractmethod
     async def dispose(self):
         """Clean up resources"""
@@ -0,0 +1,278 @@
+"""Content-addressed embedding cache
+
+Embeddings are keyed by (embedding model uuid, sha256 of the model name and the normalized
+text), so re-uploading a document, re-indexing a knowledge base or asking the same question
+again does not call the embedding model a second time. Recently used vectors are kept in an
+in-memory LRU as float32 arrays, every vector is also appended to an on-disk store read through
+mmap; the appends of one embedding request are written together from a worker thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import glob
+import hashlib
+import os
+import re
+import threading
+import typing
+import unicodedata
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    from langbot.pkg.core import app
+    from langbot.pkg.provider.modelmgr.requester import RuntimeEmbeddingModel
+
+
+DIGEST_SIZE = 32
+
+DTYPES = {'float32': np.float32, 'float16': np.float16}
+
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """NFC, trimmed, runs of whitespace collapsed to one space"""
+    return _whitespace.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def text_digest(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f'{model_name}\0{normalize_text(text)}'.encode('utf-8')).digest()
+
+
+class EmbeddingStore:
+    """Vectors of one embedding model in two append-only files
+
+    {name}.vec  one row of dim values of dtype per vector
+    {name}.idx  the 32-byte digest of each row, in the same order
+
+    A write interrupted half way leaves the longer file with a partial row, it is cut back
+    when the store is opened again. Writes may come from worker threads, they hold the write lock.
+    """
+
+    def __init__(self, path_prefix: str, dim: int, dtype: str):
+        self.vec_path = path_prefix + '.vec'
+        self.idx_path = path_prefix + '.idx'
+        self.dim = dim
+        self.dtype = DTYPES[dtype]
+        self.row_size = dim * np.dtype(self.dtype).itemsize
+
+        self.rows: dict[bytes, int] = {}
+        self._map: np.memmap | None = None
+        self._write_lock = threading.Lock()
+
+        rows = 0
+        if os.path.exists(self.vec_path) and os.path.exists(self.idx_path):
+            rows = min(os.path.getsize(self.vec_path) // self.row_size, os.path.getsize(self.idx_path) // DIGEST_SIZE)
+            with open(self.idx_path, 'rb') as f:
+                index = f.read(rows * DIGEST_SIZE)
+            for row in range(rows):
+                self.rows[index[row * DIGEST_SIZE : (row + 1) * DIGEST_SIZE]] = row
+
+        self._vec_file = open(self.vec_path, 'ab')
+        self._idx_file = open(self.idx_path, 'ab')
+        self._vec_file.truncate(rows * self.row_size)
+        self._idx_file.truncate(rows * DIGEST_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, digest: bytes) -> np.ndarray | None:
+        row = self.rows.get(digest)
+        if row is None:
+            return None
+        if self._map is None or row >= self._map.shape[0]:
+            # rows appended since the file was mapped
+            self._map = np.memmap(self.vec_path, dtype=self.dtype, mode='r', shape=(len(self.rows), self.dim))
+        return self._map[row].astype(np.float32)
+
+    def put_many(self, digests: list[bytes], vectors: list[np.ndarray]):
+        """Append the vectors not stored yet, in one write and flush per file"""
+        with self._write_lock:
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self.rows and digest not in new:
+                    new[digest] = vector
+            if not new:
+                return
+            self._vec_file.write(np.asarray(list(new.values()), dtype=self.dtype).tobytes())
+            self._vec_file.flush()
+            self._idx_file.write(b''.join(new))
+            self._idx_file.flush()
+            # rows become visible once both files hold them
+            for digest in new:
+                self.rows[digest] = len(self.rows)
+
+    def close(self):
+        self._map = None
+        self._vec_file.close()
+        self._idx_file.close()
+
+
+class EmbeddingCache:
+    """Embedding cache shared by document ingestion and retrieval"""
+
+    enabled: bool
+
+    memory_entries: int
+    """Vectors kept in the in-memory LRU"""
+
+    path: str | None
+    """Directory of the on-disk stores, None for a memory-only cache"""
+
+    dtype: str
+    """Storage type of the on-disk vectors, float32 or float16"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        memory_entries: int = 10000,
+        path: str | None = None,
+        dtype: str = 'float32',
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f'Unsupported embedding cache dtype: {dtype}')
+
+        self.enabled = enabled
+        self.memory_entries = memory_entries
+        self.path = path or None
+        self.dtype = dtype
+
+        self._memory: collections.OrderedDict[tuple[str, bytes], np.ndarray] = collections.OrderedDict()
+        self._stores: dict[str, EmbeddingStore | None] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, ap: app.Application) -> EmbeddingCache:
+        cache_config = ap.instance_config.data.get('rag', {}).get('embedding_cache', {})
+        return cls(
+            enabled=cache_config.get('enable', True),
+            memory_entries=cache_config.get('memory_entries', 10000),
+            path=cache_config.get('path', './data/embedding_cache'),
+            dtype=cache_config.get('dtype', 'float32'),
+        )
+
+    def _store_prefix(self, model_uuid: str, dim: int | str) -> str:
+        return os.path.join(self.path, f'{model_uuid}-{dim}-{self.dtype}')
+
+    def _get_store(self, model_uuid: str, dim: int | None = None) -> EmbeddingStore | None:
+        """The on-disk store of a model, opened on first use; a vector of another dim starts a new store"""
+        if self.path is None:
+            return None
+
+        store = self._stores.get(model_uuid)
+        if store is not None and (dim is None or store.dim == dim):
+            return store
+
+        if dim is None:
+            if model_uuid in self._stores:
+                return None
+            # the most recently written store of this model, if any
+            existing = sorted(glob.glob(self._store_prefix(model_uuid, '*') + '.vec'), key=os.path.getmtime)
+            if not existing:
+                self._stores[model_uuid] = None
+                return None
+            dim = int(existing[-1][: -len(f'-{self.dtype}.vec')].rsplit('-', 1)[1])
+
+        os.makedirs(self.path, exist_ok=True)
+        if store is not None:
+            store.close()
+        store = EmbeddingStore(self._store_prefix(model_uuid, dim), dim, self.dtype)
+        self._stores[model_uuid] = store
+        return store
+
+    def get(self, model_uuid: str, digest: bytes) -> np.ndarray | None:
+        key = (model_uuid, digest)
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+
+        store = self._get_store(model_uuid)
+        vector = store.get(digest) if store is not None else None
+        if vector is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, vector)
+        return vector
+
+    async def put_many(self, model_uuid: str, digests: list[bytes], vectors: list[np.ndarray]):
+        for digest, vector in zip(digests, vectors):
+            self._remember((model_uuid, digest), vector)
+        store = self._get_store(model_uuid, len(vectors[0])) if vectors else None
+        if store is not None:
+            await asyncio.to_thread(store.put_many, digests, vectors)
+
+    def _remember(self, key: tuple[str, bytes], vector: np.ndarray):
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def embed(
+        self,
+        embedding_model: RuntimeEmbeddingModel,
+        texts: list[str],
+        **invoke_kwargs,
+    ) -> list[list[float]]:
+        """Embeddings of texts, only the texts not in the cache are sent to the model
+
+        invoke_kwargs are passed to RuntimeProvider.invoke_embedding.
+        """
+        if not self.enabled:
+            return await embedding_model.provider.invoke_embedding(
+                model=embedding_model, input_text=texts, **invoke_kwargs
+            )
+
+        model_uuid = embedding_model.model_entity.uuid
+        digests = [text_digest(embedding_model.model_entity.name, text) for text in texts]
+
+        found: dict[bytes, np.ndarray] = {}
+        missing: dict[bytes, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest in found or digest in missing:
+                continue
+            vector = self.get(model_uuid, digest)
+            if vector is None:
+                missing[digest] = text
+            else:
+                found[digest] = vector
+
+        if missing:
+            vectors = await embedding_model.provider.invoke_embedding(
+                model=embedding_model, input_text=list(missing.values()), **invoke_kwargs
+            )
+            vectors = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+            await self.put_many(model_uuid, list(missing), vectors)
+            found.update(zip(missing, vectors))
+
+        # float32 values whether they come from the cache or the model
+        return [found[digest].tolist() for digest in digests]
+
+    def get_stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'memory_entries': len(self._memory),
+            'disk_entries': sum(len(store) for store in self._stores.values() if store is not None),
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0,
+        }
+
+    def close(self):
+        for store in self._stores.values():
+            if store is not None:
+                store.close()
+        self._stores.clear()
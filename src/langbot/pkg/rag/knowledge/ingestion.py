@@ -0,0 +1,265 @@
+"""Streaming document ingestion
+
+A file moves through parse -> chunk -> embed -> store in batches. The stages run concurrently
+and are connected by bounded queues, so a large file is never held in memory as a whole and
+the first chunks are searchable while the rest of the file is still being parsed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing
+
+from langbot.pkg.provider.modelmgr import errors as model_errors
+from .services.embedder import content_hash
+
+if typing.TYPE_CHECKING:
+    from langbot.pkg.core import app, taskmgr
+    from langbot.pkg.entity.persistence import rag as persistence_rag
+    from .kbmgr import RuntimeKnowledgeBase
+    from .services.parser import Section
+
+
+_DONE = None
+"""Put on a queue by a stage once it has no more items"""
+
+
+def is_rate_limited(error: Exception) -> bool:
+    if isinstance(error, model_errors.RequesterRateLimitError):
+        return True
+    response = getattr(error, 'response', None)
+    return 429 in (getattr(error, 'status_code', None), getattr(response, 'status_code', None))
+
+
+async def _drain(queue: asyncio.Queue) -> typing.AsyncIterator:
+    while (item := await queue.get()) is not _DONE:
+        yield item
+
+
+class AdaptiveBatchSize:
+    """Embedding batch size shared by the embedding workers of one file
+
+    Halved whenever the provider rate limits a request and grown back by an eighth of the
+    maximum after every request that succeeds.
+    """
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.size = maximum
+
+    def shrink(self):
+        self.size = max(1, self.size // 2)
+
+    def grow(self):
+        self.size = min(self.maximum, self.size + max(1, self.maximum // 8))
+
+
+class IngestionPipeline:
+    """Parses, chunks, embeds and stores one file of an internal knowledge base"""
+
+    ap: app.Application
+
+    kb: RuntimeKnowledgeBase
+
+    file: persistence_rag.File
+
+    task_context: taskmgr.TaskContext
+
+    queue_size: int
+    """Items each queue between two stages holds before the producing stage waits"""
+
+    batch_size: int
+    """Chunks per embedding request, lowered while the provider answers with 429"""
+
+    embedding_concurrency: int
+    """Embedding requests in flight at a time"""
+
+    existing: dict[str, list[str]]
+    """Content hash -> ids of chunks of the file already stored, such chunks are kept instead of
+    embedded again; the ids left over after run() belong to chunks the file no longer has"""
+
+    def __init__(
+        self,
+        kb: RuntimeKnowledgeBase,
+        file: persistence_rag.File,
+        task_context: taskmgr.TaskContext,
+        queue_size: int = 4,
+        batch_size: int = 64,
+        embedding_concurrency: int = 4,
+        pages_per_section: int = 20,
+        section_chars: int = 20000,
+        max_retries: int = 5,
+        retry_delay: float = 1.0,
+        existing: dict[str, list[str]] | None = None,
+    ):
+        self.ap = kb.ap
+        self.kb = kb
+        self.file = file
+        self.task_context = task_context
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.embedding_concurrency = max(1, embedding_concurrency)
+        self.pages_per_section = pages_per_section
+        self.section_chars = section_chars
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.existing = existing if existing is not None else {}
+
+        self.adaptive_batch_size = AdaptiveBatchSize(batch_size)
+        self.embedding_model = None
+        self.parsed: Section | None = None
+        self.chunks_total = 0
+        self.chunks_stored = 0
+        self.kept_chunk_ids: list[str] = []
+        self.stored_chunk_ids: list[str] = []
+
+    @classmethod
+    def from_config(
+        cls,
+        kb: RuntimeKnowledgeBase,
+        file: persistence_rag.File,
+        task_context: taskmgr.TaskContext,
+        existing: dict[str, list[str]] | None = None,
+    ) -> IngestionPipeline:
+        ingestion_config = kb.ap.instance_config.data.get('rag', {}).get('ingestion', {})
+        return cls(
+            kb,
+            file,
+            task_context,
+            queue_size=ingestion_config.get('queue_size', 4),
+            batch_size=ingestion_config.get('batch_size', 64),
+            embedding_concurrency=ingestion_config.get('embedding_concurrency', 4),
+            pages_per_section=ingestion_config.get('pages_per_section', 20),
+            section_chars=ingestion_config.get('section_chars', 20000),
+            max_retries=ingestion_config.get('max_retries', 5),
+            retry_delay=ingestion_config.get('retry_delay', 1.0),
+            existing=existing,
+        )
+
+    def _report(self):
+        parsed = self.parsed
+        if parsed is None:
+            return
+        done = self.chunks_stored + len(self.kept_chunk_ids)
+
+        if parsed.position < parsed.total:
+            # estimated from the share of the file parsed so far
+            total = max(self.chunks_total, round(self.chunks_total * parsed.total / max(parsed.position, 1)))
+            action = f'Ingesting: parsed {parsed.position}/{parsed.total} {parsed.unit}, stored {done} chunks'
+        else:
+            total = self.chunks_total
+            action = f'Ingesting: stored {done}/{self.chunks_total} chunks'
+
+        self.task_context.set_current_action(action)
+        self.task_context.set_progress(done, total, 'chunks')
+
+    async def _parse(self, sections: asyncio.Queue):
+        async for section in self.kb.parser.iter_sections(
+            self.file.file_name, self.file.extension, self.pages_per_section, self.section_chars
+        ):
+            self.parsed = section
+            if section.text.strip():
+                await sections.put(section.text)
+            self._report()
+        await sections.put(_DONE)
+
+    async def _chunk(self, sections: asyncio.Queue, batches: asyncio.Queue):
+        pending: list[str] = []
+        async for chunks in self.kb.chunker.chunk_sections(_drain(sections)):
+            self.chunks_total += len(chunks)
+            for chunk in chunks:
+                kept = self.existing.get(content_hash(chunk))
+                if kept:
+                    self.kept_chunk_ids.append(kept.pop())
+                else:
+                    pending.append(chunk)
+            while len(pending) >= self.batch_size:
+                await batches.put(pending[: self.batch_size])
+                pending = pending[self.batch_size :]
+
+        if pending:
+            await batches.put(pending)
+        if not self.chunks_total:
+            raise Exception(f'No text extracted from file {self.file.file_name}')
+
+        for _ in range(self.embedding_concurrency):
+            await batches.put(_DONE)
+
+    async def _embed_batch(self, chunks: list[str]) -> list[list[float]]:
+        """Embed chunks in requests of the current adaptive size, retrying rate limited requests"""
+        embeddings: list[list[float]] = []
+        retries = 0
+
+        while len(embeddings) < len(chunks):
+            request = chunks[len(embeddings) : len(embeddings) + self.adaptive_batch_size.size]
+            try:
+                embeddings.extend(await self.kb.embedder.embed(self.kb.get_uuid(), request, self.embedding_model))
+            except Exception as e:
+                if not is_rate_limited(e) or retries >= self.max_retries:
+                    raise
+                retries += 1
+                self.adaptive_batch_size.shrink()
+                self.ap.logger.warning(
+                    f'Embedding rate limited while ingesting {self.file.file_name}, '
+                    f'retrying with batch size {self.adaptive_batch_size.size} ({retries}/{self.max_retries})'
+                )
+                await asyncio.sleep(self.retry_delay * 2 ** (retries - 1))
+                continue
+
+            retries = 0
+            self.adaptive_batch_size.grow()
+
+        return embeddings
+
+    async def _embed(self, batches: asyncio.Queue, embedded: asyncio.Queue):
+        async for chunks in _drain(batches):
+            await embedded.put((chunks, await self._embed_batch(chunks)))
+        await embedded.put(_DONE)
+
+    async def _store(self, embedded: asyncio.Queue):
+        running = self.embedding_concurrency
+        while running:
+            item = await embedded.get()
+            if item is _DONE:
+                running -= 1
+                continue
+
+            chunks, embeddings = item
+            chunk_entities = await self.kb.embedder.store(self.kb.get_uuid(), self.file.uuid, chunks, embeddings)
+            await self.kb.lexical_index.add_chunks(chunk_entities)
+            self.stored_chunk_ids.extend(chunk.uuid for chunk in chunk_entities)
+            self.chunks_stored += len(chunks)
+            self._report()
+
+    async def run(self) -> int:
+        """Ingest the file, returns the number of chunks embedded and stored
+
+        The first error of any stage cancels the others and is raised, chunks stored before
+        it stay in the knowledge base for the caller to clean up.
+        """
+        self.embedding_model = await self.kb.get_embedding_model()
+
+        sections: asyncio.Queue = asyncio.Queue(self.queue_size)
+        batches: asyncio.Queue = asyncio.Queue(self.queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        tasks = [
+            asyncio.create_task(self._parse(sections)),
+            asyncio.create_task(self._chunk(sections, batches)),
+            *[asyncio.create_task(self._embed(batches, embedded)) for _ in range(self.embedding_concurrency)],
+            asyncio.create_task(self._store(embedded)),
+        ]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        self.ap.logger.info(
+            f'Successfully saved {self.chunks_stored} embeddings of {self.file.file_name}'
+            + (f', kept {len(self.kept_chunk_ids)} unchanged chunks.' if self.kept_chunk_ids else '.')
+        )
+        return self.chunks_stored
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import traceback
 import uuid
 import zipfile
@@ -13,6 +14,14 @@ from langbot.pkg.core import taskmgr
 from langbot_plugin.api.entities.builtin.rag import context as rag_context
 from .base import KnowledgeBaseInterface
 from .external import ExternalKnowledgeBase
+from .retrieval import RankedList, RetrievalOrchestrator, fuse_rrf
+from .embedding_cache import EmbeddingCache
+from .ingestion import IngestionPipeline
+from .services.parse_worker import ParsePool
+from .lexical import LexicalIndex
+
+
+RETRIEVAL_MODES = ('vector', 'hybrid', 'lexical')
 
 
 class RuntimeKnowledgeBase(KnowledgeBaseInterface):
@@ -28,6 +37,8 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
 
     retriever: Retriever
 
+    lexical_index: LexicalIndex
+
     def __init__(self, ap: app.Application, knowledge_base_entity: persistence_rag.KnowledgeBase):
         super().__init__(ap)
         self.knowledge_base_entity = knowledge_base_entity
@@ -37,6 +48,7 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
         self.retriever = Retriever(ap=self.ap)
         # 传递kb_id给retriever
         self.retriever.kb_id = knowledge_base_entity.uuid
+        self.lexical_index = LexicalIndex(ap, knowledge_base_entity.uuid)
 
     async def initialize(self):
         pass
@@ -51,29 +63,8 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
             )
 
             task_context.set_current_action('Parsing file')
-            # parse file
-            text = await self.parser.parse(file.file_name, file.extension)
-            if not text:
-                raise Exception(f'No text extracted from file {file.file_name}')
-
-            task_context.set_current_action('Chunking file')
-            # chunk file
-            chunks_texts = await self.chunker.chunk(text)
-            if not chunks_texts:
-                raise Exception(f'No chunks extracted from file {file.file_name}')
-
-            task_context.set_current_action('Embedding chunks')
-
-            embedding_model = await self.ap.model_mgr.get_embedding_model_by_uuid(
-                self.knowledge_base_entity.embedding_model_uuid
-            )
-            # embed chunks
-            await self.embedder.embed_and_store(
-                kb_id=self.knowledge_base_entity.uuid,
-                file_id=file.uuid,
-                chunks=chunks_texts,
-                embedding_model=embedding_model,
-            )
+            # parse, chunk, embed and store the file section by section
+            await IngestionPipeline.from_config(self, file, task_context).run()
 
             # set file status to completed
             await self.ap.persistence_mgr.execute_async(
@@ -81,10 +72,13 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
                 .where(persistence_rag.File.uuid == file.uuid)
                 .values(status='completed')
             )
+            self.content_changed()
 
         except Exception as e:
             self.ap.logger.error(f'Error storing file {file.uuid}: {e}')
             traceback.print_exc()
+            # drop the chunks stored before the error
+            await self._delete_chunks(file.uuid)
             # set file status to failed
             await self.ap.persistence_mgr.execute_async(
                 sqlalchemy.update(persistence_rag.File)
@@ -134,6 +128,154 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
         )
         return wrapper.id
 
+    async def _reindex_file_task(
+        self, file: persistence_rag.File, new_file: persistence_rag.File, task_context: taskmgr.TaskContext
+    ):
+        try:
+            result = await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.select(persistence_rag.Chunk.uuid, persistence_rag.Chunk.content_hash).where(
+                    persistence_rag.Chunk.file_id == file.uuid
+                )
+            )
+            existing: dict[str, list[str]] = {}
+            for chunk_uuid, chunk_hash in result.all():
+                existing.setdefault(chunk_hash, []).append(chunk_uuid)
+            old_count = sum(len(chunk_ids) for chunk_ids in existing.values())
+
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.update(persistence_rag.File)
+                .where(persistence_rag.File.uuid == file.uuid)
+                .values(status='processing')
+            )
+
+            task_context.set_current_action('Parsing file')
+            # only chunks whose hash is not among the old ones are embedded and stored
+            pipeline = IngestionPipeline.from_config(self, new_file, task_context, existing=existing)
+            try:
+                await pipeline.run()
+            except Exception:
+                # the old version stays complete
+                await self._delete_chunk_ids(pipeline.stored_chunk_ids)
+                await self.ap.persistence_mgr.execute_async(
+                    sqlalchemy.update(persistence_rag.File)
+                    .where(persistence_rag.File.uuid == file.uuid)
+                    .values(status=file.status)
+                )
+                raise
+
+            removed = [chunk_uuid for chunk_ids in existing.values() for chunk_uuid in chunk_ids]
+            await self._delete_chunk_ids(removed)
+
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.update(persistence_rag.File)
+                .where(persistence_rag.File.uuid == file.uuid)
+                .values(file_name=new_file.file_name, extension=new_file.extension, status='completed')
+            )
+            self.content_changed()
+
+            report = (
+                f'Re-indexed {file.uuid}: {old_count} chunks before, kept {len(pipeline.kept_chunk_ids)}, '
+                f'embedded {pipeline.chunks_stored}, removed {len(removed)}'
+            )
+            task_context.set_current_action(report)
+            self.ap.logger.info(report)
+
+        except Exception as e:
+            self.ap.logger.error(f'Error re-indexing file {file.uuid}: {e}')
+            traceback.print_exc()
+            raise
+        finally:
+            # delete file from storage
+            await self.ap.storage_mgr.storage_provider.delete(new_file.file_name)
+
+    async def reindex_file(self, file_id: str, new_file_id: str) -> str:
+        """Replace the content of a file with a new version of it
+
+        Chunks of the new version already stored for the old one are kept, only the others are
+        embedded, and chunks the new version no longer has are deleted.
+
+        Args:
+            file_id: UUID of the file in this knowledge base
+            new_file_id: The new version, in storage
+        """
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.select(persistence_rag.File).where(
+                persistence_rag.File.uuid == file_id, persistence_rag.File.kb_id == self.knowledge_base_entity.uuid
+            )
+        )
+        row = result.first()
+        if row is None:
+            raise Exception(f'File {file_id} not found in knowledge base')
+        file = persistence_rag.File(**row._mapping)
+
+        if file.status in ('pending', 'processing'):
+            raise Exception(f'File {file_id} is still being processed')
+        if not await self.ap.storage_mgr.storage_provider.exists(new_file_id):
+            raise Exception(f'File {new_file_id} not found')
+
+        extension = new_file_id.split('.')[-1].lower()
+        if extension == 'zip':
+            raise Exception('A file can not be re-indexed from a ZIP archive')
+        new_file = persistence_rag.File(
+            uuid=file.uuid, kb_id=file.kb_id, file_name=new_file_id, extension=extension, status='processing'
+        )
+
+        ctx = taskmgr.TaskContext.new()
+        wrapper = self.ap.task_mgr.create_user_task(
+            self._reindex_file_task(file, new_file, task_context=ctx),
+            kind='knowledge-operation',
+            name=f'knowledge-reindex-file-{file_id}',
+            label=f'Re-index file {file.file_name} with {new_file_id}',
+            context=ctx,
+        )
+        return wrapper.id
+
+    async def get_dedup_report(self, limit: int = 20) -> dict:
+        """How many chunks of this knowledge base repeat a text stored elsewhere in it
+
+        Returns:
+            total_chunks, unique_chunks, duplicate_chunks, and the most repeated texts
+            as {content_hash, count, files, preview}
+        """
+        Chunk, File = persistence_rag.Chunk, persistence_rag.File
+        kb_chunks = (
+            sqlalchemy.select(Chunk.content_hash, Chunk.file_id, Chunk.text)
+            .join(File, File.uuid == Chunk.file_id)
+            .where(File.kb_id == self.knowledge_base_entity.uuid)
+            .subquery()
+        )
+
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.select(
+                sqlalchemy.func.count(), sqlalchemy.func.count(sqlalchemy.distinct(kb_chunks.c.content_hash))
+            )
+        )
+        total_chunks, unique_chunks = result.first()
+
+        count = sqlalchemy.func.count().label('count')
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.select(
+                kb_chunks.c.content_hash,
+                count,
+                sqlalchemy.func.count(sqlalchemy.distinct(kb_chunks.c.file_id)),
+                sqlalchemy.func.min(kb_chunks.c.text),
+            )
+            .group_by(kb_chunks.c.content_hash)
+            .having(count > 1)
+            .order_by(count.desc())
+            .limit(limit)
+        )
+
+        return {
+            'total_chunks': total_chunks,
+            'unique_chunks': unique_chunks,
+            'duplicate_chunks': total_chunks - unique_chunks,
+            'duplicates': [
+                {'content_hash': content_hash, 'count': chunk_count, 'files': files, 'preview': (text or '')[:100]}
+                for content_hash, chunk_count, files, text in result.all()
+            ],
+        }
+
     async def _store_zip_file(self, zip_file_id: str) -> str:
         """Handle ZIP file by extracting each document and storing them separately."""
         self.ap.logger.info(f'Processing ZIP file: {zip_file_id}')
@@ -189,24 +331,72 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
 
         return stored_file_tasks[0] if stored_file_tasks else ''
 
+    async def get_embedding_model(self):
+        return await self.ap.model_mgr.get_embedding_model_by_uuid(self.knowledge_base_entity.embedding_model_uuid)
+
+    @property
+    def retrieval_mode(self) -> str:
+        """vector, hybrid (vector and BM25 ranks fused) or lexical (BM25 only, the query is not embedded)"""
+        mode = self.knowledge_base_entity.retrieval_mode
+        return mode if mode in RETRIEVAL_MODES else 'vector'
+
     async def retrieve(self, query: str, top_k: int) -> list[rag_context.RetrievalResultEntry]:
-        embedding_model = await self.ap.model_mgr.get_embedding_model_by_uuid(
-            self.knowledge_base_entity.embedding_model_uuid
+        query_embedding = None
+        if self.retrieval_mode != 'lexical':
+            embedding_model = await self.get_embedding_model()
+            query_embedding = await self.retriever.embed_query(self.knowledge_base_entity.uuid, query, embedding_model)
+        return await self.search(query, query_embedding, top_k)
+
+    async def search(
+        self, query: str, query_embedding: list[float] | None, top_k: int
+    ) -> list[rag_context.RetrievalResultEntry]:
+        """Retrieve with a query already embedded by this knowledge base's embedding model, None in lexical mode"""
+        kb_id = self.knowledge_base_entity.uuid
+        if self.retrieval_mode == 'lexical':
+            return await self.lexical_index.search(query, top_k)
+        if self.retrieval_mode == 'vector':
+            return await self.retriever.search(kb_id, query_embedding, top_k)
+
+        vector_results, lexical_results = await asyncio.gather(
+            self.retriever.search(kb_id, query_embedding, top_k),
+            self.lexical_index.search(query, top_k),
         )
-        return await self.retriever.retrieve(self.knowledge_base_entity.uuid, query, embedding_model, top_k)
+        return fuse_rrf([RankedList(kb_id, vector_results), RankedList(kb_id, lexical_results)])[:top_k]
 
-    async def delete_file(self, file_id: str):
+    async def _delete_chunks(self, file_id: str):
         # delete vector
         await self.ap.vector_db_mgr.vector_db.delete_by_file_id(self.knowledge_base_entity.uuid, file_id)
+        await self.lexical_index.remove_file(file_id)
 
         # delete chunk
         await self.ap.persistence_mgr.execute_async(
             sqlalchemy.delete(persistence_rag.Chunk).where(persistence_rag.Chunk.file_id == file_id)
         )
 
+    async def _delete_chunk_ids(self, chunk_ids: list[str]):
+        if not chunk_ids:
+            return
+        await self.ap.vector_db_mgr.vector_db.delete_by_ids(self.knowledge_base_entity.uuid, chunk_ids)
+        await self.lexical_index.remove_chunks(chunk_ids)
+
+        for start in range(0, len(chunk_ids), 500):
+            await self.ap.persistence_mgr.execute_async(
+                sqlalchemy.delete(persistence_rag.Chunk).where(
+                    persistence_rag.Chunk.uuid.in_(chunk_ids[start : start + 500])
+                )
+            )
+
+    async def delete_file(self, file_id: str):
+        await self._delete_chunks(file_id)
+
         await self.ap.persistence_mgr.execute_async(
             sqlalchemy.delete(persistence_rag.File).where(persistence_rag.File.uuid == file_id)
         )
+        self.content_changed()
+
+    def content_changed(self):
+        """Drop the cached answers built on the previous content of this knowledge base"""
+        self.ap.pipeline_mgr.response_cache.invalidate_kb(self.knowledge_base_entity.uuid)
 
     def get_uuid(self) -> str:
         """Get the UUID of the knowledge base"""
@@ -220,6 +410,14 @@ class RuntimeKnowledgeBase(KnowledgeBaseInterface):
         """Get the type of knowledge base"""
         return 'internal'
 
+    def higher_is_better(self) -> bool | None:
+        if self.retrieval_mode == 'lexical':
+            return False
+        if self.retrieval_mode == 'vector':
+            return self.ap.vector_db_mgr.vector_db.higher_is_better
+        # hybrid results mix vector distances and BM25 distances
+        return None
+
     async def dispose(self):
         await self.ap.vector_db_mgr.vector_db.delete_collection(self.knowledge_base_entity.uuid)
 
@@ -229,13 +427,27 @@ class RAGManager:
 
     knowledge_bases: list[KnowledgeBaseInterface]
 
+    retrieval: RetrievalOrchestrator
+
+    embedding_cache: EmbeddingCache
+
+    parse_pool: ParsePool
+
     def __init__(self, ap: app.Application):
         self.ap = ap
         self.knowledge_bases = []
+        self.retrieval = RetrievalOrchestrator(ap)
+        self.embedding_cache = EmbeddingCache.from_config(ap)
+        self.parse_pool = ParsePool.from_config(ap)
 
     async def initialize(self):
         await self.load_knowledge_bases_from_db()
 
+    def shutdown(self):
+        """Stop the parser workers and close the on-disk embedding cache"""
+        self.parse_pool.shutdown()
+        self.embedding_cache.close()
+
     async def load_knowledge_bases_from_db(self):
         self.ap.logger.info('Loading knowledge bases from db...')
 
@@ -324,13 +536,34 @@ class RAGManager:
                 return kb
         return None
 
+    async def retrieve(
+        self,
+        kb_uuids: list[str],
+        query: str,
+        top_k: int = 0,
+        fusion: str = 'rrf',
+        timeout: float = 0,
+    ) -> list[rag_context.RetrievalResultEntry]:
+        """Retrieve from several knowledge bases concurrently and fuse the results, unknown uuids are skipped"""
+        kbs = []
+        for kb_uuid in kb_uuids:
+            kb = await self.get_knowledge_base_by_uuid(kb_uuid)
+            if not kb:
+                self.ap.logger.warning(f'Knowledge base {kb_uuid} not found, skipping')
+                continue
+            kbs.append(kb)
+
+        return await self.retrieval.retrieve(kbs, query, top_k=top_k, fusion=fusion, timeout=timeout)
+
     async def remove_knowledge_base_from_runtime(self, kb_uuid: str):
+        self.ap.pipeline_mgr.response_cache.invalidate_kb(kb_uuid)
         for kb in self.knowledge_bases:
             if kb.get_uuid() == kb_uuid:
                 self.knowledge_bases.remove(kb)
                 return
 
     async def delete_knowledge_base(self, kb_uuid: str):
+        self.ap.pipeline_mgr.response_cache.invalidate_kb(kb_uuid)
         for kb in self.knowledge_bases:
             if kb.get_uuid() == kb_uuid:
                 await kb.dispose()
@@ -0,0 +1,205 @@
+"""Lexical retrieval with an inverted BM25 index over chunk texts
+
+Text is NFKC-normalized and lower-cased. Words of space-separated scripts become tokens, and
+codes such as ``ERR-1042`` or ``v2.3.1`` are kept whole besides their parts. Runs of CJK
+characters, which have no spaces between words, are split into overlapping bigrams.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import math
+import re
+import typing
+import unicodedata
+from collections import Counter
+
+import sqlalchemy
+
+from langbot.pkg.entity.persistence import rag as persistence_rag
+from langbot_plugin.api.entities.builtin.provider.message import ContentElement
+from langbot_plugin.api.entities.builtin.rag import context as rag_context
+
+if typing.TYPE_CHECKING:
+    from langbot.pkg.core import app
+
+
+# kana, CJK ideographs (extension A, unified, compatibility) and hangul
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+
+_TOKEN_RE = re.compile(rf'(?P<cjk>[{_CJK}]+)|(?P<word>[^\W_{_CJK}]+(?:[-_./:#][^\W_{_CJK}]+)*)')
+_PART_RE = re.compile(rf'[^\W_{_CJK}]+')
+
+
+def tokenize(text: str) -> list[str]:
+    """Terms of a text, in order, with repetitions"""
+    tokens: list[str] = []
+    for match in _TOKEN_RE.finditer(unicodedata.normalize('NFKC', text).lower()):
+        run = match.group('cjk')
+        if run:
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+            continue
+        word = match.group('word')
+        tokens.append(word)
+        parts = _PART_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index of chunk texts scored with Okapi BM25"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self.postings: dict[str, dict[str, int]] = {}
+        """term -> chunk id -> term frequency"""
+
+        self.lengths: dict[str, int] = {}
+        """chunk id -> number of terms"""
+
+        self.chunks: dict[str, tuple[str, str]] = {}
+        """chunk id -> (file id, text)"""
+
+        self.file_chunks: dict[str, list[str]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, chunk_id: str, file_id: str, text: str):
+        if chunk_id in self.chunks:
+            return
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+        length = sum(terms.values())
+        self.lengths[chunk_id] = length
+        self.total_length += length
+        self.chunks[chunk_id] = (file_id, text)
+        self.file_chunks.setdefault(file_id, []).append(chunk_id)
+
+    def remove_file(self, file_id: str) -> int:
+        return self.remove_chunks(list(self.file_chunks.get(file_id, [])))
+
+    def remove_chunks(self, chunk_ids: list[str]) -> int:
+        removed = 0
+        for chunk_id in chunk_ids:
+            if chunk_id not in self.chunks:
+                continue
+            file_id, text = self.chunks.pop(chunk_id)
+            file_chunks = self.file_chunks[file_id]
+            file_chunks.remove(chunk_id)
+            if not file_chunks:
+                del self.file_chunks[file_id]
+            for term in set(tokenize(text)):
+                postings = self.postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self.postings[term]
+            self.total_length -= self.lengths.pop(chunk_id)
+            removed += 1
+        return removed
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """(chunk id, score) of the k best chunks, best first"""
+        if not self.chunks or k <= 0:
+            return []
+
+        count = len(self.chunks)
+        average_length = self.total_length / count or 1
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class LexicalIndex:
+    """BM25 index of one knowledge base
+
+    Built from the chunks table on the first search, then kept up to date as files are added
+    and removed. Updates made before the first search are skipped, the build reads them.
+    Searches and updates run in a worker thread, one at a time under the lock.
+    """
+
+    ap: app.Application
+
+    def __init__(self, ap: app.Application, kb_id: str):
+        self.ap = ap
+        self.kb_id = kb_id
+        self.index: BM25Index | None = None
+        self._lock = asyncio.Lock()
+
+    async def _build(self) -> BM25Index:
+        """Build the index from the chunks table, with the lock held"""
+        result = await self.ap.persistence_mgr.execute_async(
+            sqlalchemy.select(persistence_rag.Chunk.uuid, persistence_rag.Chunk.file_id, persistence_rag.Chunk.text)
+            .join(persistence_rag.File, persistence_rag.File.uuid == persistence_rag.Chunk.file_id)
+            .where(persistence_rag.File.kb_id == self.kb_id)
+        )
+        rows = result.all()
+
+        def build() -> BM25Index:
+            index = BM25Index()
+            for chunk_id, file_id, text in rows:
+                index.add(chunk_id, file_id, text or '')
+            return index
+
+        self.index = await asyncio.to_thread(build)
+        self.ap.logger.info(f'Built lexical index of knowledge base {self.kb_id} over {len(self.index)} chunks')
+        return self.index
+
+    async def add_chunks(self, chunks: list[persistence_rag.Chunk]):
+        rows = [(chunk.uuid, chunk.file_id, chunk.text or '') for chunk in chunks]
+
+        def add(index: BM25Index):
+            for chunk_id, file_id, text in rows:
+                index.add(chunk_id, file_id, text)
+
+        async with self._lock:
+            if self.index is not None:
+                await asyncio.to_thread(add, self.index)
+
+    async def remove_file(self, file_id: str):
+        async with self._lock:
+            if self.index is not None:
+                await asyncio.to_thread(self.index.remove_file, file_id)
+
+    async def remove_chunks(self, chunk_ids: list[str]):
+        async with self._lock:
+            if self.index is not None:
+                await asyncio.to_thread(self.index.remove_chunks, chunk_ids)
+
+    async def search(self, query: str, k: int) -> list[rag_context.RetrievalResultEntry]:
+        """The k best chunks, with distance 1 / (1 + score) so that smaller is better as in vector results"""
+
+        def search(index: BM25Index) -> list[rag_context.RetrievalResultEntry]:
+            results = []
+            for chunk_id, score in index.search(query, k):
+                file_id, text = index.chunks[chunk_id]
+                results.append(
+                    rag_context.RetrievalResultEntry(
+                        id=chunk_id,
+                        content=[ContentElement.from_text(text)],
+                        metadata={'uuid': chunk_id, 'file_id': file_id, 'text': text},
+                        distance=1 / (1 + score),
+                    )
+                )
+            return results
+
+        async with self._lock:
+            index = self.index if self.index is not None else await self._build()
+            return await asyncio.to_thread(search, index)
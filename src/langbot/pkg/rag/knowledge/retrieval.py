@@ -0,0 +1,192 @@
+"""Retrieval across several knowledge bases
+
+The query is embedded once per embedding model (knowledge bases in lexical mode do not
+need it), every knowledge base is searched
+concurrently with its own timeout, and the ranked lists are fused into one list.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import typing
+
+from langbot.pkg.core import app
+from langbot_plugin.api.entities.builtin.rag import context as rag_context
+from .base import KnowledgeBaseInterface
+
+if typing.TYPE_CHECKING:
+    from .kbmgr import RuntimeKnowledgeBase
+
+
+FUSION_STRATEGIES = ('rrf', 'normalize', 'concat')
+
+RRF_K = 60
+"""Rank constant of reciprocal rank fusion"""
+
+EXTERNAL_TOP_K = 5
+"""External knowledge bases manage top_k in their plugin config"""
+
+
+def source_top_k(kb: KnowledgeBaseInterface) -> int:
+    if kb.get_type() == 'internal':
+        return kb.knowledge_base_entity.top_k
+    return EXTERNAL_TOP_K
+
+
+@dataclasses.dataclass
+class RankedList:
+    """The results of one knowledge base, best first"""
+
+    source: str
+    """Knowledge base uuid, entries are merged by id only within the same source"""
+
+    entries: list[rag_context.RetrievalResultEntry]
+
+    higher_is_better: bool | None = False
+    """Whether a larger entry distance ranks higher, None when only the ranks are comparable"""
+
+
+def fuse_rrf(ranked_lists: list[RankedList]) -> list[rag_context.RetrievalResultEntry]:
+    """Reciprocal rank fusion, an entry scores sum(1 / (RRF_K + rank)) over the lists containing it"""
+    scores: dict[tuple[str, str], float] = {}
+    entries: dict[tuple[str, str], rag_context.RetrievalResultEntry] = {}
+
+    for ranked in ranked_lists:
+        for rank, entry in enumerate(ranked.entries, start=1):
+            key = (ranked.source, entry.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            entries.setdefault(key, entry)
+
+    return [entries[key] for key in sorted(scores, key=lambda key: scores[key], reverse=True)]
+
+
+def _normalized_scores(ranked: RankedList) -> list[float]:
+    """Scores in [0, 1] of the entries of one list, 1 for the best"""
+    if ranked.higher_is_better is None:
+        last = len(ranked.entries) - 1
+        return [1.0 - rank / last if last > 0 else 1.0 for rank in range(len(ranked.entries))]
+
+    distances = [entry.distance for entry in ranked.entries]
+    lowest = min(distances)
+    highest = max(distances)
+    span = highest - lowest
+    if span <= 0:
+        return [1.0] * len(distances)
+    if ranked.higher_is_better:
+        return [(distance - lowest) / span for distance in distances]
+    return [(highest - distance) / span for distance in distances]
+
+
+def fuse_normalized(ranked_lists: list[RankedList]) -> list[rag_context.RetrievalResultEntry]:
+    """Min-max normalize the distances of each list into [0, 1] scores and keep the best score per entry"""
+    scores: dict[tuple[str, str], float] = {}
+    entries: dict[tuple[str, str], rag_context.RetrievalResultEntry] = {}
+
+    for ranked in ranked_lists:
+        if not ranked.entries:
+            continue
+        for entry, score in zip(ranked.entries, _normalized_scores(ranked)):
+            key = (ranked.source, entry.id)
+            if score > scores.get(key, -1.0):
+                scores[key] = score
+                entries[key] = entry
+
+    return [entries[key] for key in sorted(scores, key=lambda key: scores[key], reverse=True)]
+
+
+def fuse_concat(ranked_lists: list[RankedList]) -> list[rag_context.RetrievalResultEntry]:
+    """The lists one after another, in knowledge base order"""
+    return [entry for ranked in ranked_lists for entry in ranked.entries]
+
+
+FUSERS: dict[str, typing.Callable[[list[RankedList]], list[rag_context.RetrievalResultEntry]]] = {
+    'rrf': fuse_rrf,
+    'normalize': fuse_normalized,
+    'concat': fuse_concat,
+}
+
+
+class RetrievalOrchestrator:
+    """Fans a query out to several knowledge bases and fuses the results"""
+
+    ap: app.Application
+
+    def __init__(self, ap: app.Application):
+        self.ap = ap
+
+    async def _embed(self, kb: RuntimeKnowledgeBase, query: str) -> list[float]:
+        embedding_model = await kb.get_embedding_model()
+        return await kb.retriever.embed_query(kb.get_uuid(), query, embedding_model)
+
+    async def _retrieve_one(
+        self,
+        kb: KnowledgeBaseInterface,
+        query: str,
+        embeddings: dict[str, asyncio.Task],
+        timeout: float,
+    ) -> list[rag_context.RetrievalResultEntry]:
+        async def retrieve():
+            if kb.get_type() != 'internal':
+                return await kb.retrieve(query, source_top_k(kb))
+            query_embedding = None
+            if kb.retrieval_mode != 'lexical':
+                # the embedding is shared by the knowledge bases of one model, a timeout here must not cancel it
+                query_embedding = await asyncio.shield(embeddings[kb.knowledge_base_entity.embedding_model_uuid])
+            return await kb.search(query, query_embedding, source_top_k(kb))
+
+        try:
+            if timeout > 0:
+                return await asyncio.wait_for(retrieve(), timeout)
+            return await retrieve()
+        except asyncio.TimeoutError:
+            self.ap.logger.warning(f'Retrieval from knowledge base {kb.get_uuid()} timed out after {timeout}s')
+        except Exception as e:
+            self.ap.logger.warning(f'Retrieval from knowledge base {kb.get_uuid()} failed: {e}')
+        return []
+
+    async def retrieve(
+        self,
+        kbs: list[KnowledgeBaseInterface],
+        query: str,
+        top_k: int = 0,
+        fusion: str = 'rrf',
+        timeout: float = 0,
+    ) -> list[rag_context.RetrievalResultEntry]:
+        """Retrieve from all kbs concurrently
+
+        Args:
+            kbs: Knowledge bases to search, each returns its own top_k
+            query: The query string
+            top_k: Entries kept after fusion, <=0 keeps all of them
+            fusion: One of FUSION_STRATEGIES
+            timeout: Seconds each knowledge base may take, <=0 means no limit;
+                a knowledge base that fails or times out contributes nothing
+        """
+        if fusion not in FUSERS:
+            raise ValueError(f'Unknown fusion strategy: {fusion}')
+        if not kbs:
+            return []
+
+        # one embedding per model, started before the searches that wait for it
+        embeddings: dict[str, asyncio.Task] = {}
+        for kb in kbs:
+            if kb.get_type() == 'internal' and kb.retrieval_mode != 'lexical':
+                model_uuid = kb.knowledge_base_entity.embedding_model_uuid
+                if model_uuid not in embeddings:
+                    embeddings[model_uuid] = asyncio.create_task(self._embed(kb, query))
+
+        try:
+            ranked_lists = await asyncio.gather(*[self._retrieve_one(kb, query, embeddings, timeout) for kb in kbs])
+        finally:
+            for task in embeddings.values():
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # retrieved by the waiting searches, or nobody is left to log it
+                    task.exception()
+
+        results = FUSERS[fusion](
+            [RankedList(kb.get_uuid(), ranked, kb.higher_is_better()) for kb, ranked in zip(kbs, ranked_lists)]
+        )
+        return results[:top_k] if top_k > 0 else results
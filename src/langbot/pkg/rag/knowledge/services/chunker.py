@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import json
-from typing import List
+from typing import AsyncIterator, List
 from langbot.pkg.rag.knowledge.services import base_service
 from langbot.pkg.core import app
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -47,3 +47,19 @@ class Chunker(base_service.BaseService):
         self.ap.logger.info(f'Text chunked into {len(chunks)} pieces.')
         self.ap.logger.debug(f'Chunks: {json.dumps(chunks, indent=4, ensure_ascii=False)}')
         return chunks
+
+    async def chunk_sections(self, sections: AsyncIterator[str]) -> AsyncIterator[List[str]]:
+        """
+        Chunks a text arriving in sections, yielding the chunks of each section.
+        The last chunk of a section is held back and split again together with the next
+        section, so a chunk is not cut short just because a section ends.
+        """
+        carry = ''
+        async for section in sections:
+            text = carry + '\n' + section if carry else section
+            chunks = await self._run_sync(self._split_text_sync, text)
+            carry = chunks.pop() if chunks else ''
+            if chunks:
+                yield chunks
+        if carry:
+            yield [carry]
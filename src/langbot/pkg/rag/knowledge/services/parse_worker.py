@@ -0,0 +1,358 @@
+"""Document parsers run outside the event loop process
+
+Every parser is a plain function of the file bytes (or, for PDF, a file path) so it can be
+sent to a worker process. ParsePool runs them in a process pool, or in threads when the
+process backend is disabled, with a per-file time limit and, where the platform supports
+it, a per-file CPU limit. A file parsed in several calls shares one ParseBudget.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import io
+import multiprocessing
+import re
+import os
+import signal
+import time
+import typing
+from concurrent.futures.process import BrokenProcessPool
+
+import chardet
+import markdown
+import PyPDF2
+from bs4 import BeautifulSoup
+from docx import Document
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if typing.TYPE_CHECKING:
+    from langbot.pkg.core import app
+
+
+class ParseLimitExceeded(Exception):
+    """Parsing a file took more time or CPU than allowed"""
+
+
+# --- Parsers, run in the worker ---
+
+
+def decode_text(data: bytes, sample_size: int = 65536) -> str:
+    """Decode bytes of unknown encoding, the encoding is detected on the first sample_size bytes only"""
+    detected = chardet.detect(data[:sample_size] if sample_size > 0 else data)
+    encoding = detected['encoding'] or 'utf-8'
+    return data.decode(encoding, errors='ignore')
+
+
+def parse_txt(data: bytes, sample_size: int = 65536) -> str:
+    return decode_text(data, sample_size)
+
+
+def parse_pdf(data: bytes) -> str:
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    text_content = []
+    for page in pdf_reader.pages:
+        text = page.extract_text()
+        if text:
+            text_content.append(text)
+    return '\n'.join(text_content)
+
+
+_pdf_readers: dict[tuple, PyPDF2.PdfReader] = {}
+"""Readers of the PDFs this worker parsed last, a file read section by section is opened once per worker"""
+
+PDF_READERS_KEPT = 2
+
+
+def _open_pdf(path: str) -> PyPDF2.PdfReader:
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    pdf_reader = _pdf_readers.pop(key, None)
+    if pdf_reader is None:
+        pdf_reader = PyPDF2.PdfReader(path)
+    _pdf_readers[key] = pdf_reader
+    while len(_pdf_readers) > PDF_READERS_KEPT:
+        del _pdf_readers[next(iter(_pdf_readers))]
+    return pdf_reader
+
+
+def count_pdf_pages(path: str) -> int:
+    return len(_open_pdf(path).pages)
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> str:
+    """Text of pages [start, end) of the PDF at path"""
+    pdf_reader = _open_pdf(path)
+    texts = [pdf_reader.pages[i].extract_text() for i in range(start, end)]
+    return '\n'.join(text for text in texts if text)
+
+
+def parse_docx(data: bytes) -> str:
+    doc = Document(io.BytesIO(data))
+    text_content = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
+    return '\n'.join(text_content)
+
+
+def extract_table_to_markdown(table_element: BeautifulSoup) -> str:
+    """Convert a BeautifulSoup table element into a Markdown table string"""
+    headers = [th.get_text().strip() for th in table_element.find_all('th')]
+    rows = []
+    for tr in table_element.find_all('tr'):
+        cells = [td.get_text().strip() for td in tr.find_all('td')]
+        if cells:
+            rows.append(cells)
+
+    if not headers and not rows:
+        return ''
+
+    table_lines = []
+    if headers:
+        table_lines.append(' | '.join(headers))
+        table_lines.append(' | '.join(['---'] * len(headers)))
+
+    for row_cells in rows:
+        padded_cells = row_cells + [''] * (len(headers) - len(row_cells)) if headers else row_cells
+        table_lines.append(' | '.join(padded_cells))
+
+    return '\n'.join(table_lines)
+
+
+def parse_md(data: bytes) -> str:
+    md_content = data.decode('utf-8', errors='ignore')
+    html_content = markdown.markdown(md_content, extensions=['extra', 'codehilite', 'tables', 'toc', 'fenced_code'])
+    soup = BeautifulSoup(html_content, 'html.parser')
+    text_parts = []
+    for element in soup.children:
+        if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+            level = int(element.name[1])
+            text_parts.append('#' * level + ' ' + element.get_text().strip())
+        elif element.name == 'p':
+            text = element.get_text().strip()
+            if text:
+                text_parts.append(text)
+        elif element.name in ['ul', 'ol']:
+            for li in element.find_all('li'):
+                text_parts.append(f'* {li.get_text().strip()}')
+        elif element.name == 'pre':
+            code_block = element.get_text().strip()
+            if code_block:
+                text_parts.append(f'```\n{code_block}\n```')
+        elif element.name == 'table':
+            table_str = extract_table_to_markdown(element)
+            if table_str:
+                text_parts.append(table_str)
+        elif element.name:
+            text = element.get_text(separator=' ', strip=True)
+            if text:
+                text_parts.append(text)
+    cleaned_text = re.sub(r'\n\s*\n', '\n\n', '\n'.join(text_parts))
+    return cleaned_text.strip()
+
+
+def parse_html(data: bytes) -> str:
+    html_content = data.decode('utf-8', errors='ignore')
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for script_or_style in soup(['script', 'style']):
+        script_or_style.decompose()
+    text_parts = []
+    for element in soup.body.children if soup.body else soup.children:
+        if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+            level = int(element.name[1])
+            text_parts.append('#' * level + ' ' + element.get_text().strip())
+        elif element.name == 'p':
+            text = element.get_text().strip()
+            if text:
+                text_parts.append(text)
+        elif element.name in ['ul', 'ol']:
+            for li in element.find_all('li'):
+                text = li.get_text().strip()
+                if text:
+                    text_parts.append(f'* {text}')
+        elif element.name == 'table':
+            table_str = extract_table_to_markdown(element)
+            if table_str:
+                text_parts.append(table_str)
+        elif element.name:
+            text = element.get_text(separator=' ', strip=True)
+            if text:
+                text_parts.append(text)
+    cleaned_text = re.sub(r'\n\s*\n', '\n\n', '\n'.join(text_parts))
+    return cleaned_text.strip()
+
+
+def _on_cpu_limit(signum, frame):
+    raise ParseLimitExceeded('Parsing used more CPU time than allowed')
+
+
+def _init_worker():
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _run_limited(cpu_limit: float, func: typing.Callable, *args) -> tuple[typing.Any, float]:
+    """Run func in the worker, raising ParseLimitExceeded once it used cpu_limit seconds of CPU
+
+    Returns the result and the CPU seconds used.
+    """
+    started = time.process_time()
+    if resource is None or cpu_limit <= 0:
+        return func(*args), time.process_time() - started
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_limit) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        return func(*args), time.process_time() - started
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+# --- Pool, used by the event loop process ---
+
+
+class ParseBudget:
+    """Time and CPU left for parsing one file, shared by the calls that parse its sections"""
+
+    deadline: float | None
+    """time.monotonic() by which the file must be parsed, None means no limit"""
+
+    cpu_left: float | None
+    """CPU seconds the remaining calls may use, None means no limit"""
+
+    def __init__(self, timeout: float, cpu_limit: float):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout > 0 else None
+        self.cpu_left = cpu_limit if cpu_limit > 0 else None
+
+    def time_left(self) -> float | None:
+        if self.deadline is None:
+            return None
+        time_left = self.deadline - time.monotonic()
+        if time_left <= 0:
+            raise ParseLimitExceeded(f'Parsing took longer than {self.timeout}s')
+        return time_left
+
+    def check_cpu(self) -> float:
+        """CPU seconds left, 0 means no limit"""
+        if self.cpu_left is None:
+            return 0
+        if self.cpu_left <= 0:
+            raise ParseLimitExceeded('Parsing used more CPU time than allowed')
+        return self.cpu_left
+
+
+class ParsePool:
+    """Runs parsers in worker processes, shared by all knowledge bases"""
+
+    backend: str
+    """process, or thread to parse in threads of the main process without any limits"""
+
+    workers: int
+
+    timeout: float
+    """Seconds parsing one file may take, <=0 means no limit"""
+
+    cpu_limit: float
+    """CPU seconds parsing one file may use, <=0 means no limit; not enforced on Windows"""
+
+    sample_size: int
+    """Bytes of a text file used to detect its encoding"""
+
+    def __init__(
+        self,
+        backend: str = 'process',
+        workers: int = 2,
+        timeout: float = 300,
+        cpu_limit: float = 120,
+        sample_size: int = 65536,
+    ):
+        if backend not in ('process', 'thread'):
+            raise ValueError(f'Unknown parser backend: {backend}')
+
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.sample_size = sample_size
+
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self._killed: set[concurrent.futures.ProcessPoolExecutor] = set()
+
+    @classmethod
+    def from_config(cls, ap: app.Application) -> ParsePool:
+        parser_config = ap.instance_config.data.get('rag', {}).get('parser', {})
+        return cls(
+            backend=parser_config.get('backend', 'process'),
+            workers=parser_config.get('workers', 2),
+            timeout=parser_config.get('timeout', 300),
+            cpu_limit=parser_config.get('cpu_limit', 120),
+            sample_size=parser_config.get('detect_sample_bytes', 65536),
+        )
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, a forked copy of the event loop process would inherit its threads and sockets
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def _kill(self, executor: concurrent.futures.ProcessPoolExecutor):
+        """Stop a pool whose worker is stuck, the next call starts a new one"""
+        if executor is self._executor:
+            self._executor = None
+        self._killed.add(executor)
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def new_budget(self) -> ParseBudget:
+        """Budget of one file, pass it to every run() call parsing a part of the file"""
+        return ParseBudget(self.timeout, self.cpu_limit)
+
+    async def run(self, func: typing.Callable, *args, budget: ParseBudget | None = None) -> typing.Any:
+        """Run func(*args) in a worker and return its result
+
+        Without a budget the call gets the limits of a whole file.
+        """
+        if self.backend == 'thread':
+            return await asyncio.to_thread(func, *args)
+
+        if budget is None:
+            budget = self.new_budget()
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            time_left = budget.time_left()
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, _run_limited, budget.check_cpu(), func, *args)
+            try:
+                result, cpu_used = await asyncio.wait_for(future, time_left)
+            except asyncio.TimeoutError:
+                self._kill(executor)
+                raise ParseLimitExceeded(f'Parsing took longer than {budget.timeout}s')
+            except BrokenProcessPool:
+                if executor in self._killed and attempt == 0:
+                    # stopped because of another file, not this one
+                    continue
+                self._kill(executor)
+                raise
+
+            if budget.cpu_left is not None:
+                budget.cpu_left -= cpu_used
+            return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,23 +1,29 @@
 from __future__ import annotations
 
-import PyPDF2
-import io
-from docx import Document
-import chardet
-from typing import Union, Callable, Any
-import markdown
-from bs4 import BeautifulSoup
-import re
+import os
+import tempfile
+from typing import Union, Callable, Any, AsyncIterator, NamedTuple
 import asyncio  # Import asyncio for async operations
 from langbot.pkg.core import app
+from . import parse_worker
+
+
+class Section(NamedTuple):
+    """A piece of a file yielded by FileParser.iter_sections"""
+
+    text: str
+    position: int
+    """Pages or characters parsed so far, including this section"""
+    total: int
+    unit: str
 
 
 class FileParser:
     """
     A robust file parser class to extract text content from various document formats.
     It supports TXT, PDF, DOCX, XLSX, CSV, Markdown, HTML, and EPUB files.
-    All core file reading operations are designed to be run synchronously in a thread pool
-    to avoid blocking the asyncio event loop.
+    The parsing itself runs in the parser workers of ap.rag_mgr.parse_pool, separate processes
+    by default, so that CPU-heavy documents neither block the asyncio event loop nor hold its GIL.
     """
 
     def __init__(self, ap: app.Application):
@@ -34,6 +40,19 @@ class FileParser:
             self.ap.logger.error(f'Error running synchronous function {sync_func.__name__}: {e}')
             raise
 
+    async def _run_parser(
+        self, parser_func: Callable, *args: Any, budget: parse_worker.ParseBudget | None = None
+    ) -> Any:
+        """
+        Runs one of the parse_worker functions in the parser pool, subject to its time and CPU limits.
+        Calls parsing parts of the same file share its budget.
+        """
+        try:
+            return await self.ap.rag_mgr.parse_pool.run(parser_func, *args, budget=budget)
+        except Exception as e:
+            self.ap.logger.error(f'Error running parser {parser_func.__name__}: {e}')
+            raise
+
     async def parse(self, file_name: str, extension: str) -> Union[str, None]:
         """
         Parses the file based on its extension and returns the extracted text content.
@@ -60,11 +79,62 @@ class FileParser:
             self.ap.logger.error(f'Failed to parse {file_extension} file {file_name}: {e}')
             return None
 
+    async def iter_sections(
+        self, file_name: str, extension: str, pages_per_section: int = 20, section_chars: int = 20000
+    ) -> AsyncIterator[Section]:
+        """
+        Parses the file incrementally, yielding its text in sections so the later stages of
+        ingestion can start before the whole file is parsed.
+
+        PDF files are read pages_per_section pages at a time. Other formats are parsed as a
+        whole and then cut at line breaks into sections of about section_chars characters.
+        Unlike parse(), errors are raised instead of being logged and swallowed.
+        """
+        file_extension = extension.lower()
+
+        if file_extension == 'pdf':
+            self.ap.logger.info(f'Parsing PDF file: {file_name}')
+            pdf_bytes = await self.ap.storage_mgr.storage_provider.load(file_name)
+
+            # the workers read the pages from a temporary copy instead of receiving the bytes for every section
+            fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    await asyncio.to_thread(f.write, pdf_bytes)
+                del pdf_bytes
+
+                # the time and CPU limits apply to the whole file, not to each section
+                budget = self.ap.rag_mgr.parse_pool.new_budget()
+                total = await self._run_parser(parse_worker.count_pdf_pages, pdf_path, budget=budget)
+                for start in range(0, total, pages_per_section):
+                    end = min(start + pages_per_section, total)
+                    text = await self._run_parser(parse_worker.extract_pdf_pages, pdf_path, start, end, budget=budget)
+                    yield Section(text, end, total, 'pages')
+            finally:
+                os.remove(pdf_path)
+            return
+
+        parser_method = getattr(self, f'_parse_{file_extension}', None)
+        if parser_method is None:
+            raise ValueError(f'Unsupported file format: {file_extension}')
+
+        text = await parser_method(file_name) or ''
+        start = 0
+        while start < len(text):
+            end = start + section_chars
+            if end < len(text):
+                line_break = text.rfind('\n', start, end)
+                end = line_break + 1 if line_break > start else end
+            else:
+                end = len(text)
+            yield Section(text[start:end], end, len(text), 'chars')
+            start = end
+
     # --- Helper for reading files with encoding detection ---
     async def _read_file_content(self, file_name: str) -> Union[str, bytes]:
         """
-        Reads a file with automatic encoding detection, ensuring the synchronous
-        file read operation runs in a separate thread.
+        Reads a file with automatic encoding detection, the detection runs in a parser
+        worker on a bounded sample of the file.
         """
 
         # def _read_sync():
@@ -80,10 +150,7 @@ class FileParser:
         # return await self._run_sync(_read_sync)
         file_bytes = await self.ap.storage_mgr.storage_provider.load(file_name)
 
-        detected = chardet.detect(file_bytes)
-        encoding = detected['encoding'] or 'utf-8'
-
-        return file_bytes.decode(encoding, errors='ignore')
+        return await self._run_parser(parse_worker.decode_text, file_bytes, self.ap.rag_mgr.parse_pool.sample_size)
 
     # --- Specific Parser Methods ---
 
@@ -110,16 +177,7 @@ class FileParser:
 
         pdf_bytes = await self.ap.storage_mgr.storage_provider.load(file_name)
 
-        def _parse_pdf_sync():
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
-            text_content = []
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
-            return '\n'.join(text_content)
-
-        return await self._run_sync(_parse_pdf_sync)
+        return await self._run_parser(parse_worker.parse_pdf, pdf_bytes)
 
     async def _parse_docx(self, file_name: str) -> str:
         """Parses a DOCX file and returns its text content."""
@@ -127,12 +185,7 @@ class FileParser:
 
         docx_bytes = await self.ap.storage_mgr.storage_provider.load(file_name)
 
-        def _parse_docx_sync():
-            doc = Document(io.BytesIO(docx_bytes))
-            text_content = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
-            return '\n'.join(text_content)
-
-        return await self._run_sync(_parse_docx_sync)
+        return await self._run_parser(parse_worker.parse_docx, docx_bytes)
 
     async def _parse_doc(self, file_name: str) -> str:
         """Handles .doc files, explicitly stating lack of direct support."""
@@ -183,40 +236,7 @@ class FileParser:
 
         md_bytes = await self.ap.storage_mgr.storage_provider.load(file_name)
 
-        def _parse_markdown_sync():
-            md_content = io.BytesIO(md_bytes).read().decode('utf-8', errors='ignore')
-            html_content = markdown.markdown(
-                md_content, extensions=['extra', 'codehilite', 'tables', 'toc', 'fenced_code']
-            )
-            soup = BeautifulSoup(html_content, 'html.parser')
-            text_parts = []
-            for element in soup.children:
-                if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                    level = int(element.name[1])
-                    text_parts.append('#' * level + ' ' + element.get_text().strip())
-                elif element.name == 'p':
-                    text = element.get_text().strip()
-                    if text:
-                        text_parts.append(text)
-                elif element.name in ['ul', 'ol']:
-                    for li in element.find_all('li'):
-                        text_parts.append(f'* {li.get_text().strip()}')
-                elif element.name == 'pre':
-                    code_block = element.get_text().strip()
-                    if code_block:
-                        text_parts.append(f'```\n{code_block}\n```')
-                elif element.name == 'table':
-                    table_str = self._extract_table_to_markdown_sync(element)  # Call sync helper
-                    if table_str:
-                        text_parts.append(table_str)
-                elif element.name:
-                    text = element.get_text(separator=' ', strip=True)
-                    if text:
-                        text_parts.append(text)
-            cleaned_text = re.sub(r'\n\s*\n', '\n\n', '\n'.join(text_parts))
-            return cleaned_text.strip()
-
-        return await self._run_sync(_parse_markdown_sync)
+        return await self._run_parser(parse_worker.parse_md, md_bytes)
 
     async def _parse_html(self, file_name: str) -> str:
         """Parses an HTML file, extracting structured plain text."""
@@ -224,37 +244,7 @@ class FileParser:
 
         html_bytes = await self.ap.storage_mgr.storage_provider.load(file_name)
 
-        def _parse_html_sync():
-            html_content = io.BytesIO(html_bytes).read().decode('utf-8', errors='ignore')
-            soup = BeautifulSoup(html_content, 'html.parser')
-            for script_or_style in soup(['script', 'style']):
-                script_or_style.decompose()
-            text_parts = []
-            for element in soup.body.children if soup.body else soup.children:
-                if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                    level = int(element.name[1])
-                    text_parts.append('#' * level + ' ' + element.get_text().strip())
-                elif element.name == 'p':
-                    text = element.get_text().strip()
-                    if text:
-                        text_parts.append(text)
-                elif element.name in ['ul', 'ol']:
-                    for li in element.find_all('li'):
-                        text = li.get_text().strip()
-                        if text:
-                            text_parts.append(f'* {text}')
-                elif element.name == 'table':
-                    table_str = self._extract_table_to_markdown_sync(element)  # Call sync helper
-                    if table_str:
-                        text_parts.append(table_str)
-                elif element.name:
-                    text = element.get_text(separator=' ', strip=True)
-                    if text:
-                        text_parts.append(text)
-            cleaned_text = re.sub(r'\n\s*\n', '\n\n', '\n'.join(text_parts))
-            return cleaned_text.strip()
-
-        return await self._run_sync(_parse_html_sync)
+        return await self._run_parser(parse_worker.parse_html, html_bytes)
 
     def _add_toc_items_sync(self, toc_list: list, text_content: list, level: int):
         """Recursively adds TOC items to text_content (synchronous helper)."""
@@ -266,26 +256,3 @@ class FileParser:
                 self._add_toc_items_sync(subchapters, text_content, level + 1)
             else:
                 text_content.append(f'{indent}- {item.title}')
-
-    def _extract_table_to_markdown_sync(self, table_element: BeautifulSoup) -> str:
-        """Helper to convert a BeautifulSoup table element into a Markdown table string (synchronous)."""
-        headers = [th.get_text().strip() for th in table_element.find_all('th')]
-        rows = []
-        for tr in table_element.find_all('tr'):
-            cells = [td.get_text().strip() for td in tr.find_all('td')]
-            if cells:
-                rows.append(cells)
-
-        if not headers and not rows:
-            return ''
-
-        table_lines = []
-        if headers:
-            table_lines.append(' | '.join(headers))
-            table_lines.append(' | '.join(['---'] * len(headers)))
-
-        for row_cells in rows:
-            padded_cells = row_cells + [''] * (len(headers) - len(row_cells)) if headers else row_cells
-            table_lines.append(' | '.join(padded_cells))
-
-        return '\n'.join(table_lines)
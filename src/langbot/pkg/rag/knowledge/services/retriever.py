@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+import typing
+
 from . import base_service
 from ....core import app
 from ....provider.modelmgr.requester import RuntimeEmbeddingModel
@@ -8,27 +11,67 @@ from langbot_plugin.api.entities.builtin.provider.message import ContentElement
 
 
 class Retriever(base_service.BaseService):
+    """Vector retrieval of one knowledge base
+
+    Searches of the collection that arrive while another one is running are queued and sent
+    together with one search_batch call once it returns.
+    """
+
+    _queued: dict[tuple[str, int], list[tuple[list[float], asyncio.Future]]]
+    """Query embeddings waiting for the next search_batch call, by collection and k"""
+
+    _searching: dict[tuple[str, int], asyncio.Task]
+
     def __init__(self, ap: app.Application):
         super().__init__()
         self.ap = ap
+        self._queued = {}
+        self._searching = {}
 
-    async def retrieve(
-        self, kb_id: str, query: str, embedding_model: RuntimeEmbeddingModel, k: int = 5
-    ) -> list[rag_context.RetrievalResultEntry]:
-        self.ap.logger.info(
-            f"Retrieving for query: '{query[:10]}' with k={k} using {embedding_model.model_entity.uuid}"
-        )
-
-        query_embedding: list[float] = await embedding_model.provider.invoke_embedding(
-            model=embedding_model,
-            input_text=[query],
+    async def embed_query(self, kb_id: str, query: str, embedding_model: RuntimeEmbeddingModel) -> list[float]:
+        query_embedding: list[list[float]] = await self.ap.rag_mgr.embedding_cache.embed(
+            embedding_model,
+            [query],
             extra_args={},  # TODO: add extra args
             knowledge_base_id=kb_id,
             query_text=query,
             call_type='retrieve',
         )
+        return query_embedding[0]
 
-        vector_results = await self.ap.vector_db_mgr.vector_db.search(kb_id, query_embedding[0], k)
+    async def _search_batches(self, kb_id: str, k: int):
+        """Send the queued searches in batches until none are left"""
+        try:
+            while queued := self._queued.pop((kb_id, k), None):
+                queued = [(embedding, future) for embedding, future in queued if not future.done()]
+                if not queued:
+                    continue
+                try:
+                    results = await self.ap.vector_db_mgr.vector_db.search_batch(
+                        kb_id, [embedding for embedding, _ in queued], k
+                    )
+                except Exception as e:
+                    for _, future in queued:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for i, (_, future) in enumerate(queued):
+                    if not future.done():
+                        future.set_result({key: [results[key][i]] for key in ('ids', 'distances', 'metadatas')})
+        finally:
+            del self._searching[kb_id, k]
+
+    async def _search_vectors(self, kb_id: str, query_embedding: list[float], k: int) -> dict[str, typing.Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._queued.setdefault((kb_id, k), []).append((query_embedding, future))
+        if (kb_id, k) not in self._searching:
+            self._searching[kb_id, k] = asyncio.create_task(self._search_batches(kb_id, k))
+        return await future
+
+    async def search(
+        self, kb_id: str, query_embedding: list[float], k: int = 5
+    ) -> list[rag_context.RetrievalResultEntry]:
+        vector_results = await self._search_vectors(kb_id, query_embedding, k)
 
         # 'ids' shape mirrors the Chroma-style response contract for compatibility
         matched_vector_ids = vector_results.get('ids', [[]])[0]
@@ -51,3 +94,14 @@ class Retriever(base_service.BaseService):
             result.append(entry)
 
         return result
+
+    async def retrieve(
+        self, kb_id: str, query: str, embedding_model: RuntimeEmbeddingModel, k: int = 5
+    ) -> list[rag_context.RetrievalResultEntry]:
+        self.ap.logger.info(
+            f"Retrieving for query: '{query[:10]}' with k={k} using {embedding_model.model_entity.uuid}"
+        )
+
+        query_embedding = await self.embed_query(kb_id, query, embedding_model)
+
+        return await self.search(kb_id, query_embedding, k)
@@ -0,0 +1,446 @@
+"""Media blob store
+
+Images, voice clips and files received by the adapters are kept here instead of being
+base64-encoded into the message chain. Messages carry a handle URI in the url field
+
+    media://<key>?mime=<mime type>&size=<bytes>
+
+where key is sha256-<hex digest> for blobs stored from bytes, or an id of the platform's copy
+(e.g. telegram-<file_unique_id>) for blobs downloaded lazily. The bytes are downloaded or
+decoded only when a requester, runner or adapter needs them, see materialize_messages().
+
+Bytes are deduplicated by content and kept in an LRU up to a memory budget. Blobs are
+reference-counted by the queries being processed and the conversation history: evicting the
+bytes of a referenced blob spills them to the storage provider, unless they can be downloaded
+again, while unreferenced blobs are forgotten.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import collections
+import hashlib
+import logging
+import re
+import typing
+import urllib.parse
+
+import langbot_plugin.api.entities.builtin.platform.message as platform_message
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+
+if typing.TYPE_CHECKING:
+    from langbot.pkg.core import app
+    from .provider import StorageProvider
+
+
+SCHEME = 'media://'
+
+SPILL_PREFIX = 'media/'
+
+Loader = typing.Callable[[], typing.Awaitable[tuple[bytes, typing.Optional[str]]]]
+"""Downloads the platform's copy of a blob, returns the bytes and their MIME type if known"""
+
+_unsafe_key_chars = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class MediaHandle:
+    """Reference to a blob carried by messages"""
+
+    __slots__ = ('key', 'mime_type', 'size')
+
+    def __init__(self, key: str, mime_type: str, size: int = 0):
+        self.key = key
+        self.mime_type = mime_type
+        self.size = size
+
+    @property
+    def uri(self) -> str:
+        query = urllib.parse.urlencode({'mime': self.mime_type, 'size': self.size})
+        return f'{SCHEME}{self.key}?{query}'
+
+    @classmethod
+    def parse(cls, uri: str) -> MediaHandle:
+        if not is_media_uri(uri):
+            raise ValueError(f'Not a media handle: {uri}')
+        key, _, query = uri[len(SCHEME) :].partition('?')
+        params = urllib.parse.parse_qs(query)
+        size = params.get('size', ['0'])[0]
+        return cls(key, params.get('mime', [''])[0], int(size) if size.isdigit() else 0)
+
+
+def is_media_uri(value: typing.Any) -> bool:
+    return isinstance(value, str) and value.startswith(SCHEME)
+
+
+def media_key(platform: str, platform_id: str) -> str:
+    """Key of a blob downloaded from a platform, identical for every message of the same file"""
+    return f'{platform}-{_unsafe_key_chars.sub("_", str(platform_id))}'
+
+
+def media_uris(items: typing.Iterable[typing.Any]) -> list[str]:
+    """Handles referenced by message components or provider messages"""
+    uris = []
+    for item in items:
+        if isinstance(item, (platform_message.Image, platform_message.Voice, platform_message.File)):
+            if is_media_uri(item.url):
+                uris.append(item.url)
+        elif isinstance(item, platform_message.Quote):
+            uris.extend(media_uris(item.origin or []))
+        elif isinstance(item, platform_message.Forward):
+            for node in item.node_list:
+                uris.extend(media_uris(node.message_chain or []))
+        elif isinstance(item, provider_message.Message) and isinstance(item.content, list):
+            uris.extend(uri for uri in map(_content_uri, item.content) if uri is not None)
+    return uris
+
+
+def _content_uri(ce: provider_message.ContentElement) -> str | None:
+    if ce.type == 'image_url' and ce.image_url is not None and is_media_uri(ce.image_url.url):
+        return ce.image_url.url
+    if ce.type == 'file_url' and is_media_uri(ce.file_url):
+        return ce.file_url
+    return None
+
+
+_MEDIA_NODE_TYPES = {'Image', 'Voice', 'File', 'image_url', 'file_url', 'image_base64', 'file_base64'}
+
+
+def _media_nodes(node: typing.Any) -> typing.Iterator[dict]:
+    """Dumped message components and content elements that may carry media"""
+    if isinstance(node, list):
+        for item in node:
+            yield from _media_nodes(item)
+    elif isinstance(node, dict):
+        if node.get('type') in _MEDIA_NODE_TYPES:
+            yield node
+        for value in node.values():
+            yield from _media_nodes(value)
+
+
+class _Blob:
+    __slots__ = ('key', 'mime_type', 'size', 'digest', 'loader', 'refs', 'spilled')
+
+    def __init__(self, key: str, mime_type: str, size: int, loader: Loader | None = None):
+        self.key = key
+        self.mime_type = mime_type
+        self.size = size
+        self.digest: str | None = None
+        """sha256 of the bytes, None until they are first downloaded"""
+        self.loader = loader
+        self.refs = 0
+        self.spilled = False
+
+
+class MediaStore:
+    """Deduplicated, reference-counted media blobs"""
+
+    memory_bytes: int
+    """Bytes kept in memory, least recently used ones are evicted first"""
+
+    max_blobs: int
+    """Blobs remembered, least recently used unreferenced ones are forgotten first"""
+
+    storage_provider: StorageProvider | None
+    """Where the evicted bytes of referenced blobs are spilled, None to keep them in memory"""
+
+    def __init__(
+        self,
+        memory_bytes: int = 256 * 1024 * 1024,
+        max_blobs: int = 100000,
+        storage_provider: StorageProvider | None = None,
+        logger: logging.Logger | None = None,
+    ):
+        self.memory_bytes = memory_bytes
+        self.max_blobs = max_blobs
+        self.storage_provider = storage_provider
+        self.logger = logger or logging.getLogger('langbot')
+
+        self._blobs: collections.OrderedDict[str, _Blob] = collections.OrderedDict()
+        self._data: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        self._digest_keys: dict[str, set[str]] = {}
+        self._data_size = 0
+        self._loading: dict[str, asyncio.Future] = {}
+        self._pending_deletes: list[str] = []
+
+        self.memory_hits = 0
+        self.downloads = 0
+        self.spill_loads = 0
+        self.spills = 0
+        self.dedup_hits = 0
+
+    @classmethod
+    def from_config(cls, ap: app.Application) -> MediaStore:
+        media_config = ap.instance_config.data.get('storage', {}).get('media', {})
+        return cls(
+            memory_bytes=media_config.get('memory_mb', 256) * 1024 * 1024,
+            max_blobs=media_config.get('max_blobs', 100000),
+            logger=ap.logger,
+        )
+
+    async def put(self, data: bytes, mime_type: str) -> MediaHandle:
+        """Store bytes that have no platform copy to download again"""
+        digest = hashlib.sha256(data).hexdigest()
+        key = f'sha256-{digest}'
+        blob = self._blobs.get(key)
+        if blob is None:
+            blob = self._add_blob(_Blob(key, mime_type, len(data)))
+        else:
+            self._blobs.move_to_end(key)
+        if digest in self._data:
+            self.dedup_hits += 1
+        await self._remember(blob, digest, data)
+        return MediaHandle(key, blob.mime_type, blob.size)
+
+    def put_lazy(self, key: str, loader: Loader, mime_type: str, size: int = 0) -> MediaHandle:
+        """Register a platform's copy of a blob, loader is called when the bytes are first needed"""
+        blob = self._blobs.get(key)
+        if blob is None:
+            blob = self._add_blob(_Blob(key, mime_type, size, loader))
+        else:
+            self._blobs.move_to_end(key)
+            self.dedup_hits += 1
+            blob.loader = loader
+        return MediaHandle(key, blob.mime_type, blob.size)
+
+    def acquire(self, uris: typing.Iterable[str]):
+        for uri in uris:
+            blob = self._blobs.get(MediaHandle.parse(uri).key)
+            if blob is not None:
+                blob.refs += 1
+
+    def release(self, uris: typing.Iterable[str]):
+        for uri in uris:
+            blob = self._blobs.get(MediaHandle.parse(uri).key)
+            if blob is None or blob.refs <= 0:
+                continue
+            blob.refs -= 1
+            if blob.refs == 0 and blob.spilled and blob.digest not in self._data:
+                # the spilled copy is only kept for referenced blobs
+                self._forget(blob)
+
+    async def get_bytes(self, handle: str | MediaHandle) -> tuple[bytes, str]:
+        """Bytes and MIME type of a blob, downloaded or loaded from the storage provider if needed"""
+        if isinstance(handle, str):
+            handle = MediaHandle.parse(handle)
+
+        await self._flush_deletes()
+
+        blob = self._blobs.get(handle.key)
+        if blob is None:
+            blob = await self._recover(handle)
+        else:
+            self._blobs.move_to_end(handle.key)
+
+        if blob.digest is not None and blob.digest in self._data:
+            self._data.move_to_end(blob.digest)
+            self.memory_hits += 1
+            return self._data[blob.digest], blob.mime_type
+
+        loading = self._loading.get(blob.key)
+        if loading is None:
+            loading = self._loading[blob.key] = asyncio.ensure_future(self._load(blob))
+            loading.add_done_callback(lambda _: self._loading.pop(blob.key, None))
+        return await asyncio.shield(loading), blob.mime_type
+
+    async def get_data_url(self, handle: str | MediaHandle) -> str:
+        data, mime_type = await self.get_bytes(handle)
+        return f'data:{mime_type or "application/octet-stream"};base64,{base64.b64encode(data).decode("ascii")}'
+
+    async def materialize_content(
+        self, content: list[provider_message.ContentElement] | str | None
+    ) -> list[provider_message.ContentElement] | str | None:
+        """A copy of the content with the handles replaced by base64 data URLs, for the request only"""
+        if not isinstance(content, list) or not any(_content_uri(ce) for ce in content):
+            return content
+
+        materialized = []
+        for ce in content:
+            uri = _content_uri(ce)
+            if uri is None:
+                materialized.append(ce)
+                continue
+            try:
+                data_url = await self.get_data_url(uri)
+            except Exception as e:
+                self.logger.warning(f'Media {uri} is unavailable: {e}')
+                kind = 'image' if ce.type == 'image_url' else 'file'
+                materialized.append(provider_message.ContentElement.from_text(f'[{kind} unavailable]'))
+                continue
+            if ce.type == 'image_url':
+                materialized.append(provider_message.ContentElement.from_image_base64(data_url))
+            else:
+                materialized.append(provider_message.ContentElement.from_file_base64(data_url, ce.file_name or 'file'))
+        return materialized
+
+    async def materialize_messages(self, messages: list[provider_message.Message]) -> list[provider_message.Message]:
+        materialized = []
+        for message in messages:
+            content = await self.materialize_content(message.content)
+            materialized.append(
+                message if content is message.content else message.model_copy(update={'content': content})
+            )
+        return materialized
+
+    async def materialize_dump(self, data: typing.Any) -> dict[str, str]:
+        """Replace the handles in a model_dump() by base64 data, in place, before it leaves the process
+
+        Plugins run in another process and have no access to the store. Returns the handle of each
+        data URL, for restore_dump() to put the handles back into what the plugins return.
+        """
+        handles: dict[str, str] = {}
+        data_urls: dict[str, str | None] = {}
+
+        for node in list(_media_nodes(data)):
+            node_type = node['type']
+            if node_type in ('Image', 'Voice', 'File'):
+                uri = node.get('url')
+            elif node_type == 'image_url':
+                uri = (node.get('image_url') or {}).get('url')
+            elif node_type == 'file_url':
+                uri = node.get('file_url')
+            else:
+                continue
+            if not is_media_uri(uri):
+                continue
+
+            if uri not in data_urls:
+                try:
+                    data_urls[uri] = await self.get_data_url(uri)
+                except Exception as e:
+                    self.logger.warning(f'Media {uri} is unavailable: {e}')
+                    data_urls[uri] = None
+            url = data_urls[uri]
+            if url is None:
+                continue
+            handles[url] = uri
+
+            if node_type == 'image_url':
+                node.update(type='image_base64', image_url=None, image_base64=url)
+            elif node_type == 'file_url':
+                node.update(type='file_base64', file_url=None, file_base64=url)
+            else:
+                node.update(url='', base64=url)
+        return handles
+
+    def restore_dump(self, data: typing.Any, handles: dict[str, str]) -> typing.Any:
+        """Put the handles back in place of the data materialize_dump() sent, in place"""
+        if not handles:
+            return data
+        for node in list(_media_nodes(data)):
+            node_type = node['type']
+            if node_type in ('Image', 'Voice', 'File') and node.get('base64') in handles:
+                node.update(url=handles[node['base64']], base64='')
+            elif node_type == 'image_base64' and node.get('image_base64') in handles:
+                node.update(type='image_url', image_url={'url': handles[node['image_base64']]}, image_base64=None)
+            elif node_type == 'file_base64' and node.get('file_base64') in handles:
+                node.update(type='file_url', file_url=handles[node['file_base64']], file_base64=None)
+        return data
+
+    def _add_blob(self, blob: _Blob) -> _Blob:
+        self._blobs[blob.key] = blob
+        if len(self._blobs) > self.max_blobs:
+            for old in [old for old in self._blobs.values() if old.refs == 0][: len(self._blobs) - self.max_blobs]:
+                self._forget(old)
+        return blob
+
+    async def _recover(self, handle: MediaHandle) -> _Blob:
+        """A blob spilled before a restart, found by its content digest"""
+        if handle.key.startswith('sha256-') and self.storage_provider is not None:
+            if await self.storage_provider.exists(SPILL_PREFIX + handle.key[len('sha256-') :]):
+                blob = self._add_blob(_Blob(handle.key, handle.mime_type, handle.size))
+                blob.digest = handle.key[len('sha256-') :]
+                blob.spilled = True
+                return blob
+        raise KeyError(f'Unknown media {handle.key}')
+
+    async def _load(self, blob: _Blob) -> bytes:
+        if blob.spilled:
+            data = await self.storage_provider.load(SPILL_PREFIX + blob.digest)
+            self.spill_loads += 1
+        elif blob.loader is not None:
+            data, mime_type = await blob.loader()
+            self.downloads += 1
+            if mime_type:
+                blob.mime_type = mime_type
+            blob.size = len(data)
+        else:
+            raise KeyError(f'Bytes of media {blob.key} were evicted')
+
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._data:
+            # another message carried the same content
+            self.dedup_hits += 1
+        await self._remember(blob, digest, data)
+        return data
+
+    async def _remember(self, blob: _Blob, digest: str, data: bytes):
+        if blob.digest is not None and blob.digest != digest:
+            self._unlink(blob)
+        blob.digest = digest
+        self._digest_keys.setdefault(digest, set()).add(blob.key)
+
+        if digest not in self._data:
+            self._data[digest] = data
+            self._data_size += len(data)
+        self._data.move_to_end(digest)
+        await self._evict()
+
+    async def _evict(self):
+        for digest in list(self._data):
+            if self._data_size <= self.memory_bytes or len(self._data) <= 1:
+                break
+            blobs = [self._blobs[key] for key in self._digest_keys.get(digest, ())]
+            keep = [blob for blob in blobs if blob.refs > 0 and blob.loader is None and not blob.spilled]
+            if keep:
+                if self.storage_provider is None:
+                    continue
+                await self.storage_provider.save(SPILL_PREFIX + digest, self._data[digest])
+                self.spills += 1
+                for blob in keep:
+                    blob.spilled = True
+
+            self._data_size -= len(self._data.pop(digest))
+            for blob in blobs:
+                if blob.refs == 0 and blob.loader is None and not blob.spilled:
+                    self._forget(blob)
+
+    def _forget(self, blob: _Blob):
+        self._blobs.pop(blob.key, None)
+        if blob.spilled:
+            self._pending_deletes.append(SPILL_PREFIX + blob.digest)
+        self._unlink(blob)
+
+    def _unlink(self, blob: _Blob):
+        keys = self._digest_keys.get(blob.digest)
+        if keys is None:
+            return
+        keys.discard(blob.key)
+        if not keys:
+            del self._digest_keys[blob.digest]
+            data = self._data.pop(blob.digest, None)
+            if data is not None:
+                self._data_size -= len(data)
+
+    async def _flush_deletes(self):
+        while self._pending_deletes:
+            key = self._pending_deletes.pop()
+            try:
+                if self.storage_provider is not None and await self.storage_provider.exists(key):
+                    await self.storage_provider.delete(key)
+            except Exception as e:
+                self.logger.warning(f'Failed to delete spilled media {key}: {e}')
+
+    def get_stats(self) -> dict:
+        return {
+            'blobs': len(self._blobs),
+            'referenced_blobs': sum(1 for blob in self._blobs.values() if blob.refs > 0),
+            'memory_blobs': len(self._data),
+            'memory_bytes': self._data_size,
+            'spilled_blobs': sum(1 for blob in self._blobs.values() if blob.spilled),
+            'memory_hits': self.memory_hits,
+            'downloads': self.downloads,
+            'spill_loads': self.spill_loads,
+            'spills': self.spills,
+            'dedup_hits': self.dedup_hits,
+        }
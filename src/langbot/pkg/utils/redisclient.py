@@ -0,0 +1,179 @@
+"""Minimal asyncio client for the Redis serialization protocol (RESP2).
+
+LangBot only needs a handful of commands for shared state (conversation store,
+distributed rate limiting), so instead of adding a hard dependency on a Redis
+driver this module speaks the wire protocol directly over a single connection.
+Any server that implements RESP (Redis, Valkey, KeyDB, DragonflyDB, ...) works.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import typing
+import urllib.parse
+
+
+class RedisError(Exception):
+    """Error reply returned by the server"""
+
+    pass
+
+
+def encode_command(*args: typing.Any) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode('utf-8')
+        else:
+            data = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> typing.Any:
+    """Read one RESP reply, bulk strings are returned as bytes"""
+    line = await reader.readuntil(b'\r\n')
+    prefix, payload = line[:1], line[1:-2]
+
+    if prefix == b'+':
+        return payload.decode('utf-8')
+    if prefix == b'-':
+        return RedisError(payload.decode('utf-8'))
+    if prefix == b':':
+        return int(payload)
+    if prefix == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+
+    raise RedisError(f'Unknown RESP reply type: {line!r}')
+
+
+class Script:
+    """Lua script run atomically on the server, called by its SHA1 once the server has it cached"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+class RedisClient:
+    """Single-connection RESP client
+
+    Commands are serialized through a lock, pipelines send several commands in one write.
+    The connection is (re)established lazily.
+    """
+
+    host: str
+
+    port: int
+
+    password: typing.Optional[str]
+
+    db: int
+
+    timeout: float
+
+    def __init__(self, url: str = 'redis://127.0.0.1:6379/0', timeout: float = 5.0):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.username = urllib.parse.unquote(parsed.username) if parsed.username else None
+        self.password = urllib.parse.unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+
+        self._reader: typing.Optional[asyncio.StreamReader] = None
+        self._writer: typing.Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.timeout
+        )
+
+        handshake = []
+        if self.password:
+            handshake.append(('AUTH', self.username, self.password) if self.username else ('AUTH', self.password))
+        if self.db:
+            handshake.append(('SELECT', self.db))
+
+        for reply in await self._send(handshake):
+            if isinstance(reply, RedisError):
+                raise reply
+
+    async def _send(self, commands: list[tuple]) -> list[typing.Any]:
+        self._writer.write(b''.join(encode_command(*command) for command in commands))
+        await self._writer.drain()
+        return [await asyncio.wait_for(read_reply(self._reader), timeout=self.timeout) for _ in commands]
+
+    def _drop_connection(self):
+        """Close the connection without waiting, safe to call while the task is being cancelled"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def _close_connection(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = None
+        self._writer = None
+
+    async def pipeline(self, commands: list[tuple], raise_on_error: bool = True) -> list[typing.Any]:
+        """Send several commands at once and return their replies in order"""
+        if not commands:
+            return []
+
+        async with self._lock:
+            try:
+                if self._writer is None or self._writer.is_closing():
+                    await self._connect()
+                replies = await self._send(commands)
+            except BaseException:
+                # errors and cancellation alike can leave a half-done handshake or unread
+                # replies on the connection, drop it so the next call reconnects
+                self._drop_connection()
+                raise
+
+        if raise_on_error:
+            for reply in replies:
+                if isinstance(reply, RedisError):
+                    raise reply
+
+        return replies
+
+    async def execute(self, *args: typing.Any) -> typing.Any:
+        """Execute one command"""
+        return (await self.pipeline([args]))[0]
+
+    async def eval(self, script: Script, keys: list[str], args: list[typing.Any]) -> typing.Any:
+        """Run a script with EVALSHA, sending the source only when the server doesn't know it yet"""
+        try:
+            return await self.execute('EVALSHA', script.sha, len(keys), *keys, *args)
+        except RedisError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+        return await self.execute('EVAL', script.source, len(keys), *keys, *args)
+
+    async def ping(self) -> bool:
+        return await self.execute('PING') == 'PONG'
+
+    async def close(self):
+        async with self._lock:
+            await self._close_connection()
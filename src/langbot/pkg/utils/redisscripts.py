@@ -0,0 +1,86 @@
+"""Lua scripts for state shared by several LangBot instances through a Redis-protocol store.
+
+Each script runs atomically on the server and reads the time from the server, so instances
+with skewed clocks still agree. Keys expire once their state equals a fresh one, the store
+only holds state of recently active scopes and sessions.
+"""
+
+from __future__ import annotations
+
+from .redisclient import Script
+
+
+TOKEN_BUCKET = Script(
+    """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * capacity / window)
+
+local delay = 0
+if tokens < 1 then
+    delay = math.ceil((1 - tokens) * window / capacity)
+    if delay > max_wait then
+        return -1
+    end
+end
+
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) * window / capacity))
+return delay
+"""
+)
+"""Take a token from the bucket KEYS[1] of ARGV[1] tokens refilled every ARGV[2] ms
+
+Returns the ms to wait before proceeding, the token is reserved meanwhile, or -1 if the wait
+would exceed ARGV[3] ms and nothing was taken.
+"""
+
+
+LEASE_ACQUIRE = Script(
+    """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[2])
+    redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[3]))
+    return 1
+end
+return 0
+"""
+)
+"""Add lease ARGV[2] valid for ARGV[3] ms to the sorted set KEYS[1] if it holds less than ARGV[1] live leases
+
+Returns 1 if the lease was granted, 0 otherwise.
+"""
+
+
+LEASE_RENEW = Script(
+    """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local expires_at = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]))
+if expires_at == nil or expires_at <= now then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+)
+"""Extend the live lease ARGV[1] in KEYS[1] to ARGV[2] ms from now
+
+Returns 0 if the lease already expired and may have been granted to another holder.
+"""
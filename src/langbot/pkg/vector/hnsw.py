@@ -0,0 +1,231 @@
+"""Hierarchical navigable small world graph in NumPy
+
+The graph only stores node numbers; vectors are read through a `rows(indices) -> float32 matrix`
+callable so the caller decides how they are stored (memory-mapped, quantized...). Vectors
+are expected to be normalized, similarity is their dot product.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import typing
+
+import numpy as np
+
+RowsFunc = typing.Callable[[np.ndarray], np.ndarray]
+
+
+class HNSWGraph:
+    """Malkov & Yashunin's HNSW with the neighbor selection heuristic, also used to prune the
+    neighbor list of a node that a new node connects to once it is full
+
+    Not thread-safe, searches share a scratch array; callers serialize access.
+    """
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, seed: int = 42, keep_pruned: bool = False):
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.keep_pruned = keep_pruned
+        """Fill the neighbor slots the heuristic leaves empty with the closest skipped candidates
+        (keepPrunedConnections); denser lists, but lower recall on clustered embeddings"""
+        self.level_mult = 1 / math.log(m)
+        self.rng = np.random.default_rng(seed)
+
+        self.size = 0
+        """Nodes 0..size-1 are in the graph"""
+
+        self.levels = np.zeros(0, dtype=np.int8)
+        self.neighbors0 = np.full((0, self.m0), -1, dtype=np.int32)
+        """Level 0 neighbors of every node, -1 padded"""
+        self.counts0 = np.zeros(0, dtype=np.int32)
+
+        self.upper: list[dict[int, np.ndarray]] = []
+        """upper[level - 1][node] is the neighbor array of node on that level"""
+
+        self.entry = -1
+        self.max_level = -1
+
+        # a node was visited by the current search if its mark equals the current epoch
+        self._visited = np.zeros(0, dtype=np.int64)
+        self._epoch = 0
+
+    def _reserve(self, size: int):
+        if size <= len(self.levels):
+            return
+        capacity = max(size, 2 * len(self.levels), 1024)
+        self.levels = np.concatenate([self.levels, np.zeros(capacity - len(self.levels), dtype=np.int8)])
+        padding = np.full((capacity - len(self.neighbors0), self.m0), -1, dtype=np.int32)
+        self.neighbors0 = np.concatenate([self.neighbors0, padding])
+        self.counts0 = np.concatenate([self.counts0, np.zeros(capacity - len(self.counts0), dtype=np.int32)])
+        self._visited = np.concatenate([self._visited, np.zeros(capacity - len(self._visited), dtype=np.int64)])
+
+    def _neighbors(self, node: int, level: int) -> np.ndarray:
+        if level == 0:
+            return self.neighbors0[node, : self.counts0[node]]
+        return self.upper[level - 1][node]
+
+    def _set_neighbors(self, node: int, level: int, neighbors: np.ndarray):
+        if level == 0:
+            self.neighbors0[node] = -1
+            self.neighbors0[node, : len(neighbors)] = neighbors
+            self.counts0[node] = len(neighbors)
+        else:
+            self.upper[level - 1][node] = neighbors.astype(np.int32)
+
+    def _search_layer(
+        self, rows: RowsFunc, query: np.ndarray, entries: list[int], ef: int, level: int
+    ) -> list[tuple[float, int]]:
+        """The ef nodes of a level closest to query, best first"""
+        self._epoch += 1
+        epoch, visited = self._epoch, self._visited
+        visited[entries] = epoch
+
+        sims = (rows(np.asarray(entries)) @ query).tolist()
+        candidates = [(-sim, node) for sim, node in zip(sims, entries)]
+        heapq.heapify(candidates)
+        best = [(sim, node) for sim, node in zip(sims, entries)]
+        heapq.heapify(best)
+        while len(best) > ef:
+            heapq.heappop(best)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if len(best) >= ef and -neg_sim < best[0][0]:
+                break
+
+            neighbors = self._neighbors(node, level)
+            neighbors = neighbors[visited[neighbors] != epoch]
+            if not len(neighbors):
+                continue
+            visited[neighbors] = epoch
+
+            sims = rows(neighbors) @ query
+            if len(best) >= ef:
+                closer = sims > best[0][0]
+                neighbors, sims = neighbors[closer], sims[closer]
+
+            for sim, neighbor in zip(sims.tolist(), neighbors.tolist()):
+                if len(best) < ef or sim > best[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbor))
+                    heapq.heappush(best, (sim, neighbor))
+                    if len(best) > ef:
+                        heapq.heappop(best)
+
+        return sorted(best, reverse=True)
+
+    def _select(self, candidates: np.ndarray, vectors: np.ndarray, sims: np.ndarray, limit: int) -> np.ndarray:
+        """Pick up to limit candidates, closest first, skipping those closer to an already picked one
+        than to the base node, so the neighbors spread out in every direction"""
+        order = np.argsort(-sims)
+        pairwise = vectors @ vectors.T
+        picked: list[int] = []
+        pruned: list[int] = []
+        for i in order.tolist():
+            if len(picked) >= limit:
+                break
+            if not picked or pairwise[i, picked].max() < sims[i]:
+                picked.append(i)
+            else:
+                pruned.append(i)
+        if self.keep_pruned:
+            picked += pruned[: limit - len(picked)]
+        return candidates[picked].astype(np.int32)
+
+    def _connect(self, rows: RowsFunc, node: int, neighbor: int, level: int):
+        """Add node to the neighbors of neighbor, selecting them again with the heuristic when the list is full"""
+        neighbors = np.append(self._neighbors(neighbor, level), node).astype(np.int32)
+        limit = self.m0 if level == 0 else self.m
+        if len(neighbors) > limit:
+            vectors = rows(neighbors)
+            neighbors = self._select(neighbors, vectors, vectors @ rows(np.asarray([neighbor]))[0], limit)
+        self._set_neighbors(neighbor, level, neighbors)
+
+    def add(self, rows: RowsFunc, count: int):
+        """Insert the next count nodes, size .. size + count - 1"""
+        self._reserve(self.size + count)
+        for node in range(self.size, self.size + count):
+            self._insert(rows, node)
+            self.size = node + 1
+
+    def _insert(self, rows: RowsFunc, node: int):
+        level = int(-math.log(1.0 - self.rng.random()) * self.level_mult)
+        self.levels[node] = level
+        while len(self.upper) < level:
+            self.upper.append({})
+        for lc in range(1, level + 1):
+            self.upper[lc - 1][node] = np.zeros(0, dtype=np.int32)
+
+        if self.entry < 0:
+            self.entry = node
+            self.max_level = level
+            return
+
+        query = rows(np.asarray([node]))[0]
+        entries = [self.entry]
+        for lc in range(self.max_level, level, -1):
+            entries = [self._search_layer(rows, query, entries, 1, lc)[0][1]]
+
+        for lc in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(rows, query, entries, self.ef_construction, lc)
+            candidates = np.asarray([n for _, n in found], dtype=np.int32)
+            selected = self._select(candidates, rows(candidates), np.asarray([sim for sim, _ in found]), self.m)
+            self._set_neighbors(node, lc, selected)
+            for neighbor in selected.tolist():
+                self._connect(rows, node, neighbor, lc)
+            entries = [n for _, n in found]
+
+        if level > self.max_level:
+            self.entry = node
+            self.max_level = level
+
+    def search(self, rows: RowsFunc, query: np.ndarray, k: int, ef: int = 64) -> tuple[np.ndarray, np.ndarray]:
+        """(nodes, similarities) of the about-k nearest nodes, best first"""
+        if self.entry < 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        entries = [self.entry]
+        for lc in range(self.max_level, 0, -1):
+            entries = [self._search_layer(rows, query, entries, 1, lc)[0][1]]
+
+        found = self._search_layer(rows, query, entries, max(ef, k), 0)[:k]
+        return (
+            np.asarray([node for _, node in found], dtype=np.int64),
+            np.asarray([sim for sim, _ in found], dtype=np.float32),
+        )
+
+    def save(self, path: str):
+        arrays = {
+            'header': np.asarray([self.m, self.ef_construction, self.size, self.entry, self.max_level]),
+            'levels': self.levels[: self.size],
+            'neighbors0': self.neighbors0[: self.size],
+        }
+        for level, nodes in enumerate(self.upper, start=1):
+            node_ids = np.asarray(sorted(nodes), dtype=np.int32)
+            neighbors = np.full((len(node_ids), self.m), -1, dtype=np.int32)
+            for i, node in enumerate(node_ids.tolist()):
+                neighbors[i, : len(nodes[node])] = nodes[node]
+            arrays[f'nodes{level}'] = node_ids
+            arrays[f'neighbors{level}'] = neighbors
+
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> HNSWGraph:
+        with np.load(path) as data:
+            m, ef_construction, size, entry, max_level = data['header'].tolist()
+            graph = cls(m=m, ef_construction=ef_construction)
+            graph.size = size
+            graph.entry = entry
+            graph.max_level = max_level
+            graph.levels = data['levels'].copy()
+            graph.neighbors0 = data['neighbors0'].copy()
+            graph.counts0 = (graph.neighbors0 >= 0).sum(axis=1).astype(np.int32)
+            graph._visited = np.zeros(size, dtype=np.int64)
+            for level in range(1, max_level + 1):
+                node_ids = data[f'nodes{level}']
+                neighbors = data[f'neighbors{level}']
+                graph.upper.append({node: row[row >= 0] for node, row in zip(node_ids.tolist(), neighbors)})
+        return graph
@@ -7,6 +7,35 @@ from .vdbs.qdrant import QdrantVectorDatabase
 from .vdbs.seekdb import SeekDBVectorDatabase
 from .vdbs.milvus import MilvusVectorDatabase
 from .vdbs.pgvector_db import PgVectorDatabase
+from .vdbs.native import NativeVectorDatabase
+
+
+def create_pgvector_database(ap: app.Application, pgvector_config: dict) -> PgVectorDatabase:
+    """pgvector backend of the vdb.pgvector config"""
+    index_options = {
+        'index_type': pgvector_config.get('index_type', 'none'),
+        'quantization': pgvector_config.get('quantization', 'none'),
+        'hnsw_m': pgvector_config.get('hnsw_m', 16),
+        'ef_construction': pgvector_config.get('ef_construction', 64),
+        'ef_search': pgvector_config.get('ef_search', 200),
+        'ivfflat_lists': pgvector_config.get('ivfflat_lists', 100),
+        'probes': pgvector_config.get('probes', 10),
+        'rerank_factor': pgvector_config.get('rerank_factor', 4),
+    }
+    connection_string = pgvector_config.get('connection_string')
+    if connection_string:
+        return PgVectorDatabase(ap, connection_string=connection_string, **index_options)
+
+    # Use individual parameters
+    return PgVectorDatabase(
+        ap,
+        host=pgvector_config.get('host', 'localhost'),
+        port=pgvector_config.get('port', 5432),
+        database=pgvector_config.get('database', 'langbot'),
+        user=pgvector_config.get('user', 'postgres'),
+        password=pgvector_config.get('password', 'postgres'),
+        **index_options,
+    )
 
 
 class VectorDBManager:
@@ -42,23 +71,22 @@ class VectorDBManager:
                 self.ap.logger.info('Initialized Milvus vector database backend.')
 
             elif vdb_type == 'pgvector':
-                # Get pgvector configuration
-                pgvector_config = kb_config.get('pgvector', {})
-                connection_string = pgvector_config.get('connection_string')
-                if connection_string:
-                    self.vector_db = PgVectorDatabase(self.ap, connection_string=connection_string)
-                else:
-                    # Use individual parameters
-                    host = pgvector_config.get('host', 'localhost')
-                    port = pgvector_config.get('port', 5432)
-                    database = pgvector_config.get('database', 'langbot')
-                    user = pgvector_config.get('user', 'postgres')
-                    password = pgvector_config.get('password', 'postgres')
-                    self.vector_db = PgVectorDatabase(
-                        self.ap, host=host, port=port, database=database, user=user, password=password
-                    )
+                self.vector_db = create_pgvector_database(self.ap, kb_config.get('pgvector', {}))
                 self.ap.logger.info('Initialized pgvector database backend.')
 
+            elif vdb_type == 'native':
+                native_config = kb_config.get('native', {})
+                self.vector_db = NativeVectorDatabase(
+                    self.ap,
+                    base_path=native_config.get('path', './data/native_vdb'),
+                    quantization=native_config.get('quantization', 'none'),
+                    hnsw_threshold=native_config.get('hnsw_threshold', 100000),
+                    hnsw_m=native_config.get('hnsw_m', 32),
+                    ef_construction=native_config.get('ef_construction', 200),
+                    ef_search=native_config.get('ef_search', 200),
+                )
+                self.ap.logger.info('Initialized native vector database backend.')
+
             else:
                 self.vector_db = ChromaVectorDatabase(self.ap)
                 self.ap.logger.warning('No valid vector database backend configured, defaulting to Chroma.')
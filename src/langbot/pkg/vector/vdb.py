@@ -1,10 +1,25 @@
 from __future__ import annotations
 import abc
-from typing import Any, Dict
+from typing import Any, AsyncIterable, Dict, Iterable
 import numpy as np
 
 
+VectorItem = tuple[str, list[float], dict[str, Any]]
+"""(id, embedding, metadata) of one vector"""
+
+
+async def _aiter(items: Iterable[VectorItem]) -> AsyncIterable[VectorItem]:
+    for item in items:
+        yield item
+
+
 class VectorDatabase(abc.ABC):
+    upsert_batch_size: int = 256
+    """Vectors sent per request by upsert_iter, tuned by each backend to its payload limits."""
+
+    higher_is_better: bool = False
+    """Whether the 'distances' returned by search are similarities, larger meaning closer."""
+
     @abc.abstractmethod
     async def add_embeddings(
         self,
@@ -17,16 +32,78 @@ class VectorDatabase(abc.ABC):
         """Add vector data to the specified collection."""
         pass
 
+    @abc.abstractmethod
+    async def upsert(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        """Add vector data to the specified collection, replacing vectors whose id already exists."""
+        pass
+
+    async def upsert_iter(
+        self,
+        collection: str,
+        items: Iterable[VectorItem] | AsyncIterable[VectorItem],
+        batch_size: int = 0,
+    ) -> int:
+        """Upsert a stream of (id, embedding, metadata) items in batches, returns the number of items.
+
+        Only one batch is held at a time, batch_size defaults to the backend's upsert_batch_size.
+        """
+        batch_size = batch_size or self.upsert_batch_size
+        if not hasattr(items, '__aiter__'):
+            items = _aiter(items)
+
+        batch: list[VectorItem] = []
+        total = 0
+        async for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                total += await self._upsert_items(collection, batch)
+                batch = []
+        if batch:
+            total += await self._upsert_items(collection, batch)
+        return total
+
+    async def _upsert_items(self, collection: str, items: list[VectorItem]) -> int:
+        ids, embeddings_list, metadatas = (list(column) for column in zip(*items))
+        await self.upsert(collection, ids, embeddings_list, metadatas)
+        return len(items)
+
     @abc.abstractmethod
     async def search(self, collection: str, query_embedding: np.ndarray, k: int = 5) -> Dict[str, Any]:
         """Search for the most similar vectors in the specified collection."""
         pass
 
+    @abc.abstractmethod
+    async def search_batch(self, collection: str, query_embeddings: list[list[float]], k: int = 5) -> Dict[str, Any]:
+        """Search for several queries at once, 'ids', 'distances' and 'metadatas' hold one list per query."""
+        pass
+
+    @abc.abstractmethod
+    async def count(self, collection: str) -> int:
+        """Number of vectors in the specified collection, 0 if it does not exist."""
+        pass
+
+    @abc.abstractmethod
+    async def stats(self, collection: str) -> Dict[str, Any]:
+        """Statistics of the specified collection: 'backend', 'count', 'dimension' (None while empty) and
+        backend specific entries."""
+        pass
+
     @abc.abstractmethod
     async def delete_by_file_id(self, collection: str, file_id: str) -> None:
         """Delete vectors from the specified collection by file_id."""
         pass
 
+    @abc.abstractmethod
+    async def delete_by_ids(self, collection: str, ids: list[str]) -> None:
+        """Delete vectors from the specified collection by id, unknown ids are ignored."""
+        pass
+
     @abc.abstractmethod
     async def get_or_create_collection(self, collection: str):
         """Get or create collection."""
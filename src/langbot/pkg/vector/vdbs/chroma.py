@@ -13,6 +13,8 @@ class ChromaVectorDatabase(VectorDatabase):
         self.ap = ap
         self.client = PersistentClient(path=base_path)
         self._collections = {}
+        # the largest batch the client accepts in one call
+        self.upsert_batch_size = self.client.get_max_batch_size()
 
     async def get_or_create_collection(self, collection: str) -> chromadb.Collection:
         if collection not in self._collections:
@@ -33,6 +35,17 @@ class ChromaVectorDatabase(VectorDatabase):
         await asyncio.to_thread(col.add, embeddings=embeddings_list, ids=ids, metadatas=metadatas)
         self.ap.logger.info(f"Added {len(ids)} embeddings to Chroma collection '{collection}'.")
 
+    async def upsert(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        col = await self.get_or_create_collection(collection)
+        await asyncio.to_thread(col.upsert, embeddings=embeddings_list, ids=ids, metadatas=metadatas)
+        self.ap.logger.info(f"Upserted {len(ids)} embeddings to Chroma collection '{collection}'.")
+
     async def search(self, collection: str, query_embedding: list[float], k: int = 5) -> dict[str, Any]:
         col = await self.get_or_create_collection(collection)
         results = await asyncio.to_thread(
@@ -44,11 +57,44 @@ class ChromaVectorDatabase(VectorDatabase):
         self.ap.logger.info(f"Chroma search in '{collection}' returned {len(results.get('ids', [[]])[0])} results.")
         return results
 
+    async def search_batch(self, collection: str, query_embeddings: list[list[float]], k: int = 5) -> dict[str, Any]:
+        if not query_embeddings:
+            return {'ids': [], 'metadatas': [], 'distances': []}
+        col = await self.get_or_create_collection(collection)
+        results = await asyncio.to_thread(
+            col.query,
+            query_embeddings=query_embeddings,
+            n_results=k,
+            include=['metadatas', 'distances', 'documents'],
+        )
+        self.ap.logger.info(f"Chroma batch search of {len(query_embeddings)} queries in '{collection}'.")
+        return results
+
+    async def count(self, collection: str) -> int:
+        col = await self.get_or_create_collection(collection)
+        return await asyncio.to_thread(col.count)
+
+    async def stats(self, collection: str) -> dict[str, Any]:
+        col = await self.get_or_create_collection(collection)
+        count = await asyncio.to_thread(col.count)
+        dimension = None
+        if count:
+            sample = await asyncio.to_thread(col.get, limit=1, include=['embeddings'])
+            dimension = len(sample['embeddings'][0])
+        return {'backend': 'chroma', 'count': count, 'dimension': dimension}
+
     async def delete_by_file_id(self, collection: str, file_id: str) -> None:
         col = await self.get_or_create_collection(collection)
         await asyncio.to_thread(col.delete, where={'file_id': file_id})
         self.ap.logger.info(f"Deleted embeddings from Chroma collection '{collection}' with file_id: {file_id}")
 
+    async def delete_by_ids(self, collection: str, ids: list[str]) -> None:
+        if not ids:
+            return
+        col = await self.get_or_create_collection(collection)
+        await asyncio.to_thread(col.delete, ids=ids)
+        self.ap.logger.info(f"Deleted {len(ids)} embeddings from Chroma collection '{collection}'.")
+
     async def delete_collection(self, collection: str):
         if collection in self._collections:
             del self._collections[collection]
@@ -10,6 +10,12 @@ from langbot.pkg.core import app
 class MilvusVectorDatabase(VectorDatabase):
     """Milvus vector database implementation"""
 
+    # keeps a batch of 3072-dimensional vectors under the 64 MB gRPC message limit
+    upsert_batch_size = 1000
+
+    # the COSINE metric reports similarity as 'distance'
+    higher_is_better = True
+
     def __init__(self, ap: app.Application, uri: str = 'milvus.db', token: str = None, db_name: str = None):
         """Initialize Milvus vector database
 
@@ -173,7 +179,21 @@ class MilvusVectorDatabase(VectorDatabase):
         vector_size = len(embeddings_list[0])
         await self._get_or_create_collection_internal(collection, vector_size)
 
-        # Prepare data in Milvus format
+        data = self._to_entities(ids, embeddings_list, metadatas)
+
+        # Insert data into Milvus
+        await asyncio.to_thread(self.client.insert, collection_name=collection, data=data)
+
+        # Load collection for searching (Milvus requires this)
+        await asyncio.to_thread(self.client.load_collection, collection_name=collection)
+
+        self.ap.logger.info(f"Added {len(ids)} embeddings to Milvus collection '{collection}'")
+
+    @staticmethod
+    def _to_entities(
+        ids: list[str], embeddings_list: list[list[float]], metadatas: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Prepare data in Milvus format"""
         data = []
         for i, vector_id in enumerate(ids):
             entry = {
@@ -191,14 +211,65 @@ class MilvusVectorDatabase(VectorDatabase):
                 if 'uuid' in metadata:
                     entry['chunk_uuid'] = metadata['uuid']
             data.append(entry)
+        return data
 
-        # Insert data into Milvus
-        await asyncio.to_thread(self.client.insert, collection_name=collection, data=data)
+    async def upsert(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        """Insert vector embeddings, replacing the entities whose id already exists
 
-        # Load collection for searching (Milvus requires this)
+        Args:
+            collection: Collection name
+            ids: List of unique IDs for each vector
+            embeddings_list: List of embedding vectors
+            metadatas: List of metadata dictionaries for each vector
+        """
+        collection = self._normalize_collection_name(collection)
+
+        if not embeddings_list:
+            return
+
+        await self._get_or_create_collection_internal(collection, len(embeddings_list[0]))
+
+        data = self._to_entities(ids, embeddings_list, metadatas)
+        await asyncio.to_thread(self.client.upsert, collection_name=collection, data=data)
         await asyncio.to_thread(self.client.load_collection, collection_name=collection)
 
-        self.ap.logger.info(f"Added {len(ids)} embeddings to Milvus collection '{collection}'")
+        self.ap.logger.info(f"Upserted {len(ids)} embeddings to Milvus collection '{collection}'")
+
+    @staticmethod
+    def _to_result(results: list) -> Dict[str, Any]:
+        """Convert results to Chroma-compatible format, one list per query
+
+        Milvus returns: [[ {id, distance, entity: {...}} ]]
+        """
+        result = {'ids': [], 'distances': [], 'metadatas': []}
+        for hits in results or []:
+            ids = []
+            distances = []
+            metadatas = []
+            for hit in hits:
+                ids.append(hit.get('id', ''))
+                distances.append(hit.get('distance', 0.0))
+
+                # Build metadata from entity fields
+                entity = hit.get('entity', {})
+                metadata = {}
+                if 'text' in entity:
+                    metadata['text'] = entity['text']
+                if 'file_id' in entity:
+                    metadata['file_id'] = entity['file_id']
+                if 'chunk_uuid' in entity:
+                    metadata['uuid'] = entity['chunk_uuid']
+                metadatas.append(metadata)
+            result['ids'].append(ids)
+            result['distances'].append(distances)
+            result['metadatas'].append(metadatas)
+        return result
 
     async def search(self, collection: str, query_embedding: list[float], k: int = 5) -> Dict[str, Any]:
         """Search for similar vectors in Milvus collection
@@ -226,33 +297,76 @@ class MilvusVectorDatabase(VectorDatabase):
             output_fields=['text', 'file_id', 'chunk_uuid'],
         )
 
-        # Convert results to Chroma-compatible format
-        # Milvus returns: [[ {id, distance, entity: {...}} ]]
-        ids = []
-        distances = []
-        metadatas = []
+        result = self._to_result(results[:1]) if results else {'ids': [[]], 'distances': [[]], 'metadatas': [[]]}
 
-        if results and len(results) > 0:
-            for hit in results[0]:
-                ids.append(hit.get('id', ''))
-                distances.append(hit.get('distance', 0.0))
+        self.ap.logger.info(f"Milvus search in '{collection}' returned {len(result['ids'][0])} results")
+        return result
 
-                # Build metadata from entity fields
-                entity = hit.get('entity', {})
-                metadata = {}
-                if 'text' in entity:
-                    metadata['text'] = entity['text']
-                if 'file_id' in entity:
-                    metadata['file_id'] = entity['file_id']
-                if 'chunk_uuid' in entity:
-                    metadata['uuid'] = entity['chunk_uuid']
-                metadatas.append(metadata)
+    async def search_batch(self, collection: str, query_embeddings: list[list[float]], k: int = 5) -> Dict[str, Any]:
+        """Search for several query vectors in one request
 
-        # Return in Chroma-compatible format (nested lists)
-        result = {'ids': [ids], 'distances': [distances], 'metadatas': [metadatas]}
+        Args:
+            collection: Collection name
+            query_embeddings: Query vectors
+            k: Number of top results to return per query
 
-        self.ap.logger.info(f"Milvus search in '{collection}' returned {len(ids)} results")
-        return result
+        Returns:
+            Dictionary with one result list per query in Chroma-compatible format
+        """
+        if not query_embeddings:
+            return {'ids': [], 'distances': [], 'metadatas': []}
+        collection = self._normalize_collection_name(collection)
+        await self.get_or_create_collection(collection)
+
+        results = await asyncio.to_thread(
+            self.client.search,
+            collection_name=collection,
+            data=query_embeddings,
+            limit=k,
+            search_params={'metric_type': 'COSINE', 'params': {}},
+            output_fields=['text', 'file_id', 'chunk_uuid'],
+        )
+
+        self.ap.logger.info(f"Milvus batch search of {len(query_embeddings)} queries in '{collection}'")
+        return self._to_result(results)
+
+    async def count(self, collection: str) -> int:
+        """Number of entities in a Milvus collection
+
+        Args:
+            collection: Collection name
+        """
+        collection = self._normalize_collection_name(collection)
+        has_collection = await asyncio.to_thread(self.client.has_collection, collection_name=collection)
+        if not has_collection:
+            return 0
+
+        # count(*) honours deletions, unlike the row count of get_collection_stats
+        await asyncio.to_thread(self.client.load_collection, collection_name=collection)
+        rows = await asyncio.to_thread(self.client.query, collection_name=collection, output_fields=['count(*)'])
+        return int(rows[0]['count(*)']) if rows else 0
+
+    async def stats(self, collection: str) -> Dict[str, Any]:
+        """Statistics of a Milvus collection
+
+        Args:
+            collection: Collection name
+        """
+        normalized = self._normalize_collection_name(collection)
+        has_collection = await asyncio.to_thread(self.client.has_collection, collection_name=normalized)
+        if not has_collection:
+            return {'backend': 'milvus', 'count': 0, 'dimension': None}
+
+        description = await asyncio.to_thread(self.client.describe_collection, collection_name=normalized)
+        dimension = next(
+            (field['params'].get('dim') for field in description['fields'] if field['name'] == 'vector'), None
+        )
+        return {
+            'backend': 'milvus',
+            'count': await self.count(collection),
+            'dimension': int(dimension) if dimension is not None else None,
+            'collection': normalized,
+        }
 
     async def delete_by_file_id(self, collection: str, file_id: str) -> None:
         """Delete vectors from collection by file_id
@@ -268,6 +382,21 @@ class MilvusVectorDatabase(VectorDatabase):
         await asyncio.to_thread(self.client.delete, collection_name=collection, filter=f'file_id == "{file_id}"')
         self.ap.logger.info(f"Deleted embeddings from Milvus collection '{collection}' with file_id: {file_id}")
 
+    async def delete_by_ids(self, collection: str, ids: list[str]) -> None:
+        """Delete vectors from collection by id
+
+        Args:
+            collection: Collection name
+            ids: IDs of the vectors to delete
+        """
+        if not ids:
+            return
+        collection = self._normalize_collection_name(collection)
+        await self.get_or_create_collection(collection)
+
+        await asyncio.to_thread(self.client.delete, collection_name=collection, ids=ids)
+        self.ap.logger.info(f"Deleted {len(ids)} embeddings from Milvus collection '{collection}'")
+
     async def delete_collection(self, collection: str):
         """Delete a Milvus collection
 
@@ -0,0 +1,498 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+from typing import Any
+
+import numpy as np
+
+from langbot.pkg.core import app
+from langbot.pkg.vector.hnsw import HNSWGraph
+from langbot.pkg.vector.vdb import VectorDatabase
+
+QUANTIZATIONS = ('none', 'int8')
+
+SCAN_BLOCK_ROWS = 65536
+"""Rows dequantized at a time by an exact int8 scan"""
+
+
+class NativeCollection:
+    """Vectors of one collection in memory-mapped files under its own directory
+
+    info.json        dim and quantization, fixed when the first vector is added
+    vectors.f32      normalized float32 rows, or
+    vectors.i8       int8 rows, and
+    scales.f32       one dequantization scale per int8 row
+    meta.jsonl       {"id": ..., "metadata": {...}} per row
+    deleted.i32      deleted row numbers, appended by deletes and upserts
+    hnsw.npz         graph over the first rows, once the collection is large enough
+
+    Files are only appended to; deleted rows are skipped by searches and dropped when more
+    than a quarter of the rows are deleted, which rewrites the files and the graph.
+    Every method takes the collection lock, call them from worker threads.
+    """
+
+    def __init__(self, path: str, quantization: str, hnsw_threshold: int, hnsw_m: int, ef_construction: int):
+        self.path = path
+        self.hnsw_threshold = hnsw_threshold
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.lock = threading.RLock()
+
+        self.dim = 0
+        self.quantization = quantization
+        self.ids: list[str] = []
+        self.metadatas: list[dict[str, Any]] = []
+        self.rows_by_id: dict[str, int] = {}
+        self.rows_by_file: dict[str, list[int]] = {}
+        self.deleted = np.zeros(0, dtype=bool)
+        self.deleted_count = 0
+
+        self._vectors: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+        self.graph: HNSWGraph | None = None
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def _vector_file(self) -> str:
+        return self._file('vectors.i8' if self.quantization == 'int8' else 'vectors.f32')
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.deleted_count
+
+    def _load(self):
+        if not os.path.exists(self._file('info.json')):
+            return
+
+        with open(self._file('info.json')) as f:
+            info = json.load(f)
+        self.dim = info['dim']
+        self.quantization = info['quantization']
+
+        row_size = self.dim * (1 if self.quantization == 'int8' else 4)
+        rows = os.path.getsize(self._vector_file) // row_size
+        if self.quantization == 'int8':
+            rows = min(rows, os.path.getsize(self._file('scales.f32')) // 4)
+
+        with open(self._file('meta.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                if len(self.ids) >= rows:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a write interrupted half way
+                    break
+                self._index_row(len(self.ids), record['id'], record['metadata'])
+                self.ids.append(record['id'])
+                self.metadatas.append(record['metadata'])
+
+        # rows of an interrupted add are cut back to the rows every file has
+        rows = len(self.ids)
+        with open(self._vector_file, 'ab') as f:
+            f.truncate(rows * row_size)
+        if self.quantization == 'int8':
+            with open(self._file('scales.f32'), 'ab') as f:
+                f.truncate(rows * 4)
+
+        self.deleted = np.zeros(rows, dtype=bool)
+        if os.path.exists(self._file('deleted.i32')):
+            deleted_rows = np.fromfile(self._file('deleted.i32'), dtype=np.int32)
+            self.deleted[deleted_rows[deleted_rows < rows]] = True
+        self.deleted_count = int(self.deleted.sum())
+        for row in np.flatnonzero(self.deleted).tolist():
+            self._unindex_row(row)
+
+        self._map()
+
+        if os.path.exists(self._file('hnsw.npz')):
+            graph = HNSWGraph.load(self._file('hnsw.npz'))
+            if graph.size <= rows:
+                self.graph = graph
+
+    def _index_row(self, row: int, vector_id: str, metadata: dict[str, Any]):
+        self.rows_by_id[vector_id] = row
+        self.rows_by_file.setdefault(metadata.get('file_id'), []).append(row)
+
+    def _unindex_row(self, row: int):
+        if self.rows_by_id.get(self.ids[row]) == row:
+            del self.rows_by_id[self.ids[row]]
+        file_rows = self.rows_by_file.get(self.metadatas[row].get('file_id'))
+        if file_rows is not None and row in file_rows:
+            file_rows.remove(row)
+
+    def _map(self):
+        rows = len(self.ids)
+        if rows == 0:
+            self._vectors = self._scales = None
+            return
+        dtype = np.int8 if self.quantization == 'int8' else np.float32
+        self._vectors = np.memmap(self._vector_file, dtype=dtype, mode='r', shape=(rows, self.dim))
+        if self.quantization == 'int8':
+            self._scales = np.memmap(self._file('scales.f32'), dtype=np.float32, mode='r', shape=(rows,))
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        """Normalized float32 vectors of some rows"""
+        vectors = self._vectors[indices]
+        if self.quantization == 'int8':
+            return vectors.astype(np.float32) * self._scales[indices, None]
+        return vectors
+
+    def _scan(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Similarities of rows [start, end) to query, or to each column of a (dim, queries) matrix"""
+        if self.quantization != 'int8':
+            return self._vectors[start:end] @ query
+        sims = np.empty((end - start, *query.shape[1:]), dtype=np.float32)
+        for block in range(start, end, SCAN_BLOCK_ROWS):
+            block_end = min(block + SCAN_BLOCK_ROWS, end)
+            sims[block - start : block_end - start] = self._vectors[block:block_end].astype(np.float32) @ query
+        return sims * self._scales[start:end].reshape(-1, *[1] * (query.ndim - 1))
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        return embeddings / np.where(norms > 0, norms, 1)
+
+    def add(self, ids: list[str], embeddings: list[list[float]], metadatas: list[dict[str, Any]]):
+        """Append vectors, an id already present replaces its old vector"""
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        # an id given more than once keeps its last vector
+        last = {vector_id: i for i, vector_id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+            vectors = vectors[keep]
+        with self.lock:
+            if not self.dim:
+                self.dim = vectors.shape[1]
+                with open(self._file('info.json'), 'w') as f:
+                    json.dump({'dim': self.dim, 'quantization': self.quantization}, f)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f'Embedding dimension {vectors.shape[1]} does not match collection dimension {self.dim}'
+                )
+
+            replaced = [self.rows_by_id[vector_id] for vector_id in ids if vector_id in self.rows_by_id]
+            if replaced:
+                self._mark_deleted(replaced)
+
+            if self.quantization == 'int8':
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                with open(self._file('scales.f32'), 'ab') as f:
+                    f.write(scales.astype(np.float32).tobytes())
+                data = np.round(vectors / scales[:, None]).astype(np.int8)
+            else:
+                data = vectors
+            with open(self._vector_file, 'ab') as f:
+                f.write(data.tobytes())
+            with open(self._file('meta.jsonl'), 'a', encoding='utf-8') as f:
+                for vector_id, metadata in zip(ids, metadatas):
+                    f.write(json.dumps({'id': vector_id, 'metadata': metadata}, ensure_ascii=False) + '\n')
+
+            for vector_id, metadata in zip(ids, metadatas):
+                self._index_row(len(self.ids), vector_id, metadata)
+                self.ids.append(vector_id)
+                self.metadatas.append(metadata)
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(ids), dtype=bool)])
+            self._map()
+
+    def _mark_deleted(self, rows: list[int]):
+        for row in rows:
+            self._unindex_row(row)
+        self.deleted[rows] = True
+        self.deleted_count = int(self.deleted.sum())
+        with open(self._file('deleted.i32'), 'ab') as f:
+            f.write(np.asarray(rows, dtype=np.int32).tobytes())
+
+    def _delete_rows(self, rows: list[int]) -> int:
+        if rows:
+            self._mark_deleted(rows)
+            if self.deleted_count * 4 > len(self.ids):
+                self._compact()
+        return len(rows)
+
+    def delete_by_file_id(self, file_id: str) -> int:
+        with self.lock:
+            return self._delete_rows(list(self.rows_by_file.pop(file_id, [])))
+
+    def delete_ids(self, ids: list[str]) -> int:
+        with self.lock:
+            return self._delete_rows(list({self.rows_by_id[i] for i in ids if i in self.rows_by_id}))
+
+    def _compact(self):
+        """Rewrite the files without the deleted rows, the graph is rebuilt afterwards"""
+        keep = np.flatnonzero(~self.deleted)
+        for name in ('vectors.f32', 'vectors.i8', 'scales.f32', 'meta.jsonl', 'deleted.i32', 'hnsw.npz'):
+            if os.path.exists(self._file(name + '.tmp')):
+                os.remove(self._file(name + '.tmp'))
+
+        for start in range(0, len(keep), SCAN_BLOCK_ROWS):
+            block = keep[start : start + SCAN_BLOCK_ROWS]
+            with open(self._vector_file + '.tmp', 'ab') as f:
+                f.write(np.ascontiguousarray(self._vectors[block]).tobytes())
+            if self.quantization == 'int8':
+                with open(self._file('scales.f32.tmp'), 'ab') as f:
+                    f.write(np.ascontiguousarray(self._scales[block]).tobytes())
+        with open(self._file('meta.jsonl.tmp'), 'w', encoding='utf-8') as f:
+            for row in keep.tolist():
+                f.write(json.dumps({'id': self.ids[row], 'metadata': self.metadatas[row]}, ensure_ascii=False) + '\n')
+
+        self._vectors = self._scales = None
+        self.graph = None
+        for name in ('hnsw.npz', 'deleted.i32'):
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+        for name in (os.path.basename(self._vector_file), 'scales.f32', 'meta.jsonl'):
+            if os.path.exists(self._file(name + '.tmp')):
+                os.replace(self._file(name + '.tmp'), self._file(name))
+            elif os.path.exists(self._file(name)):
+                # nothing kept
+                os.remove(self._file(name))
+                open(self._file(name), 'wb').close()
+
+        ids, metadatas = self.ids, self.metadatas
+        self.ids, self.metadatas = [], []
+        self.rows_by_id, self.rows_by_file = {}, {}
+        for row in keep.tolist():
+            self._index_row(len(self.ids), ids[row], metadatas[row])
+            self.ids.append(ids[row])
+            self.metadatas.append(metadatas[row])
+        self.deleted = np.zeros(len(self.ids), dtype=bool)
+        self.deleted_count = 0
+        self._map()
+
+    def needs_indexing(self) -> bool:
+        return len(self) >= self.hnsw_threshold and (self.graph is None or self.graph.size < len(self.ids))
+
+    def build_index(self, max_rows: int) -> bool:
+        """Add up to max_rows rows to the graph, returns whether rows are left"""
+        with self.lock:
+            if self.graph is None:
+                self.graph = HNSWGraph(m=self.hnsw_m, ef_construction=self.ef_construction)
+            self.graph.add(self.rows, min(max_rows, len(self.ids) - self.graph.size))
+            if self.graph.size < len(self.ids):
+                return True
+            self.graph.save(self._file('hnsw.npz'))
+            return False
+
+    def search(
+        self, query_embedding: list[float], k: int, ef_search: int, file_ids: list[str] | None = None
+    ) -> tuple[list[str], list[float], list[dict[str, Any]]]:
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        with self.lock:
+            if self._vectors is None or k <= 0:
+                return [], [], []
+
+            if file_ids is not None:
+                # filtered searches scan the rows of those files only
+                candidates = np.asarray(
+                    sorted(row for file_id in set(file_ids) for row in self.rows_by_file.get(file_id, [])),
+                    dtype=np.int64,
+                )
+                sims = self.rows(candidates) @ query if len(candidates) else np.zeros(0, dtype=np.float32)
+            elif self.graph is not None and len(self) >= self.hnsw_threshold:
+                # the graph covers the first rows, rows added since are scanned;
+                # deleted rows stay in the graph until compaction, so ask for a few more
+                nodes, node_sims = self.graph.search(self.rows, query, k + min(self.deleted_count, 4 * k), ef_search)
+                tail = np.arange(self.graph.size, len(self.ids))
+                candidates = np.concatenate([nodes, tail])
+                sims = np.concatenate([node_sims, self._scan(query, self.graph.size, len(self.ids))])
+            else:
+                candidates = np.arange(len(self.ids))
+                sims = self._scan(query, 0, len(self.ids))
+
+            live = ~self.deleted[candidates]
+            return self._top(candidates[live], sims[live], k)
+
+    def _top(
+        self, candidates: np.ndarray, sims: np.ndarray, k: int
+    ) -> tuple[list[str], list[float], list[dict[str, Any]]]:
+        if len(candidates) > k:
+            top = np.argpartition(-sims, k - 1)[:k]
+            candidates, sims = candidates[top], sims[top]
+        order = np.argsort(-sims, kind='stable')
+        rows = candidates[order].tolist()
+        return (
+            [self.ids[row] for row in rows],
+            (1 - sims[order]).tolist(),
+            [self.metadatas[row] for row in rows],
+        )
+
+    def search_batch(
+        self, query_embeddings: list[list[float]], k: int, ef_search: int
+    ) -> list[tuple[list[str], list[float], list[dict[str, Any]]]]:
+        """search for each query; exact searches share one pass over the rows"""
+        with self.lock:
+            if (
+                self._vectors is None
+                or k <= 0
+                or not query_embeddings
+                or (self.graph is not None and len(self) >= self.hnsw_threshold)
+            ):
+                return [self.search(query_embedding, k, ef_search) for query_embedding in query_embeddings]
+
+            queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+            candidates = np.flatnonzero(~self.deleted)
+            sims = self._scan(queries.T, 0, len(self.ids))[candidates]
+            return [self._top(candidates, sims[:, i], k) for i in range(len(query_embeddings))]
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                'count': len(self),
+                'dimension': self.dim or None,
+                'quantization': self.quantization,
+                'rows': len(self.ids),
+                'deleted_rows': self.deleted_count,
+                'graph_size': self.graph.size if self.graph is not None else 0,
+            }
+
+
+class NativeVectorDatabase(VectorDatabase):
+    """Built-in vector index, exact NumPy search and an HNSW graph for large collections"""
+
+    # appends are local file writes, larger batches only cost memory
+    upsert_batch_size = 4096
+
+    def __init__(
+        self,
+        ap: app.Application,
+        base_path: str = './data/native_vdb',
+        quantization: str = 'none',
+        hnsw_threshold: int = 100000,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 200,
+    ):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f'Unsupported quantization: {quantization}')
+
+        self.ap = ap
+        self.base_path = base_path
+        self.quantization = quantization
+        self.hnsw_threshold = hnsw_threshold
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._collections: dict[str, NativeCollection] = {}
+        self._indexing: dict[str, asyncio.Task] = {}
+
+    async def get_or_create_collection(self, collection: str) -> NativeCollection:
+        if collection not in self._collections:
+            self._collections[collection] = await asyncio.to_thread(
+                NativeCollection,
+                os.path.join(self.base_path, collection),
+                self.quantization,
+                self.hnsw_threshold,
+                self.hnsw_m,
+                self.ef_construction,
+            )
+            self.ap.logger.info(f"Native vector collection '{collection}' accessed/created.")
+        return self._collections[collection]
+
+    def _schedule_indexing(self, collection: str, col: NativeCollection):
+        if not col.needs_indexing() or collection in self._indexing:
+            return
+
+        async def build():
+            try:
+                # small steps, so searches waiting for the lock are not held up long
+                while await asyncio.to_thread(col.build_index, 256):
+                    pass
+                self.ap.logger.info(f"HNSW graph of native vector collection '{collection}' is up to date.")
+            except Exception as e:
+                self.ap.logger.error(f"Failed to build HNSW graph of native vector collection '{collection}': {e}")
+            finally:
+                self._indexing.pop(collection, None)
+
+        self._indexing[collection] = asyncio.create_task(build())
+
+    async def add_embeddings(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        if not ids:
+            return
+        col = await self.get_or_create_collection(collection)
+        await asyncio.to_thread(col.add, ids, embeddings_list, metadatas)
+        self.ap.logger.info(f"Added {len(ids)} embeddings to native vector collection '{collection}'.")
+        self._schedule_indexing(collection, col)
+
+    async def upsert(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        # adding an id already present replaces its vector
+        await self.add_embeddings(collection, ids, embeddings_list, metadatas)
+
+    async def search(
+        self, collection: str, query_embedding: list[float], k: int = 5, file_ids: list[str] | None = None
+    ) -> dict[str, Any]:
+        """file_ids restricts the search to the chunks of those files"""
+        col = await self.get_or_create_collection(collection)
+        ids, distances, metadatas = await asyncio.to_thread(col.search, query_embedding, k, self.ef_search, file_ids)
+        self.ap.logger.info(f"Native vector search in '{collection}' returned {len(ids)} results.")
+        return {'ids': [ids], 'metadatas': [metadatas], 'distances': [distances]}
+
+    async def search_batch(self, collection: str, query_embeddings: list[list[float]], k: int = 5) -> dict[str, Any]:
+        col = await self.get_or_create_collection(collection)
+        results = await asyncio.to_thread(col.search_batch, query_embeddings, k, self.ef_search)
+        self.ap.logger.info(f"Native vector batch search of {len(query_embeddings)} queries in '{collection}'.")
+        return {
+            'ids': [ids for ids, _, _ in results],
+            'metadatas': [metadatas for _, _, metadatas in results],
+            'distances': [distances for _, distances, _ in results],
+        }
+
+    async def count(self, collection: str) -> int:
+        col = await self.get_or_create_collection(collection)
+        return len(col)
+
+    async def stats(self, collection: str) -> dict[str, Any]:
+        col = await self.get_or_create_collection(collection)
+        return {'backend': 'native', **await asyncio.to_thread(col.stats)}
+
+    async def delete_by_file_id(self, collection: str, file_id: str) -> None:
+        col = await self.get_or_create_collection(collection)
+        deleted = await asyncio.to_thread(col.delete_by_file_id, file_id)
+        self.ap.logger.info(
+            f"Deleted {deleted} embeddings from native vector collection '{collection}' with file_id: {file_id}"
+        )
+        self._schedule_indexing(collection, col)
+
+    async def delete_by_ids(self, collection: str, ids: list[str]) -> None:
+        if not ids:
+            return
+        col = await self.get_or_create_collection(collection)
+        deleted = await asyncio.to_thread(col.delete_ids, ids)
+        self.ap.logger.info(f"Deleted {deleted} embeddings from native vector collection '{collection}'.")
+        self._schedule_indexing(collection, col)
+
+    async def delete_collection(self, collection: str):
+        task = self._indexing.pop(collection, None)
+        if task is not None:
+            task.cancel()
+        self._collections.pop(collection, None)
+
+        path = os.path.join(self.base_path, collection)
+        if not os.path.exists(path):
+            self.ap.logger.warning(f"Native vector collection '{collection}' not found.")
+            return
+        await asyncio.to_thread(shutil.rmtree, path)
+        self.ap.logger.info(f"Native vector collection '{collection}' deleted.")
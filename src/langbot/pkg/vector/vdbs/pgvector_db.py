@@ -1,30 +1,47 @@
 from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
 from typing import Any, Dict
-from sqlalchemy import create_engine, text, Column, String, Text
-from sqlalchemy.orm import declarative_base
+
+import sqlalchemy
+from sqlalchemy import text, Column, MetaData, String, Table, Text, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from pgvector.sqlalchemy import Vector
 from langbot.pkg.vector.vdb import VectorDatabase
 from langbot.pkg.core import app
 
-Base = declarative_base()
+LEGACY_TABLE = 'langbot_vectors'
+"""Shared 1536-dimensional table of every collection, used before per-collection tables"""
+
+TABLE_PREFIX = 'langbot_vectors_'
+INDEX_SUFFIX = '_embedding'
 
+INDEX_TYPES = ('hnsw', 'ivfflat', 'none')
+QUANTIZATIONS = ('none', 'halfvec', 'binary')
 
-class PgVectorEntry(Base):
-    """SQLAlchemy model for pgvector entries"""
+# pgvector cannot index vector columns of more dimensions than this, halfvec up to 4000
+MAX_VECTOR_INDEX_DIM = 2000
+MAX_HALFVEC_INDEX_DIM = 4000
 
-    __tablename__ = 'langbot_vectors'
 
-    id = Column(String, primary_key=True)
-    collection = Column(String, index=True, nullable=False)
-    embedding = Column(Vector(1536))  # Default dimension, will be created dynamically
-    text = Column(Text)
-    file_id = Column(String, index=True)
-    chunk_uuid = Column(String)
+def _version_tuple(version: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in re.findall(r'\d+', version)[:3])
 
 
 class PgVectorDatabase(VectorDatabase):
-    """PostgreSQL with pgvector extension database implementation"""
+    """PostgreSQL with pgvector extension database implementation
+
+    Every collection has its own table whose embedding column is sized to the vectors of its
+    first insert, with an HNSW or IVFFlat index for cosine distance. With quantization, the
+    index is built over a halfvec or binary expression of the embeddings: searches collect
+    rerank_factor times more candidates through it and re-rank them with the full vectors.
+    """
+
+    # 6 bind parameters per row, keeps a statement far below the 32767 parameter limit
+    upsert_batch_size = 500
 
     def __init__(
         self,
@@ -35,6 +52,14 @@ class PgVectorDatabase(VectorDatabase):
         database: str = 'langbot',
         user: str = 'postgres',
         password: str = 'postgres',
+        index_type: str = 'none',
+        quantization: str = 'none',
+        hnsw_m: int = 16,
+        ef_construction: int = 64,
+        ef_search: int = 200,
+        ivfflat_lists: int = 100,
+        probes: int = 10,
+        rerank_factor: int = 4,
     ):
         """Initialize pgvector database
 
@@ -46,7 +71,20 @@ class PgVectorDatabase(VectorDatabase):
             database: Database name
             user: Database user
             password: Database password
+            index_type: hnsw, ivfflat or none (exact scans)
+            quantization: none, halfvec or binary, what the index is built over
+            hnsw_m: Neighbors per HNSW node
+            ef_construction: HNSW build candidate list size
+            ef_search: HNSW search candidate list size
+            ivfflat_lists: IVFFlat list count, the index is built once a table has 10 rows per list
+            probes: IVFFlat lists visited per search
+            rerank_factor: Candidates per requested result re-ranked with the full vectors
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f'Unsupported pgvector index type: {index_type}')
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f'Unsupported pgvector quantization: {quantization}')
+
         self.ap = ap
 
         # Build connection string if not provided
@@ -59,48 +97,252 @@ class PgVectorDatabase(VectorDatabase):
             'postgresql+psycopg://', 'postgresql+asyncpg://'
         )
 
-        self.engine = None
-        self.async_engine = None
-        self.SessionLocal = None
-        self.AsyncSessionLocal = None
-        self._collections = set()
-        self._initialize_db()
-
-    def _initialize_db(self):
-        """Initialize database connection and create tables"""
-        try:
-            # Create async engine for async operations
-            self.async_engine = create_async_engine(self.async_connection_string, echo=False, pool_pre_ping=True)
-            self.AsyncSessionLocal = async_sessionmaker(self.async_engine, class_=AsyncSession, expire_on_commit=False)
-
-            # Create sync engine for table creation
-            sync_connection_string = self.connection_string.replace('postgresql+asyncpg://', 'postgresql+psycopg://')
-            self.engine = create_engine(sync_connection_string, echo=False)
-
-            # Create pgvector extension and tables
-            with self.engine.connect() as conn:
-                # Enable pgvector extension
-                conn.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
-                conn.commit()
-
-            # Create tables
-            Base.metadata.create_all(self.engine)
-
-            self.ap.logger.info('Connected to PostgreSQL with pgvector')
-        except Exception as e:
-            self.ap.logger.error(f'Failed to connect to PostgreSQL: {e}')
-            raise
+        self.index_type = index_type
+        self.quantization = quantization
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.ivfflat_lists = ivfflat_lists
+        self.probes = probes
+        self.rerank_factor = max(1, rerank_factor)
+
+        self.async_engine = create_async_engine(self.async_connection_string, echo=False, pool_pre_ping=True)
+        self.AsyncSessionLocal = async_sessionmaker(self.async_engine, class_=AsyncSession, expire_on_commit=False)
+        self.extension_version: tuple[int, ...] = ()
+
+        self._metadata = MetaData()
+        self._tables: dict[str, Table] = {}
+        """collection -> table of an existing collection"""
+        self._pending_ivfflat: set[str] = set()
+        """collections whose IVFFlat index waits for enough rows"""
+
+        self._ready = False
+        self._lock = asyncio.Lock()
+
+    async def _initialize(self):
+        """Enable the extension, once"""
+        if self._ready:
+            return
+        async with self._lock:
+            if self._ready:
+                return
+            try:
+                async with self.async_engine.begin() as conn:
+                    await conn.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+                    version = (
+                        await conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+                    ).scalar_one()
+                self.extension_version = _version_tuple(version)
+                if self.quantization != 'none' and self.extension_version < (0, 7, 0):
+                    raise ValueError(f'{self.quantization} quantization needs pgvector 0.7.0 or later, found {version}')
+
+                self._ready = True
+                self.ap.logger.info(f'Connected to PostgreSQL with pgvector {version}')
+            except Exception as e:
+                self.ap.logger.error(f'Failed to connect to PostgreSQL: {e}')
+                raise
+
+    @staticmethod
+    def table_name(collection: str) -> str:
+        """Table of a collection, a valid unquoted identifier short enough for its index names
+        to stay under the 63 byte limit"""
+        name = TABLE_PREFIX + re.sub(r'[^a-z0-9_]', '_', collection.lower())
+        if len(name) > 63 - len(INDEX_SUFFIX):
+            name = TABLE_PREFIX + hashlib.sha1(collection.encode()).hexdigest()[:32]
+        return name
+
+    def _table(self, collection: str, dim: int) -> Table:
+        return Table(
+            self.table_name(collection),
+            self._metadata,
+            Column('id', String, primary_key=True),
+            Column('embedding', Vector(dim), nullable=False),
+            Column('text', Text),
+            Column('file_id', String, index=True),
+            Column('chunk_uuid', String),
+            extend_existing=True,
+        )
+
+    async def _get_table(self, collection: str) -> Table | None:
+        """Table of an existing collection, None if it has none yet"""
+        await self._initialize()
+        if collection in self._tables:
+            return self._tables[collection]
+
+        async with self.async_engine.connect() as conn:
+            # the type modifier of a vector column is its dimension
+            dim = (
+                await conn.execute(
+                    text(
+                        'SELECT a.atttypmod FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid '
+                        "WHERE c.relname = :table AND a.attname = 'embedding' AND NOT a.attisdropped"
+                    ),
+                    {'table': self.table_name(collection)},
+                )
+            ).scalar()
+        if dim is None:
+            return None
+
+        table = self._table(collection, dim)
+        self._tables[collection] = table
+        if self.index_type == 'ivfflat' and not await self._has_vector_index(table):
+            self._pending_ivfflat.add(collection)
+        return table
+
+    async def _create_table(self, collection: str, dim: int) -> Table:
+        table = self._table(collection, dim)
+        async with self.async_engine.begin() as conn:
+            await conn.run_sync(lambda sync_conn: table.create(sync_conn, checkfirst=True))
+        self._tables[collection] = table
+
+        if self.index_type == 'hnsw':
+            await self._create_vector_index(table)
+        elif self.index_type == 'ivfflat':
+            # IVFFlat clusters the rows present when it is built, an empty table gives useless lists
+            self._pending_ivfflat.add(collection)
+
+        self.ap.logger.info(
+            f"Created pgvector table '{table.name}' for collection '{collection}' with dimension={dim}, "
+            f'index={self.index_type}, quantization={self.quantization}'
+        )
+        return table
+
+    def _dim(self, table: Table) -> int:
+        return table.c.embedding.type.dim
+
+    def _index_expression(self, table: Table) -> tuple[str, str]:
+        """(indexed expression, operator class) for the configured quantization"""
+        dim = self._dim(table)
+        if self.quantization == 'halfvec':
+            return f'(embedding::halfvec({dim}))', 'halfvec_cosine_ops'
+        if self.quantization == 'binary':
+            return f'(binary_quantize(embedding)::bit({dim}))', 'bit_hamming_ops'
+        return 'embedding', 'vector_cosine_ops'
+
+    def _quantized_query(self, table: Table, query: str) -> str:
+        """Quantized form of a query vector, compared with the indexed expression"""
+        dim = self._dim(table)
+        if self.quantization == 'halfvec':
+            return f'CAST({query} AS halfvec({dim}))'
+        if self.quantization == 'binary':
+            return f'binary_quantize({query})'
+        return query
+
+    def _candidate_order(self, table: Table, quantized_query: str) -> str:
+        """ORDER BY expression matching the index"""
+        dim = self._dim(table)
+        if self.quantization == 'halfvec':
+            return f'embedding::halfvec({dim}) <=> {quantized_query}'
+        if self.quantization == 'binary':
+            return f'binary_quantize(embedding)::bit({dim}) <~> {quantized_query}'
+        return f'embedding <=> {quantized_query}'
+
+    async def _has_vector_index(self, table: Table) -> bool:
+        async with self.async_engine.connect() as conn:
+            return bool(
+                (
+                    await conn.execute(
+                        text('SELECT 1 FROM pg_indexes WHERE tablename = :table AND indexname = :index'),
+                        {'table': table.name, 'index': table.name + INDEX_SUFFIX},
+                    )
+                ).scalar()
+            )
+
+    async def _create_vector_index(self, table: Table):
+        dim = self._dim(table)
+        limit = MAX_HALFVEC_INDEX_DIM if self.quantization == 'halfvec' else MAX_VECTOR_INDEX_DIM
+        if self.quantization != 'binary' and dim > limit:
+            self.ap.logger.warning(
+                f'pgvector cannot index {dim}-dimensional {self.quantization if self.quantization != "none" else "vector"} '
+                f"columns, '{table.name}' is searched by exact scans; use halfvec or binary quantization"
+            )
+            return
+
+        expression, opclass = self._index_expression(table)
+        if self.index_type == 'hnsw':
+            options = f'm = {int(self.hnsw_m)}, ef_construction = {int(self.ef_construction)}'
+        else:
+            options = f'lists = {int(self.ivfflat_lists)}'
+        async with self.async_engine.begin() as conn:
+            await conn.execute(
+                text(
+                    f'CREATE INDEX IF NOT EXISTS {table.name}{INDEX_SUFFIX} ON {table.name} '
+                    f'USING {self.index_type} ({expression} {opclass}) WITH ({options})'
+                )
+            )
+        self.ap.logger.info(f"Created {self.index_type} index on pgvector table '{table.name}'")
+
+    async def _maybe_build_ivfflat(self, collection: str, table: Table):
+        if collection not in self._pending_ivfflat:
+            return
+        async with self.AsyncSessionLocal() as session:
+            rows = (await session.execute(select(func.count()).select_from(table))).scalar_one()
+        if rows >= 10 * self.ivfflat_lists:
+            self._pending_ivfflat.discard(collection)
+            await self._create_vector_index(table)
+
+    async def migrate_legacy_table(self):
+        """Copy the collections of the shared langbot_vectors table into their own tables
+
+        Run by database migration 23. The legacy table is only dropped once every one of its rows
+        is found in the table of its collection, otherwise it is kept and an error is logged.
+        """
+        await self._initialize()
+        async with self.async_engine.connect() as conn:
+            exists = (await conn.execute(text('SELECT to_regclass(:table)'), {'table': LEGACY_TABLE})).scalar()
+            if exists is None:
+                return
+            collections = (await conn.execute(text(f'SELECT DISTINCT collection FROM {LEGACY_TABLE}'))).scalars().all()
+
+        missing = 0
+        for collection in collections:
+            async with self.async_engine.connect() as conn:
+                dim = (
+                    await conn.execute(
+                        text(f'SELECT vector_dims(embedding) FROM {LEGACY_TABLE} WHERE collection = :c LIMIT 1'),
+                        {'c': collection},
+                    )
+                ).scalar()
+            table = await self._get_table(collection) or await self._create_table(collection, dim)
+            async with self.async_engine.begin() as conn:
+                copied = await conn.execute(
+                    text(
+                        f'INSERT INTO {table.name} (id, embedding, text, file_id, chunk_uuid) '
+                        f'SELECT id, embedding, text, file_id, chunk_uuid FROM {LEGACY_TABLE} WHERE collection = :c '
+                        'ON CONFLICT (id) DO NOTHING'
+                    ),
+                    {'c': collection},
+                )
+                not_copied = (
+                    await conn.execute(
+                        text(
+                            f'SELECT count(*) FROM {LEGACY_TABLE} l WHERE l.collection = :c '
+                            f'AND NOT EXISTS (SELECT 1 FROM {table.name} t WHERE t.id = l.id)'
+                        ),
+                        {'c': collection},
+                    )
+                ).scalar_one()
+            missing += not_copied
+            self.ap.logger.info(f"Copied {copied.rowcount} vectors of collection '{collection}' to '{table.name}'")
+            await self._maybe_build_ivfflat(collection, table)
+
+        if missing:
+            self.ap.logger.error(
+                f"{missing} vectors of the legacy pgvector table '{LEGACY_TABLE}' were not copied, the table is kept"
+            )
+            return
+
+        async with self.async_engine.begin() as conn:
+            await conn.execute(text(f'DROP TABLE IF EXISTS {LEGACY_TABLE}'))
+        self.ap.logger.info(f"Dropped legacy pgvector table '{LEGACY_TABLE}'")
 
     async def get_or_create_collection(self, collection: str):
-        """Get or create a collection (logical grouping in pgvector)
+        """Get a collection, its table is created by the first insert which knows the dimension
 
         Args:
             collection: Collection name (knowledge base UUID)
         """
-        # In pgvector, collections are logical - we just track them
-        if collection not in self._collections:
-            self._collections.add(collection)
-            self.ap.logger.info(f"Registered pgvector collection '{collection}'")
+        await self._get_table(collection)
         return collection
 
     async def add_embeddings(
@@ -118,30 +360,73 @@ class PgVectorDatabase(VectorDatabase):
             embeddings_list: List of embedding vectors
             metadatas: List of metadata dictionaries
         """
-        await self.get_or_create_collection(collection)
+        await self._write(collection, ids, embeddings_list, metadatas, replace=False)
+        self.ap.logger.info(f"Added {len(ids)} embeddings to pgvector collection '{collection}'")
+
+    async def upsert(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+    ) -> None:
+        """Insert vector embeddings with one statement, replacing the rows whose id already exists
+
+        Args:
+            collection: Collection name
+            ids: List of unique IDs for each vector
+            embeddings_list: List of embedding vectors
+            metadatas: List of metadata dictionaries
+        """
+        await self._write(collection, ids, embeddings_list, metadatas, replace=True)
+        self.ap.logger.info(f"Upserted {len(ids)} embeddings to pgvector collection '{collection}'")
+
+    async def _write(
+        self,
+        collection: str,
+        ids: list[str],
+        embeddings_list: list[list[float]],
+        metadatas: list[dict[str, Any]],
+        replace: bool,
+    ):
+        if not ids:
+            return
+        table = await self._get_table(collection)
+        if table is None:
+            async with self._lock:
+                table = self._tables.get(collection) or await self._create_table(collection, len(embeddings_list[0]))
+
+        rows = []
+        for i, vector_id in enumerate(ids):
+            metadata = metadatas[i] if i < len(metadatas) else {}
+            rows.append(
+                {
+                    'id': vector_id,
+                    'embedding': embeddings_list[i],
+                    'text': metadata.get('text', ''),
+                    'file_id': metadata.get('file_id', ''),
+                    'chunk_uuid': metadata.get('uuid', ''),
+                }
+            )
+
+        stmt = insert(table).values(rows)
+        if replace:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={column: stmt.excluded[column] for column in ('embedding', 'text', 'file_id', 'chunk_uuid')},
+            )
 
         async with self.AsyncSessionLocal() as session:
             try:
-                for i, vector_id in enumerate(ids):
-                    metadata = metadatas[i] if i < len(metadatas) else {}
-
-                    entry = PgVectorEntry(
-                        id=vector_id,
-                        collection=collection,
-                        embedding=embeddings_list[i],
-                        text=metadata.get('text', ''),
-                        file_id=metadata.get('file_id', ''),
-                        chunk_uuid=metadata.get('uuid', ''),
-                    )
-                    session.add(entry)
-
+                await session.execute(stmt)
                 await session.commit()
-                self.ap.logger.info(f"Added {len(ids)} embeddings to pgvector collection '{collection}'")
             except Exception as e:
                 await session.rollback()
-                self.ap.logger.error(f'Error adding embeddings to pgvector: {e}')
+                self.ap.logger.error(f'Error writing embeddings to pgvector: {e}')
                 raise
 
+        await self._maybe_build_ivfflat(collection, table)
+
     async def search(self, collection: str, query_embedding: list[float], k: int = 5) -> Dict[str, Any]:
         """Search for similar vectors using cosine distance
 
@@ -153,50 +438,128 @@ class PgVectorDatabase(VectorDatabase):
         Returns:
             Dictionary with search results in Chroma-compatible format
         """
-        await self.get_or_create_collection(collection)
+        result = await self._knn(collection, [query_embedding], k)
+        self.ap.logger.info(f"pgvector search in '{collection}' returned {len(result['ids'][0])} results")
+        return result
+
+    async def search_batch(self, collection: str, query_embeddings: list[list[float]], k: int = 5) -> Dict[str, Any]:
+        """Search for several query vectors in one round trip
+
+        Args:
+            collection: Collection name
+            query_embeddings: Query vectors
+            k: Number of top results to return per query
+
+        Returns:
+            Dictionary with one result list per query in Chroma-compatible format
+        """
+        result = await self._knn(collection, query_embeddings, k)
+        self.ap.logger.info(f"pgvector batch search of {len(query_embeddings)} queries in '{collection}'")
+        return result
+
+    async def _knn(self, collection: str, query_embeddings: list[list[float]], k: int) -> Dict[str, Any]:
+        """The queries are unnested into rows and each one runs the ordered index scan through a lateral
+        join. With quantization the scan collects k * rerank_factor candidates, ordered again by their
+        exact distance.
+
+        The queries are converted in a materialized CTE, a cast in the lateral subquery would be
+        evaluated again for every row it is compared with."""
+        result_dict = {
+            'ids': [[] for _ in query_embeddings],
+            'distances': [[] for _ in query_embeddings],
+            'metadatas': [[] for _ in query_embeddings],
+        }
+        table = await self._get_table(collection)
+        if table is None or not query_embeddings or k <= 0:
+            return result_dict
+
+        dim = self._dim(table)
+        exact = 'embedding <=> q.embedding'
+        if self.quantization == 'none':
+            hits = (
+                f'SELECT id, text, file_id, chunk_uuid, {exact} AS distance FROM {table.name} ORDER BY {exact} LIMIT :k'
+            )
+            candidates = k
+        else:
+            hits = (
+                f'SELECT id, text, file_id, chunk_uuid, {exact} AS distance FROM ('
+                f'SELECT id, text, file_id, chunk_uuid, embedding FROM {table.name} '
+                f'ORDER BY {self._candidate_order(table, "q.quantized")} LIMIT :candidates'
+                f') AS candidate ORDER BY distance LIMIT :k'
+            )
+            candidates = k * self.rerank_factor
+
+        stmt = text(
+            f'WITH q AS MATERIALIZED ('
+            f'SELECT ord, embedding, {self._quantized_query(table, "embedding")} AS quantized FROM ('
+            f'SELECT ord, CAST(raw AS vector({dim})) AS embedding '
+            f'FROM unnest(CAST(:queries AS text[])) WITH ORDINALITY AS input(raw, ord)) AS parsed) '
+            f'SELECT q.ord, hit.id, hit.text, hit.file_id, hit.chunk_uuid, hit.distance '
+            f'FROM q CROSS JOIN LATERAL ({hits}) AS hit '
+            f'ORDER BY q.ord, hit.distance'
+        )
+        queries = ['[' + ','.join(map(str, query_embedding)) + ']' for query_embedding in query_embeddings]
 
         async with self.AsyncSessionLocal() as session:
             try:
-                # Use cosine distance for similarity search
-                from sqlalchemy import select
-
-                # Query for similar vectors
-                stmt = (
-                    select(
-                        PgVectorEntry.id,
-                        PgVectorEntry.text,
-                        PgVectorEntry.file_id,
-                        PgVectorEntry.chunk_uuid,
-                        PgVectorEntry.embedding.cosine_distance(query_embedding).label('distance'),
-                    )
-                    .filter(PgVectorEntry.collection == collection)
-                    .order_by(PgVectorEntry.embedding.cosine_distance(query_embedding))
-                    .limit(k)
-                )
-
-                result = await session.execute(stmt)
-                rows = result.fetchall()
+                # SET LOCAL lasts until the end of the transaction the session has begun
+                if self.index_type == 'hnsw':
+                    ef_search = min(1000, max(self.ef_search, candidates))
+                    await session.execute(text(f'SET LOCAL hnsw.ef_search = {ef_search}'))
+                elif self.index_type == 'ivfflat':
+                    await session.execute(text(f'SET LOCAL ivfflat.probes = {int(self.probes)}'))
+                rows = (await session.execute(stmt, {'queries': queries, 'k': k, 'candidates': candidates})).fetchall()
+            except Exception as e:
+                self.ap.logger.error(f'Error searching pgvector: {e}')
+                raise
 
-                # Convert to Chroma-compatible format
-                ids = []
-                distances = []
-                metadatas = []
+        for row in rows:
+            i = row.ord - 1
+            result_dict['ids'][i].append(row.id)
+            result_dict['distances'][i].append(float(row.distance))
+            result_dict['metadatas'][i].append(
+                {'text': row.text or '', 'file_id': row.file_id or '', 'uuid': row.chunk_uuid or ''}
+            )
+        return result_dict
 
-                for row in rows:
-                    ids.append(row.id)
-                    distances.append(float(row.distance))
-                    metadatas.append(
-                        {'text': row.text or '', 'file_id': row.file_id or '', 'uuid': row.chunk_uuid or ''}
-                    )
+    async def count(self, collection: str) -> int:
+        """Number of vectors in a collection
 
-                result_dict = {'ids': [ids], 'distances': [distances], 'metadatas': [metadatas]}
+        Args:
+            collection: Collection name
+        """
+        table = await self._get_table(collection)
+        if table is None:
+            return 0
+        async with self.AsyncSessionLocal() as session:
+            return (await session.execute(select(func.count()).select_from(table))).scalar_one()
 
-                self.ap.logger.info(f"pgvector search in '{collection}' returned {len(ids)} results")
-                return result_dict
+    async def stats(self, collection: str) -> Dict[str, Any]:
+        """Statistics of a collection
 
-            except Exception as e:
-                self.ap.logger.error(f'Error searching pgvector: {e}')
-                raise
+        Args:
+            collection: Collection name
+        """
+        table = await self._get_table(collection)
+        if table is None:
+            return {'backend': 'pgvector', 'count': 0, 'dimension': None}
+        async with self.AsyncSessionLocal() as session:
+            count = (await session.execute(select(func.count()).select_from(table))).scalar_one()
+            table_bytes, index_bytes = (
+                await session.execute(
+                    select(func.pg_table_size(table.name), func.pg_indexes_size(table.name)),
+                )
+            ).one()
+        return {
+            'backend': 'pgvector',
+            'count': count,
+            'dimension': self._dim(table),
+            'table': table.name,
+            'index_type': self.index_type if collection not in self._pending_ivfflat else 'none',
+            'quantization': self.quantization,
+            'table_bytes': table_bytes,
+            'index_bytes': index_bytes,
+        }
 
     async def delete_by_file_id(self, collection: str, file_id: str) -> None:
         """Delete vectors by file_id
@@ -205,52 +568,59 @@ class PgVectorDatabase(VectorDatabase):
             collection: Collection name
             file_id: File ID to filter deletion
         """
-        await self.get_or_create_collection(collection)
+        await self._delete(collection, file_id=file_id)
+        self.ap.logger.info(f"Deleted embeddings from pgvector collection '{collection}' with file_id: {file_id}")
+
+    async def delete_by_ids(self, collection: str, ids: list[str]) -> None:
+        """Delete vectors by id
+
+        Args:
+            collection: Collection name
+            ids: IDs of the vectors to delete
+        """
+        if not ids:
+            return
+        await self._delete(collection, ids=ids)
+        self.ap.logger.info(f"Deleted {len(ids)} embeddings from pgvector collection '{collection}'")
+
+    async def _delete(self, collection: str, file_id: str | None = None, ids: list[str] | None = None):
+        table = await self._get_table(collection)
+        if table is None:
+            return
+        stmt = sqlalchemy.delete(table)
+        stmt = stmt.where(table.c.file_id == file_id) if file_id is not None else stmt.where(table.c.id.in_(ids))
 
         async with self.AsyncSessionLocal() as session:
             try:
-                from sqlalchemy import delete
-
-                stmt = delete(PgVectorEntry).where(
-                    PgVectorEntry.collection == collection, PgVectorEntry.file_id == file_id
-                )
                 await session.execute(stmt)
                 await session.commit()
-
-                self.ap.logger.info(
-                    f"Deleted embeddings from pgvector collection '{collection}' with file_id: {file_id}"
-                )
             except Exception as e:
                 await session.rollback()
                 self.ap.logger.error(f'Error deleting from pgvector: {e}')
                 raise
 
     async def delete_collection(self, collection: str):
-        """Delete all vectors in a collection
+        """Drop the table of a collection
 
         Args:
             collection: Collection name to delete
         """
-        if collection in self._collections:
-            self._collections.remove(collection)
+        await self._initialize()
+        self._tables.pop(collection, None)
+        self._pending_ivfflat.discard(collection)
 
-        async with self.AsyncSessionLocal() as session:
+        async with self.async_engine.begin() as conn:
             try:
-                from sqlalchemy import delete
-
-                stmt = delete(PgVectorEntry).where(PgVectorEntry.collection == collection)
-                await session.execute(stmt)
-                await session.commit()
-
-                self.ap.logger.info(f"Deleted pgvector collection '{collection}'")
+                await conn.execute(text(f'DROP TABLE IF EXISTS {self.table_name(collection)}'))
             except Exception as e:
-                await session.rollback()
                 self.ap.logger.error(f'Error deleting pgvector collection: {e}')
                 raise
+        table = self._metadata.tables.get(self.table_name(collection))
+        if table is not None:
+            self._metadata.remove(table)
+        self.ap.logger.info(f"Deleted pgvector collection '{collection}'")
 
     async def close(self):
         """Close database connections"""
         if self.async_engine:
             await self.async_engine.dispose()
-        if self.engine:
-            self.engine.dispose()
@@ -8,6 +8,9 @@ from langbot.pkg.vector.vdb import VectorDatabase
 
 
 class QdrantVectorDatabase(VectorDatabase):
+    # a few MB per request, well below the server's 32 MB payload limit for 3072-dimensional vectors
+    upsert_batch_size = 256
+
     def __init__(self, ap: app.Application):
         self.ap = ap
         url = self.ap.instance_config.data['vdb']['qdrant']['url']
@@ -60,6 +63,16 @@ class QdrantVectorDatabase(VectorDatabase):
         await self.client.upsert(collection_name=collection, points=points)
         self.ap.logger.info(f"Added {len(ids)} embeddings to Qdrant collection '{collection}'.")
 
+    async def upsert(
+        self,
+        collection: str,
+        ids: List[str],
+        embeddings_list: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        # Qdrant's add is an upsert already
+        await self.add_embeddings(collection, ids, embeddings_list, metadatas)
+
     async def search(self, collection: str, query_embedding: list[float], k: int = 5) -> dict[str, Any]:
         exists = await self.client.collection_exists(collection)
         if not exists:
@@ -82,6 +95,54 @@ class QdrantVectorDatabase(VectorDatabase):
         self.ap.logger.info(f"Qdrant search in '{collection}' returned {len(results.get('ids', [[]])[0])} results.")
         return results
 
+    async def search_batch(self, collection: str, query_embeddings: list[list[float]], k: int = 5) -> dict[str, Any]:
+        exists = await self.client.collection_exists(collection)
+        if not exists:
+            return {
+                'ids': [[] for _ in query_embeddings],
+                'metadatas': [[] for _ in query_embeddings],
+                'distances': [[] for _ in query_embeddings],
+            }
+
+        responses = await self.client.query_batch_points(
+            collection_name=collection,
+            requests=[
+                models.QueryRequest(query=query_embedding, limit=k, with_payload=True)
+                for query_embedding in query_embeddings
+            ],
+        )
+        results = {
+            'ids': [[str(hit.id) for hit in response.points] for response in responses],
+            'metadatas': [[hit.payload or {} for hit in response.points] for response in responses],
+            'distances': [
+                [1 - float(hit.score) if hit.score is not None else 1.0 for hit in response.points]
+                for response in responses
+            ],
+        }
+        self.ap.logger.info(f"Qdrant batch search of {len(query_embeddings)} queries in '{collection}'.")
+        return results
+
+    async def count(self, collection: str) -> int:
+        exists = await self.client.collection_exists(collection)
+        if not exists:
+            return 0
+        return (await self.client.count(collection_name=collection, exact=True)).count
+
+    async def stats(self, collection: str) -> dict[str, Any]:
+        exists = await self.client.collection_exists(collection)
+        if not exists:
+            return {'backend': 'qdrant', 'count': 0, 'dimension': None}
+
+        info = await self.client.get_collection(collection)
+        return {
+            'backend': 'qdrant',
+            'count': await self.count(collection),
+            'dimension': info.config.params.vectors.size,
+            'indexed_vectors': info.indexed_vectors_count,
+            'segments': info.segments_count,
+            'status': str(info.status),
+        }
+
     async def delete_by_file_id(self, collection: str, file_id: str) -> None:
         exists = await self.client.collection_exists(collection)
         if not exists:
@@ -95,6 +156,16 @@ class QdrantVectorDatabase(VectorDatabase):
         )
         self.ap.logger.info(f"Deleted embeddings from Qdrant collection '{collection}' with file_id: {file_id}")
 
+    async def delete_by_ids(self, collection: str, ids: list[str]) -> None:
+        if not ids:
+            return
+        exists = await self.client.collection_exists(collection)
+        if not exists:
+            return
+
+        await self.client.delete(collection_name=collection, points_selector=models.PointIdsList(points=ids))
+        self.ap.logger.info(f"Deleted {len(ids)} embeddings from Qdrant collection '{collection}'.")
+
     async def delete_collection(self, collection: str):
         try:
             await self.client.delete_collection(collection)
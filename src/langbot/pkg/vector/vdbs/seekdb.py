@@ -28,6 +28,9 @@ class SeekDBVectorDatabase(VectorDatabase):
     Supports both embedded mode and remote server mode.
     """
 
+    # rows are written with one multi-row INSERT per batch
+    upsert_batch_size = 500
+
     def __init__(self, ap: app.Application):
         if not SEEKDB_AVAILABLE:
             raise ImportError('pyseekdb is not installed. Install it with: pip install pyseekdb')
@@ -142,6 +145,16 @@ class SeekDBVectorDatabase(VectorDatabase):
             if v is not None
         }
 
+    async def _get_existing_collection(self, collection: str) -> Any | None:
+        """Get a collection if it exists, without creating it."""
+        if collection in self._collections:
+            return self._collections[collection]
+        if not await asyncio.to_thread(self.client.has_collection, collection):
+            return None
+        coll = await asyncio.to_thread(self.client.get_collection, collection, embedding_function=None)
+        self._collections[collection] = coll
+        return coll
+
     async def get_or_create_collection(self, collection: str):
         """Get or create collection (without vector size - will use default)."""
         return await self._get_or_create_collection_internal(collection)
@@ -170,6 +183,28 @@ class SeekDBVectorDatabase(VectorDatabase):
 
         self.ap.logger.info(f"Added {len(ids)} embeddings to SeekDB collection '{collection}'")
 
+    async def upsert(
+        self, collection: str, ids: List[str], embeddings_list: List[List[float]], metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """Add vector embeddings, replacing the ones whose ID already exists.
+
+        Args:
+            collection: Collection name
+            ids: List of document IDs
+            embeddings_list: List of embedding vectors
+            metadatas: List of metadata dictionaries
+        """
+        if not embeddings_list:
+            return
+
+        coll = await self._get_or_create_collection_internal(collection, len(embeddings_list[0]))
+
+        cleaned_metadatas = [self._clean_metadata(meta) for meta in metadatas]
+
+        await asyncio.to_thread(coll.upsert, ids=ids, embeddings=embeddings_list, metadatas=cleaned_metadatas)
+
+        self.ap.logger.info(f"Upserted {len(ids)} embeddings to SeekDB collection '{collection}'")
+
     async def search(self, collection: str, query_embedding: List[float], k: int = 5) -> Dict[str, Any]:
         """Search for the most similar vectors in the specified collection.
 
@@ -201,6 +236,57 @@ class SeekDBVectorDatabase(VectorDatabase):
 
         return results
 
+    async def search_batch(self, collection: str, query_embeddings: List[List[float]], k: int = 5) -> Dict[str, Any]:
+        """Search for several query vectors at once.
+
+        Args:
+            collection: Collection name
+            query_embeddings: Query vectors
+            k: Number of results to return per query
+
+        Returns:
+            Dictionary with 'ids', 'metadatas', 'distances' keys, one list per query
+        """
+        coll = await self._get_existing_collection(collection)
+        if coll is None or not query_embeddings:
+            return {
+                'ids': [[] for _ in query_embeddings],
+                'metadatas': [[] for _ in query_embeddings],
+                'distances': [[] for _ in query_embeddings],
+            }
+
+        results = await asyncio.to_thread(coll.query, query_embeddings=query_embeddings, n_results=k)
+
+        self.ap.logger.info(f"SeekDB batch search of {len(query_embeddings)} queries in '{collection}'")
+        return results
+
+    async def count(self, collection: str) -> int:
+        """Number of vectors in the collection.
+
+        Args:
+            collection: Collection name
+        """
+        coll = await self._get_existing_collection(collection)
+        if coll is None:
+            return 0
+        return await asyncio.to_thread(coll.count)
+
+    async def stats(self, collection: str) -> Dict[str, Any]:
+        """Statistics of the collection.
+
+        Args:
+            collection: Collection name
+        """
+        coll = await self._get_existing_collection(collection)
+        if coll is None:
+            return {'backend': 'seekdb', 'count': 0, 'dimension': None}
+        return {
+            'backend': 'seekdb',
+            'count': await asyncio.to_thread(coll.count),
+            'dimension': coll.dimension,
+            'distance': 'cosine',
+        }
+
     async def delete_by_file_id(self, collection: str, file_id: str) -> None:
         """Delete vectors from the collection by file_id metadata.
 
@@ -227,6 +313,30 @@ class SeekDBVectorDatabase(VectorDatabase):
 
         self.ap.logger.info(f"Deleted embeddings from SeekDB collection '{collection}' with file_id: {file_id}")
 
+    async def delete_by_ids(self, collection: str, ids: List[str]) -> None:
+        """Delete vectors from the collection by id.
+
+        Args:
+            collection: Collection name
+            ids: IDs of the vectors to delete
+        """
+        if not ids:
+            return
+        exists = await asyncio.to_thread(self.client.has_collection, collection)
+        if not exists:
+            self.ap.logger.warning(f"SeekDB collection '{collection}' not found for deletion")
+            return
+
+        if collection not in self._collections:
+            coll = await asyncio.to_thread(self.client.get_collection, collection, embedding_function=None)
+            self._collections[collection] = coll
+        else:
+            coll = self._collections[collection]
+
+        await asyncio.to_thread(coll.delete, ids=ids)
+
+        self.ap.logger.info(f"Deleted {len(ids)} embeddings from SeekDB collection '{collection}'")
+
     async def delete_collection(self, collection: str):
         """Delete the entire collection.
 
@@ -0,0 +1,98 @@
+"""
+Ban word filter benchmark
+
+Masks synthetic chat messages against a generated moderation list with:
+
+- legacy: `re.findall` and `str.replace` for every word, as the filter did before
+- matcher: BanWordMatcher, an Aho-Corasick automaton for the literal words and the regex
+  ones matched one by one
+
+A small share of the list uses regex syntax, like the bundled sensitive-words.json.
+
+Usage:
+    python -m tests.benchmarks.bench_banwords [--words 20000] [--messages 2000] [--regex-ratio 0.01]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from importlib import import_module
+
+# filters are registered while the application module is imported, import it first to avoid a circular import
+import_module('langbot.pkg.core.app')
+BanWordMatcher = import_module('langbot.pkg.pipeline.cntfilter.filters.banwords').BanWordMatcher
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年'
+
+
+def make_words(count: int, regex_ratio: float, rng: random.Random) -> list[str]:
+    words = []
+    for i in range(count):
+        word = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 6)))
+        if rng.random() < regex_ratio:
+            word = f'[{word[0].upper()}{word[0]}]{word[1:]}[ ]?x'
+        words.append(word)
+    return words
+
+
+def make_messages(count: int, words: list[str], rng: random.Random) -> list[str]:
+    messages = []
+    for _ in range(count):
+        text = ''.join(rng.choice(ALPHABET + '     ') for _ in range(rng.randint(20, 200)))
+        if rng.random() < 0.2:
+            cut = rng.randint(0, len(text))
+            text = text[:cut] + rng.choice(words) + text[cut:]
+        messages.append(text)
+    return messages
+
+
+def legacy_mask(words: list[str], message: str) -> str:
+    for word in words:
+        match = re.findall(word, message)
+        for i in range(len(match)):
+            message = message.replace(match[i], '*' * len(match[i]))
+    return message
+
+
+def report(name: str, elapsed: float, messages: list[str]):
+    chars = sum(len(message) for message in messages)
+    print(
+        f'{name:<8} {elapsed * 1000:10.1f} ms  '
+        f'{len(messages) / elapsed:12,.0f} messages/s  {chars / elapsed / 1e6:8.2f} Mchars/s'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--regex-ratio', type=float, default=0.01)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = make_words(args.words, args.regex_ratio, rng)
+    messages = make_messages(args.messages, words, rng)
+    print(f'{len(words)} words, {len(messages)} messages')
+
+    start = time.perf_counter()
+    matcher = BanWordMatcher(words)
+    print(f'build    {(time.perf_counter() - start) * 1000:10.1f} ms')
+
+    start = time.perf_counter()
+    for message in messages:
+        matcher.mask_message(message)
+    report('matcher', time.perf_counter() - start, messages)
+
+    # the legacy loop is orders of magnitude slower, a sample is enough
+    sample = messages[: max(1, len(messages) // 20)]
+    start = time.perf_counter()
+    for message in sample:
+        legacy_mask(words, message)
+    report('legacy', time.perf_counter() - start, sample)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Parser event-loop lag benchmark
+
+Parses a synthetic corpus (large HTML, Markdown, DOCX and GB18030 text files, the formats a
+bulk ZIP upload is made of) while a ticker on the event loop measures how late its 10 ms
+sleeps wake up. That lateness is what every chat request handled by the same loop waits
+in addition to its own work.
+
+- thread: ParsePool(backend='thread'), the parsers run in asyncio.to_thread and hold the GIL
+- process: ParsePool(backend='process'), the parsers run in worker processes
+
+The full-file encoding detection of the old parser is timed on its own, it ran directly
+on the event loop.
+
+Usage:
+    python -m tests.benchmarks.bench_parser_loop_lag [--files 8] [--workers 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import statistics
+import time
+
+from docx import Document
+
+from langbot.pkg.rag.knowledge.services import parse_worker
+
+TICK = 0.01
+
+
+def make_corpus(files: int) -> list[tuple[str, bytes]]:
+    rows = ''.join(f'<tr><td>row {i}</td><td>{i * 7}</td><td>value {i % 13}</td></tr>' for i in range(400))
+    html = (
+        '<html><body>'
+        + ''.join(
+            f'<h2>Section {s}</h2><p>{"Lorem ipsum dolor sit amet. " * 40}</p>'
+            f'<ul>{"<li>item</li>" * 30}</ul><table><tr><th>a</th><th>b</th><th>c</th></tr>{rows}</table>'
+            for s in range(20)
+        )
+        + '</body></html>'
+    ).encode('utf-8')
+
+    markdown = ''.join(
+        f'## Section {s}\n\n{"Lorem ipsum dolor sit amet. " * 40}\n\n'
+        + ''.join(f'- item {i}\n' for i in range(30))
+        + '\n| a | b |\n|---|---|\n'
+        + ''.join(f'| {i} | {i * 3} |\n' for i in range(300))
+        + '\n'
+        for s in range(20)
+    ).encode('utf-8')
+
+    doc = Document()
+    for i in range(3000):
+        doc.add_paragraph(f'Paragraph {i}: ' + 'Lorem ipsum dolor sit amet. ' * 6)
+    docx = io.BytesIO()
+    doc.save(docx)
+
+    text = ('知识库批量上传的中文文本，编码为 GB18030。' * 20 + '\n') * 600
+
+    kinds = [
+        ('html', html),
+        ('md', markdown),
+        ('docx', docx.getvalue()),
+        ('txt', text.encode('gb18030')),
+    ]
+    return [kinds[i % len(kinds)] for i in range(files)]
+
+
+PARSERS = {
+    'html': parse_worker.parse_html,
+    'md': parse_worker.parse_md,
+    'docx': parse_worker.parse_docx,
+    'txt': parse_worker.parse_txt,
+}
+
+
+async def ticker(lags: list[float], stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def bench(pool: parse_worker.ParsePool, corpus: list[tuple[str, bytes]]) -> dict:
+    # start the workers before measuring
+    await asyncio.gather(*[pool.run(parse_worker.parse_txt, b'warm up') for _ in range(pool.workers)])
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[pool.run(PARSERS[kind], data) for kind, data in corpus])
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+
+    lags.sort()
+    return {
+        'elapsed': elapsed,
+        'p50': statistics.median(lags) * 1000,
+        'p99': lags[int(len(lags) * 0.99) - 1] * 1000,
+        'max': lags[-1] * 1000,
+    }
+
+
+def bench_full_detection(corpus: list[tuple[str, bytes]]) -> tuple[float, float]:
+    data = next(data for kind, data in corpus if kind == 'txt')
+    started = time.perf_counter()
+    parse_worker.decode_text(data, sample_size=0)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parse_worker.decode_text(data)
+    sampled = time.perf_counter() - started
+    return full * 1000, sampled * 1000
+
+
+async def main(files: int, workers: int):
+    corpus = make_corpus(files)
+    size = sum(len(data) for _, data in corpus)
+    print(f'corpus: {files} files, {size / 1024 / 1024:.1f} MiB, {workers} workers')
+
+    for backend in ('thread', 'process'):
+        pool = parse_worker.ParsePool(backend=backend, workers=workers, timeout=0, cpu_limit=0)
+        try:
+            result = await bench(pool, corpus)
+        finally:
+            pool.shutdown()
+        print(
+            f'{backend:>8}: {result["elapsed"]:6.2f}s total, loop lag '
+            f'p50 {result["p50"]:7.1f} ms, p99 {result["p99"]:7.1f} ms, max {result["max"]:7.1f} ms'
+        )
+
+    full, sampled = bench_full_detection(corpus)
+    print(f'encoding detection on the loop: full file {full:.1f} ms, 64 KiB sample {sampled:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.workers))
@@ -0,0 +1,147 @@
+"""
+QueryPool dispatch benchmark
+
+Floods the pool with queries spread over many sessions and measures how long the
+controller-style dispatch loop takes to pick each runnable query. For reference the
+legacy "scan every pending query" selection is measured on the same workload.
+
+Usage:
+    python -m tests.benchmarks.bench_query_dispatch [--queries 10000] [--sessions 1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import statistics
+import time
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+from langbot.pkg.pipeline import pool
+
+
+class FakeSession:
+    def __init__(self, concurrency: int):
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+
+def make_queries(query_count: int, session_count: int, hot_sessions: int) -> list[pipeline_query.Query]:
+    """Half of the queries go to a few hot group chats, the rest spread evenly"""
+    queries = []
+    for i in range(query_count):
+        launcher_id = i % hot_sessions if i % 2 == 0 else i % session_count
+        queries.append(
+            pipeline_query.Query.model_construct(
+                query_id=i,
+                launcher_type=provider_session.LauncherTypes.GROUP,
+                launcher_id=launcher_id,
+                sender_id=i,
+            )
+        )
+    return queries
+
+
+def percentile(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def bench_ready_queue(queries: list[pipeline_query.Query], concurrency: int, in_flight: int) -> list[float]:
+    query_pool = pool.QueryPool()
+    sessions: dict[pool.SessionKey, FakeSession] = {}
+    latencies: list[float] = []
+
+    for query in queries:
+        query_pool.enqueue(query)
+
+    running: collections.deque[tuple[pool.SessionKey, FakeSession]] = collections.deque()
+
+    while query_pool.pending_count:
+        start = time.perf_counter()
+        session_key = None if len(running) >= in_flight else query_pool.next_ready_session()
+
+        if session_key is None:
+            # simulate the oldest in-flight query completing
+            key, session = running.popleft()
+            session._semaphore.release()
+            query_pool.mark_ready(key)
+            continue
+
+        session = sessions.setdefault(session_key, FakeSession(concurrency))
+        if session._semaphore.locked():
+            continue
+
+        await session._semaphore.acquire()
+        query_pool.pop_query(session_key)
+        if not session._semaphore.locked():
+            query_pool.mark_ready(session_key)
+        latencies.append(time.perf_counter() - start)
+        running.append((session_key, session))
+
+    return latencies
+
+
+async def bench_linear_scan(queries: list[pipeline_query.Query], concurrency: int, in_flight: int) -> list[float]:
+    pending = list(queries)
+    sessions: dict[pool.SessionKey, FakeSession] = {}
+    latencies: list[float] = []
+    running: collections.deque[FakeSession] = collections.deque()
+
+    while pending:
+        start = time.perf_counter()
+        selected = None
+        if len(running) < in_flight:
+            for query in pending:
+                session = sessions.setdefault(pool.get_session_key(query), FakeSession(concurrency))
+                if not session._semaphore.locked():
+                    await session._semaphore.acquire()
+                    selected = query
+                    break
+
+        if selected is None:
+            running.popleft()._semaphore.release()
+            continue
+
+        pending.remove(selected)
+        latencies.append(time.perf_counter() - start)
+        running.append(session)
+
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    print(
+        f'{name:<12} picks={len(latencies):>6}  '
+        f'total={sum(latencies) * 1000:9.2f}ms  '
+        f'mean={statistics.mean(latencies) * 1e6:8.2f}us  '
+        f'p50={percentile(latencies, 0.5) * 1e6:8.2f}us  '
+        f'p99={percentile(latencies, 0.99) * 1e6:8.2f}us'
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--hot-sessions', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1, help='per-session concurrency')
+    parser.add_argument('--in-flight', type=int, default=64, help='pipeline concurrency')
+    parser.add_argument('--skip-linear', action='store_true')
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.sessions, args.hot_sessions)
+    print(
+        f'{args.queries} queries over {args.sessions} sessions ({args.hot_sessions} hot), '
+        f'session concurrency {args.concurrency}, pipeline concurrency {args.in_flight}'
+    )
+
+    report('ready-queue', await bench_ready_queue(queries, args.concurrency, args.in_flight))
+    if not args.skip_linear:
+        report('linear-scan', await bench_linear_scan(queries, args.concurrency, args.in_flight))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
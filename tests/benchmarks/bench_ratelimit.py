@@ -0,0 +1,144 @@
+"""
+Rate limit benchmark
+
+Calls `require_access` for messages spread over many sessions and reports the cost per call
+and the memory held by the containers, for the legacy fixed window (a global containers lock,
+a per-session wait lock and containers kept forever) and the fixwin, tokenbucket and slidewin
+algorithms. Afterwards every session goes idle for a window and one more message arrives, to
+show how many containers are still kept.
+
+Usage:
+    python -m tests.benchmarks.bench_ratelimit [--sessions 100000] [--messages 500000] [--limitation 60]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from importlib import import_module
+from unittest.mock import Mock
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+
+# algorithms are registered while the application module is imported, import it first to avoid a circular import
+import_module('langbot.pkg.core.app')
+algo = import_module('langbot.pkg.pipeline.ratelimit.algo')
+import_module('langbot.pkg.pipeline.ratelimit.ratelimit')
+
+
+class LegacyFixedWindow:
+    """The fixed window algorithm before containers were scoped and evicted"""
+
+    def __init__(self):
+        self.containers_lock = asyncio.Lock()
+        self.containers = {}
+
+    async def require_access(self, query, launcher_type, launcher_id) -> bool:
+        session_name = f'{launcher_type}_{launcher_id}'
+        async with self.containers_lock:
+            container = self.containers.get(session_name)
+            if container is None:
+                container = self.containers[session_name] = (asyncio.Lock(), {})
+
+        wait_lock, records = container
+        async with wait_lock:
+            window_size = query.pipeline_config['safety']['rate-limit']['window-length']
+            limitation = query.pipeline_config['safety']['rate-limit']['limitation']
+            now = int(time.time())
+            now = now - now % window_size
+            count = records.get(now, 0)
+            if count >= limitation:
+                return False
+            if now not in records:
+                records.clear()
+            records[now] = count + 1
+            return True
+
+
+def make_query(window: int, limitation: int) -> pipeline_query.Query:
+    return pipeline_query.Query.model_construct(
+        sender_id=1,
+        bot_uuid='bot',
+        pipeline_config={
+            'safety': {
+                'rate-limit': {
+                    'window-length': window,
+                    'limitation': limitation,
+                    'strategy': 'drop',
+                    'scope': 'session',
+                }
+            }
+        },
+    )
+
+
+def make_algos() -> dict:
+    algos = {'legacy': LegacyFixedWindow()}
+    for cls in algo.preregistered_algos:
+        algos[cls.name] = cls(Mock())
+    return algos
+
+
+def container_count(inst) -> int:
+    return len(inst.containers)
+
+
+async def run(inst, query, launcher_ids: list[int]) -> int:
+    if hasattr(inst, 'initialize'):
+        await inst.initialize()
+    admitted = 0
+    for launcher_id in launcher_ids:
+        admitted += await inst.require_access(query, 'group', launcher_id)
+    return admitted
+
+
+async def bench(name: str, query, launcher_ids: list[int]):
+    inst = make_algos()[name]
+    start = time.perf_counter()
+    admitted = await run(inst, query, launcher_ids)
+    elapsed = time.perf_counter() - start
+
+    # tracing slows every allocation down, memory is measured on a separate run
+    inst = make_algos()[name]
+    tracemalloc.start()
+    await run(inst, query, launcher_ids)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(
+        f'{name:<12} {elapsed / len(launcher_ids) * 1e6:8.2f} us/call  admitted={admitted:>8}  '
+        f'containers={container_count(inst):>7}  memory={memory / 1024 / 1024:8.1f} MiB'
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--messages', type=int, default=500000)
+    parser.add_argument('--limitation', type=int, default=60)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    launcher_ids = [rng.randrange(args.sessions) for _ in range(args.messages)]
+    print(f'{args.messages} messages over {args.sessions} sessions, {args.limitation} per 60s')
+
+    query = make_query(60, args.limitation)
+    for name in make_algos():
+        await bench(name, query, launcher_ids)
+
+    print('\nevery session idle for one window, then one more message')
+    query = make_query(1, args.limitation)
+    algos = make_algos()
+    for inst in algos.values():
+        await run(inst, query, list(range(args.sessions)))
+    await asyncio.sleep(2.1)
+    for name, inst in algos.items():
+        await inst.require_access(query, 'group', -1)
+        print(f'{name:<12} containers={container_count(inst):>7}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
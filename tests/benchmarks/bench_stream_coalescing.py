@@ -0,0 +1,103 @@
+"""
+Streaming coalescing benchmark
+
+Replays a synthetic 10k-token LLM stream and counts how many characters are copied
+(string building) and pushed downstream (chunk payloads) by:
+
+- legacy: `accumulated += delta` and a full-text chunk every 8 tokens
+- full-text: StreamBuffer + FlushPolicy, full text materialized at each flush
+- delta: StreamBuffer + FlushPolicy, only the new text sent downstream
+
+CPython can sometimes grow a string in place on `+=`, so the legacy copy count is an upper bound.
+
+Usage:
+    python -m tests.benchmarks.bench_stream_coalescing [--tokens 10000] [--tokens-per-second 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from langbot.pkg.provider import streaming
+
+
+def make_tokens(count: int) -> list[str]:
+    rng = random.Random(42)
+    words = ['the', 'model', 'streams', 'tokens', 'quickly', 'and', 'answers', 'questions', '，', '流式', '输出']
+    return [rng.choice(words) + ' ' for _ in range(count)]
+
+
+def bench_legacy(tokens: list[str]) -> dict:
+    accumulated = ''
+    copied = 0
+    sent = 0
+    chunks = 0
+    for i, token in enumerate(tokens, start=1):
+        accumulated += token
+        copied += len(accumulated)
+        if i % 8 == 0 or i == len(tokens):
+            sent += len(accumulated)
+            chunks += 1
+    return {'copied': copied, 'sent': sent, 'chunks': chunks}
+
+
+def bench_buffered(tokens: list[str], tokens_per_second: float, delta: bool) -> dict:
+    policy = streaming.FlushPolicy()
+    runner_buffer = streaming.StreamBuffer()
+    handler_buffer = streaming.StreamBuffer()
+    copied = 0
+    sent = 0
+    chunks = 0
+
+    now = 0.0
+    policy.mark_flushed(now)
+
+    for i, token in enumerate(tokens, start=1):
+        now += 1 / tokens_per_second
+        runner_buffer.append(token)
+
+        is_final = i == len(tokens)
+        if is_final or policy.should_flush(runner_buffer.delta_length, now):
+            policy.mark_flushed(now)
+            chunk = runner_buffer.take_delta()
+            copied += len(chunk)
+            handler_buffer.append(chunk)
+            if delta:
+                sent += len(chunk)
+            else:
+                # joining the cached prefix with the new parts copies the whole text
+                copied += len(handler_buffer)
+                sent += len(handler_buffer.getvalue())
+            chunks += 1
+
+    # the runner materializes its round once for the request history, the handler once for the conversation
+    copied += len(runner_buffer.getvalue()) + len(handler_buffer.getvalue())
+    return {'copied': copied, 'sent': sent, 'chunks': chunks}
+
+
+def report(name: str, result: dict, text_length: int):
+    print(
+        f'{name:<10} chunks={result["chunks"]:>6}  '
+        f'copied={result["copied"]:>12,} chars ({result["copied"] / text_length:8.1f}x text)  '
+        f'sent={result["sent"]:>12,} chars ({result["sent"] / text_length:8.1f}x text)'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=10000)
+    parser.add_argument('--tokens-per-second', type=float, default=50)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    text_length = sum(len(token) for token in tokens)
+    print(f'{args.tokens} tokens, {text_length:,} chars, {args.tokens_per_second} tokens/s')
+
+    report('legacy', bench_legacy(tokens), text_length)
+    report('full-text', bench_buffered(tokens, args.tokens_per_second, delta=False), text_length)
+    report('delta', bench_buffered(tokens, args.tokens_per_second, delta=True), text_length)
+
+
+if __name__ == '__main__':
+    main()
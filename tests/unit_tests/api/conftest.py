@@ -0,0 +1,53 @@
+"""
+Shared fixtures for HTTP service tests
+
+Services run against a real SQLite database so the SQL they build is exercised.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import Mock
+
+import pytest
+import sqlalchemy.ext.asyncio as sqlalchemy_asyncio
+
+
+class SQLitePersistence:
+    """The parts of PersistenceManager the services use, backed by a temporary SQLite file"""
+
+    def __init__(self, engine: sqlalchemy_asyncio.AsyncEngine):
+        self.engine = engine
+
+    def get_db_engine(self) -> sqlalchemy_asyncio.AsyncEngine:
+        return self.engine
+
+    async def execute_async(self, *args, **kwargs):
+        async with self.engine.connect() as conn:
+            result = await conn.execute(*args, **kwargs)
+            await conn.commit()
+            return result
+
+    def serialize_model(self, model, data, masked_columns: list[str] = []) -> dict:
+        persistence_mgr = import_module('langbot.pkg.persistence.mgr')
+        return persistence_mgr.PersistenceManager.serialize_model(self, model, data, masked_columns)
+
+
+@pytest.fixture
+async def sqlite_app(tmp_path):
+    import_module('langbot.pkg.core.app')
+    persistence_monitoring = import_module('langbot.pkg.entity.persistence.monitoring')
+
+    engine = sqlalchemy_asyncio.create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(persistence_monitoring.Base.metadata.create_all)
+
+    app = Mock()
+    app.logger = Mock()
+    app.instance_config = Mock()
+    app.instance_config.data = {}
+    app.persistence_mgr = SQLitePersistence(engine)
+
+    yield app
+
+    await engine.dispose()
@@ -0,0 +1,155 @@
+"""
+Monitoring keyset pagination and streaming export tests
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+import quart
+import sqlalchemy
+
+
+def get_modules():
+    monitoring = import_module('langbot.pkg.api.http.service.monitoring')
+    persistence_monitoring = import_module('langbot.pkg.entity.persistence.monitoring')
+    return monitoring, persistence_monitoring
+
+
+BASE_TIME = datetime.datetime(2025, 1, 1, 10, 0, 0)
+
+
+async def seed(app, persistence_monitoring, count: int = 57) -> list[dict]:
+    # timestamps repeat in runs of three so pages have to break ties on the id
+    messages = [
+        {
+            'id': f'm{i:03d}',
+            'timestamp': BASE_TIME + datetime.timedelta(seconds=i // 3),
+            'bot_id': 'bot-1' if i % 2 else 'bot-2',
+            'bot_name': 'Bot',
+            'pipeline_id': 'pipeline-1',
+            'pipeline_name': 'Pipeline',
+            'message_content': json.dumps([{'type': 'Plain', 'text': f'hello, {i}'}]),
+            'session_id': 'person_1',
+            'status': 'success',
+            'level': 'info',
+        }
+        for i in range(count)
+    ]
+
+    async with app.persistence_mgr.get_db_engine().begin() as conn:
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringMessage), messages)
+
+    return sorted(messages, key=lambda m: (m['timestamp'], m['id']), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_every_row_once(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    service = monitoring.MonitoringService(sqlite_app)
+    expected = await seed(sqlite_app, persistence_monitoring)
+
+    seen = []
+    cursor = None
+    while True:
+        rows, total = await service.get_messages(limit=10, cursor=cursor, count='none')
+        assert total is None
+        seen.extend(row['id'] for row in rows)
+        cursor = service.next_cursor(rows, 10)
+        if cursor is None:
+            break
+
+    assert seen == [m['id'] for m in expected]
+
+    # a page in the middle matches the offset page
+    first, _ = await service.get_messages(limit=20)
+    by_offset, total = await service.get_messages(limit=10, offset=20)
+    by_cursor, _ = await service.get_messages(limit=10, cursor=service.next_cursor(first, 20))
+    assert by_cursor == by_offset
+    assert total == len(expected)
+
+
+@pytest.mark.asyncio
+async def test_approximate_count(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = {'monitoring': {'query': {'approximate_count_cap': 5}}}
+    service = monitoring.MonitoringService(sqlite_app)
+    expected = await seed(sqlite_app, persistence_monitoring)
+
+    await service.rollup(now=BASE_TIME + datetime.timedelta(minutes=5))
+
+    # answered by the rollups
+    _, total = await service.get_messages(bot_ids=['bot-1'], count='approximate')
+    assert total == sum(1 for m in expected if m['bot_id'] == 'bot-1')
+
+    # a session filter has no rollup, counting stops at the cap
+    _, total = await service.get_messages(session_ids=['person_1'], count='approximate')
+    assert total == 5
+
+
+@pytest.mark.asyncio
+async def test_export_streams_in_batches(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    controller = import_module('langbot.pkg.api.http.controller.groups.monitoring')
+    sqlite_app.instance_config.data = {'monitoring': {'query': {'export_batch_size': 8}}}
+    service = monitoring.MonitoringService(sqlite_app)
+    expected = await seed(sqlite_app, persistence_monitoring)
+
+    exported = [row async for row in service.export_messages(limit=50)]
+    assert [row['id'] for row in exported] == [m['id'] for m in expected[:50]]
+    assert exported[0]['message_text'] == 'hello, 56'
+
+    chunks = [
+        chunk
+        async for chunk in controller.iter_csv(
+            service.export_messages(), controller.EXPORT_HEADERS['messages'], service._escape_csv_field
+        )
+    ]
+    lines = b''.join(chunks).decode('utf-8').splitlines()
+    assert lines[0] == '\ufeff' + ','.join(controller.EXPORT_HEADERS['messages'])
+    assert len(lines) == len(expected) + 1
+    assert '"hello, 56"' in lines[1]
+
+    jsonl = b''.join([chunk async for chunk in controller.iter_jsonl(service.export_messages(limit=3))])
+    assert [json.loads(line)['id'] for line in jsonl.decode('utf-8').splitlines()] == [m['id'] for m in expected[:3]]
+
+
+def test_malformed_cursor_is_rejected():
+    monitoring, _ = get_modules()
+
+    cursor = monitoring.encode_cursor(BASE_TIME, 'm001')
+    assert monitoring.decode_cursor(cursor) == (BASE_TIME, 'm001')
+
+    for bad in ['not-a-cursor', monitoring.encode_cursor(BASE_TIME, 'x')[:-3]]:
+        with pytest.raises(ValueError):
+            monitoring.decode_cursor(bad)
+
+
+@pytest.mark.asyncio
+async def test_invalid_export_parameters_are_rejected(sqlite_app):
+    monitoring, _ = get_modules()
+    controller = import_module('langbot.pkg.api.http.controller.groups.monitoring')
+    sqlite_app.monitoring_service = monitoring.MonitoringService(sqlite_app)
+    sqlite_app.user_service = Mock()
+    sqlite_app.user_service.verify_jwt_token = AsyncMock(return_value='admin@example.com')
+    sqlite_app.user_service.get_user_by_email = AsyncMock(return_value=Mock())
+
+    quart_app = quart.Quart(__name__)
+    await controller.MonitoringRouterGroup(sqlite_app, quart_app).initialize()
+    client = quart_app.test_client()
+    headers = {'Authorization': 'Bearer token'}
+
+    for query_string in ({'format': 'xml'}, {'type': 'unknown'}):
+        response = await client.get('/api/v1/monitoring/export', query_string=query_string, headers=headers)
+        assert response.status_code == 400
+        assert (await response.get_json())['code'] == -1
+
+    response = await client.get('/api/v1/monitoring/messages/missing/details', headers=headers)
+    assert response.status_code == 404
+
+    response = await client.get('/api/v1/monitoring/export', query_string={'format': 'jsonl'}, headers=headers)
+    assert response.status_code == 200
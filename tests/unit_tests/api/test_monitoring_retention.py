@@ -0,0 +1,154 @@
+"""
+Monitoring retention tests
+"""
+
+from __future__ import annotations
+
+import datetime
+from importlib import import_module
+
+import pytest
+import sqlalchemy
+
+
+def get_modules():
+    monitoring = import_module('langbot.pkg.api.http.service.monitoring')
+    persistence_monitoring = import_module('langbot.pkg.entity.persistence.monitoring')
+    return monitoring, persistence_monitoring
+
+
+NOW = datetime.datetime(2025, 3, 1, 12, 0, 0)
+
+
+def retention_config(**retention) -> dict:
+    return {
+        'monitoring': {
+            'rollup': {'interval': 0, 'lookback': 3600},
+            'retention': {'interval': 0, 'chunk_size': 7, **retention},
+        }
+    }
+
+
+async def seed(app, persistence_monitoring, days: int = 20, per_day: int = 10):
+    messages, llm_calls, sessions = [], [], []
+    for day in range(days):
+        for i in range(per_day):
+            timestamp = NOW - datetime.timedelta(days=day, minutes=i * 7 + 1)
+            messages.append(
+                {
+                    'id': f'm{day}-{i}',
+                    'timestamp': timestamp,
+                    'bot_id': 'bot-1',
+                    'bot_name': 'Bot',
+                    'pipeline_id': 'pipeline-1',
+                    'pipeline_name': 'Pipeline',
+                    'message_content': 'x' * 2000,
+                    'session_id': f'person_{day}',
+                    'status': 'success',
+                    'level': 'info',
+                }
+            )
+            llm_calls.append(
+                {
+                    'id': f'l{day}-{i}',
+                    'timestamp': timestamp,
+                    'model_name': 'model',
+                    'input_tokens': 10,
+                    'output_tokens': 5,
+                    'total_tokens': 15,
+                    'duration': 800,
+                    'status': 'success',
+                    'bot_id': 'bot-1',
+                    'bot_name': 'Bot',
+                    'pipeline_id': 'pipeline-1',
+                    'pipeline_name': 'Pipeline',
+                    'session_id': f'person_{day}',
+                }
+            )
+        sessions.append(
+            {
+                'session_id': f'person_{day}',
+                'bot_id': 'bot-1',
+                'bot_name': 'Bot',
+                'pipeline_id': 'pipeline-1',
+                'pipeline_name': 'Pipeline',
+                'message_count': per_day,
+                'start_time': NOW - datetime.timedelta(days=day, hours=2),
+                'last_activity': NOW - datetime.timedelta(days=day, minutes=1),
+                'is_active': False,
+            }
+        )
+
+    async with app.persistence_mgr.get_db_engine().begin() as conn:
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringMessage), messages)
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringLLMCall), llm_calls)
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringSession), sessions)
+
+
+async def count(app, model) -> int:
+    result = await app.persistence_mgr.execute_async(sqlalchemy.select(sqlalchemy.func.count()).select_from(model))
+    return result.scalar()
+
+
+@pytest.mark.asyncio
+async def test_expired_rows_are_deleted_and_stay_in_rollups(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = retention_config(ttl_days={'messages': 7, 'sessions': 3, 'llm_calls': 0})
+    service = monitoring.MonitoringService(sqlite_app)
+    await seed(sqlite_app, persistence_monitoring)
+    service._remember_session('person_19')
+
+    report = await service.retention.run(now=NOW)
+
+    assert report['deleted']['messages'] == 130
+    assert await count(sqlite_app, persistence_monitoring.MonitoringMessage) == 70
+    assert 'llm_calls' not in report['deleted']
+    assert await count(sqlite_app, persistence_monitoring.MonitoringLLMCall) == 200
+    assert report['deleted']['sessions'] == 17
+    assert service._known_sessions == set()
+
+    # the dashboard still counts the deleted messages
+    totals = await service._sum_counters(None, None, None, None)
+    assert totals['message_count'] == 200
+    assert totals['llm_call_count'] == 200
+
+
+@pytest.mark.asyncio
+async def test_rows_not_rolled_up_are_kept(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = retention_config(ttl_days={'messages': 1}, rollup=False)
+    service = monitoring.MonitoringService(sqlite_app)
+    await seed(sqlite_app, persistence_monitoring)
+
+    # rolled up to ten days ago only
+    await service.rollup(now=NOW - datetime.timedelta(days=10))
+    await service.retention.run(now=NOW)
+
+    async with sqlite_app.persistence_mgr.get_db_engine().connect() as conn:
+        oldest = (
+            await conn.execute(
+                sqlalchemy.select(sqlalchemy.func.min(persistence_monitoring.MonitoringMessage.timestamp))
+            )
+        ).scalar()
+    assert oldest >= monitoring.floor_time(NOW - datetime.timedelta(days=10, hours=1), monitoring.HOUR)
+    assert oldest < NOW - datetime.timedelta(days=9)
+
+    totals = await service._sum_counters(None, None, None, None)
+    assert totals['message_count'] == 200
+
+
+@pytest.mark.asyncio
+async def test_vacuum_reports_reclaimed_bytes(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = retention_config(ttl_days={'messages': 2})
+    service = monitoring.MonitoringService(sqlite_app)
+    await seed(sqlite_app, persistence_monitoring)
+
+    report = await service.retention.run(now=NOW)
+    assert report['deleted']['messages'] > 0
+    assert report['bytes_reclaimed'] > 100 * 2000
+
+    # nothing left to delete, so no VACUUM either
+    report = await service.retention.run(now=NOW + datetime.timedelta(minutes=5))
+    assert report['deleted'] == {'messages': 0}
+    assert report['bytes_reclaimed'] is None
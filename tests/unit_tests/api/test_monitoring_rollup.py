@@ -0,0 +1,197 @@
+"""
+Monitoring rollup tests
+"""
+
+from __future__ import annotations
+
+import datetime
+import random
+from importlib import import_module
+
+import pytest
+import sqlalchemy
+
+
+def get_modules():
+    monitoring = import_module('langbot.pkg.api.http.service.monitoring')
+    persistence_monitoring = import_module('langbot.pkg.entity.persistence.monitoring')
+    return monitoring, persistence_monitoring
+
+
+BASE_TIME = datetime.datetime(2025, 1, 1, 10, 0, 0)
+
+
+async def seed(app, persistence_monitoring, count: int = 300) -> list[dict]:
+    rng = random.Random(42)
+    messages, llm_calls, embedding_calls = [], [], []
+
+    for i in range(count):
+        timestamp = BASE_TIME + datetime.timedelta(seconds=rng.randint(0, 3 * 3600))
+        bot_id = rng.choice(['bot-1', 'bot-2'])
+        messages.append(
+            {
+                'id': f'm{i}',
+                'timestamp': timestamp,
+                'bot_id': bot_id,
+                'bot_name': bot_id,
+                'pipeline_id': 'pipeline-1',
+                'pipeline_name': 'Pipeline',
+                'message_content': 'hi',
+                'session_id': 'person_1',
+                'status': rng.choice(['success', 'success', 'error', 'pending']),
+                'level': 'info',
+            }
+        )
+        llm_calls.append(
+            {
+                'id': f'l{i}',
+                'timestamp': timestamp,
+                'model_name': 'model',
+                'input_tokens': 10,
+                'output_tokens': 5,
+                'total_tokens': 15,
+                'duration': rng.choice([500, 2000, 12000, 40000]),
+                'status': 'success',
+                'bot_id': bot_id,
+                'bot_name': bot_id,
+                'pipeline_id': 'pipeline-1',
+                'pipeline_name': 'Pipeline',
+                'session_id': 'person_1',
+            }
+        )
+        if i % 3 == 0:
+            embedding_calls.append(
+                {
+                    'id': f'e{i}',
+                    'timestamp': timestamp,
+                    'model_name': 'embedding',
+                    'prompt_tokens': 1,
+                    'total_tokens': 1,
+                    'duration': 10,
+                    'input_count': 1,
+                    'status': 'success',
+                }
+            )
+
+    async with app.persistence_mgr.get_db_engine().begin() as conn:
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringMessage), messages)
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringLLMCall), llm_calls)
+        await conn.execute(sqlalchemy.insert(persistence_monitoring.MonitoringEmbeddingCall), embedding_calls)
+
+    return messages
+
+
+def expected_overview(messages: list[dict], start, end, bot_ids=None) -> tuple[int, int]:
+    selected = [
+        m
+        for m in messages
+        if (start is None or m['timestamp'] >= start)
+        and (end is None or m['timestamp'] <= end)
+        and (not bot_ids or m['bot_id'] in bot_ids)
+    ]
+    return len(selected), sum(1 for m in selected if m['status'] == 'success')
+
+
+@pytest.mark.asyncio
+async def test_rollup_tables_match_raw_records(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    service = monitoring.MonitoringService(sqlite_app)
+    await seed(sqlite_app, persistence_monitoring)
+
+    until = await service.rollup(now=BASE_TIME + datetime.timedelta(hours=2, minutes=30, seconds=20))
+    assert until == BASE_TIME + datetime.timedelta(hours=2, minutes=30)
+
+    async with sqlite_app.persistence_mgr.get_db_engine().connect() as conn:
+        raw = await service._aggregate_raw(conn, None, until)
+        minute_total = (
+            await conn.execute(
+                sqlalchemy.select(sqlalchemy.func.sum(persistence_monitoring.MonitoringRollupMinute.message_count))
+            )
+        ).scalar()
+        hour_rows = (await conn.execute(sqlalchemy.select(persistence_monitoring.MonitoringRollupHour))).all()
+
+    assert minute_total == sum(values['message_count'] for values in raw.values())
+    assert sum(row.message_count for row in hour_rows) == minute_total
+    assert {row.bucket.minute for row in hour_rows} == {0}
+    histogram = sum(
+        row.llm_duration_lt_1s
+        + row.llm_duration_lt_3s
+        + row.llm_duration_lt_10s
+        + row.llm_duration_lt_30s
+        + row.llm_duration_ge_30s
+        for row in hour_rows
+    )
+    assert histogram == sum(row.llm_call_count for row in hour_rows)
+
+
+@pytest.mark.asyncio
+async def test_overview_from_rollups_matches_raw(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    service = monitoring.MonitoringService(sqlite_app)
+    messages = await seed(sqlite_app, persistence_monitoring)
+
+    # the last half hour is only in the raw tables
+    await service.rollup(now=BASE_TIME + datetime.timedelta(hours=2, minutes=30))
+
+    ranges = [
+        (None, None),
+        (BASE_TIME + datetime.timedelta(minutes=7, seconds=30), None),
+        (BASE_TIME + datetime.timedelta(minutes=20), BASE_TIME + datetime.timedelta(hours=1, minutes=50, seconds=5)),
+        (BASE_TIME + datetime.timedelta(hours=1), BASE_TIME + datetime.timedelta(hours=2)),
+        (BASE_TIME + datetime.timedelta(hours=2, minutes=10), BASE_TIME + datetime.timedelta(hours=2, minutes=50)),
+        (BASE_TIME + datetime.timedelta(minutes=1, seconds=10), BASE_TIME + datetime.timedelta(minutes=1, seconds=50)),
+    ]
+    for start, end in ranges:
+        for bot_ids in (None, ['bot-1']):
+            overview = await service.get_overview_metrics(bot_ids=bot_ids, start_time=start, end_time=end)
+            total, success = expected_overview(messages, start, end, bot_ids)
+            assert overview['total_messages'] == total, (start, end, bot_ids)
+            assert overview['llm_calls'] == total
+            assert overview['total_tokens'] == total * 15
+            assert overview['success_rate'] == round(success / total * 100 if total else 100, 2)
+
+
+@pytest.mark.asyncio
+async def test_late_status_updates_are_picked_up(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    service = monitoring.MonitoringService(sqlite_app)
+    messages = await seed(sqlite_app, persistence_monitoring, count=50)
+
+    await service.rollup(now=BASE_TIME + datetime.timedelta(hours=3, minutes=1))
+
+    await sqlite_app.persistence_mgr.execute_async(
+        sqlalchemy.update(persistence_monitoring.MonitoringMessage).values(status='success')
+    )
+    await service.rollup(now=BASE_TIME + datetime.timedelta(hours=3, minutes=2))
+
+    end = BASE_TIME + datetime.timedelta(hours=2)
+    overview = await service.get_overview_metrics(start_time=BASE_TIME + datetime.timedelta(hours=2, minutes=30))
+    assert overview['success_rate'] == 100
+
+    # outside the lookback window the rollups are not recomputed
+    stale = await service.get_overview_metrics(end_time=end)
+    total, _ = expected_overview(messages, None, end)
+    assert stale['total_messages'] == total
+
+
+@pytest.mark.asyncio
+async def test_timeseries(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    service = monitoring.MonitoringService(sqlite_app)
+    messages = await seed(sqlite_app, persistence_monitoring)
+
+    await service.rollup(now=BASE_TIME + datetime.timedelta(hours=1, minutes=30))
+
+    points = await service.get_timeseries(granularity='hour')
+    hours = sorted({m['timestamp'].replace(minute=0, second=0) for m in messages})
+    assert [point['bucket'] for point in points] == [hour.isoformat() for hour in hours]
+    assert sum(point['message_count'] for point in points) == len(messages)
+    assert points[0]['embedding_call_count'] > 0
+
+    minute_points = await service.get_timeseries(
+        granularity='minute', start_time=BASE_TIME, end_time=BASE_TIME + datetime.timedelta(minutes=9, seconds=59)
+    )
+    assert (
+        sum(point['message_count'] for point in minute_points)
+        == expected_overview(messages, BASE_TIME, BASE_TIME + datetime.timedelta(minutes=9, seconds=59))[0]
+    )
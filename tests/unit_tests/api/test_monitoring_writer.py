@@ -0,0 +1,124 @@
+"""
+Buffered monitoring writer tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+from importlib import import_module
+
+import pytest
+import sqlalchemy
+
+
+def get_modules():
+    monitoring = import_module('langbot.pkg.api.http.service.monitoring')
+    persistence_monitoring = import_module('langbot.pkg.entity.persistence.monitoring')
+    return monitoring, persistence_monitoring
+
+
+async def count_rows(app, table) -> int:
+    result = await app.persistence_mgr.execute_async(sqlalchemy.select(sqlalchemy.func.count()).select_from(table))
+    return result.scalar()
+
+
+async def record_query(service, session_id: str = 'person_1') -> str:
+    message_id = await service.record_message(
+        bot_id='bot-1',
+        bot_name='Bot',
+        pipeline_id='pipeline-1',
+        pipeline_name='Pipeline',
+        message_content='hi',
+        session_id=session_id,
+        status='pending',
+    )
+    if not await service.update_session_activity(session_id, pipeline_id='pipeline-1', pipeline_name='Pipeline'):
+        await service.record_session_start(session_id, 'bot-1', 'Bot', 'pipeline-1', 'Pipeline')
+    await service.update_message_status(message_id, 'success', variables='{}')
+    return message_id
+
+
+@pytest.mark.asyncio
+async def test_records_are_buffered_and_reads_flush(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = {'monitoring': {'writer': {'flush_interval': 60}, 'rollup': {'interval': 0}}}
+    service = monitoring.MonitoringService(sqlite_app)
+    await service.initialize()
+
+    message_ids = [await record_query(service) for _ in range(3)]
+
+    # nothing reached the database yet
+    assert await count_rows(sqlite_app, persistence_monitoring.MonitoringMessage) == 0
+    assert service.writer.pending_count > 0
+
+    messages, total = await service.get_messages()
+    assert total == 3
+    assert {message['id'] for message in messages} == set(message_ids)
+    assert {message['status'] for message in messages} == {'success'}
+
+    sessions, _ = await service.get_sessions()
+    # the first query created the session, the next two bumped its counter
+    assert sessions[0]['message_count'] == 2
+
+    await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_background_flush_by_size(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = {
+        'monitoring': {'writer': {'flush_interval': 60, 'batch_size': 5}, 'rollup': {'interval': 0}}
+    }
+    service = monitoring.MonitoringService(sqlite_app)
+    await service.initialize()
+
+    for i in range(5):
+        await service.record_error('bot-1', 'Bot', 'pipeline-1', 'Pipeline', 'ValueError', f'e{i}')
+
+    for _ in range(50):
+        if service.writer.flush_count:
+            break
+        await asyncio.sleep(0.01)
+
+    assert await count_rows(sqlite_app, persistence_monitoring.MonitoringError) == 5
+    assert service.writer.get_stats()['written'] == 5
+
+    await service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_and_shutdown_flushes(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = {
+        'monitoring': {'writer': {'flush_interval': 60, 'batch_size': 100, 'max_pending': 2, 'put_timeout': 0.01}}
+    }
+    service = monitoring.MonitoringService(sqlite_app)
+    # no background task, nothing frees room in the buffer
+
+    for i in range(4):
+        await service.record_error('bot-1', 'Bot', 'pipeline-1', 'Pipeline', 'ValueError', f'e{i}')
+
+    stats = service.writer.get_stats()
+    assert stats['pending'] == 2
+    assert stats['dropped'] == 2
+    assert stats['backpressure_waits'] == 2
+
+    await service.shutdown()
+    assert await count_rows(sqlite_app, persistence_monitoring.MonitoringError) == 2
+
+    # after shutdown records are written directly
+    await service.record_error('bot-1', 'Bot', 'pipeline-1', 'Pipeline', 'ValueError', 'late')
+    assert await count_rows(sqlite_app, persistence_monitoring.MonitoringError) == 3
+
+
+@pytest.mark.asyncio
+async def test_unbuffered_writer(sqlite_app):
+    monitoring, persistence_monitoring = get_modules()
+    sqlite_app.instance_config.data = {'monitoring': {'writer': {'buffered': False}, 'rollup': {'interval': 0}}}
+    service = monitoring.MonitoringService(sqlite_app)
+    await service.initialize()
+
+    await record_query(service)
+
+    assert await count_rows(sqlite_app, persistence_monitoring.MonitoringMessage) == 1
+    assert service.writer.pending_count == 0
@@ -34,6 +34,8 @@ class MockApplication:
         self.query_pool = self._create_mock_query_pool()
         self.instance_config = self._create_mock_instance_config()
         self.task_mgr = self._create_mock_task_manager()
+        self.storage_mgr = Mock()
+        self.media_store = Mock()
 
     def _create_mock_logger(self):
         logger = Mock()
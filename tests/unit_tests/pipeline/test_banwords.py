@@ -0,0 +1,106 @@
+"""
+BanWordFilter unit tests
+"""
+
+import json
+import os
+from importlib import import_module
+from unittest.mock import Mock
+
+import pytest
+
+
+def get_banwords_module():
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.pipeline.cntfilter.filters.banwords')
+
+
+def test_literal_and_regex_words_masked_in_one_pass():
+    banwords = get_banwords_module()
+    matcher = banwords.BanWordMatcher(['共产', '共产党', 'abc', 'bcd', '[Rr]ed[Tt]ube', '[Nn]aughty[ ]?[Aa]merica'])
+
+    assert matcher.mask_message('hello') == ('hello', False)
+    # overlapping words are merged into one masked span
+    assert matcher.mask_message('x共产党y abcd') == ('x***y ****', True)
+    assert matcher.mask_message('see redtube and Naughty America') == ('see ******* and ' + '*' * 15, True)
+
+    # overlapping regex matches are all masked
+    assert banwords.BanWordMatcher(['c.e', 'ab.']).mask_message('xabcde') == ('x*****', True)
+
+    word_matcher = banwords.BanWordMatcher(['abc', 'b.d'], mask_word='[removed]')
+    assert word_matcher.mask_message('abcd, bxd') == ('[removed], [removed]', True)
+
+
+def test_aho_corasick_follows_failure_links():
+    banwords = get_banwords_module()
+    matcher = banwords.BanWordMatcher(['he', 'she', 'his', 'hers'])
+
+    assert matcher.find('ushers') == [(1, 6)]
+    assert matcher.find('ahishe') == [(1, 6)]
+    assert matcher.find('hhhx') == []
+
+
+class FakeSensitiveMeta:
+    def __init__(self, path: str):
+        self.file = Mock()
+        self.file.config_file_name = path
+        self.loads = 0
+        self.data = {}
+
+    async def load_config(self):
+        self.loads += 1
+        with open(self.file.config_file_name, encoding='utf-8') as f:
+            self.data = json.load(f)
+
+
+def write_words(path, words: list[str], mtime: int):
+    path.write_text(json.dumps({'mask': '*', 'mask_word': '', 'words': words}), encoding='utf-8')
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.mark.asyncio
+async def test_filter_rebuilds_only_when_file_changes(tmp_path, sample_query):
+    banwords = get_banwords_module()
+    path = tmp_path / 'sensitive-words.json'
+    write_words(path, ['foo'], 1_000_000_000)
+
+    ap = Mock()
+    ap.sensitive_meta = FakeSensitiveMeta(str(path))
+    await ap.sensitive_meta.load_config()
+
+    ban_filter = banwords.BanWordFilter(ap)
+    await ban_filter.initialize()
+
+    assert (await ban_filter.process(sample_query, 'foo bar')).replacement == '*** bar'
+    matcher = ban_filter.matcher
+    assert (await ban_filter.process(sample_query, 'bar')).replacement == 'bar'
+    assert ban_filter.matcher is matcher and ap.sensitive_meta.loads == 1
+
+    write_words(path, ['bar'], 2_000_000_000)
+    result = await ban_filter.process(sample_query, 'foo bar')
+    assert result.replacement == 'foo ***'
+    assert ban_filter.matcher is not matcher and ap.sensitive_meta.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_filter_keeps_matcher_when_reload_fails(tmp_path, sample_query):
+    banwords = get_banwords_module()
+    path = tmp_path / 'sensitive-words.json'
+    write_words(path, ['foo'], 1_000_000_000)
+
+    ap = Mock()
+    ap.sensitive_meta = FakeSensitiveMeta(str(path))
+    await ap.sensitive_meta.load_config()
+
+    ban_filter = banwords.BanWordFilter(ap)
+    await ban_filter.initialize()
+    await ban_filter.process(sample_query, 'foo')
+
+    # a half-written file
+    path.write_text('{"mask": "*", "words": ["ba', encoding='utf-8')
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert (await ban_filter.process(sample_query, 'foo bar')).replacement == '*** bar'
+    ap.logger.warning.assert_called_once()
+
+    write_words(path, ['bar'], 3_000_000_000)
+    assert (await ban_filter.process(sample_query, 'foo bar')).replacement == 'foo ***'
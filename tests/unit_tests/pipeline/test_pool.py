@@ -0,0 +1,81 @@
+"""
+QueryPool dispatch structure unit tests
+"""
+
+from importlib import import_module
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+def get_pool_module():
+    return import_module('langbot.pkg.pipeline.pool')
+
+
+def make_query(query_id: int, launcher_id: int) -> pipeline_query.Query:
+    return pipeline_query.Query.model_construct(
+        query_id=query_id,
+        launcher_type=provider_session.LauncherTypes.GROUP,
+        launcher_id=launcher_id,
+        sender_id=query_id,
+    )
+
+
+def test_session_fifo_order():
+    """Queries of one session are dispatched in arrival order"""
+    pool = get_pool_module()
+    query_pool = pool.QueryPool()
+
+    for i in range(3):
+        query_pool.enqueue(make_query(i, 1))
+
+    key = query_pool.next_ready_session()
+    assert [query_pool.pop_query(key).query_id for _ in range(3)] == [0, 1, 2]
+    assert query_pool.pending_count == 0
+    assert key not in query_pool.session_queues
+
+
+def test_ready_sessions_round_robin():
+    """Ready sessions rotate instead of draining one session first"""
+    pool = get_pool_module()
+    query_pool = pool.QueryPool()
+
+    for i, launcher_id in enumerate([1, 1, 2, 2]):
+        query_pool.enqueue(make_query(i, launcher_id))
+
+    picked = []
+    while query_pool.pending_count:
+        key = query_pool.next_ready_session()
+        picked.append(query_pool.pop_query(key).query_id)
+        query_pool.mark_ready(key)
+
+    assert picked == [0, 2, 1, 3]
+
+
+def test_busy_session_parked_until_marked_ready():
+    """A session taken off the ready queue stays off until mark_ready is called"""
+    pool = get_pool_module()
+    query_pool = pool.QueryPool()
+
+    query_pool.enqueue(make_query(0, 1))
+    query_pool.enqueue(make_query(1, 1))
+
+    key = query_pool.next_ready_session()
+    query_pool.pop_query(key)
+
+    # session is busy, not put back
+    assert query_pool.next_ready_session() is None
+
+    query_pool.mark_ready(key)
+    query_pool.mark_ready(key)
+    assert len(query_pool.ready_sessions) == 1
+    assert query_pool.peek_query(query_pool.next_ready_session()).query_id == 1
+
+
+def test_mark_ready_ignores_empty_session():
+    pool = get_pool_module()
+    query_pool = pool.QueryPool()
+
+    query_pool.mark_ready(('group', '1'))
+
+    assert query_pool.next_ready_session() is None
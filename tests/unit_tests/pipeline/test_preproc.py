@@ -0,0 +1,58 @@
+"""
+PreProcessor unit tests
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+
+
+def get_modules():
+    import_module('langbot.pkg.core.app')
+    preproc = import_module('langbot.pkg.pipeline.preproc.preproc')
+    media = import_module('langbot.pkg.storage.media')
+    return preproc, media
+
+
+@pytest.mark.asyncio
+async def test_images_dropped_for_text_models_are_released(
+    mock_app, sample_query, mock_session, mock_conversation, mock_model
+):
+    preproc, media = get_modules()
+    store = mock_app.media_store = media.MediaStore()
+    image = await store.put(b'png', 'image/png')
+
+    history = [
+        provider_message.Message(
+            role='user',
+            content=[
+                provider_message.ContentElement.from_text('look'),
+                provider_message.ContentElement.from_image_url(image.uri),
+                provider_message.ContentElement.from_image_url(image.uri),
+            ],
+        ),
+        provider_message.Message(role='assistant', content='nice'),
+    ]
+    # the conversation history holds a reference per element
+    store.acquire(media.media_uris(history))
+    assert store._blobs[image.key].refs == 2
+
+    mock_conversation.messages.copy = Mock(return_value=list(history))
+    mock_app.sess_mgr.get_session = AsyncMock(return_value=mock_session)
+    mock_app.sess_mgr.get_conversation = AsyncMock(return_value=mock_conversation)
+    mock_model.model_entity.abilities = ['func_call']
+    mock_app.model_mgr.get_model_by_uuid = AsyncMock(return_value=mock_model)
+    mock_app.plugin_connector.emit_event = AsyncMock(
+        side_effect=lambda event, bound_plugins: Mock(event=event, is_prevented_default=Mock(return_value=False))
+    )
+
+    stage = preproc.PreProcessor(mock_app)
+    await stage.process(sample_query, 'PreProcessor')
+
+    assert [ce.type for ce in history[0].content] == ['text']
+    assert store._blobs[image.key].refs == 0
@@ -13,6 +13,7 @@ import langbot_plugin.api.entities.builtin.provider.session as provider_session
 def get_modules():
     """Lazy import to ensure proper initialization order"""
     # Import pipelinemgr first to trigger proper stage registration
+    import_module('langbot.pkg.core.app')
     ratelimit = import_module('langbot.pkg.pipeline.ratelimit.ratelimit')
     entities = import_module('langbot.pkg.pipeline.entities')
     algo_module = import_module('langbot.pkg.pipeline.ratelimit.algo')
@@ -98,3 +99,246 @@ async def test_release_access(mock_app, sample_query):
     assert result.result_type == entities.ResultType.CONTINUE
     assert result.new_query == sample_query
     mock_algo.release_access.assert_called_once_with(sample_query, 'person', '12345')
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+
+
+async def make_algo(monkeypatch, module_name: str, algo_name: str):
+    _, _, algo_module = get_modules()
+    module = import_module(f'langbot.pkg.pipeline.ratelimit.algos.{module_name}')
+    clock = FakeClock()
+    monkeypatch.setattr(module, 'time', clock)
+    monkeypatch.setattr(module, 'asyncio', clock)
+
+    algo_cls = next(cls for cls in algo_module.preregistered_algos if cls.name == algo_name)
+    algo = algo_cls(Mock())
+    await algo.initialize()
+    return algo, clock
+
+
+def make_query(sample_query, strategy='drop', scope='session', sender_id='1', limitation=2, window=10):
+    sample_query.sender_id = sender_id
+    sample_query.bot_uuid = 'bot-1'
+    sample_query.pipeline_config = {
+        'safety': {
+            'rate-limit': {'window-length': window, 'limitation': limitation, 'strategy': strategy, 'scope': scope}
+        }
+    }
+    return sample_query
+
+
+async def admitted(algo, query, launcher_id='g1', times=1):
+    return [await algo.require_access(query, 'group', launcher_id) for _ in range(times)]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_gradually(monkeypatch, sample_query):
+    algo, clock = await make_algo(monkeypatch, 'tokenbucket', 'tokenbucket')
+    query = make_query(sample_query)
+
+    assert await admitted(algo, query, times=3) == [True, True, False]
+    # other sessions have their own bucket
+    assert await admitted(algo, query, 'g2') == [True]
+
+    clock.now += 5
+    assert await admitted(algo, query, times=2) == [True, False]
+
+    # a bucket full again is evicted
+    clock.now += 100
+    await admitted(algo, query, 'g3')
+    assert list(algo.containers.containers) == ['group_g3']
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_wait_reserves_slot(monkeypatch, sample_query):
+    algo, clock = await make_algo(monkeypatch, 'slidewin', 'slidewin')
+    query = make_query(sample_query, strategy='wait')
+
+    assert await admitted(algo, query, times=2) == [True, True]
+    clock.now += 4
+    # waits until the first request leaves the window, then the second one
+    assert await admitted(algo, query, times=2) == [True, True]
+    assert clock.sleeps == [6, 6]
+    # more than a window of backlog is dropped
+    assert await admitted(algo, query) == [False]
+
+
+@pytest.mark.asyncio
+async def test_leaky_bucket_spaces_requests(monkeypatch, sample_query):
+    algo, clock = await make_algo(monkeypatch, 'leakybucket', 'leakybucket')
+
+    # no bursts, one request per window-length / limitation
+    query = make_query(sample_query)
+    assert await admitted(algo, query, times=2) == [True, False]
+    clock.now += 5
+    assert await admitted(algo, query) == [True]
+
+    # waiting requests leave the bucket evenly, up to a window of backlog
+    wait_query = make_query(sample_query, strategy='wait')
+    assert await admitted(algo, wait_query, 'g2', times=4) == [True, True, True, False]
+    assert clock.sleeps == [5, 10]
+
+
+@pytest.mark.asyncio
+async def test_fixed_window_scopes_and_wait(monkeypatch, sample_query):
+    algo, clock = await make_algo(monkeypatch, 'fixedwin', 'fixwin')
+
+    user_query = make_query(sample_query, scope='user', limitation=1)
+    assert await admitted(algo, user_query, 'g1') == [True]
+    # the same user in another group shares the limit
+    assert await admitted(algo, user_query, 'g2') == [False]
+
+    bot_query = make_query(sample_query, strategy='wait', scope='bot', sender_id='2', limitation=1)
+    assert await admitted(algo, bot_query, times=3) == [True, True, True]
+    # once the next window is full, waiting requests take the windows after it
+    assert clock.sleeps == [10, 20]
+
+    # the reserved requests count in their windows
+    clock.now += 10
+    assert await admitted(algo, bot_query) == [True]
+    assert clock.sleeps == [10, 20, 20]
+    clock.now += 30
+    assert await admitted(algo, bot_query) == [True]
+    assert clock.sleeps == [10, 20, 20]
+
+
+def test_scoped_containers_evict_least_recently_used():
+    _, _, algo_module = get_modules()
+
+    class Container:
+        expires_at = 0.0
+
+    containers = algo_module.ScopedContainers(Container)
+    a = containers.get('a', 0)
+    a.expires_at = 10
+    containers.get('b', 0).expires_at = 20
+
+    # a hit refreshes the recency, so the expired 'b' is evicted before 'a' blocks the scan
+    assert containers.get('a', 5) is a
+    a.expires_at = 30
+    assert containers.get('c', 25) is not None
+    assert list(containers.containers) == ['a', 'c']
+    assert containers.evicted_count == 1
+
+
+@pytest.mark.asyncio
+async def test_model_budget(monkeypatch, mock_app, sample_query):
+    ratelimit, entities, algo_module = get_modules()
+    budget_module = import_module('langbot.pkg.pipeline.ratelimit.budget')
+    clock = FakeClock()
+    monkeypatch.setattr(budget_module, 'time', clock)
+
+    budget = budget_module.ModelBudget(
+        {'model-1': {'tokens': 1000, 'window': 100}, '*': {'requests': 2, 'window': 100}}
+    )
+    budget.charge('model-1', 1500)
+    assert not budget.allow('model-1')
+    assert budget.allow('model-2')
+
+    # refills gradually, the overdraft is paid back first
+    clock.now += 60
+    assert budget.allow('model-1')
+
+    budget.charge('model-2', 10)
+    budget.charge('model-2', 10)
+    assert not budget.allow('model-2')
+    assert budget.get_stats()['*']['used_requests'] == 3
+
+    mock_app.pipeline_mgr = Mock()
+    mock_app.pipeline_mgr.model_budget = budget
+    sample_query.launcher_type = provider_session.LauncherTypes.PERSON
+    sample_query.use_llm_model_uuid = 'model-2'
+    stage = ratelimit.RateLimit(mock_app)
+    stage.algo = Mock(spec=algo_module.ReteLimitAlgo)
+    result = await stage.process(sample_query, 'RequireRateLimitOccupancy')
+    assert result.result_type == entities.ResultType.INTERRUPT
+    stage.algo.require_access.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_streamed_calls_are_charged(mock_app):
+    get_modules()
+    requester = import_module('langbot.pkg.provider.modelmgr.requester')
+    streaming = import_module('langbot.pkg.provider.streaming')
+    provider_message = import_module('langbot_plugin.api.entities.builtin.provider.message')
+
+    charges = []
+    mock_app.pipeline_mgr = Mock()
+    mock_app.pipeline_mgr.model_budget.charge = lambda model_uuid, tokens: charges.append(tokens)
+
+    async def materialize_messages(messages):
+        return messages
+
+    mock_app.media_store.materialize_messages = materialize_messages
+
+    async def collect(chunks):
+        async def invoke_llm_stream(**kwargs):
+            for chunk in chunks:
+                yield chunk
+
+        provider_requester = Mock()
+        provider_requester.ap = mock_app
+        provider_requester.invoke_llm_stream = invoke_llm_stream
+        provider = requester.RuntimeProvider(Mock(), Mock(), provider_requester)
+        model = Mock()
+        messages = [provider_message.Message(role='user', content='x' * 40)]
+        return [chunk async for chunk in provider.invoke_llm_stream(None, model, messages)]
+
+    # usage reported in the stream is charged as is
+    await collect(
+        [
+            provider_message.MessageChunk(role='assistant', content='hello'),
+            streaming.UsageChunk(role='assistant', is_final=True, usage={'input_tokens': 30, 'output_tokens': 7}),
+        ]
+    )
+    # otherwise estimated from the text of the messages and the reply
+    await collect([provider_message.MessageChunk(role='assistant', content='y' * 20, is_final=True)])
+
+    assert charges == [37, 15]
+
+
+@pytest.mark.asyncio
+async def test_redis_token_bucket_shared_by_instances(sample_query):
+    from tests.unit_tests.redis_standin import RedisStandIn
+
+    get_modules()
+    redis_module = import_module('langbot.pkg.pipeline.ratelimit.algos.redistokenbucket')
+    standin = RedisStandIn()
+    await standin.start()
+
+    async def make_instance():
+        ap = Mock()
+        ap.instance_config.data = {'rate_limit': {'redis': {'url': standin.url, 'retry_interval': 30}}}
+        inst = redis_module.RedisTokenBucketAlgo(ap)
+        await inst.initialize()
+        return inst
+
+    try:
+        first, second = await make_instance(), await make_instance()
+        query = make_query(sample_query, limitation=2, window=60)
+        sample_query.pipeline_uuid = 'pipeline-1'
+
+        # two replicas share one bucket
+        assert await admitted(first, query) == [True]
+        assert await admitted(second, query, times=2) == [True, False]
+        assert await admitted(first, query, 'g2') == [True]
+
+        # the store going away falls back to a bucket per instance
+        standin.available = False
+        assert await admitted(second, query, times=3) == [True, True, False]
+        second.ap.logger.warning.assert_called_once()
+        assert second.unavailable_until > 0
+    finally:
+        await standin.stop()
@@ -138,3 +138,65 @@ async def test_atbot_rule_no_match(mock_app, sample_query):
     result = await atbot_rule.match(str(message_chain), message_chain, {}, sample_query)
 
     assert result.matching is False
+
+
+@pytest.mark.asyncio
+async def test_compiled_rules_and_group_override(mock_app, sample_query):
+    """Test prefix and regexp rules are compiled once and per-group rules override the defaults"""
+    resprule, entities, rule, rule_entities = get_modules()
+
+    sample_query.launcher_type = provider_session.LauncherTypes.GROUP
+    sample_query.adapter.bot_account_id = '999'
+    sample_query.pipeline_config = {
+        'trigger': {
+            'group-respond-rules': {
+                'at': False,
+                'prefix': ['ai', 'a', 'bot'],
+                'regexp': [r'\d+\?$', 'help'],
+                'random': 0.0,
+                '12345': {'prefix': ['!']},
+            }
+        }
+    }
+
+    stage = resprule.GroupRespondRuleCheckStage(mock_app)
+    await stage.initialize(sample_query.pipeline_config)
+    compiled = stage.default_rules
+
+    async def check(launcher_id: str, text: str):
+        sample_query.launcher_id = launcher_id
+        sample_query.message_chain = platform_message.MessageChain([platform_message.Plain(text=text)])
+        result = await stage.process(sample_query, 'GroupRespondRuleCheckStage')
+        return result.result_type, str(sample_query.message_chain)
+
+    # the first configured prefix wins, like checking them one by one
+    assert await check('1', 'ai hello') == (entities.ResultType.CONTINUE, ' hello')
+    assert await check('1', 'abc') == (entities.ResultType.CONTINUE, 'bc')
+    assert await check('1', 'help me') == (entities.ResultType.CONTINUE, 'help me')
+    assert (await check('1', 'hello'))[0] == entities.ResultType.INTERRUPT
+    assert (await check('1', '!hello'))[0] == entities.ResultType.INTERRUPT
+
+    assert await check('12345', '!hello') == (entities.ResultType.CONTINUE, 'hello')
+    assert (await check('12345', 'ai hello'))[0] == entities.ResultType.INTERRUPT
+    assert await check('12345', 'help') == (entities.ResultType.CONTINUE, 'help')
+    assert stage.default_rules is compiled
+
+    # a query carrying another config is compiled again
+    sample_query.pipeline_config = {'trigger': {'group-respond-rules': {'at': False, 'prefix': ['hey']}}}
+    assert await check('1', 'hey you') == (entities.ResultType.CONTINUE, ' you')
+    assert stage.default_rules is not compiled
+
+
+@pytest.mark.asyncio
+async def test_invalid_regexp_is_skipped(mock_app):
+    """An invalid expression is logged and skipped, the valid ones still match"""
+    get_modules()
+    regexp = import_module('langbot.pkg.pipeline.resprule.rules.regexp')
+
+    rule = regexp.RegExpRule(mock_app)
+    compiled = rule.compile({'regexp': ['(unclosed', '(?i)^HELP']})
+
+    assert [pattern.pattern for pattern in compiled] == ['(?i)^HELP']
+    mock_app.logger.warning.assert_called_once()
+    chain = platform_message.MessageChain([platform_message.Plain(text='help me')])
+    assert (await rule.match('help me', chain, compiled, None)).matching is True
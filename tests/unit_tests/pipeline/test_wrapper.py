@@ -0,0 +1,56 @@
+"""
+ResponseWrapper unit tests
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.platform.message as platform_message
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+def get_modules():
+    import_module('langbot.pkg.core.app')
+    wrapper = import_module('langbot.pkg.pipeline.wrapper.wrapper')
+    streaming = import_module('langbot.pkg.provider.streaming')
+    return wrapper, streaming
+
+
+@pytest.mark.asyncio
+async def test_delta_chunks_emit_the_event_once_with_the_full_text(mock_app, sample_query):
+    wrapper, streaming = get_modules()
+    session = provider_session.Session.model_construct(
+        launcher_type=provider_session.LauncherTypes.PERSON, launcher_id=12345, sender_id=12345
+    )
+    mock_app.sess_mgr.get_session = AsyncMock(return_value=session)
+
+    emitted = []
+
+    async def emit_event(event, bound_plugins):
+        emitted.append(event.response_text)
+        event.reply_message_chain = platform_message.MessageChain([platform_message.Plain(text='replaced')])
+        return Mock(event=event, is_prevented_default=Mock(return_value=False))
+
+    mock_app.plugin_connector.emit_event = AsyncMock(side_effect=emit_event)
+    stage = wrapper.ResponseWrapper(mock_app)
+    sample_query.resp_messages = []
+    sample_query.resp_message_chain = []
+
+    # the chat handler sends increments and turns the last chunk into the full text
+    chunks = [
+        streaming.DeltaChunk(role='assistant', content='Hel', msg_sequence=1),
+        streaming.DeltaChunk(role='assistant', content='lo', msg_sequence=2),
+        provider_message.MessageChunk(role='assistant', content='Hello!', is_final=True, msg_sequence=3),
+    ]
+    for chunk in chunks:
+        sample_query.resp_messages = [chunk]
+        async for _ in stage.process(sample_query, 'ResponseWrapper'):
+            pass
+
+    assert emitted == ['Hello!']
+    assert [str(chain) for chain in sample_query.resp_message_chain] == ['Hel', 'lo', 'replaced']
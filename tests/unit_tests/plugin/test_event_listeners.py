@@ -0,0 +1,68 @@
+"""Events are only sent to the plugin runtime when a bound plugin listens to events."""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+from langbot_plugin.api.entities import events
+
+
+def make_plugin(author: str, name: str, kind: str) -> dict:
+    return {
+        'manifest': {'manifest': {'metadata': {'author': author, 'name': name}}},
+        'components': [{'manifest': {'manifest': {'kind': kind}}}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_events_skip_plugins_without_listeners():
+    import_module('langbot.pkg.core.app')
+    connector_module = import_module('langbot.pkg.plugin.connector')
+    media = import_module('langbot.pkg.storage.media')
+
+    ap = MagicMock()
+    ap.instance_config.data = {'plugin': {'enable': True}}
+    ap.media_store = media.MediaStore()
+    image = await ap.media_store.put(b'png', 'image/png')
+    ap.media_store.materialize_dump = AsyncMock(wraps=ap.media_store.materialize_dump)
+
+    connector = connector_module.PluginRuntimeConnector(ap, AsyncMock())
+    connector.handler = MagicMock()
+    connector.handler.list_plugins = AsyncMock(
+        return_value=[make_plugin('a', 'tools', 'Tool'), make_plugin('b', 'listener', 'EventListener')]
+    )
+
+    async def emit_event(event_ctx_data, include_plugins=None):
+        return {'event_context': event_ctx_data}
+
+    connector.handler.emit_event = AsyncMock(side_effect=emit_event)
+
+    event = events.PromptPreProcessing(
+        query=pipeline_query.Query.model_construct(query_id=1),
+        session_name='group_g1',
+        default_prompt=[],
+        prompt=[
+            provider_message.Message(role='user', content=[provider_message.ContentElement.from_image_url(image.uri)])
+        ],
+    )
+
+    # the bound plugins have no event listener, the images are not read
+    await connector.emit_event(event, bound_plugins=['a/tools'])
+    connector.handler.emit_event.assert_not_awaited()
+    ap.media_store.materialize_dump.assert_not_awaited()
+
+    event_ctx = await connector.emit_event(event, bound_plugins=['a/tools', 'b/listener'])
+    connector.handler.emit_event.assert_awaited_once()
+    assert event_ctx.event.prompt[0].content[0].image_url.url == image.uri
+
+    # the listener list is cached until the plugins change
+    await connector.emit_event(event)
+    assert connector.handler.list_plugins.await_count == 1
+    connector.plugins_version += 1
+    await connector.emit_event(event)
+    assert connector.handler.list_plugins.await_count == 2
@@ -0,0 +1,150 @@
+"""
+ConversationStore backend tests
+
+The same contract runs against the memory, database (SQLite) and Redis (stand-in) backends.
+"""
+
+from __future__ import annotations
+
+import pytest
+from unittest.mock import Mock
+from importlib import import_module
+
+import sqlalchemy.ext.asyncio as sqlalchemy_asyncio
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+from tests.unit_tests.redis_standin import RedisStandIn
+
+
+def get_modules():
+    sessionmgr = import_module('langbot.pkg.provider.session.sessionmgr')
+    store = import_module('langbot.pkg.provider.session.store')
+    persistence_conversation = import_module('langbot.pkg.entity.persistence.conversation')
+    return sessionmgr, store, persistence_conversation
+
+
+@pytest.fixture(params=['memory', 'database', 'redis'])
+async def mock_app(request, tmp_path):
+    sessionmgr, store, persistence_conversation = get_modules()
+
+    app = Mock()
+    app.logger = Mock()
+    app.instance_config = Mock()
+    app.instance_config.data = {
+        'concurrency': {'pipeline': 10, 'session': 1},
+        'session': {'max_messages': 4, 'store': {'use': request.param}},
+    }
+
+    engine = None
+    standin = None
+
+    if request.param == 'database':
+        engine = sqlalchemy_asyncio.create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                persistence_conversation.Conversation.metadata.create_all,
+                tables=[
+                    persistence_conversation.Conversation.__table__,
+                    persistence_conversation.ConversationMessage.__table__,
+                ],
+            )
+        app.persistence_mgr = Mock()
+        app.persistence_mgr.get_db_engine = Mock(return_value=engine)
+    elif request.param == 'redis':
+        standin = RedisStandIn()
+        await standin.start()
+        app.instance_config.data['session']['store']['redis'] = {'url': standin.url, 'ttl': 60}
+
+    yield app
+
+    if engine is not None:
+        await engine.dispose()
+    if standin is not None:
+        await standin.stop()
+
+
+async def new_session_manager(app):
+    sessionmgr, _, _ = get_modules()
+    sess_mgr = sessionmgr.SessionManager(app)
+    await sess_mgr.initialize()
+    return sess_mgr
+
+
+def make_query(launcher_id=1) -> pipeline_query.Query:
+    return pipeline_query.Query.model_construct(
+        launcher_type=provider_session.LauncherTypes.PERSON,
+        launcher_id=launcher_id,
+        sender_id=launcher_id,
+    )
+
+
+def round_messages(i: int) -> list[provider_message.Message]:
+    return [
+        provider_message.Message(role='user', content=f'q{i}'),
+        provider_message.Message(role='assistant', content=f'a{i}'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_conversation_survives_restart(mock_app):
+    sess_mgr = await new_session_manager(mock_app)
+    session = await sess_mgr.get_session(make_query())
+    conversation = await sess_mgr.get_conversation(
+        make_query(), session, [{'role': 'system', 'content': 'be nice'}], 'pipeline-1', 'bot-1'
+    )
+    conversation.uuid = 'external-conversation'
+    await sess_mgr.append_messages(session, conversation, round_messages(0))
+
+    # a fresh manager sharing the same backend, like a restarted process
+    if mock_app.instance_config.data['session']['store']['use'] == 'memory':
+        restarted = sess_mgr
+        restarted.sessions.clear()
+    else:
+        restarted = await new_session_manager(mock_app)
+
+    restored = await restarted.get_session(make_query())
+
+    assert restored is not session
+    assert len(restored.conversations) == 1
+    assert restored.using_conversation.pipeline_uuid == 'pipeline-1'
+    assert restored.using_conversation.uuid == 'external-conversation'
+    assert restored.using_conversation.prompt.messages[0].content == 'be nice'
+    assert [m.content for m in restored.using_conversation.messages] == ['q0', 'a0']
+
+    # appending to a restored conversation keeps writing to the same record
+    await restarted.append_messages(restored, restored.using_conversation, round_messages(1))
+    restarted.sessions.clear()
+    restored_again = await restarted.get_session(make_query())
+    assert [m.content for m in restored_again.using_conversation.messages] == ['q0', 'a0', 'q1', 'a1']
+
+
+@pytest.mark.asyncio
+async def test_trimmed_messages_are_removed_from_store(mock_app):
+    sess_mgr = await new_session_manager(mock_app)
+    session = await sess_mgr.get_session(make_query())
+    conversation = await sess_mgr.get_conversation(make_query(), session, [], 'pipeline-1', 'bot-1')
+
+    for i in range(3):
+        await sess_mgr.append_messages(session, conversation, round_messages(i))
+
+    _, store, _ = get_modules()
+    loaded = await sess_mgr.conversation_store.load_conversations(store.get_session_key(session))
+
+    assert [m.content for m in loaded[0].messages] == ['q1', 'a1', 'q2', 'a2']
+
+
+@pytest.mark.asyncio
+async def test_delete_conversation(mock_app):
+    sess_mgr = await new_session_manager(mock_app)
+    session = await sess_mgr.get_session(make_query())
+    conversation = await sess_mgr.get_conversation(make_query(), session, [], 'pipeline-1', 'bot-1')
+    await sess_mgr.append_messages(session, conversation, round_messages(0))
+
+    _, store, _ = get_modules()
+    session_key = store.get_session_key(session)
+    await sess_mgr.conversation_store.delete_conversation(session_key, store.get_conversation_id(conversation))
+
+    assert await sess_mgr.conversation_store.load_conversations(session_key) == []
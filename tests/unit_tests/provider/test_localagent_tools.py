@@ -0,0 +1,118 @@
+"""
+LocalAgentRunner tool call execution tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+def get_localagent_module():
+    # runners are registered while the application module is imported, import it first to avoid a circular import
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.provider.runners.localagent')
+
+
+def make_runner(delays: dict[str, float]):
+    localagent = get_localagent_module()
+
+    running = {'now': 0, 'peak': 0}
+
+    async def execute_func_call(name, parameters, query):
+        running['now'] += 1
+        running['peak'] = max(running['peak'], running['now'])
+        try:
+            await asyncio.sleep(delays[name])
+            if name == 'broken':
+                raise ValueError('broken tool')
+            return {'tool': name, 'parameters': parameters}
+        finally:
+            running['now'] -= 1
+
+    ap = Mock()
+    ap.logger = Mock()
+    ap.tool_mgr = Mock()
+    ap.tool_mgr.execute_func_call = execute_func_call
+    ap.monitoring_service = Mock()
+    ap.monitoring_service.record_tool_call = AsyncMock()
+
+    return localagent.LocalAgentRunner(ap, {}), running
+
+
+def make_query() -> pipeline_query.Query:
+    return pipeline_query.Query.model_construct(
+        launcher_type=provider_session.LauncherTypes.PERSON,
+        launcher_id=1,
+        bot_uuid='bot-1',
+        pipeline_uuid='pipeline-1',
+        variables={},
+    )
+
+
+def make_tool_call(name: str, index: int) -> provider_message.ToolCall:
+    return provider_message.ToolCall(
+        id=f'call-{index}',
+        type='function',
+        function=provider_message.FunctionCall(name=name, arguments=json.dumps({'i': index})),
+    )
+
+
+async def collect(runner, tool_calls, concurrency, timeout=0):
+    return [item async for item in runner._execute_tool_calls(make_query(), tool_calls, concurrency, timeout)]
+
+
+@pytest.mark.asyncio
+async def test_parallel_results_keep_tool_call_order():
+    runner, running = make_runner({'slow': 0.2, 'fast': 0.01})
+    tool_calls = [make_tool_call('slow', 0), make_tool_call('fast', 1), make_tool_call('slow', 2)]
+
+    start = time.monotonic()
+    results = await collect(runner, tool_calls, concurrency=4)
+    elapsed = time.monotonic() - start
+
+    assert [tool_call.id for tool_call, _ in results] == ['call-0', 'call-1', 'call-2']
+    assert [ret['parameters']['i'] for _, ret in results] == [0, 1, 2]
+    assert running['peak'] == 3
+    assert elapsed < 0.35
+    assert runner.ap.monitoring_service.record_tool_call.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_sequential_mode():
+    runner, running = make_runner({'slow': 0.05})
+    tool_calls = [make_tool_call('slow', i) for i in range(6)]
+
+    await collect(runner, tool_calls, concurrency=2)
+    assert running['peak'] == 2
+
+    running['peak'] = 0
+    await collect(runner, tool_calls, concurrency=1)
+    assert running['peak'] == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_and_timeouts_are_per_call():
+    runner, _ = make_runner({'slow': 1.0, 'broken': 0.01, 'fast': 0.01})
+    tool_calls = [make_tool_call('slow', 0), make_tool_call('broken', 1), make_tool_call('fast', 2)]
+
+    results = await collect(runner, tool_calls, concurrency=4, timeout=0.1)
+
+    assert isinstance(results[0][1], TimeoutError)
+    assert isinstance(results[1][1], ValueError)
+    assert results[2][1]['tool'] == 'fast'
+
+    statuses = {
+        call.kwargs['tool_name']: call.kwargs['status']
+        for call in runner.ap.monitoring_service.record_tool_call.await_args_list
+    }
+    assert statuses == {'slow': 'timeout', 'broken': 'error', 'fast': 'success'}
@@ -0,0 +1,216 @@
+"""
+Response cache tests, the cache alone and LocalAgentRunner answering from it
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.prompt as provider_prompt
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+def get_modules():
+    # runners are registered while the application module is imported, import it first to avoid a circular import
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.provider.response_cache'), import_module(
+        'langbot.pkg.provider.runners.localagent'
+    )
+
+
+def prompt(text: str) -> list[provider_message.Message]:
+    return [provider_message.Message(role='system', content=text)]
+
+
+def test_exact_match_ignores_case_and_whitespace():
+    response_cache, _ = get_modules()
+    cache = response_cache.ResponseCache()
+    key = cache.context_key(prompt('be nice'), 'model-1', ['kb-1'])
+
+    assert cache.lookup('p1', key, 'How do I reset my password?') is None
+    cache.store('p1', key, ['kb-1'], 'How do I reset my password?', 'Click "forgot password".', ttl=60)
+
+    assert cache.lookup('p1', key, '  how do I   reset my PASSWORD? ') == ('Click "forgot password".', 'exact')
+    # other pipelines, prompts and models do not share answers
+    assert cache.lookup('p2', key, 'How do I reset my password?') is None
+    assert (
+        cache.lookup('p1', cache.context_key(prompt('be brief'), 'model-1', ['kb-1']), 'How do I reset my password?')
+        is None
+    )
+    assert (
+        cache.lookup('p1', cache.context_key(prompt('be nice'), 'model-2', ['kb-1']), 'How do I reset my password?')
+        is None
+    )
+
+    stats = cache.get_stats()
+    assert (stats['exact_hits'], stats['misses']) == (1, 4)
+    assert stats['pipelines']['p1'] == {'exact_hits': 1, 'semantic_hits': 0, 'misses': 3}
+
+
+def test_semantic_match_above_threshold():
+    response_cache, _ = get_modules()
+    cache = response_cache.ResponseCache()
+    key = cache.context_key([], 'model-1', [])
+    cache.store('p1', key, [], 'opening hours?', 'Nine to five.', ttl=60, embedding=[1.0, 0.0, 0.0])
+    cache.store('p1', key, [], 'where are you?', 'Berlin.', ttl=60, embedding=[0.0, 1.0, 0.0])
+
+    assert cache.lookup('p1', key, 'when are you open?', [0.96, 0.2, 0.0], similarity=0.95) == (
+        'Nine to five.',
+        'semantic',
+    )
+    assert cache.lookup('p1', key, 'do you ship abroad?', [0.6, 0.6, 0.5], similarity=0.95) is None
+    # 1 turns the nearest neighbour lookup off
+    assert cache.lookup('p1', key, 'when are you open?', [0.96, 0.2, 0.0], similarity=1) is None
+    assert cache.get_stats()['semantic_hits'] == 1
+
+
+def test_ttl_eviction_and_invalidation(monkeypatch):
+    response_cache, _ = get_modules()
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'monotonic', lambda: now[0])
+
+    cache = response_cache.ResponseCache(max_entries=2)
+    key = cache.context_key([], 'model-1', ['kb-1'])
+    cache.store('p1', key, ['kb-1'], 'a', 'A', ttl=10)
+    cache.store('p1', key, ['kb-1'], 'b', 'B', ttl=0)
+    now[0] += 11
+    assert cache.lookup('p1', key, 'a') is None
+    assert cache.lookup('p1', key, 'b') == ('B', 'exact')
+
+    # the least recently used answer is evicted
+    cache.store('p1', key, ['kb-1'], 'c', 'C', ttl=0)
+    cache.store('p1', key, ['kb-1'], 'd', 'D', ttl=0)
+    assert cache.lookup('p1', key, 'b') is None
+    assert cache.get_stats()['entries'] == 2
+
+    # a changed knowledge base gets a new snapshot, the answers built on it are dropped
+    other_key = cache.context_key([], 'model-1', [])
+    cache.store('p2', other_key, [], 'e', 'E', ttl=0)
+    cache.invalidate_kb('kb-1')
+    assert cache.context_key([], 'model-1', ['kb-1']) != key
+    assert cache.lookup('p1', key, 'c') is None
+    assert cache.lookup('p2', other_key, 'e') == ('E', 'exact')
+
+    cache.invalidate_pipeline('p2')
+    assert cache.lookup('p2', other_key, 'e') is None
+    assert cache.get_stats()['entries'] == 0
+
+
+def make_runner(stream: bool):
+    response_cache, localagent = get_modules()
+
+    llm_calls = []
+
+    async def invoke_llm(query, model, messages, funcs, extra_args, remove_think):
+        llm_calls.append(messages)
+        return provider_message.Message(role='assistant', content=f'answer {len(llm_calls)}')
+
+    async def invoke_llm_stream(query, model, messages, funcs, extra_args, remove_think):
+        llm_calls.append(messages)
+        yield provider_message.MessageChunk(role='assistant', content=f'answer {len(llm_calls)}', is_final=True)
+
+    model = Mock()
+    model.provider.invoke_llm = invoke_llm
+    model.provider.invoke_llm_stream = invoke_llm_stream
+    model.model_entity.extra_args = {}
+
+    ap = Mock()
+    ap.instance_config.data = {}
+    ap.model_mgr.get_model_by_uuid = AsyncMock(return_value=model)
+    ap.pipeline_mgr.response_cache = response_cache.ResponseCache()
+
+    adapter = Mock()
+    adapter.is_stream_output_supported = AsyncMock(return_value=stream)
+    return localagent.LocalAgentRunner(ap, {}), adapter, llm_calls
+
+
+def make_query(
+    adapter, text: str, cache: bool = True, launcher_id: int = 1, history: list[provider_message.Message] | None = None
+) -> pipeline_query.Query:
+    return pipeline_query.Query.model_construct(
+        query_id=1,
+        launcher_type=provider_session.LauncherTypes.PERSON,
+        launcher_id=launcher_id,
+        pipeline_uuid='pipeline-1',
+        pipeline_config={
+            'ai': {'local-agent': {'response-cache': cache, 'response-cache-similarity': 1}},
+            'output': {'misc': {'remove-think': False}},
+        },
+        user_message=provider_message.Message(role='user', content=text),
+        prompt=provider_prompt.Prompt(name='default', messages=prompt('be nice')),
+        messages=list(history or []),
+        use_funcs=[],
+        use_llm_model_uuid='model-1',
+        adapter=adapter,
+        variables={},
+    )
+
+
+async def run(runner, query):
+    return [msg async for msg in runner.run(query)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('stream', [False, True])
+async def test_runner_replays_cached_answer(stream):
+    runner, adapter, llm_calls = make_runner(stream)
+
+    first = make_query(adapter, 'Opening hours?')
+    assert [msg.content for msg in await run(runner, first)] == ['answer 1']
+    assert first.variables['response_cache'] == 'miss'
+
+    second = make_query(adapter, 'opening hours? ')
+    replies = await run(runner, second)
+    assert [msg.content for msg in replies] == ['answer 1']
+    assert second.variables['response_cache'] == 'exact'
+    assert len(llm_calls) == 1
+    if stream:
+        assert isinstance(replies[0], provider_message.MessageChunk) and replies[0].is_final
+    else:
+        assert not isinstance(replies[0], provider_message.MessageChunk)
+
+    # pipelines without the cache enabled always ask the model
+    assert [msg.content for msg in await run(runner, make_query(adapter, 'Opening hours?', cache=False))] == [
+        'answer 2'
+    ]
+
+    # updating the pipeline drops its answers
+    runner.ap.pipeline_mgr.response_cache.invalidate_pipeline('pipeline-1')
+    assert [msg.content for msg in await run(runner, make_query(adapter, 'Opening hours?'))] == ['answer 3']
+
+
+@pytest.mark.asyncio
+async def test_sessions_with_history_do_not_share_answers():
+    runner, adapter, llm_calls = make_runner(stream=False)
+
+    alice = make_query(
+        adapter,
+        'What is my order number?',
+        launcher_id=1,
+        history=[
+            provider_message.Message(role='user', content='I ordered a lamp, order 1001'),
+            provider_message.Message(role='assistant', content='Noted.'),
+        ],
+    )
+    bob = make_query(
+        adapter,
+        'What is my order number?',
+        launcher_id=2,
+        history=[
+            provider_message.Message(role='user', content='I ordered a chair, order 2002'),
+            provider_message.Message(role='assistant', content='Noted.'),
+        ],
+    )
+
+    assert [msg.content for msg in await run(runner, alice)] == ['answer 1']
+    assert [msg.content for msg in await run(runner, bob)] == ['answer 2']
+    assert 'response_cache' not in bob.variables
+    assert len(llm_calls) == 2
+    # the question is asked with each session's own history
+    assert llm_calls[1][1].content == 'I ordered a chair, order 2002'
+    assert runner.ap.pipeline_mgr.response_cache.get_stats()['entries'] == 0
@@ -0,0 +1,144 @@
+"""
+Session lease tests, several session managers sharing one Redis stand-in like replicas
+"""
+
+from __future__ import annotations
+
+import asyncio
+from importlib import import_module
+from unittest.mock import Mock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+from langbot.pkg.utils import redisscripts
+from tests.unit_tests.redis_standin import RedisStandIn
+
+
+@pytest.fixture
+async def standin():
+    standin = RedisStandIn()
+    await standin.start()
+    yield standin
+    await standin.stop()
+
+
+async def make_session_manager(standin: RedisStandIn, ttl: float = 60):
+    sessionmgr = import_module('langbot.pkg.provider.session.sessionmgr')
+    app = Mock()
+    app.instance_config.data = {
+        'concurrency': {'pipeline': 10, 'session': 1},
+        'session': {
+            'lease': {'use': 'redis', 'redis': {'url': standin.url}, 'ttl': ttl, 'poll_interval': 0.01},
+        },
+    }
+    sess_mgr = sessionmgr.SessionManager(app)
+    await sess_mgr.initialize()
+    return sess_mgr
+
+
+async def get_session(sess_mgr) -> provider_session.Session:
+    query = pipeline_query.Query.model_construct(
+        launcher_type=provider_session.LauncherTypes.GROUP, launcher_id=1, sender_id=1
+    )
+    return await sess_mgr.get_session(query)
+
+
+@pytest.mark.asyncio
+async def test_lease_limits_concurrency_across_instances(standin):
+    first, second = await make_session_manager(standin), await make_session_manager(standin)
+    first_session, second_session = await get_session(first), await get_session(second)
+
+    events = []
+
+    async def process(sess_mgr, session, name):
+        async with sess_mgr.lease(session):
+            events.append(f'{name} start')
+            await asyncio.sleep(0.05)
+            events.append(f'{name} end')
+
+    await asyncio.gather(process(first, first_session, 'a'), process(second, second_session, 'b'))
+
+    assert events in (['a start', 'a end', 'b start', 'b end'], ['b start', 'b end', 'a start', 'a end'])
+    assert standin.data == {}
+
+
+@pytest.mark.asyncio
+async def test_lease_is_renewed_while_held(standin):
+    first, second = await make_session_manager(standin, ttl=0.15), await make_session_manager(standin, ttl=0.15)
+    first_session, second_session = await get_session(first), await get_session(second)
+
+    entered = asyncio.Event()
+
+    async def long_query():
+        async with first.lease(first_session):
+            entered.set()
+            await asyncio.sleep(0.4)
+
+    task = asyncio.create_task(long_query())
+    await entered.wait()
+
+    # still held after more than one ttl
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(second.lease(second_session).__aenter__(), timeout=0.3)
+
+    await task
+
+
+@pytest.mark.asyncio
+async def test_store_unavailable_falls_back_to_local_limit(standin):
+    sess_mgr = await make_session_manager(standin)
+    session = await get_session(sess_mgr)
+
+    standin.available = False
+    async with sess_mgr.lease(session):
+        pass
+    sess_mgr.ap.logger.warning.assert_called_once()
+
+    # the store is not retried before retry_interval
+    standin.available = True
+    async with sess_mgr.lease(session):
+        assert standin.data == {}
+
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_store_connections(standin):
+    sess_mgr = await make_session_manager(standin)
+    session = await get_session(sess_mgr)
+    async with sess_mgr.lease(session):
+        pass
+    assert sess_mgr.lease_mgr.client._writer is not None
+
+    await sess_mgr.shutdown()
+    assert sess_mgr.lease_mgr.client._writer is None
+
+
+@pytest.mark.asyncio
+async def test_release_waits_for_in_flight_renewal(standin):
+    sess_mgr = await make_session_manager(standin, ttl=0.3)
+    session = await get_session(sess_mgr)
+
+    client = sess_mgr.lease_mgr.client
+    eval_ = client.eval
+    renewing = asyncio.Event()
+    renewed = []
+
+    async def slow_eval(script, keys, args):
+        if script is redisscripts.LEASE_RENEW:
+            renewing.set()
+            await asyncio.sleep(0.05)
+            renewed.append(await eval_(script, keys, args))
+            return renewed[-1]
+        return await eval_(script, keys, args)
+
+    client.eval = slow_eval
+
+    async with sess_mgr.lease(session):
+        await renewing.wait()
+
+    # the renewal finished instead of being cancelled while reading its reply
+    assert renewed == [1]
+    assert client._writer is not None
+    assert standin.data == {}
@@ -0,0 +1,222 @@
+"""
+SessionManager unit tests
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import Mock
+from importlib import import_module
+
+import langbot_plugin.api.entities.builtin.pipeline.query as pipeline_query
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+import langbot_plugin.api.entities.builtin.provider.prompt as provider_prompt
+import langbot_plugin.api.entities.builtin.provider.session as provider_session
+
+
+def get_sessionmgr_module():
+    return import_module('langbot.pkg.provider.session.sessionmgr')
+
+
+def make_query(launcher_id, launcher_type=provider_session.LauncherTypes.GROUP) -> pipeline_query.Query:
+    return pipeline_query.Query.model_construct(
+        launcher_type=launcher_type,
+        launcher_id=launcher_id,
+        sender_id=launcher_id,
+    )
+
+
+async def make_session_manager(**session_config):
+    sessionmgr = get_sessionmgr_module()
+    mock_app = Mock()
+    mock_app.instance_config = Mock()
+    mock_app.instance_config.data = {
+        'concurrency': {'pipeline': 10, 'session': 1},
+        'session': session_config,
+    }
+    sess_mgr = sessionmgr.SessionManager(mock_app)
+    await sess_mgr.initialize()
+    return sess_mgr
+
+
+@pytest.mark.asyncio
+async def test_get_session_returns_same_instance():
+    sess_mgr = await make_session_manager()
+
+    session = await sess_mgr.get_session(make_query(1))
+
+    assert await sess_mgr.get_session(make_query(1)) is session
+    assert await sess_mgr.get_session(make_query(1, provider_session.LauncherTypes.PERSON)) is not session
+    assert sess_mgr.live_session_count == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_on_capacity():
+    sess_mgr = await make_session_manager(max_sessions=2)
+
+    first = await sess_mgr.get_session(make_query(1))
+    await sess_mgr.get_session(make_query(2))
+    # touch 1 so that 2 becomes the least recently used
+    await sess_mgr.get_session(make_query(1))
+    await sess_mgr.get_session(make_query(3))
+
+    assert sess_mgr.live_session_count == 2
+    assert sess_mgr.evicted_session_count == 1
+    assert (provider_session.LauncherTypes.GROUP, 2) not in sess_mgr.sessions
+    assert await sess_mgr.get_session(make_query(1)) is first
+
+
+@pytest.mark.asyncio
+async def test_busy_session_not_evicted():
+    sess_mgr = await make_session_manager(max_sessions=1)
+
+    busy = await sess_mgr.get_session(make_query(1))
+    await busy._semaphore.acquire()
+
+    await sess_mgr.get_session(make_query(2))
+
+    assert await sess_mgr.get_session(make_query(1)) is busy
+    assert sess_mgr.evicted_session_count == 0
+
+
+@pytest.mark.asyncio
+async def test_idle_timeout_eviction():
+    sess_mgr = await make_session_manager(idle_timeout=60)
+
+    await sess_mgr.get_session(make_query(1))
+    sess_mgr.last_active[(provider_session.LauncherTypes.GROUP, 1)] -= 120
+
+    await sess_mgr.get_session(make_query(2))
+
+    assert (provider_session.LauncherTypes.GROUP, 1) not in sess_mgr.sessions
+    assert sess_mgr.get_stats()['evicted_session_count'] == 1
+
+
+@pytest.mark.asyncio
+async def test_conversation_cap():
+    sess_mgr = await make_session_manager(max_conversations=2)
+    session = await sess_mgr.get_session(make_query(1))
+
+    for pipeline_uuid in ['a', 'b', 'c']:
+        await sess_mgr.get_conversation(make_query(1), session, [], pipeline_uuid, 'bot')
+
+    assert [c.pipeline_uuid for c in session.conversations] == ['b', 'c']
+    assert session.using_conversation.pipeline_uuid == 'c'
+    assert sess_mgr.trimmed_conversation_count == 1
+
+
+@pytest.mark.asyncio
+async def test_message_cap_keeps_user_first():
+    sess_mgr = await make_session_manager(max_messages=3)
+    session = await sess_mgr.get_session(make_query(1))
+    conversation = await sess_mgr.get_conversation(make_query(1), session, [], 'p', 'bot')
+
+    for i in range(2):
+        await sess_mgr.append_messages(
+            session,
+            conversation,
+            [
+                provider_message.Message(role='user', content=f'q{i}'),
+                provider_message.Message(role='assistant', content=f'a{i}'),
+            ],
+        )
+
+    # 3 would leave a dangling assistant message first, so the whole first round is dropped
+    assert [m.content for m in conversation.messages] == ['q1', 'a1']
+    assert sess_mgr.trimmed_message_count == 2
+
+
+@pytest.mark.asyncio
+async def test_message_cap_keeps_last_round_with_tool_heavy_tail():
+    sess_mgr = await make_session_manager(max_messages=3)
+    session = await sess_mgr.get_session(make_query(1))
+    conversation = await sess_mgr.get_conversation(make_query(1), session, [], 'p', 'bot')
+
+    await sess_mgr.append_messages(
+        session,
+        conversation,
+        [provider_message.Message(role='user', content='q0'), provider_message.Message(role='assistant', content='a0')],
+    )
+    # a single round with more tool messages than the cap and no later user message
+    await sess_mgr.append_messages(
+        session,
+        conversation,
+        [provider_message.Message(role='user', content='q1')]
+        + [provider_message.Message(role='tool', content=f't{i}') for i in range(4)]
+        + [provider_message.Message(role='assistant', content='a1')],
+    )
+
+    assert [m.content for m in conversation.messages] == ['q1', 't0', 't1', 't2', 't3', 'a1']
+    assert sess_mgr.trimmed_message_count == 2
+
+
+@pytest.mark.asyncio
+async def test_zero_limits_disable_eviction():
+    sess_mgr = await make_session_manager(max_sessions=0, idle_timeout=0, max_conversations=0, max_messages=0)
+
+    assert sess_mgr.max_sessions == sess_mgr.idle_timeout == -1
+    assert sess_mgr.max_conversations == sess_mgr.max_messages == -1
+    for i in range(3):
+        await sess_mgr.get_session(make_query(i))
+    assert sess_mgr.live_session_count == 3
+
+
+@pytest.mark.asyncio
+async def test_trimmed_messages_release_media():
+    media = import_module('langbot.pkg.storage.media')
+    sess_mgr = await make_session_manager(max_messages=2)
+    store = sess_mgr.ap.media_store = media.MediaStore()
+    session = await sess_mgr.get_session(make_query(1))
+    conversation = await sess_mgr.get_conversation(make_query(1), session, [], 'p', 'bot')
+
+    handles = [await store.put(f'image {i}'.encode(), 'image/png') for i in range(2)]
+    for handle in handles:
+        await sess_mgr.append_messages(
+            session,
+            conversation,
+            [
+                provider_message.Message(
+                    role='user', content=[provider_message.ContentElement.from_image_url(handle.uri)]
+                ),
+                provider_message.Message(role='assistant', content='nice'),
+            ],
+        )
+
+    # the first image only lived in the trimmed round
+    assert store._blobs[handles[0].key].refs == 0
+    assert store._blobs[handles[1].key].refs == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_wait_for_store():
+    sess_mgr = await make_session_manager()
+    released = asyncio.Event()
+    loads = []
+
+    async def load_conversations(session_key, max_conversations, max_messages):
+        loads.append(session_key)
+        await released.wait()
+        return [
+            provider_session.Conversation(
+                prompt=provider_prompt.Prompt(name='default', messages=[]),
+                messages=[],
+                pipeline_uuid='p',
+                bot_uuid='bot',
+            )
+        ]
+
+    sess_mgr.conversation_store = Mock()
+    sess_mgr.conversation_store.load_conversations = load_conversations
+
+    # the scheduler holds the query pool lock, it gets the session while the store is still loading
+    session = await asyncio.wait_for(sess_mgr.get_session(make_query(1), wait_loaded=False), 1)
+    assert not session.conversations
+
+    waiting = asyncio.create_task(sess_mgr.get_session(make_query(1)))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+
+    released.set()
+    assert await waiting is session
+    assert session.using_conversation.pipeline_uuid == 'p'
+    assert len(loads) == 1 and not sess_mgr.loading
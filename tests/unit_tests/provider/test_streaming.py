@@ -0,0 +1,87 @@
+"""
+Streaming buffer and flush policy unit tests
+"""
+
+from importlib import import_module
+
+
+def get_streaming_module():
+    return import_module('langbot.pkg.provider.streaming')
+
+
+def test_buffer_delta_and_value():
+    streaming = get_streaming_module()
+    buffer = streaming.StreamBuffer()
+
+    buffer.append('Hello')
+    buffer.append(None)
+    buffer.append(', ')
+    assert buffer.delta_length == 7
+    assert buffer.take_delta() == 'Hello, '
+    assert buffer.delta_length == 0
+
+    buffer.append('world')
+    assert buffer.getvalue() == 'Hello, world'
+    assert buffer.take_delta() == 'world'
+    assert len(buffer) == 12
+    assert buffer.getvalue() == 'Hello, world'
+
+
+def test_empty_buffer():
+    streaming = get_streaming_module()
+    buffer = streaming.StreamBuffer()
+
+    assert buffer.getvalue() == ''
+    assert buffer.take_delta() == ''
+
+
+def test_flush_policy_by_size_and_time():
+    streaming = get_streaming_module()
+    policy = streaming.FlushPolicy(interval=1.0, max_chars=10)
+    policy.mark_flushed(100.0)
+
+    assert not policy.should_flush(0, now=200.0)
+    assert not policy.should_flush(5, now=100.5)
+    assert policy.should_flush(10, now=100.5)
+    assert policy.should_flush(5, now=101.0)
+
+
+def test_flush_policy_from_config():
+    streaming = get_streaming_module()
+
+    policy = streaming.FlushPolicy.from_config({'streaming': {'flush_interval': 0.5, 'flush_chars': 64}})
+    assert policy.interval == 0.5
+    assert policy.max_chars == 64
+
+    default_policy = streaming.FlushPolicy.from_config({})
+    assert default_policy.interval == 0.2
+    assert default_policy.max_chars == 256
+
+
+def test_stream_reply_buffers_join_deltas_only_when_read():
+    streaming = get_streaming_module()
+    import_module('langbot.pkg.core.app')
+    platform_streaming = import_module('langbot.pkg.platform.streaming')
+    platform_message = import_module('langbot_plugin.api.entities.builtin.platform.message')
+    provider_message = import_module('langbot_plugin.api.entities.builtin.provider.message')
+
+    def chain(*components):
+        return platform_message.MessageChain(list(components))
+
+    buffers = platform_streaming.StreamReplyBuffers()
+    for text in ['Hel', 'lo', ', world']:
+        delta = streaming.DeltaChunk(role='assistant', content=text)
+        buffers.append('r1', delta, chain(platform_message.Plain(text=text)))
+
+    image = platform_message.Image(url='https://example.com/a.png')
+    sent = buffers.message_chain('r1', chain(platform_message.Plain(text=', world'), image))
+    assert [c.text for c in sent if isinstance(c, platform_message.Plain)] == ['Hello, world']
+    assert sent[1] is image
+
+    # chunks of runners streaming the full text so far replace what was buffered
+    full = provider_message.MessageChunk(role='assistant', content='Hi')
+    buffers.append('r1', full, chain(platform_message.Plain(text='Hi')))
+    assert str(buffers.message_chain('r1', chain())) == 'Hi'
+
+    buffers.pop('r1')
+    assert str(buffers.message_chain('r1', chain())) == ''
@@ -0,0 +1,138 @@
+"""
+ToolManager index and cache tests
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.resource.tool as resource_tool
+
+
+def get_modules():
+    import_module('langbot.pkg.core.app')
+    toolmgr = import_module('langbot.pkg.provider.tools.toolmgr')
+    plugin_loader = import_module('langbot.pkg.provider.tools.loaders.plugin')
+    mcp_loader = import_module('langbot.pkg.provider.tools.loaders.mcp')
+    return toolmgr, plugin_loader, mcp_loader
+
+
+def make_plugin_tool(name: str):
+    tool = Mock()
+    tool.metadata.name = name
+    tool.metadata.description.en_US = name
+    tool.spec = {'llm_prompt': f'{name} prompt', 'parameters': {'type': 'object', 'properties': {}}}
+    return tool
+
+
+def make_mcp_session(server_uuid: str, tool_names: list[str]):
+    session = Mock()
+    session.server_uuid = server_uuid
+    session.tools_version = 1
+
+    async def func(**kwargs):
+        return {'server': server_uuid, **kwargs}
+
+    tools = [
+        resource_tool.LLMTool(name=name, human_desc='', description=name, parameters={}, func=func)
+        for name in tool_names
+    ]
+    session.get_tools = Mock(return_value=tools)
+    return session
+
+
+@pytest.fixture
+def tool_mgr():
+    toolmgr, plugin_loader, mcp_loader = get_modules()
+
+    ap = Mock()
+    ap.logger = Mock()
+    ap.instance_config.data = {}
+    ap.plugin_connector.plugins_version = 0
+    ap.plugin_connector.list_tools = AsyncMock(return_value=[make_plugin_tool('weather')])
+    ap.plugin_connector.call_tool = AsyncMock(return_value={'ok': True})
+
+    mgr = toolmgr.ToolManager(ap)
+    mgr.plugin_tool_loader = plugin_loader.PluginToolLoader(ap)
+    mgr.mcp_tool_loader = mcp_loader.MCPLoader(ap)
+    mgr.mcp_tool_loader.sessions = {'search': make_mcp_session('mcp-1', ['search'])}
+    return mgr
+
+
+@pytest.mark.asyncio
+async def test_tool_lists_are_cached_until_plugins_change(tool_mgr):
+    connector = tool_mgr.ap.plugin_connector
+
+    first = await tool_mgr.get_all_tools(['a/b'], None)
+    assert [tool.name for tool in first] == ['weather', 'search']
+    assert await tool_mgr.get_all_tools(['a/b'], None) is first
+    assert connector.list_tools.await_count == 1
+
+    # a different binding set is cached separately
+    await tool_mgr.get_all_tools(None, ['mcp-2'])
+    assert connector.list_tools.await_count == 2
+
+    connector.plugins_version += 1
+    connector.list_tools.return_value = [make_plugin_tool('weather'), make_plugin_tool('stock')]
+    refreshed = await tool_mgr.get_all_tools(['a/b'], None)
+    assert [tool.name for tool in refreshed] == ['weather', 'stock', 'search']
+
+
+@pytest.mark.asyncio
+async def test_execute_func_call_uses_index(tool_mgr):
+    connector = tool_mgr.ap.plugin_connector
+
+    assert await tool_mgr.execute_func_call('search', {'q': 'x'}, query=Mock()) == {'server': 'mcp-1', 'q': 'x'}
+    assert await tool_mgr.execute_func_call('weather', {}, query=Mock()) == {'ok': True}
+    assert await tool_mgr.execute_func_call('search', {}, query=Mock()) == {'server': 'mcp-1'}
+    assert connector.list_tools.await_count == 1
+
+    # a refreshed MCP session rebuilds the index
+    tool_mgr.mcp_tool_loader.sessions['search'] = make_mcp_session('mcp-1', ['search', 'fetch'])
+    tool_mgr.mcp_tool_loader.sessions['search'].tools_version = 2
+    assert await tool_mgr.execute_func_call('fetch', {}, query=Mock()) == {'server': 'mcp-1'}
+
+    with pytest.raises(ValueError):
+        await tool_mgr.execute_func_call('missing', {}, query=Mock())
+
+
+@pytest.mark.asyncio
+async def test_schemas_are_generated_once(tool_mgr):
+    tools = await tool_mgr.get_all_tools()
+
+    openai_tools = await tool_mgr.generate_tools_for_openai(tools)
+    assert await tool_mgr.generate_tools_for_openai(tools) is openai_tools
+    assert openai_tools[0]['function']['name'] == 'weather'
+
+    anthropic_tools = await tool_mgr.generate_tools_for_anthropic(tools)
+    assert anthropic_tools is not openai_tools
+    assert anthropic_tools[1]['name'] == 'search'
+
+    # a different list of tools gets its own schema
+    assert len(await tool_mgr.generate_tools_for_openai(tools[:1])) == 1
+
+
+@pytest.mark.asyncio
+async def test_tool_lists_expire_without_a_version_bump(tool_mgr, monkeypatch):
+    toolmgr, plugin_loader, _ = get_modules()
+    clock = Mock(return_value=1000.0)
+    monkeypatch.setattr(toolmgr.time, 'monotonic', clock)
+    connector = tool_mgr.ap.plugin_connector
+
+    assert [tool.name for tool in await tool_mgr.get_all_tools()] == ['weather', 'search']
+
+    # a debug plugin connects, the plugins version stays the same
+    connector.list_tools.return_value = [make_plugin_tool('weather'), make_plugin_tool('debug')]
+    assert [tool.name for tool in await tool_mgr.get_all_tools()] == ['weather', 'search']
+
+    clock.return_value += tool_mgr.plugin_tool_loader.cache_ttl
+    assert [tool.name for tool in await tool_mgr.get_all_tools()] == ['weather', 'debug', 'search']
+    assert await tool_mgr.execute_func_call('debug', {}, query=Mock()) == {'ok': True}
+
+    # a ttl of 0 turns caching off
+    tool_mgr.plugin_tool_loader.cache_ttl = 0
+    connector.list_tools.return_value = [make_plugin_tool('other')]
+    assert [tool.name for tool in await tool_mgr.get_all_tools()] == ['other', 'search']
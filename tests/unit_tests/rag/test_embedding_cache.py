@@ -0,0 +1,126 @@
+"""
+Embedding cache tests
+"""
+
+from __future__ import annotations
+
+import os
+from importlib import import_module
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+
+def get_embedding_cache_module():
+    return import_module('langbot.pkg.rag.knowledge.embedding_cache')
+
+
+def make_model(uuid: str = 'model-1', dim: int = 4):
+    calls = []
+
+    async def invoke_embedding(model, input_text, **kwargs):
+        calls.append(list(input_text))
+        return [[float(len(text)) + i / 10 for i in range(dim)] for text in input_text]
+
+    model = Mock()
+    model.model_entity.uuid = uuid
+    model.model_entity.name = 'text-embedding'
+    model.provider.invoke_embedding = invoke_embedding
+    return model, calls
+
+
+@pytest.mark.asyncio
+async def test_only_missing_texts_are_embedded():
+    embedding_cache = get_embedding_cache_module()
+    cache = embedding_cache.EmbeddingCache()
+    model, calls = make_model()
+
+    first = await cache.embed(model, ['hello', 'world!', 'hello', '  hello\n'], knowledge_base_id='kb')
+    assert calls == [['hello', 'world!']]
+    assert first[0] == first[2] == first[3]
+
+    second = await cache.embed(model, ['world!', 'hello', 'new'])
+    assert calls[1:] == [['new']]
+    assert second[:2] == [first[1], first[0]]
+
+    # the same text under another model is a different entry
+    other_model, other_calls = make_model(uuid='model-2')
+    await cache.embed(other_model, ['hello'])
+    assert other_calls == [['hello']]
+
+    stats = cache.get_stats()
+    assert stats['memory_hits'] == 2
+    assert stats['misses'] == 4
+    assert stats['hit_rate'] == pytest.approx(2 / 6, abs=1e-4)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('dtype', ['float32', 'float16'])
+async def test_vectors_survive_restart_on_disk(tmp_path, dtype):
+    embedding_cache = get_embedding_cache_module()
+    model, calls = make_model()
+
+    cache = embedding_cache.EmbeddingCache(path=str(tmp_path), dtype=dtype)
+    expected = await cache.embed(model, [f'chunk {i}' * (i + 1) for i in range(20)])
+    cache.close()
+
+    restarted = embedding_cache.EmbeddingCache(memory_entries=0, path=str(tmp_path), dtype=dtype)
+    vectors = await restarted.embed(model, [f'chunk {i}' * (i + 1) for i in range(20)])
+
+    assert len(calls) == 1
+    assert restarted.get_stats()['disk_hits'] == 20
+    for got, want in zip(vectors, expected):
+        assert got == pytest.approx(want, rel=1e-3)
+
+    # a row appended after the file was mapped is found too
+    await restarted.embed(model, ['late'])
+    (late,) = await restarted.embed(model, ['late'])
+    assert late == pytest.approx([4.0, 4.1, 4.2, 4.3], rel=1e-3)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_partial_write_is_discarded(tmp_path):
+    embedding_cache = get_embedding_cache_module()
+    model, calls = make_model()
+
+    cache = embedding_cache.EmbeddingCache(path=str(tmp_path))
+    await cache.embed(model, ['a', 'bb'])
+    cache.close()
+
+    # a crash in the middle of appending the third row
+    (vec_path,) = [tmp_path / name for name in os.listdir(tmp_path) if name.endswith('.vec')]
+    with open(vec_path, 'ab') as f:
+        f.write(b'\x00' * 6)
+
+    restarted = embedding_cache.EmbeddingCache(memory_entries=0, path=str(tmp_path))
+    bb, ccc = await restarted.embed(model, ['bb', 'ccc'])
+    assert bb == pytest.approx([2.0, 2.1, 2.2, 2.3])
+    assert ccc == pytest.approx([3.0, 3.1, 3.2, 3.3])
+    assert calls[1:] == [['ccc']]
+    assert os.path.getsize(vec_path) == 3 * 4 * 4
+
+
+@pytest.mark.asyncio
+async def test_new_vectors_are_written_once_per_request(tmp_path, monkeypatch):
+    embedding_cache = get_embedding_cache_module()
+    model, calls = make_model(dim=1536)
+    cache = embedding_cache.EmbeddingCache(path=str(tmp_path))
+
+    writes = []
+    write = embedding_cache.EmbeddingStore.put_many
+    monkeypatch.setattr(
+        embedding_cache.EmbeddingStore,
+        'put_many',
+        lambda store, digests, vectors: writes.append(len(digests)) or write(store, digests, vectors),
+    )
+
+    await cache.embed(model, ['a', 'bb', 'ccc', 'a'])
+    await cache.embed(model, ['a', 'dddd'])
+    assert writes == [3, 1]
+
+    # the memory holds compact float32 arrays, not lists of Python floats
+    vector = next(iter(cache._memory.values()))
+    assert vector.dtype == np.float32 and vector.shape == (1536,)
+    cache.close()
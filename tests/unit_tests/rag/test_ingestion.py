@@ -0,0 +1,161 @@
+"""
+Streaming document ingestion tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+
+def get_modules():
+    import_module('langbot.pkg.core.app')
+    kbmgr = import_module('langbot.pkg.rag.knowledge.kbmgr')
+    ingestion = import_module('langbot.pkg.rag.knowledge.ingestion')
+    parser = import_module('langbot.pkg.rag.knowledge.services.parser')
+    return kbmgr, ingestion, parser
+
+
+class FakeProvider:
+    """Embeds a text as [len(text)], rejects requests larger than rate_limit_above with 429"""
+
+    def __init__(self, rate_limit_above: int = 0):
+        self.rate_limit_above = rate_limit_above
+        self.requests: list[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def invoke_embedding(self, model, input_text, **kwargs):
+        errors = import_module('langbot.pkg.provider.modelmgr.errors')
+        if self.rate_limit_above and len(input_text) > self.rate_limit_above:
+            raise errors.RequesterRateLimitError('429')
+
+        self.requests.append(len(input_text))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        return [[float(len(text))] for text in input_text]
+
+
+def make_kb(provider: FakeProvider, sections: list[str], events: list[str]):
+    kbmgr, _, parser = get_modules()
+    embedding_cache = import_module('langbot.pkg.rag.knowledge.embedding_cache')
+
+    ap = Mock()
+    ap.logger = Mock()
+    ap.persistence_mgr.execute_async = AsyncMock()
+    ap.rag_mgr.embedding_cache = embedding_cache.EmbeddingCache(memory_entries=0)
+
+    model = Mock()
+    model.model_entity.uuid = 'model-1'
+    model.model_entity.name = 'model-1'
+    model.provider = provider
+    ap.model_mgr.get_embedding_model_by_uuid = AsyncMock(return_value=model)
+
+    stored: list[str] = []
+
+    async def upsert_iter(kb_id, items):
+        events.append('store')
+        stored.extend(chunk_id for chunk_id, _, _ in items)
+
+    ap.vector_db_mgr.vector_db.upsert_iter = upsert_iter
+
+    entity = Mock()
+    entity.uuid = 'kb-1'
+    entity.embedding_model_uuid = 'model-1'
+    kb = kbmgr.RuntimeKnowledgeBase(ap, entity)
+    kb.chunker.chunk_size = 50
+    kb.chunker.chunk_overlap = 0
+
+    async def iter_sections(file_name, extension, pages_per_section, section_chars):
+        for i, text in enumerate(sections, start=1):
+            events.append('parse')
+            yield parser.Section(text, i, len(sections), 'pages')
+            await asyncio.sleep(0.005)
+
+    kb.parser.iter_sections = iter_sections
+    return kb, stored
+
+
+def make_file():
+    file = Mock()
+    file.uuid = 'file-1'
+    file.file_name = 'book.pdf'
+    file.extension = 'pdf'
+    return file
+
+
+def page(i: int) -> str:
+    # ten words of nine characters, about two chunks of 50 characters per line
+    return '\n'.join(' '.join(f'p{i:03d}w{j:04d}' for j in range(10 * line, 10 * line + 10)) for line in range(3))
+
+
+@pytest.mark.asyncio
+async def test_pages_stream_through_bounded_stages():
+    _, ingestion, _ = get_modules()
+    provider = FakeProvider()
+    events: list[str] = []
+    kb, stored = make_kb(provider, [page(i) for i in range(30)], events)
+    ctx = import_module('langbot.pkg.core.taskmgr').TaskContext.new()
+
+    pipeline = ingestion.IngestionPipeline(kb, make_file(), ctx, queue_size=2, batch_size=8, embedding_concurrency=3)
+    count = await pipeline.run()
+
+    assert count == len(stored) == pipeline.chunks_total > 30
+    assert sum(provider.requests) == count
+    assert max(provider.requests) <= 8
+    assert 1 < provider.max_in_flight <= 3
+    # storing starts long before the last page is parsed
+    assert events.index('store') < len(events) - events[::-1].index('parse') - 1
+    assert ctx.progress == {'current': count, 'total': count, 'unit': 'chunks'}
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_shrink_the_batch_size():
+    _, ingestion, _ = get_modules()
+    provider = FakeProvider(rate_limit_above=5)
+    kb, stored = make_kb(provider, [page(i) for i in range(4)], [])
+
+    pipeline = ingestion.IngestionPipeline(
+        kb, make_file(), Mock(), batch_size=16, embedding_concurrency=1, retry_delay=0
+    )
+    count = await pipeline.run()
+
+    assert count == len(stored)
+    assert max(provider.requests) <= 5
+    assert kb.ap.logger.warning.called
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_every_stage():
+    _, ingestion, _ = get_modules()
+    provider = FakeProvider(rate_limit_above=1)
+    kb, stored = make_kb(provider, [page(i) for i in range(50)], [])
+
+    pipeline = ingestion.IngestionPipeline(kb, make_file(), Mock(), max_retries=2, retry_delay=0)
+    tasks_before = len(asyncio.all_tasks())
+    with pytest.raises(import_module('langbot.pkg.provider.modelmgr.errors').RequesterRateLimitError):
+        await pipeline.run()
+
+    assert stored == []
+    assert len(asyncio.all_tasks()) == tasks_before
+
+
+def test_sections_are_chunked_like_the_whole_text():
+    kbmgr, _, _ = get_modules()
+    ap = Mock()
+    chunker = kbmgr.chunker.Chunker(ap, chunk_size=50, chunk_overlap=0)
+    pages = [page(i) for i in range(5)]
+
+    async def sections():
+        for text in pages:
+            yield text
+
+    async def collect():
+        return [chunk async for chunks in chunker.chunk_sections(sections()) for chunk in chunks]
+
+    assert asyncio.run(collect()) == chunker._split_text_sync('\n'.join(pages))
@@ -0,0 +1,121 @@
+"""
+Lexical and hybrid retrieval tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from importlib import import_module
+from unittest.mock import Mock
+
+import pytest
+
+from .test_retrieval import get_modules, internal_kb, make_app
+
+
+def get_lexical():
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.rag.knowledge.lexical')
+
+
+CHUNKS = {
+    'f1': [
+        ('c1', 'Error ERR-1042 means the license key has expired.'),
+        ('c2', 'Restart the gateway service after changing the config.'),
+    ],
+    'f2': [
+        ('c3', '退款申请需要在七天内提交，超过期限无法处理。'),
+        ('c4', '会员积分可以在个人中心查看和兑换。'),
+    ],
+}
+
+
+def make_index(lexical):
+    index = lexical.BM25Index()
+    for file_id, chunks in CHUNKS.items():
+        for chunk_id, text in chunks:
+            index.add(chunk_id, file_id, text)
+    return index
+
+
+def test_tokenize_codes_and_cjk():
+    lexical = get_lexical()
+
+    assert lexical.tokenize('Ｖ2.3 报错 ERR-1042') == ['v2.3', 'v2', '3', '报错', 'err-1042', 'err', '1042']
+    assert lexical.tokenize('退款') == ['退款']
+    assert lexical.tokenize('七天内') == ['七天', '天内']
+
+
+def test_bm25_ranks_and_removes_files():
+    lexical = get_lexical()
+    index = make_index(lexical)
+
+    assert index.search('what is err-1042', 2)[0][0] == 'c1'
+    assert index.search('怎么申请退款', 1)[0][0] == 'c3'
+    assert index.search('unrelated words', 5) == []
+
+    assert index.remove_file('f2') == 2
+    assert index.search('退款', 5) == []
+    assert len(index) == 2
+    assert set(index.postings) == {term for _, text in CHUNKS['f1'] for term in lexical.tokenize(text)}
+
+
+@pytest.mark.asyncio
+async def test_lexical_mode_skips_the_query_embedding():
+    kbmgr, retrieval = get_modules()
+    ap, embedding_calls = make_app(search_delay=0)
+    kb = internal_kb(kbmgr, ap, 'a', 'model-1', retrieval_mode='lexical')
+    kb.lexical_index.index = make_index(get_lexical())
+
+    results = await retrieval.RetrievalOrchestrator(ap).retrieve([kb], 'ERR-1042')
+
+    assert embedding_calls == []
+    assert [result.id for result in results] == ['c1']
+    assert results[0].metadata == {'uuid': 'c1', 'file_id': 'f1', 'text': CHUNKS['f1'][0][1]}
+
+
+@pytest.mark.asyncio
+async def test_hybrid_mode_fuses_vector_and_keyword_ranks():
+    kbmgr, _ = get_modules()
+    ap, embedding_calls = make_app(search_delay=0)
+    kb = internal_kb(kbmgr, ap, 'a', 'model-1', top_k=3, retrieval_mode='hybrid')
+    kb.lexical_index.index = make_index(get_lexical())
+
+    results = await kb.retrieve('ERR-1042', 3)
+
+    assert embedding_calls == ['model-1']
+    # the exact match missed by the vector search is ranked with the best vector match
+    assert {result.id for result in results[:2]} == {'a-0', 'c1'}
+    assert len(results) == 3
+
+
+@pytest.mark.asyncio
+async def test_index_work_runs_off_the_event_loop():
+    lexical = get_lexical()
+    lexical_index = lexical.LexicalIndex(Mock(), 'a')
+    lexical_index.index = index = make_index(lexical)
+
+    threads = []
+    release = threading.Event()
+    search = index.search
+
+    def slow_search(query, k):
+        threads.append(threading.get_ident())
+        release.wait(5)
+        return search(query, k)
+
+    index.search = slow_search
+    searching = asyncio.create_task(lexical_index.search('ERR-1042', 1))
+    await asyncio.sleep(0.05)
+
+    # the loop is free while the search runs, and updates wait for it under the lock
+    removing = asyncio.create_task(lexical_index.remove_file('f1'))
+    await asyncio.sleep(0.05)
+    assert threads and threads[0] != threading.get_ident()
+    assert not removing.done() and len(index) == 4
+
+    release.set()
+    assert [result.id for result in await searching] == ['c1']
+    await removing
+    assert len(index) == 2
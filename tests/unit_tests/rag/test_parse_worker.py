@@ -0,0 +1,124 @@
+"""
+Process pool document parsing tests
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from importlib import import_module
+
+import pytest
+
+
+def get_module():
+    return import_module('langbot.pkg.rag.knowledge.services.parse_worker')
+
+
+def spin():
+    while True:
+        pass
+
+
+def burn(seconds: float):
+    started = time.process_time()
+    while time.process_time() - started < seconds:
+        pass
+
+
+HTML = b'<html><body><h1>Title</h1><p>First</p><table><tr><th>a</th></tr><tr><td>1</td></tr></table></body></html>'
+
+
+@pytest.mark.asyncio
+async def test_process_pool_parses_and_survives_a_stuck_file():
+    parse_worker = get_module()
+    pool = parse_worker.ParsePool(workers=1, timeout=1, cpu_limit=0)
+    try:
+        assert await pool.run(parse_worker.parse_html, HTML) == '# Title\nFirst\na\n---\n1'
+
+        started = time.monotonic()
+        with pytest.raises(parse_worker.ParseLimitExceeded):
+            await pool.run(time.sleep, 30)
+        assert time.monotonic() - started < 5
+
+        # the stuck worker was replaced
+        assert await pool.run(parse_worker.parse_txt, 'héllo'.encode('utf-8')) == 'héllo'
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == 'win32', reason='CPU limits need resource.setrlimit')
+async def test_cpu_limit_stops_a_runaway_parser():
+    parse_worker = get_module()
+    pool = parse_worker.ParsePool(workers=1, timeout=20, cpu_limit=1)
+    try:
+        with pytest.raises(parse_worker.ParseLimitExceeded):
+            await pool.run(spin)
+        # the same worker keeps serving, with its limit lifted again
+        assert await pool.run(parse_worker.parse_md, b'# Title\n\ntext') == '# Title\ntext'
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_sections_of_a_file_share_one_time_limit():
+    parse_worker = get_module()
+    pool = parse_worker.ParsePool(workers=1, timeout=2, cpu_limit=0)
+    try:
+        # start the worker outside the budget
+        await pool.run(parse_worker.parse_txt, b'warm up')
+
+        budget = pool.new_budget()
+        await pool.run(time.sleep, 0.8, budget=budget)
+        await pool.run(time.sleep, 0.8, budget=budget)
+        # each call is well within the limit, the file as a whole is not
+        with pytest.raises(parse_worker.ParseLimitExceeded):
+            await pool.run(time.sleep, 0.8, budget=budget)
+        with pytest.raises(parse_worker.ParseLimitExceeded):
+            await pool.run(parse_worker.parse_txt, b'next section', budget=budget)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_sections_of_a_file_share_one_cpu_limit():
+    parse_worker = get_module()
+    pool = parse_worker.ParsePool(workers=1, timeout=20, cpu_limit=1)
+    try:
+        budget = pool.new_budget()
+        with pytest.raises(parse_worker.ParseLimitExceeded):
+            for _ in range(3):
+                await pool.run(burn, 0.6, budget=budget)
+        assert budget.cpu_left <= 0
+    finally:
+        pool.shutdown()
+
+
+def test_pdf_is_opened_once_per_worker(tmp_path, monkeypatch):
+    parse_worker = get_module()
+    import PyPDF2
+
+    writer = PyPDF2.PdfWriter()
+    for _ in range(5):
+        writer.add_blank_page(width=100, height=100)
+    path = str(tmp_path / 'blank.pdf')
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+    opened = []
+    reader_class = PyPDF2.PdfReader
+    monkeypatch.setattr(parse_worker.PyPDF2, 'PdfReader', lambda *args: opened.append(args) or reader_class(*args))
+
+    assert parse_worker.count_pdf_pages(path) == 5
+    for start in range(0, 5, 2):
+        assert parse_worker.extract_pdf_pages(path, start, min(start + 2, 5)) == ''
+    assert len(opened) == 1
+
+
+def test_encoding_is_detected_on_a_sample():
+    parse_worker = get_module()
+    text = '中文编码检测，' * 5000
+    data = text.encode('gb18030')
+
+    assert parse_worker.decode_text(data, sample_size=4096) == text
@@ -0,0 +1,157 @@
+"""
+Incremental re-indexing tests
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+import sqlalchemy
+
+from .test_ingestion import FakeProvider, make_kb, page
+
+
+def get_modules():
+    import_module('langbot.pkg.core.app')
+    persistence_rag = import_module('langbot.pkg.entity.persistence.rag')
+    embedder = import_module('langbot.pkg.rag.knowledge.services.embedder')
+    taskmgr = import_module('langbot.pkg.core.taskmgr')
+    return persistence_rag, embedder, taskmgr
+
+
+def use_sqlite(ap):
+    """Back ap.persistence_mgr with an in-memory database holding the knowledge base tables"""
+    persistence_rag, _, _ = get_modules()
+    engine = sqlalchemy.create_engine('sqlite://')
+    persistence_rag.Base.metadata.create_all(
+        engine, tables=[persistence_rag.File.__table__, persistence_rag.Chunk.__table__]
+    )
+
+    async def execute_async(*args, **kwargs):
+        with engine.begin() as conn:
+            result = conn.execute(*args, **kwargs)
+            rows = result.all() if result.returns_rows else []
+        fetched = Mock()
+        fetched.all = Mock(return_value=rows)
+        fetched.first = Mock(return_value=rows[0] if rows else None)
+        return fetched
+
+    def serialize_model(model, data):
+        return {column.name: getattr(data, column.name) for column in model.__table__.columns}
+
+    ap.persistence_mgr.execute_async = execute_async
+    ap.persistence_mgr.serialize_model = serialize_model
+    ap.instance_config.data = {}
+    ap.storage_mgr.storage_provider.delete = AsyncMock()
+    ap.vector_db_mgr.vector_db.delete_by_ids = AsyncMock()
+    ap.vector_db_mgr.vector_db.delete_by_file_id = AsyncMock()
+    return engine
+
+
+def chunk_texts(engine, file_id: str) -> list[str]:
+    persistence_rag, _, _ = get_modules()
+    with engine.connect() as conn:
+        return sorted(
+            conn.execute(
+                sqlalchemy.select(persistence_rag.Chunk.text).where(persistence_rag.Chunk.file_id == file_id)
+            ).scalars()
+        )
+
+
+async def ingest(kb, file_id: str):
+    persistence_rag, _, taskmgr = get_modules()
+    file = persistence_rag.File(uuid=file_id, kb_id='kb-1', file_name=f'{file_id}.pdf', extension='pdf')
+    await kb.ap.persistence_mgr.execute_async(
+        sqlalchemy.insert(persistence_rag.File).values(
+            uuid=file_id, kb_id='kb-1', file_name=file.file_name, extension='pdf', status='completed'
+        )
+    )
+    await kb._store_file_task(file, taskmgr.TaskContext.new())
+
+
+@pytest.mark.asyncio
+async def test_reindex_embeds_only_changed_chunks():
+    persistence_rag, _, taskmgr = get_modules()
+    provider = FakeProvider()
+    sections = [page(i) for i in range(10)]
+    kb, _ = make_kb(provider, sections, [])
+    engine = use_sqlite(kb.ap)
+
+    await ingest(kb, 'file-1')
+    before = chunk_texts(engine, 'file-1')
+    embedded_before = sum(provider.requests)
+
+    # page 3 rewritten, page 9 dropped
+    sections[3] = page(103)
+    del sections[9]
+    file = persistence_rag.File(
+        uuid='file-1', kb_id='kb-1', file_name='file-1.pdf', extension='pdf', status='completed'
+    )
+    new_file = persistence_rag.File(uuid='file-1', kb_id='kb-1', file_name='file-1-v2.pdf', extension='pdf')
+    ctx = taskmgr.TaskContext.new()
+    await kb._reindex_file_task(file, new_file, ctx)
+
+    after = chunk_texts(engine, 'file-1')
+    assert after == sorted(kb.chunker._split_text_sync('\n'.join(sections)))
+    added = set(after) - set(before)
+    removed = set(before) - set(after)
+    assert added and removed
+    # only the chunks of the rewritten page were embedded again
+    assert sum(provider.requests) - embedded_before == len(added)
+    deleted_ids = kb.ap.vector_db_mgr.vector_db.delete_by_ids.call_args.args[1]
+    assert len(deleted_ids) == len(removed)
+    assert 'kept' in ctx.current_action
+
+    with engine.connect() as conn:
+        row = conn.execute(sqlalchemy.select(persistence_rag.File).where(persistence_rag.File.uuid == 'file-1')).one()
+    assert (row.file_name, row.status) == ('file-1-v2.pdf', 'completed')
+
+
+@pytest.mark.asyncio
+async def test_failed_reindex_keeps_the_old_version():
+    persistence_rag, _, taskmgr = get_modules()
+    provider = FakeProvider()
+    sections = [page(i) for i in range(4)]
+    kb, _ = make_kb(provider, sections, [])
+    engine = use_sqlite(kb.ap)
+
+    await ingest(kb, 'file-1')
+    before = chunk_texts(engine, 'file-1')
+
+    sections[:] = [page(i) for i in range(100, 104)]
+    provider.rate_limit_above = 1
+    file = persistence_rag.File(
+        uuid='file-1', kb_id='kb-1', file_name='file-1.pdf', extension='pdf', status='completed'
+    )
+    new_file = persistence_rag.File(uuid='file-1', kb_id='kb-1', file_name='file-1-v2.pdf', extension='pdf')
+    kb.ap.instance_config.data = {'rag': {'ingestion': {'max_retries': 0}}}
+    with pytest.raises(Exception):
+        await kb._reindex_file_task(file, new_file, taskmgr.TaskContext.new())
+
+    assert chunk_texts(engine, 'file-1') == before
+    with engine.connect() as conn:
+        status = conn.execute(
+            sqlalchemy.select(persistence_rag.File.status).where(persistence_rag.File.uuid == 'file-1')
+        ).scalar()
+    assert status == 'completed'
+
+
+@pytest.mark.asyncio
+async def test_dedup_report_counts_repeated_chunks():
+    provider = FakeProvider()
+    kb, _ = make_kb(provider, [page(0), page(1)], [])
+    kb.ap.rag_mgr.embedding_cache = import_module('langbot.pkg.rag.knowledge.embedding_cache').EmbeddingCache()
+    use_sqlite(kb.ap)
+
+    await ingest(kb, 'file-1')
+    embedded = sum(provider.requests)
+    await ingest(kb, 'file-2')
+
+    # the same texts are served from the embedding cache
+    assert sum(provider.requests) == embedded
+    report = await kb.get_dedup_report()
+    assert report['total_chunks'] == 2 * report['unique_chunks'] == 2 * embedded
+    assert report['duplicate_chunks'] == embedded
+    assert all(duplicate['count'] == 2 and duplicate['files'] == 2 for duplicate in report['duplicates'])
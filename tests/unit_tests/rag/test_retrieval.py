@@ -0,0 +1,171 @@
+"""
+Multi knowledge base retrieval tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from importlib import import_module
+from unittest.mock import Mock
+
+import pytest
+
+from langbot_plugin.api.entities.builtin.rag import context as rag_context
+from langbot_plugin.api.entities.builtin.provider.message import ContentElement
+
+
+def get_modules():
+    import_module('langbot.pkg.core.app')
+    kbmgr = import_module('langbot.pkg.rag.knowledge.kbmgr')
+    retrieval = import_module('langbot.pkg.rag.knowledge.retrieval')
+    return kbmgr, retrieval
+
+
+def entry(entry_id: str, distance: float) -> rag_context.RetrievalResultEntry:
+    return rag_context.RetrievalResultEntry(
+        id=entry_id, content=[ContentElement.from_text(entry_id)], metadata={}, distance=distance
+    )
+
+
+def make_app(search_delay: float = 0.2):
+    ap = Mock()
+    ap.logger = Mock()
+    embedding_calls = []
+    search_batches = []
+
+    async def invoke_embedding(model, input_text, **kwargs):
+        embedding_calls.append(model.model_entity.uuid)
+        await asyncio.sleep(0.05)
+        return [[1.0, 0.0]]
+
+    async def get_embedding_model_by_uuid(model_uuid):
+        model = Mock()
+        model.model_entity.uuid = model_uuid
+        model.model_entity.name = model_uuid
+        model.provider.invoke_embedding = invoke_embedding
+        return model
+
+    async def search_batch(kb_id, query_embeddings, k):
+        search_batches.append((kb_id, len(query_embeddings)))
+        await asyncio.sleep(search_delay)
+        ids = [f'{kb_id}-{i}' for i in range(k)]
+        return {
+            'ids': [ids for _ in query_embeddings],
+            'distances': [[0.1 * (i + 1) for i in range(k)] for _ in query_embeddings],
+            'metadatas': [[{'text': chunk_id} for chunk_id in ids] for _ in query_embeddings],
+        }
+
+    ap.model_mgr.get_embedding_model_by_uuid = get_embedding_model_by_uuid
+    ap.rag_mgr.embedding_cache = import_module('langbot.pkg.rag.knowledge.embedding_cache').EmbeddingCache()
+    ap.vector_db_mgr.vector_db.search_batch = search_batch
+    ap.vector_db_mgr.vector_db.higher_is_better = False
+    ap.search_batches = search_batches
+    return ap, embedding_calls
+
+
+def internal_kb(kbmgr, ap, uuid: str, model_uuid: str, top_k: int = 3, retrieval_mode: str = 'vector'):
+    entity = Mock()
+    entity.uuid = uuid
+    entity.embedding_model_uuid = model_uuid
+    entity.top_k = top_k
+    entity.retrieval_mode = retrieval_mode
+    return kbmgr.RuntimeKnowledgeBase(ap, entity)
+
+
+def external_kb(uuid: str, delay: float):
+    kb = Mock()
+    kb.get_uuid = Mock(return_value=uuid)
+    kb.get_type = Mock(return_value='external')
+    kb.higher_is_better = Mock(return_value=None)
+
+    async def retrieve(query, top_k):
+        await asyncio.sleep(delay)
+        return [entry(f'{uuid}-0', 0.5)]
+
+    kb.retrieve = retrieve
+    return kb
+
+
+@pytest.mark.asyncio
+async def test_embeds_once_per_model_and_searches_concurrently():
+    kbmgr, retrieval = get_modules()
+    ap, embedding_calls = make_app()
+    kbs = [
+        internal_kb(kbmgr, ap, 'a', 'model-1'),
+        internal_kb(kbmgr, ap, 'b', 'model-1'),
+        internal_kb(kbmgr, ap, 'c', 'model-2'),
+    ]
+
+    started = time.monotonic()
+    results = await retrieval.RetrievalOrchestrator(ap).retrieve(kbs, 'hello', top_k=4)
+    elapsed = time.monotonic() - started
+
+    assert sorted(embedding_calls) == ['model-1', 'model-2']
+    assert elapsed < 0.5
+    # rrf interleaves the first ranks of every knowledge base before the second ranks
+    assert [result.id for result in results] == ['a-0', 'b-0', 'c-0', 'a-1']
+
+
+@pytest.mark.asyncio
+async def test_slow_source_is_dropped_after_timeout():
+    kbmgr, retrieval = get_modules()
+    ap, _ = make_app(search_delay=0)
+    kbs = [external_kb('slow', delay=5), internal_kb(kbmgr, ap, 'a', 'model-1', top_k=2), external_kb('fast', 0)]
+
+    started = time.monotonic()
+    results = await retrieval.RetrievalOrchestrator(ap).retrieve(kbs, 'hello', fusion='concat', timeout=0.3)
+
+    assert time.monotonic() - started < 1
+    assert [result.id for result in results] == ['a-0', 'a-1', 'fast-0']
+    ap.logger.warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_of_one_knowledge_base_are_batched():
+    kbmgr, _ = get_modules()
+    ap, _ = make_app(search_delay=0.1)
+    kb = internal_kb(kbmgr, ap, 'a', 'model-1', top_k=2)
+
+    results = await asyncio.gather(*(kb.retrieve(f'question {i}', 2) for i in range(5)))
+
+    assert all([result.id for result in entries] == ['a-0', 'a-1'] for entries in results)
+    # searches queued while another one is in flight share the next call
+    assert len(ap.search_batches) < 5
+    assert sum(size for _, size in ap.search_batches) == 5
+
+
+def test_fusion_strategies():
+    _, retrieval = get_modules()
+    first = retrieval.RankedList('kb', [entry('x', 0.1), entry('shared', 0.2), entry('y', 0.9)])
+    second = retrieval.RankedList('kb', [entry('shared', 10.0), entry('z', 30.0)])
+
+    # an entry ranked by both lists wins under rrf
+    assert [e.id for e in retrieval.fuse_rrf([first, second])] == ['shared', 'x', 'z', 'y']
+
+    # normalized per list, so the different distance scales do not matter
+    assert [e.id for e in retrieval.fuse_normalized([first, second])] == ['x', 'shared', 'y', 'z']
+
+
+def test_fusion_keeps_same_ids_from_different_knowledge_bases():
+    _, retrieval = get_modules()
+    first = retrieval.RankedList('kb-1', [entry('0', 0.1), entry('1', 0.2)])
+    second = retrieval.RankedList('kb-2', [entry('0', 0.3), entry('1', 0.4)])
+
+    for fuse in (retrieval.fuse_rrf, retrieval.fuse_normalized):
+        fused = fuse([first, second])
+        assert len(fused) == 4
+        assert {e.distance for e in fused} == {0.1, 0.2, 0.3, 0.4}
+
+
+def test_normalized_fusion_follows_score_direction():
+    _, retrieval = get_modules()
+    # similarities, the first entry is the closest
+    similarities = retrieval.RankedList('a', [entry('a0', 0.9), entry('a1', 0.5), entry('a2', 0.1)], True)
+    distances = retrieval.RankedList('b', [entry('b0', 0.2), entry('b1', 0.4), entry('b2', 0.6)], False)
+    ranks_only = retrieval.RankedList('c', [entry('c0', 7.0), entry('c1', 3.0)], None)
+
+    fused = retrieval.fuse_normalized([similarities, distances, ranks_only])
+
+    assert {e.id for e in fused[:3]} == {'a0', 'b0', 'c0'}
+    assert {e.id for e in fused[-3:]} == {'a2', 'b2', 'c1'}
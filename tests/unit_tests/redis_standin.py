@@ -0,0 +1,292 @@
+"""
+In-process stand-in for a Redis-protocol server
+
+Speaks RESP2 over a local TCP port and implements just the commands LangBot uses, so
+the Redis-backed components can be tested without a real server. Scripts run in Lua 5.1,
+the version Redis embeds, through lupa, with redis.call dispatching to the same commands.
+They run atomically as the stand-in handles one command at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import time
+
+import lupa.lua51 as lupa
+
+from langbot.pkg.utils import redisclient
+
+
+class RedisStandIn:
+    def __init__(self):
+        self.data: dict[bytes, object] = {}
+        self.expires: dict[bytes, float] = {}
+        self.available = True
+        """When False every command fails like a server going away"""
+        self.scripts: dict[str, bytes] = {}
+        """Sources of the scripts sent with EVAL by their SHA1"""
+        self.lua = lupa.LuaRuntime(encoding=None)
+        self.lua.globals().redis = self.lua.table_from({b'call': self._redis_call})
+        self.server: asyncio.base_events.Server | None = None
+        self.port: int = 0
+
+    @property
+    def url(self) -> str:
+        return f'redis://127.0.0.1:{self.port}/0'
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await redisclient.read_reply(reader)
+                writer.write(self._encode(self.dispatch(command)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def _encode(self, value) -> bytes:
+        if isinstance(value, Exception):
+            message = str(value)
+            # errors starting with their own code, like NOSCRIPT, are sent as is
+            if not message.split(' ', 1)[0].isupper():
+                message = f'ERR {message}'
+            return b'-%s\r\n' % message.encode()
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, bool):
+            return b':%d\r\n' % int(value)
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, bytes):
+            return b'$%d\r\n%s\r\n' % (len(value), value)
+        if isinstance(value, (list, tuple)):
+            return b'*%d\r\n' % len(value) + b''.join(self._encode(item) for item in value)
+        raise TypeError(type(value))
+
+    def _purge(self, key: bytes):
+        expire_at = self.expires.get(key)
+        if expire_at is not None and expire_at <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def _get(self, key: bytes, factory=None):
+        self._purge(key)
+        if key not in self.data and factory is not None:
+            self.data[key] = factory()
+        return self.data.get(key)
+
+    def dispatch(self, command: list[bytes]):
+        if not self.available:
+            return Exception('stand-in unavailable')
+        name = command[0].decode().upper()
+        args = command[1:]
+        handler = getattr(self, f'cmd_{name.lower()}', None)
+        if handler is None:
+            return Exception(f"unknown command '{name}'")
+        try:
+            return handler(*args)
+        except Exception as e:
+            return e
+
+    # ---- commands ----
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_auth(self, *args):
+        return 'OK'
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._get(key) is not None)
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._get(key) is not None:
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_expire(self, key, seconds):
+        if self._get(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        return 1
+
+    def cmd_pexpire(self, key, milliseconds):
+        if self._get(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_get(self, key):
+        return self._get(key)
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._get(key) is not None:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            self.expires[key] = time.time() + int(options[options.index(b'PX') + 1]) / 1000
+        if b'EX' in options:
+            self.expires[key] = time.time() + int(options[options.index(b'EX') + 1])
+        return 'OK'
+
+    def cmd_incrby(self, key, amount):
+        value = int(self._get(key) or 0) + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_keys(self, pattern):
+        return [key for key in list(self.data) if self._get(key) is not None and fnmatch.fnmatchcase(key, pattern)]
+
+    def cmd_hset(self, key, *pairs):
+        table = self._get(key, dict)
+        added = 0
+        for i in range(0, len(pairs), 2):
+            added += pairs[i] not in table
+            table[pairs[i]] = pairs[i + 1]
+        return added
+
+    def cmd_hgetall(self, key):
+        table = self._get(key) or {}
+        return [item for pair in table.items() for item in pair]
+
+    def cmd_rpush(self, key, *values):
+        items = self._get(key, list)
+        items.extend(values)
+        return len(items)
+
+    def _range(self, items: list, start: int, stop: int) -> slice:
+        length = len(items)
+        start = max(length + start, 0) if start < 0 else start
+        stop = length + stop if stop < 0 else stop
+        return slice(start, stop + 1)
+
+    def cmd_lrange(self, key, start, stop):
+        items = self._get(key) or []
+        return items[self._range(items, int(start), int(stop))]
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self._get(key)
+        if items is not None:
+            items[:] = items[self._range(items, int(start), int(stop))]
+            if not items:
+                del self.data[key]
+        return 'OK'
+
+    def cmd_lrem(self, key, count, value):
+        items = self._get(key) or []
+        before = len(items)
+        items[:] = [item for item in items if item != value]
+        return before - len(items)
+
+    def cmd_time(self):
+        now = time.time()
+        return [str(int(now)).encode(), str(int(now % 1 * 1e6)).encode()]
+
+    def cmd_zrem(self, key, *members):
+        table = self._get(key) or {}
+        removed = sum(1 for member in members if table.pop(member, None) is not None)
+        if key in self.data and not table:
+            del self.data[key]
+        return removed
+
+    def cmd_hmget(self, key, *fields):
+        table = self._get(key) or {}
+        return [table.get(field) for field in fields]
+
+    def cmd_zadd(self, key, *pairs):
+        table = self._get(key, dict)
+        added = 0
+        for i in range(0, len(pairs), 2):
+            added += pairs[i + 1] not in table
+            table[pairs[i + 1]] = float(pairs[i])
+        return added
+
+    def cmd_zcard(self, key):
+        return len(self._get(key) or {})
+
+    def cmd_zscore(self, key, member):
+        score = (self._get(key) or {}).get(member)
+        if score is None:
+            return None
+        return (b'%d' % score) if score.is_integer() else repr(score).encode()
+
+    def cmd_zremrangebyscore(self, key, min_score, max_score):
+        table = self._get(key) or {}
+        low, high = float(min_score), float(max_score)
+        removed = [member for member, score in table.items() if low <= score <= high]
+        for member in removed:
+            del table[member]
+        if key in self.data and not table:
+            del self.data[key]
+        return len(removed)
+
+    def cmd_eval(self, source, numkeys, *keys_and_args):
+        sha = redisclient.Script(source.decode()).sha
+        self.scripts[sha] = source
+        return self.cmd_evalsha(sha.encode(), numkeys, *keys_and_args)
+
+    def cmd_evalsha(self, sha, numkeys, *keys_and_args):
+        source = self.scripts.get(sha.decode())
+        if source is None:
+            return Exception('NOSCRIPT No matching script')
+        numkeys = int(numkeys)
+        lua_globals = self.lua.globals()
+        lua_globals.KEYS = self.lua.table_from(keys_and_args[:numkeys])
+        lua_globals.ARGV = self.lua.table_from(keys_and_args[numkeys:])
+        return self._from_lua(self.lua.execute(source))
+
+    # ---- Lua conversions, following the rules Redis applies ----
+
+    def _redis_call(self, *args):
+        reply = self.dispatch([self._lua_arg(arg) for arg in args])
+        if isinstance(reply, Exception):
+            raise reply
+        return self._to_lua(reply)
+
+    def _lua_arg(self, value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).encode()
+
+    def _to_lua(self, value):
+        if value is None:
+            return False
+        if isinstance(value, str):
+            return self.lua.table_from({b'ok': value.encode()})
+        if isinstance(value, list):
+            return self.lua.table_from([self._to_lua(item) for item in value])
+        return value
+
+    def _from_lua(self, value):
+        if value is None or value is False:
+            return None
+        if value is True:
+            return 1
+        if isinstance(value, float):
+            return int(value)
+        if lupa.lua_type(value) == 'table':
+            return [self._from_lua(item) for item in value.values()]
+        return value
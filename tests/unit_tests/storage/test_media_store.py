@@ -0,0 +1,183 @@
+"""
+Media blob store tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+
+import pytest
+
+import langbot_plugin.api.entities.builtin.platform.message as platform_message
+import langbot_plugin.api.entities.builtin.provider.message as provider_message
+
+from langbot.pkg.storage import media
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+
+    async def save(self, key: str, value: bytes):
+        self.files[key] = value
+
+    async def load(self, key: str) -> bytes:
+        return self.files[key]
+
+    async def exists(self, key: str) -> bool:
+        return key in self.files
+
+    async def delete(self, key: str):
+        del self.files[key]
+
+
+def make_loader(data: bytes, mime_type: str = 'image/png'):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return data, mime_type
+
+    return loader, calls
+
+
+def test_handle_round_trip():
+    handle = media.MediaHandle(media.media_key('telegram', 'AQAD/x+y'), 'image/jpeg', 1234)
+    assert handle.key == 'telegram-AQAD_x_y'
+    parsed = media.MediaHandle.parse(handle.uri)
+    assert (parsed.key, parsed.mime_type, parsed.size) == ('telegram-AQAD_x_y', 'image/jpeg', 1234)
+    assert media.is_media_uri(handle.uri) and not media.is_media_uri('https://example.com/a.png')
+
+
+@pytest.mark.asyncio
+async def test_lazy_blobs_are_downloaded_once_and_deduplicated():
+    store = media.MediaStore()
+    loader, calls = make_loader(b'photo')
+    handle = store.put_lazy('telegram-a', loader, 'image/jpeg')
+    assert calls == []
+
+    # concurrent readers share one download
+    results = await asyncio.gather(store.get_bytes(handle.uri), store.get_bytes(handle.uri))
+    assert results == [(b'photo', 'image/png')] * 2
+    assert len(calls) == 1
+
+    # the same content forwarded as another file is kept once
+    other_loader, _ = make_loader(b'photo')
+    await store.get_bytes(store.put_lazy('telegram-b', other_loader, 'image/jpeg'))
+    assert (await store.put(b'photo', 'image/png')).key == 'sha256-' + hashlib.sha256(b'photo').hexdigest()
+    stats = store.get_stats()
+    assert (stats['memory_blobs'], stats['memory_bytes'], stats['downloads']) == (1, 5, 2)
+    assert stats['dedup_hits'] == 2
+
+
+@pytest.mark.asyncio
+async def test_eviction_spills_referenced_blobs_only():
+    storage = MemoryStorage()
+    store = media.MediaStore(memory_bytes=10, storage_provider=storage)
+
+    kept = await store.put(b'kept-bytes', 'image/png')
+    store.acquire([kept.uri])
+    dropped = await store.put(b'dropped!!!', 'image/png')
+    loader, calls = make_loader(b'lazy-bytes')
+    lazy = store.put_lazy('discord-1', loader, 'image/png')
+    store.acquire([lazy.uri])
+    await store.get_bytes(lazy)
+
+    # only the referenced blob without a platform copy was written out
+    assert list(storage.files) == [f'media/{kept.key[len("sha256-") :]}']
+    with pytest.raises(KeyError):
+        await store.get_bytes(dropped)
+
+    assert await store.get_bytes(kept) == (b'kept-bytes', 'image/png')
+    assert store.get_stats()['spill_loads'] == 1
+    assert await store.get_bytes(lazy) == (b'lazy-bytes', 'image/png')
+    assert len(calls) == 2
+
+    # once nothing refers to it the spilled copy is deleted
+    await store.get_bytes(lazy)
+    store.release([kept.uri])
+    await store.get_bytes(lazy)
+    assert storage.files == {}
+
+
+@pytest.mark.asyncio
+async def test_materialize_keeps_handles_in_the_original_messages():
+    store = media.MediaStore()
+    image = await store.put(b'png', 'image/png')
+    loader, _ = make_loader(b'voice', 'audio/ogg')
+    voice = store.put_lazy('lark-v', loader, 'audio/ogg')
+    broken = store.put_lazy('lark-x', make_loader(b'')[0], 'image/png')
+    store._blobs.pop(broken.key)
+
+    message = provider_message.Message(
+        role='user',
+        content=[
+            provider_message.ContentElement.from_text('look'),
+            provider_message.ContentElement.from_image_url(image.uri),
+            provider_message.ContentElement.from_file_url(voice.uri, 'voice'),
+            provider_message.ContentElement.from_image_url(broken.uri),
+        ],
+    )
+    plain = provider_message.Message(role='assistant', content='ok')
+
+    materialized = await store.materialize_messages([message, plain])
+
+    assert materialized[1] is plain
+    content = materialized[0].content
+    assert content[0].text == 'look'
+    assert content[1].image_base64 == 'data:image/png;base64,' + base64.b64encode(b'png').decode()
+    assert content[2].file_base64 == 'data:audio/ogg;base64,dm9pY2U=' and content[2].file_name == 'voice'
+    assert content[3].text == '[image unavailable]'
+    assert message.content[1].image_url.url == image.uri
+
+    chain = platform_message.MessageChain(
+        [
+            platform_message.Plain(text='hi'),
+            platform_message.Image(url=image.uri),
+            platform_message.Voice(url=voice.uri),
+        ]
+    )
+    assert media.media_uris(chain) == [image.uri, voice.uri]
+    assert media.media_uris([message]) == [image.uri, voice.uri, broken.uri]
+
+
+@pytest.mark.asyncio
+async def test_dumps_sent_to_plugins_carry_data_and_get_handles_back():
+    store = media.MediaStore()
+    image = await store.put(b'png', 'image/png')
+    data_url = 'data:image/png;base64,' + base64.b64encode(b'png').decode()
+
+    dump = {
+        'event': {
+            'message_chain': platform_message.MessageChain(
+                [platform_message.Plain(text='hi'), platform_message.Image(url=image.uri)]
+            ).model_dump(),
+            'prompt': [
+                provider_message.Message(
+                    role='user', content=[provider_message.ContentElement.from_image_url(image.uri)]
+                ).model_dump()
+            ],
+        }
+    }
+    handles = await store.materialize_dump(dump)
+
+    assert handles == {data_url: image.uri}
+    assert dump['event']['message_chain'][1]['base64'] == data_url
+    assert dump['event']['message_chain'][1]['url'] == ''
+    assert dump['event']['prompt'][0]['content'][0]['image_base64'] == data_url
+    assert media.SCHEME not in str(dump)
+
+    # what the plugin returns, the image it added stays as it is
+    dump['event']['prompt'][0]['content'].append(
+        provider_message.ContentElement.from_image_base64('data:image/png;base64,b3RoZXI=').model_dump()
+    )
+    store.restore_dump(dump, handles)
+
+    chain = platform_message.MessageChain.model_validate(dump['event']['message_chain'])
+    assert chain[1].url == image.uri and not chain[1].base64
+    prompt = provider_message.Message.model_validate(dump['event']['prompt'][0])
+    assert prompt.content[0].image_url.url == image.uri
+    assert prompt.content[1].image_base64 == 'data:image/png;base64,b3RoZXI='
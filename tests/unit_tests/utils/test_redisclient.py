@@ -0,0 +1,58 @@
+"""A connection left in an unknown state is dropped, so the next command doesn't read stale replies."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from langbot.pkg.utils import redisclient
+from tests.unit_tests.redis_standin import RedisStandIn
+
+
+@pytest.fixture
+async def standin():
+    standin = RedisStandIn()
+    await standin.start()
+    yield standin
+    await standin.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_command_drops_connection():
+    received = asyncio.Event()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # reads the command but never replies
+        await redisclient.read_reply(reader)
+        received.set()
+        await reader.read()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    client = redisclient.RedisClient(f'redis://127.0.0.1:{port}/0')
+
+    task = asyncio.create_task(client.execute('PING'))
+    await received.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert client._writer is None
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_failed_handshake_drops_connection(standin):
+    standin.cmd_auth = lambda *args: Exception('WRONGPASS invalid password')
+    client = redisclient.RedisClient(f'redis://:secret@127.0.0.1:{standin.port}/0')
+
+    with pytest.raises(redisclient.RedisError):
+        await client.ping()
+    assert client._writer is None
+
+    standin.cmd_auth = lambda *args: 'OK'
+    assert await client.ping()
+    await client.close()
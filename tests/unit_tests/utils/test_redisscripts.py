@@ -0,0 +1,69 @@
+"""
+The Lua scripts for shared state, run by the stand-in's Lua interpreter
+
+Set LANGBOT_TEST_REDIS_URL (e.g. redis://127.0.0.1:6379/15) to also run them against a real
+server, the tests only touch keys under a random prefix.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from langbot.pkg.utils import redisclient, redisscripts
+from tests.unit_tests.redis_standin import RedisStandIn
+
+
+@pytest.fixture(params=['standin', 'server'])
+async def client(request):
+    if request.param == 'standin':
+        standin = RedisStandIn()
+        await standin.start()
+        client = redisclient.RedisClient(standin.url)
+        yield client
+        await client.close()
+        await standin.stop()
+    else:
+        url = os.environ.get('LANGBOT_TEST_REDIS_URL')
+        if not url:
+            pytest.skip('LANGBOT_TEST_REDIS_URL is not set')
+        client = redisclient.RedisClient(url)
+        yield client
+        await client.close()
+
+
+@pytest.fixture
+async def key(client):
+    key = f'langbot-test:{uuid.uuid4().hex}'
+    yield key
+    await client.execute('DEL', key)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket(client, key):
+    # 2 tokens refilled every second
+    assert await client.eval(redisscripts.TOKEN_BUCKET, [key], [2, 1000, 0]) == 0
+    assert await client.eval(redisscripts.TOKEN_BUCKET, [key], [2, 1000, 0]) == 0
+    assert await client.eval(redisscripts.TOKEN_BUCKET, [key], [2, 1000, 0]) == -1
+
+    # waiting is allowed, the next token is reserved half a window ahead
+    delay = await client.eval(redisscripts.TOKEN_BUCKET, [key], [2, 1000, 1000])
+    assert 0 < delay <= 500
+    assert await client.execute('EXISTS', key) == 1
+
+
+@pytest.mark.asyncio
+async def test_lease_acquire_and_renew(client, key):
+    assert await client.eval(redisscripts.LEASE_ACQUIRE, [key], [1, 'a', 100]) == 1
+    assert await client.eval(redisscripts.LEASE_ACQUIRE, [key], [1, 'b', 100]) == 0
+    assert await client.eval(redisscripts.LEASE_RENEW, [key], ['a', 100]) == 1
+    assert await client.eval(redisscripts.LEASE_RENEW, [key], ['b', 100]) == 0
+
+    # once the lease expires it can't be renewed and the slot is free
+    await asyncio.sleep(0.15)
+    assert await client.eval(redisscripts.LEASE_RENEW, [key], ['a', 100]) == 0
+    assert await client.eval(redisscripts.LEASE_ACQUIRE, [key], [1, 'b', 100]) == 1
+    assert await client.execute('ZCARD', key) == 1
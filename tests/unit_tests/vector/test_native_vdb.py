@@ -0,0 +1,158 @@
+"""
+Native vector database tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+from importlib import import_module
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+
+def get_module():
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.vector.vdbs.native')
+
+
+def make_db(path, **kwargs):
+    return get_module().NativeVectorDatabase(Mock(), base_path=str(path), **kwargs)
+
+
+def clustered(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(0, 20, count)] + rng.normal(scale=0.3, size=(count, dim))).astype(np.float32)
+
+
+async def fill(db, vectors: np.ndarray, files: int = 10):
+    ids = [f'c{i}' for i in range(len(vectors))]
+    metadatas = [{'uuid': f'c{i}', 'file_id': f'f{i % files}', 'text': f'chunk {i}'} for i in range(len(vectors))]
+    await db.add_embeddings('kb', ids, vectors.tolist(), metadatas)
+
+
+def exact_top(vectors: np.ndarray, query: np.ndarray, k: int) -> list[str]:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f'c{i}' for i in np.argsort(-(normalized @ query))[:k]]
+
+
+@pytest.mark.asyncio
+async def test_exact_search_persistence_and_deletes(tmp_path):
+    vectors = clustered(300)
+    db = make_db(tmp_path)
+    await fill(db, vectors)
+
+    query = vectors[7] / np.linalg.norm(vectors[7])
+    result = await db.search('kb', query.tolist(), k=5)
+    assert result['ids'][0] == exact_top(vectors, query, 5)
+    assert result['ids'][0][0] == 'c7'
+    assert result['distances'][0][0] == pytest.approx(0, abs=1e-5)
+    assert result['metadatas'][0][0]['text'] == 'chunk 7'
+
+    await db.delete_by_file_id('kb', 'f7')
+    # an existing id is replaced
+    await db.add_embeddings('kb', ['c8'], [(-vectors[8]).tolist()], [{'uuid': 'c8', 'file_id': 'f8', 'text': 'new'}])
+
+    reopened = make_db(tmp_path)
+    result = await reopened.search('kb', query.tolist(), k=300)
+    assert 'c7' not in result['ids'][0]
+    assert len(result['ids'][0]) == 270
+    replaced = await reopened.search('kb', (-vectors[8]).tolist(), k=1)
+    assert replaced['metadatas'][0] == [{'uuid': 'c8', 'file_id': 'f8', 'text': 'new'}]
+
+    await reopened.delete_collection('kb')
+    assert (await reopened.search('kb', query.tolist()))['ids'] == [[]]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_ids_in_one_add_keep_the_last(tmp_path):
+    vectors = clustered(3)
+    db = make_db(tmp_path)
+    await db.add_embeddings(
+        'kb',
+        ['a', 'b', 'a'],
+        vectors.tolist(),
+        [{'file_id': 'f1', 'text': 'old'}, {'file_id': 'f1', 'text': 'b'}, {'file_id': 'f2', 'text': 'new'}],
+    )
+
+    assert await db.count('kb') == 2
+    result = await db.search('kb', vectors[2].tolist(), k=3)
+    assert result['ids'][0] == ['a', 'b']
+    assert result['metadatas'][0][0]['text'] == 'new'
+
+    # the id is not left behind under the file of the dropped duplicate
+    await db.delete_by_file_id('kb', 'f1')
+    assert (await db.search('kb', vectors[2].tolist(), k=3))['ids'][0] == ['a']
+
+
+@pytest.mark.asyncio
+async def test_compaction_drops_deleted_rows(tmp_path):
+    vectors = clustered(100)
+    db = make_db(tmp_path)
+    await fill(db, vectors, files=2)
+
+    await db.delete_by_file_id('kb', 'f0')
+    collection = await db.get_or_create_collection('kb')
+    assert len(collection.ids) == 50 and collection.deleted_count == 0
+
+    await db.delete_by_ids('kb', ['c1', 'c2', 'missing'])
+
+    reopened = make_db(tmp_path)
+    result = await reopened.search('kb', vectors[1].tolist(), k=100)
+    assert sorted(result['ids'][0]) == sorted(f'c{i}' for i in range(3, 100, 2))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('quantization', ['none', 'int8'])
+async def test_hnsw_graph_recall(tmp_path, quantization):
+    vectors = clustered(2000)
+    db = make_db(tmp_path, quantization=quantization, hnsw_threshold=1000)
+    await fill(db, vectors[:1500])
+    await asyncio.gather(*db._indexing.values())
+    # rows added after the graph was built are searched exactly until it catches up
+    await fill_tail(db, vectors[1500:])
+
+    collection = await db.get_or_create_collection('kb')
+    assert collection.graph is not None and collection.graph.size == 1500
+
+    queries = clustered(50, seed=1)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    hits = 0
+    for query in queries:
+        result = await db.search('kb', query.tolist(), k=10)
+        hits += len(set(result['ids'][0]) & set(exact_top(vectors, query, 10)))
+    assert hits / (10 * len(queries)) > 0.9
+
+    await asyncio.gather(*db._indexing.values())
+    reopened = await make_db(tmp_path, hnsw_threshold=1000).get_or_create_collection('kb')
+    assert reopened.graph is not None and reopened.graph.size == 2000
+
+
+async def fill_tail(db, vectors: np.ndarray):
+    ids = [f'c{1500 + i}' for i in range(len(vectors))]
+    metadatas = [{'uuid': vector_id, 'file_id': 'tail', 'text': ''} for vector_id in ids]
+    await db.add_embeddings('kb', ids, vectors.tolist(), metadatas)
+
+
+@pytest.mark.parametrize('keep_pruned', [False, True])
+def test_hnsw_recall_on_unseen_queries(keep_pruned):
+    hnsw = import_module('langbot.pkg.vector.hnsw')
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 64))
+    vectors = centers[rng.integers(0, 20, 3000)] + rng.normal(scale=0.4, size=(3000, 64))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    # queries pointing away from every cluster, the hard case for a graph
+    queries = rng.normal(size=(100, 64)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    graph = hnsw.HNSWGraph(keep_pruned=keep_pruned)
+    graph.add(lambda indices: vectors[indices], len(vectors))
+
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    hits = 0
+    for query, expected in zip(queries, truth):
+        nodes, _ = graph.search(lambda indices: vectors[indices], query, 10, ef=64)
+        hits += len(set(nodes.tolist()) & set(expected.tolist()))
+    assert hits / truth.size > 0.9
@@ -0,0 +1,127 @@
+"""
+pgvector quantized index and search statements, checked without a server
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+
+def get_module():
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.vector.vdbs.pgvector_db')
+
+
+class RecordingConnection:
+    """Stands in for an engine connection or an ORM session, records the statements it runs"""
+
+    def __init__(self, rows=()):
+        self.statements: list[tuple[str, dict | None]] = []
+        self.rows = list(rows)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+        return SimpleNamespace(fetchall=lambda: self.rows)
+
+
+def make_db(dim: int = 8, **kwargs):
+    db = get_module().PgVectorDatabase(Mock(), connection_string='postgresql://u:p@localhost/db', **kwargs)
+    db._ready = True
+    db._tables['kb'] = db._table('kb', dim)
+    connection = RecordingConnection()
+    db.async_engine = Mock(begin=Mock(return_value=connection))
+    return db, connection
+
+
+@pytest.mark.parametrize(
+    'quantization, indexed',
+    [
+        ('none', 'USING hnsw (embedding vector_cosine_ops)'),
+        ('halfvec', 'USING hnsw ((embedding::halfvec(8)) halfvec_cosine_ops)'),
+        ('binary', 'USING hnsw ((binary_quantize(embedding)::bit(8)) bit_hamming_ops)'),
+    ],
+)
+@pytest.mark.asyncio
+async def test_index_is_built_over_the_quantized_expression(quantization, indexed):
+    db, connection = make_db(index_type='hnsw', quantization=quantization)
+
+    await db._create_vector_index(db._tables['kb'])
+
+    [(statement, _)] = connection.statements
+    assert indexed in statement
+
+
+@pytest.mark.parametrize('quantization, dim', [('none', 3000), ('halfvec', 5000)])
+@pytest.mark.asyncio
+async def test_vectors_too_large_for_the_index_are_scanned(quantization, dim):
+    db, connection = make_db(dim, index_type='hnsw', quantization=quantization)
+
+    await db._create_vector_index(db._tables['kb'])
+
+    assert connection.statements == []
+    db.ap.logger.warning.assert_called_once()
+
+
+@pytest.mark.parametrize('quantization', ['halfvec', 'binary'])
+@pytest.mark.asyncio
+async def test_quantized_index_is_built_for_large_vectors(quantization):
+    db, connection = make_db(3000, index_type='hnsw', quantization=quantization)
+
+    await db._create_vector_index(db._tables['kb'])
+
+    assert len(connection.statements) == 1
+
+
+@pytest.mark.parametrize(
+    'quantization, candidate_order',
+    [
+        ('halfvec', 'ORDER BY embedding::halfvec(8) <=> q.quantized LIMIT :candidates'),
+        ('binary', 'ORDER BY binary_quantize(embedding)::bit(8) <~> q.quantized LIMIT :candidates'),
+    ],
+)
+@pytest.mark.asyncio
+async def test_quantized_search_reranks_candidates_with_full_vectors(quantization, candidate_order):
+    db, _ = make_db(index_type='hnsw', quantization=quantization, rerank_factor=10, ef_search=20)
+    row = SimpleNamespace(ord=1, id='a', text='chunk', file_id='f', chunk_uuid='u', distance=0.25)
+    session = RecordingConnection([row])
+    db.AsyncSessionLocal = Mock(return_value=session)
+
+    result = await db.search_batch('kb', [[0.5] * 8], k=3)
+
+    (ef_search, _), (statement, params) = session.statements
+    # the candidate scan asks the index for rerank_factor times more rows
+    assert ef_search == 'SET LOCAL hnsw.ef_search = 30'
+    assert params['candidates'] == 30 and params['k'] == 3
+    assert candidate_order in statement
+    # and they are ordered again by their exact distance
+    assert 'embedding <=> q.embedding AS distance' in statement
+    assert ') AS candidate ORDER BY distance LIMIT :k' in statement
+    assert result == {
+        'ids': [['a']],
+        'distances': [[0.25]],
+        'metadatas': [[{'text': 'chunk', 'file_id': 'f', 'uuid': 'u'}]],
+    }
+
+
+@pytest.mark.asyncio
+async def test_exact_search_is_the_default():
+    db, _ = make_db()
+    session = RecordingConnection()
+    db.AsyncSessionLocal = Mock(return_value=session)
+
+    await db.search_batch('kb', [[0.5] * 8], k=3)
+
+    # no index tuning, the table is scanned in full
+    [(statement, _)] = session.statements
+    assert db.index_type == 'none'
+    assert 'LIMIT :candidates' not in statement
@@ -0,0 +1,157 @@
+"""
+pgvector backend tests, run against the server in LANGBOT_TEST_PGVECTOR_URL
+"""
+
+from __future__ import annotations
+
+import os
+import uuid
+from importlib import import_module
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+URL = os.environ.get('LANGBOT_TEST_PGVECTOR_URL')
+
+pytestmark = pytest.mark.skipif(not URL, reason='needs LANGBOT_TEST_PGVECTOR_URL')
+
+
+def get_module():
+    import_module('langbot.pkg.core.app')
+    return import_module('langbot.pkg.vector.vdbs.pgvector_db')
+
+
+@pytest.fixture
+async def make_db():
+    created = []
+
+    def make(**kwargs):
+        db = get_module().PgVectorDatabase(Mock(), connection_string=URL, **kwargs)
+        created.append(db)
+        return db
+
+    yield make
+    for db in created:
+        for collection in list(db._tables):
+            await db.delete_collection(collection)
+        await db.close()
+
+
+def items(count: int, dim: int, seed: int = 0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    metadatas = [{'uuid': ids[i], 'file_id': f'f{i % 3}', 'text': f'chunk {i}'} for i in range(count)]
+    return ids, vectors, metadatas
+
+
+async def index_names(db, collection: str) -> list[str]:
+    async with db.async_engine.connect() as conn:
+        result = await conn.execute(
+            text('SELECT indexname FROM pg_indexes WHERE tablename = :table'), {'table': db.table_name(collection)}
+        )
+        return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_collections_have_their_own_dimension_and_index(make_db):
+    db = make_db(index_type='hnsw')
+    small, large = f'kb-{uuid.uuid4()}', f'kb-{uuid.uuid4()}'
+    small_ids, small_vectors, small_metadatas = items(30, 8)
+    large_ids, large_vectors, large_metadatas = items(30, 768, seed=1)
+    await db.add_embeddings(small, small_ids, small_vectors.tolist(), small_metadatas)
+    await db.add_embeddings(large, large_ids, large_vectors.tolist(), large_metadatas)
+
+    assert (await db.stats(small))['dimension'] == 8
+    assert (await db.stats(large))['dimension'] == 768
+    assert f'{db.table_name(small)}_embedding' in await index_names(db, small)
+
+    # results never cross collections
+    result = await db.search(small, small_vectors[4].tolist(), k=30)
+    assert result['ids'][0][0] == small_ids[4]
+    assert set(result['ids'][0]) == set(small_ids)
+
+    # a fresh instance finds the existing tables
+    reopened = make_db(index_type='hnsw')
+    assert await reopened.count(large) == 30
+    assert (await reopened.search(large, large_vectors[7].tolist(), k=1))['ids'][0] == [large_ids[7]]
+
+
+@pytest.mark.asyncio
+async def test_ivfflat_index_waits_for_rows(make_db):
+    db = make_db(index_type='ivfflat', ivfflat_lists=2, probes=2)
+    collection = f'kb-{uuid.uuid4()}'
+    ids, vectors, metadatas = items(30, 16)
+
+    await db.add_embeddings(collection, ids[:10], vectors[:10].tolist(), metadatas[:10])
+    assert f'{db.table_name(collection)}_embedding' not in await index_names(db, collection)
+    assert (await db.stats(collection))['index_type'] == 'none'
+
+    await db.add_embeddings(collection, ids[10:], vectors[10:].tolist(), metadatas[10:])
+    assert f'{db.table_name(collection)}_embedding' in await index_names(db, collection)
+    assert (await db.stats(collection))['index_type'] == 'ivfflat'
+    assert (await db.search(collection, vectors[12].tolist(), k=1))['ids'][0] == [ids[12]]
+
+
+@pytest.mark.asyncio
+async def test_legacy_shared_table_is_migrated(make_db):
+    module = get_module()
+    probe = make_db()
+    await probe._initialize()
+
+    collections = [f'kb-{uuid.uuid4()}', f'kb-{uuid.uuid4()}']
+    ids, vectors, metadatas = items(6, 1536)
+    async with probe.async_engine.begin() as conn:
+        await conn.execute(
+            text(
+                f'CREATE TABLE {module.LEGACY_TABLE} (id varchar PRIMARY KEY, collection varchar NOT NULL, '
+                'embedding vector(1536), text text, file_id varchar, chunk_uuid varchar)'
+            )
+        )
+        for i in range(6):
+            await conn.execute(
+                text(f'INSERT INTO {module.LEGACY_TABLE} VALUES (:id, :c, CAST(:e AS vector), :t, :f, :u)'),
+                {
+                    'id': ids[i],
+                    'c': collections[i % 2],
+                    'e': str(vectors[i].tolist()),
+                    't': metadatas[i]['text'],
+                    'f': metadatas[i]['file_id'],
+                    'u': ids[i],
+                },
+            )
+
+    db = make_db()
+    await db.migrate_legacy_table()
+    assert await db.count(collections[0]) == 3
+    assert await db.count(collections[1]) == 3
+    result = await db.search(collections[1], vectors[3].tolist(), k=1)
+    assert result['ids'][0] == [ids[3]]
+    assert result['metadatas'][0][0] == {'text': 'chunk 3', 'file_id': 'f0', 'uuid': ids[3]}
+
+    async with db.async_engine.connect() as conn:
+        assert (await conn.execute(text('SELECT to_regclass(:t)'), {'t': module.LEGACY_TABLE})).scalar() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('quantization', ['halfvec', 'binary'])
+async def test_quantized_index_reranks_with_full_vectors(make_db, quantization):
+    db = make_db(quantization=quantization, rerank_factor=10)
+    try:
+        await db._initialize()
+    except ValueError:
+        pytest.skip('needs pgvector 0.7.0+')
+
+    collection = f'kb-{uuid.uuid4()}'
+    ids, vectors, metadatas = items(200, 64)
+    await db.add_embeddings(collection, ids, vectors.tolist(), metadatas)
+
+    query = vectors[42] + np.random.default_rng(3).normal(scale=0.05, size=64)
+    result = await db.search(collection, query.tolist(), k=3)
+    assert result['ids'][0][0] == ids[42]
+    # distances are exact cosine distances of the full vectors, best first
+    assert result['distances'][0] == sorted(result['distances'][0])
+    normalized = vectors[42] / np.linalg.norm(vectors[42])
+    expected = 1 - float(normalized @ (query / np.linalg.norm(query)))
+    assert result['distances'][0][0] == pytest.approx(expected, abs=1e-4)
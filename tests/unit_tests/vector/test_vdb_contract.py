@@ -0,0 +1,229 @@
+"""
+Contract tests of the VectorDatabase interface
+
+Every backend runs the same tests against a local or embedded instance: Chroma, the native
+index, Qdrant (in-memory client) and SeekDB (embedded) always, Milvus with milvus-lite or a
+server in LANGBOT_TEST_MILVUS_URI, pgvector with a server in LANGBOT_TEST_PGVECTOR_URL.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import inspect
+import os
+import uuid
+from importlib import import_module
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+# dimension of common embedding models, collections take the dimension of their first vectors
+DIM = 1536
+COUNT = 40
+
+BACKENDS = ['chroma', 'native', 'qdrant', 'seekdb', 'milvus', 'pgvector']
+
+
+def make_ap(vdb_config: dict) -> Mock:
+    ap = Mock()
+    ap.instance_config.data = {'vdb': vdb_config}
+    return ap
+
+
+async def make_db(backend: str, path):
+    import_module('langbot.pkg.core.app')
+
+    if backend == 'chroma':
+        from langbot.pkg.vector.vdbs.chroma import ChromaVectorDatabase
+
+        return ChromaVectorDatabase(make_ap({}), base_path=str(path / 'chroma'))
+
+    if backend == 'native':
+        from langbot.pkg.vector.vdbs.native import NativeVectorDatabase
+
+        return NativeVectorDatabase(make_ap({}), base_path=str(path / 'native'))
+
+    if backend == 'qdrant':
+        from qdrant_client import AsyncQdrantClient
+        from langbot.pkg.vector.vdbs.qdrant import QdrantVectorDatabase
+
+        db = QdrantVectorDatabase(
+            make_ap({'qdrant': {'url': 'http://localhost:6333', 'host': None, 'port': None, 'api_key': None}})
+        )
+        db.client = AsyncQdrantClient(location=':memory:')
+        return db
+
+    if backend == 'seekdb':
+        if importlib.util.find_spec('pyseekdb') is None:
+            pytest.skip('pyseekdb is not installed')
+        from langbot.pkg.vector.vdbs.seekdb import SeekDBVectorDatabase
+
+        return SeekDBVectorDatabase(
+            make_ap({'seekdb': {'mode': 'embedded', 'path': str(path / 'seekdb'), 'database': 'langbot'}})
+        )
+
+    if backend == 'milvus':
+        uri = os.environ.get('LANGBOT_TEST_MILVUS_URI')
+        if not uri:
+            if importlib.util.find_spec('milvus_lite') is None:
+                pytest.skip('needs milvus-lite or LANGBOT_TEST_MILVUS_URI')
+            uri = str(path / 'milvus.db')
+        from langbot.pkg.vector.vdbs.milvus import MilvusVectorDatabase
+
+        return MilvusVectorDatabase(make_ap({}), uri=uri)
+
+    if backend == 'pgvector':
+        url = os.environ.get('LANGBOT_TEST_PGVECTOR_URL')
+        if not url:
+            pytest.skip('needs LANGBOT_TEST_PGVECTOR_URL')
+        from langbot.pkg.vector.vdbs.pgvector_db import PgVectorDatabase
+
+        return PgVectorDatabase(make_ap({}), connection_string=url)
+
+    raise ValueError(backend)
+
+
+@pytest.fixture(params=BACKENDS)
+async def db(request, tmp_path):
+    db = await make_db(request.param, tmp_path)
+    db.test_collection = f'contract_{uuid.uuid4().hex[:12]}'
+    yield db
+    await db.delete_collection(db.test_collection)
+    if hasattr(db, 'close'):
+        await db.close()
+
+
+async def eventually(check, timeout: float = 10.0):
+    """Retry an async assertion, SeekDB makes writes visible to reads after a short delay"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        try:
+            return await check()
+        except AssertionError:
+            if asyncio.get_running_loop().time() > deadline:
+                raise
+            await asyncio.sleep(0.25)
+
+
+def make_items(seed: int = 0) -> tuple[list[str], np.ndarray, list[dict]]:
+    vectors = np.random.default_rng(seed).normal(size=(COUNT, DIM)).astype(np.float32)
+    ids = [str(uuid.UUID(int=i + 1)) for i in range(COUNT)]
+    metadatas = [{'uuid': ids[i], 'file_id': f'file-{i % 4}', 'text': f'chunk {i}'} for i in range(COUNT)]
+    return ids, vectors, metadatas
+
+
+async def fill(db) -> tuple[list[str], np.ndarray]:
+    ids, vectors, metadatas = make_items()
+
+    async def items():
+        for i in range(COUNT):
+            yield ids[i], vectors[i].tolist(), metadatas[i]
+
+    assert await db.upsert_iter(db.test_collection, items(), batch_size=16) == COUNT
+    return ids, vectors
+
+
+@pytest.mark.asyncio
+async def test_upsert_iter_count_and_stats(db):
+    collection = db.test_collection
+    assert await db.count(collection) == 0
+    stats = await db.stats(collection)
+    assert stats['count'] == 0 and stats['dimension'] is None
+    assert isinstance(stats['backend'], str)
+
+    ids, vectors = await fill(db)
+
+    async def check_filled():
+        assert await db.count(collection) == COUNT
+        stats = await db.stats(collection)
+        assert stats['count'] == COUNT
+        assert stats['dimension'] == DIM
+
+    await eventually(check_filled)
+
+    # upserting existing ids replaces them, from a plain iterable this time
+    replaced = [(ids[i], (-vectors[i]).tolist(), {'uuid': ids[i], 'file_id': 'file-x', 'text': 'new'}) for i in (0, 1)]
+    assert await db.upsert_iter(collection, replaced) == 2
+
+    async def check_replaced():
+        assert await db.count(collection) == COUNT
+        result = await db.search(collection, (-vectors[0]).tolist(), k=1)
+        assert result['ids'][0] == [ids[0]]
+        assert result['metadatas'][0][0]['file_id'] == 'file-x'
+        assert result['metadatas'][0][0]['text'] == 'new'
+
+    await eventually(check_replaced)
+
+
+@pytest.mark.asyncio
+async def test_search_batch_matches_search(db):
+    collection = db.test_collection
+    ids, vectors = await fill(db)
+    queries = [vectors[i].tolist() for i in (3, 17, 29)]
+
+    async def check():
+        batch = await db.search_batch(collection, queries, k=5)
+        assert len(batch['ids']) == len(batch['distances']) == len(batch['metadatas']) == 3
+        for query, expected_id, hit_ids, metadatas in zip(
+            queries, (ids[3], ids[17], ids[29]), batch['ids'], batch['metadatas']
+        ):
+            assert len(hit_ids) == 5
+            assert hit_ids[0] == expected_id
+            assert metadatas[0]['uuid'] == expected_id
+            single = await db.search(collection, query, k=5)
+            assert single['ids'][0] == hit_ids
+
+    await eventually(check)
+    assert (await db.search_batch(collection, [], k=5))['ids'] == []
+
+
+@pytest.mark.asyncio
+async def test_delete_by_ids_and_file_id(db):
+    collection = db.test_collection
+    ids, vectors = await fill(db)
+    await eventually(lambda: _assert_count(db, COUNT))
+
+    await db.delete_by_ids(collection, ids[:5] + [str(uuid.uuid4())])
+    await eventually(lambda: _assert_count(db, COUNT - 5))
+
+    # file-1 holds the 10 chunks 1, 5, 9, ..., chunk 1 is deleted already
+    await db.delete_by_file_id(collection, 'file-1')
+    await eventually(lambda: _assert_count(db, COUNT - 5 - 9))
+
+    async def check_search():
+        result = await db.search_batch(collection, [vectors[0].tolist(), vectors[9].tolist()], k=COUNT)
+        for hit_ids in result['ids']:
+            assert len(hit_ids) == COUNT - 14
+            assert ids[0] not in hit_ids and ids[9] not in hit_ids
+
+    await eventually(check_search)
+
+
+@pytest.mark.asyncio
+async def test_search_filtered_by_file_ids(db):
+    if 'file_ids' not in inspect.signature(db.search).parameters:
+        pytest.skip(f'{type(db).__name__} does not filter searches by file')
+
+    collection = db.test_collection
+    ids, vectors = await fill(db)
+
+    async def check():
+        # chunk 0 is in file-0, the nearest chunks of file-2 and file-3 are returned instead
+        result = await db.search(collection, vectors[0].tolist(), k=COUNT, file_ids=['file-2', 'file-3'])
+        hit_ids = result['ids'][0]
+        assert sorted(hit_ids) == sorted(ids[i] for i in range(COUNT) if i % 4 in (2, 3))
+        assert {metadata['file_id'] for metadata in result['metadatas'][0]} == {'file-2', 'file-3'}
+
+        result = await db.search(collection, vectors[6].tolist(), k=3, file_ids=['file-2'])
+        assert result['ids'][0][0] == ids[6] and len(result['ids'][0]) == 3
+
+        result = await db.search(collection, vectors[0].tolist(), k=5, file_ids=[])
+        assert result['ids'][0] == []
+
+    await eventually(check)
+
+
+async def _assert_count(db, expected: int):
+    assert await db.count(db.test_collection) == expected
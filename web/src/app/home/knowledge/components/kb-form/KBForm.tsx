@@ -41,6 +41,7 @@ const getFormSchema = (t: (key: string) => string) =>
       .number()
       .min(1, { message: t('knowledge.topKRequired') })
       .max(30, { message: t('knowledge.topKMax') }),
+    retrieval_mode: z.enum(['vector', 'hybrid', 'lexical']),
   });
 
 export default function KBForm({
@@ -63,6 +64,7 @@ export default function KBForm({
       emoji: '📚',
       embeddingModelUUID: '',
       top_k: 5,
+      retrieval_mode: 'vector',
     },
   });
 
@@ -77,6 +79,7 @@ export default function KBForm({
           form.setValue('emoji', val.emoji);
           form.setValue('embeddingModelUUID', val.embeddingModelUUID);
           form.setValue('top_k', val.top_k || 5);
+          form.setValue('retrieval_mode', val.retrieval_mode);
         });
       }
     });
@@ -93,6 +96,9 @@ export default function KBForm({
           emoji: res.base.emoji || '📚',
           embeddingModelUUID: res.base.embedding_model_uuid,
           top_k: res.base.top_k || 5,
+          retrieval_mode:
+            (res.base.retrieval_mode as 'vector' | 'hybrid' | 'lexical') ||
+            'vector',
         });
       });
     });
@@ -122,6 +128,7 @@ export default function KBForm({
         emoji: data.emoji,
         embedding_model_uuid: data.embeddingModelUUID,
         top_k: data.top_k,
+        retrieval_mode: data.retrieval_mode,
       };
       httpClient
         .updateKnowledgeBase(initKbId, updateKb)
@@ -141,6 +148,7 @@ export default function KBForm({
         emoji: data.emoji,
         embedding_model_uuid: data.embeddingModelUUID,
         top_k: data.top_k,
+        retrieval_mode: data.retrieval_mode,
       };
       httpClient
         .createKnowledgeBase(newKb)
@@ -303,6 +311,37 @@ export default function KBForm({
                 </FormItem>
               )}
             />
+            <FormField
+              control={form.control}
+              name="retrieval_mode"
+              render={({ field }) => (
+                <FormItem>
+                  <FormLabel>{t('knowledge.retrievalMode')}</FormLabel>
+                  <FormControl>
+                    <Select onValueChange={field.onChange} value={field.value}>
+                      <SelectTrigger className="w-[240px] bg-[#ffffff] dark:bg-[#2a2a2e]">
+                        <SelectValue />
+                      </SelectTrigger>
+                      <SelectContent className="fixed z-[1000]">
+                        <SelectItem value="vector">
+                          {t('knowledge.retrievalModeVector')}
+                        </SelectItem>
+                        <SelectItem value="hybrid">
+                          {t('knowledge.retrievalModeHybrid')}
+                        </SelectItem>
+                        <SelectItem value="lexical">
+                          {t('knowledge.retrievalModeLexical')}
+                        </SelectItem>
+                      </SelectContent>
+                    </Select>
+                  </FormControl>
+                  <FormDescription>
+                    {t('knowledge.retrievalModeDescription')}
+                  </FormDescription>
+                  <FormMessage />
+                </FormItem>
+              )}
+            />
           </div>
         </form>
       </Form>
@@ -78,6 +78,7 @@ export interface KnowledgeBase {
   created_at?: string;
   updated_at?: string;
   top_k: number;
+  retrieval_mode?: string;
   emoji?: string;
 }
 
@@ -168,6 +169,7 @@ export interface KnowledgeBase {
   description: string;
   embedding_model_uuid: string;
   top_k: number;
+  retrieval_mode?: string;
   created_at?: string;
   updated_at?: string;
   emoji?: string;
@@ -274,9 +276,16 @@ export interface AsyncTaskRuntimeInfo {
   state: string;
 }
 
+export interface AsyncTaskProgress {
+  current: number;
+  total: number | null;
+  unit: string;
+}
+
 export interface AsyncTaskTaskContext {
   current_action: string;
   log: string;
+  progress: AsyncTaskProgress | null;
 }
 
 export interface AsyncTask {
@@ -362,6 +371,20 @@ export interface ApiRespKnowledgeBaseRetrieve {
   results: RetrieveResult[];
 }
 
+export interface DuplicateChunk {
+  content_hash: string;
+  count: number;
+  files: number;
+  preview: string;
+}
+
+export interface ApiRespKnowledgeBaseDedupReport {
+  total_chunks: number;
+  unique_chunks: number;
+  duplicate_chunks: number;
+  duplicates: DuplicateChunk[];
+}
+
 // MCP
 export interface ApiRespMCPServers {
   servers: MCPServer[];
@@ -28,6 +28,7 @@ import {
   KnowledgeBase,
   ApiRespKnowledgeBaseFiles,
   ApiRespKnowledgeBaseRetrieve,
+  ApiRespKnowledgeBaseDedupReport,
   ApiRespProviderEmbeddingModels,
   ApiRespProviderEmbeddingModel,
   EmbeddingModel,
@@ -454,6 +455,23 @@ export class BackendClient extends BaseHttpClient {
     return this.delete(`/api/v1/knowledge/bases/${uuid}/files/${file_id}`);
   }
 
+  public reindexKnowledgeBaseFile(
+    uuid: string,
+    file_id: string,
+    new_file_id: string,
+  ): Promise<{ task_id: string }> {
+    return this.post(
+      `/api/v1/knowledge/bases/${uuid}/files/${file_id}/reindex`,
+      { file_id: new_file_id },
+    );
+  }
+
+  public getKnowledgeBaseDedupReport(
+    uuid: string,
+  ): Promise<ApiRespKnowledgeBaseDedupReport> {
+    return this.get(`/api/v1/knowledge/bases/${uuid}/dedup-report`);
+  }
+
   public deleteKnowledgeBase(uuid: string): Promise<object> {
     return this.delete(`/api/v1/knowledge/bases/${uuid}`);
   }
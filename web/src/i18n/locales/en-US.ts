@@ -696,6 +696,12 @@ const enUS = {
     topKMax: 'Top K maximum value is 30',
     topKdescription:
       'Used to specify the number of relevant documents to retrieve, ranging from 1 to 30.',
+    retrievalMode: 'Retrieval Mode',
+    retrievalModeDescription:
+      'Hybrid also matches keywords such as product codes, error messages and names; keyword only does not call the embedding model for queries',
+    retrievalModeVector: 'Vector',
+    retrievalModeHybrid: 'Hybrid (vector + keyword)',
+    retrievalModeLexical: 'Keyword only',
     defaultDescription: 'A knowledge base',
     embeddingModelUUID: 'Embedding Model',
     selectEmbeddingModel: 'Select Embedding Model',
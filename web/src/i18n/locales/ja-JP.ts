@@ -698,6 +698,12 @@ const jaJP = {
     topKMax: 'Top Kの最大値は30です',
     topKdescription:
       '取得する関連性の高い上位K件の文書の数。1～30の範囲で設定できます',
+    retrievalMode: '検索モード',
+    retrievalModeDescription:
+      'ハイブリッドは製品コード、エラーメッセージ、名前などのキーワードにも一致します。キーワードのみはクエリに埋め込みモデルを呼び出しません',
+    retrievalModeVector: 'ベクトル',
+    retrievalModeHybrid: 'ハイブリッド（ベクトル + キーワード）',
+    retrievalModeLexical: 'キーワードのみ',
     defaultDescription: '知識ベース',
     embeddingModelUUID: '埋め込みモデル',
     selectEmbeddingModel: '埋め込みモデルを選択',
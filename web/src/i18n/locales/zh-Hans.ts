@@ -670,6 +670,12 @@ const zhHans = {
     topKRequired: '召回数量不能为空',
     topKMax: '召回数量最大值为 30',
     topKdescription: '召回相关文档块的数量，取值范围为 1-30',
+    retrievalMode: '检索模式',
+    retrievalModeDescription:
+      '混合检索还会匹配产品编号、错误信息、名称等关键词；仅关键词模式检索时不调用嵌入模型',
+    retrievalModeVector: '向量',
+    retrievalModeHybrid: '混合（向量 + 关键词）',
+    retrievalModeLexical: '仅关键词',
     defaultDescription: '一个知识库',
     embeddingModelUUID: '嵌入模型',
     selectEmbeddingModel: '选择嵌入模型',
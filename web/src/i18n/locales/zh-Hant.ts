@@ -663,6 +663,12 @@ const zhHant = {
     topKRequired: '召回數量不能為空',
     topKMax: '召回數量最大值為30',
     topKdescription: '取得相關性高的上位 K 件文獻的數量，範圍為1～30',
+    retrievalMode: '檢索模式',
+    retrievalModeDescription:
+      '混合檢索還會比對產品編號、錯誤訊息、名稱等關鍵字；僅關鍵字模式檢索時不呼叫嵌入模型',
+    retrievalModeVector: '向量',
+    retrievalModeHybrid: '混合（向量 + 關鍵字）',
+    retrievalModeLexical: '僅關鍵字',
     defaultDescription: '一個知識庫',
     embeddingModelUUID: '嵌入模型',
     selectEmbeddingModel: '選擇嵌入模型',